@@ -0,0 +1,192 @@
+"""
+In-memory agent registration status
+Kept current from AgentRegistry events pushed by the log subscription and a periodic isActiveAgent probe
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from hexbytes import HexBytes
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+# AgentRegistry events that change whether a DID is active, and the state each one leaves it in
+STATUS_EVENTS = {
+    "AgentRegistered": True,
+    "AgentDeactivated": False,
+    "AgentReactivated": True,
+}
+
+
+class AgentStatus:
+    """
+    Whether this agent's DID is registered and active, served from memory
+
+    The value comes from an isActiveAgent probe at start and every probe_interval
+    seconds after that. While the log subscription is live, AgentRegistered,
+    AgentDeactivated and AgentReactivated events for the DID update it as they are
+    mined, and the probe only runs every push_probe_interval seconds as a safety net.
+    A removed (reorged) event or a reconnect triggers a probe straight away.
+    """
+
+    def __init__(
+        self,
+        somnia_client,
+        did: str,
+        probe_interval: Optional[float] = None,
+        push_probe_interval: Optional[float] = None,
+    ):
+        """
+        Args:
+            somnia_client: SomniaClient with the AgentRegistry contract loaded
+            did: Agent DID to follow
+            probe_interval: Seconds between probes while polling
+            push_probe_interval: Seconds between probes while events are pushed
+        """
+        self.somnia_client = somnia_client
+        self.did = did
+        self.did_hash = Web3.keccak(text=did)
+        self.probe_interval = probe_interval or float(os.getenv("AGENT_STATUS_PROBE_INTERVAL", "60"))
+        self.push_probe_interval = push_probe_interval or float(os.getenv("AGENT_STATUS_PUSH_PROBE_INTERVAL", "600"))
+        self.live = False
+
+        self.active: Optional[bool] = None
+        self.source: Optional[str] = None
+        self.updated_at: Optional[float] = None
+        # (blockNumber, logIndex) of the newest event applied, so late or replayed logs can't roll it back
+        self._last_event: Optional[tuple] = None
+        # Bumped by every set(), so a probe that was in flight doesn't overwrite a newer event
+        self._changes = 0
+
+        self._task: Optional[asyncio.Task] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+        # Metrics
+        self.probes = 0
+        self.events_applied = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def registry(self):
+        return self.somnia_client.agent_registry
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "active": self.active,
+            "source": self.source,
+            "age_seconds": round(time.time() - self.updated_at, 3) if self.updated_at else None,
+            "live": self.live,
+            "probes": self.probes,
+            "events_applied": self.events_applied,
+            "last_error": self.last_error,
+        }
+
+    def start(self):
+        """Probe now and keep the status current in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._probe_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._probe_task = None
+
+    def set(self, active: bool, source: str):
+        """Record a status learned elsewhere (e.g. from our own registration transaction)"""
+        self.active = active
+        self.source = source
+        self.updated_at = time.time()
+        self._changes += 1
+
+    async def get(self) -> bool:
+        """
+        Current status, from memory once the first probe has finished
+
+        Raises:
+            Exception: The status has never been read and the probe failed
+        """
+        if self.active is None:
+            await self.probe()
+        return self.active
+
+    async def probe(self) -> bool:
+        """Read isActiveAgent now; concurrent callers share one read"""
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe())
+        return await asyncio.shield(self._probe_task)
+
+    async def _probe(self) -> bool:
+        self.probes += 1
+        changes = self._changes
+        active = await self.somnia_client.is_agent_active(self.did)
+        if self._changes == changes:
+            self.set(active, "probe")
+        return self.active
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe()
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Agent status probe failed: {e}")
+
+            interval = self.push_probe_interval if self.live else self.probe_interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def subscription_filter(self) -> Optional[Dict[str, Any]]:
+        """eth_subscribe("logs") filter for this DID's status events"""
+        if not self.registry:
+            return None
+        topics = [getattr(self.registry.events, name).topic for name in STATUS_EVENTS]
+        return {"address": self.registry.address, "topics": [topics, "0x" + self.did_hash.hex()]}
+
+    def set_live(self, live: bool):
+        """Switch probe cadence; either way, probe now to cover events missed while disconnected"""
+        self.live = live
+        self._wake.set()
+
+    def on_log(self, log):
+        """Apply a pushed status event for the DID"""
+        topics: List[HexBytes] = [HexBytes(topic) for topic in log["topics"]]
+        if len(topics) < 2 or topics[1] != self.did_hash:
+            return
+        if log.get("removed"):
+            # The event was reorged out; the chain has the answer
+            self._wake.set()
+            return
+
+        position = (_as_int(log["blockNumber"]), _as_int(log["logIndex"]))
+        if self._last_event is not None and position <= self._last_event:
+            return
+        for name, active in STATUS_EVENTS.items():
+            if topics[0] == HexBytes(getattr(self.registry.events, name).topic):
+                self._last_event = position
+                self.events_applied += 1
+                self.set(active, name)
+                logger.info(f"Agent status from {name} at block {position[0]}: active={active}")
+                return
+
+
+def _as_int(value: Any) -> int:
+    """Block numbers and log indexes arrive as ints from web3 and as hex strings from raw JSON-RPC"""
+    return int(value, 16) if isinstance(value, str) else value
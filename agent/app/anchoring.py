@@ -0,0 +1,331 @@
+"""
+Batched provenance anchoring
+Collects execution roots per NFT, anchors each batch's Merkle root in one Provenance record
+"""
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .verifiable import MerkleTree
+
+logger = logging.getLogger(__name__)
+
+BATCH_MANIFEST_TYPE = "provenance_batch"
+
+
+def normalize_root(root: str) -> str:
+    """Normalize a bytes32 hex string to lowercase with 0x prefix"""
+    return "0x" + root.lower().removeprefix("0x")
+
+
+@dataclass
+class PendingAnchor:
+    """Handle returned to a caller while its execution waits for the batch transaction"""
+    nft_token_id: int
+    input_cid: str
+    input_root: str
+    output_cid: str
+    execution_root: str
+    trace_cid: str
+    submitted_at: float = field(default_factory=time.time)
+    status: str = "pending"  # "pending", "anchored" or "failed"
+    record_id: Optional[int] = None
+    tx_hash: Optional[str] = None
+    batch_root: Optional[str] = None
+    manifest_cid: Optional[str] = None
+    leaf_index: Optional[int] = None
+    leaf_count: Optional[int] = None
+    proof: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    _future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self._future = asyncio.get_running_loop().create_future()
+
+    async def wait(self, timeout: Optional[float] = None) -> "PendingAnchor":
+        """Wait until the batch containing this execution is anchored"""
+        await asyncio.wait_for(asyncio.shield(self._future), timeout)
+        return self
+
+    def add_done_callback(self, callback: Callable[["PendingAnchor"], None]):
+        """Call callback(anchor) once the batch is anchored or has failed"""
+        self._future.add_done_callback(lambda _: callback(self))
+
+    @classmethod
+    def settled(cls, row: Dict[str, Any]) -> "PendingAnchor":
+        """An anchored handle rebuilt from its DocumentDatabase.get_provenance_anchor row"""
+        anchor = cls(
+            nft_token_id=row["nft_token_id"],
+            input_cid=row["input_cid"],
+            input_root=row["input_root"],
+            output_cid=row["output_cid"],
+            execution_root=row["execution_root"],
+            trace_cid=row["trace_cid"],
+            status="anchored",
+            record_id=row["record_id"],
+            tx_hash=row["tx_hash"],
+            batch_root=row["batch_root"],
+            manifest_cid=row["manifest_cid"],
+            leaf_index=row["leaf_index"],
+            leaf_count=row["leaf_count"],
+            proof=row["proof"],
+        )
+        anchor._future.set_result({"tx_hash": row["tx_hash"], "record_id": row["record_id"]})
+        return anchor
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "execution_root": self.execution_root,
+            "nft_token_id": self.nft_token_id,
+            "input_cid": self.input_cid,
+            "input_root": self.input_root,
+            "output_cid": self.output_cid,
+            "trace_cid": self.trace_cid,
+            "record_id": self.record_id,
+            "tx_hash": self.tx_hash,
+            "batch_root": self.batch_root,
+            "manifest_cid": self.manifest_cid,
+            "leaf_index": self.leaf_index,
+            "leaf_count": self.leaf_count,
+            "proof": self.proof,
+            "error": self.error,
+        }
+
+
+class ProvenanceAnchor:
+    """
+    Batching anchor service for provenance records
+
+    Executions are grouped per NFT token (Provenance indexes records by token).
+    A batch is flushed when it reaches max_batch_size or window_seconds after its
+    first execution arrived. A batch of one is recorded exactly like before; larger
+    batches upload a manifest listing every execution to IPFS and record the Merkle
+    root of their execution roots, so each execution can be proven by inclusion.
+
+    Pending handles live in memory. Once a batch settles, where each execution
+    ended up (record, batch root, manifest and proof) is also stored in the
+    database, so it can still be looked up after a restart or once its handle
+    has been pruned.
+    """
+
+    def __init__(
+        self,
+        somnia_client,
+        ipfs_client,
+        agent_did: str,
+        window_seconds: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+        db=None,
+    ):
+        """
+        Args:
+            somnia_client: SomniaClient used to send the anchor transaction
+            ipfs_client: IPFSClient used to store batch manifests
+            agent_did: DID recorded as the executing agent
+            window_seconds: Max time an execution waits for its batch to fill
+            max_batch_size: Flush as soon as a batch holds this many executions
+            db: DocumentDatabase keeping settled anchors (in memory only without it)
+        """
+        self.somnia_client = somnia_client
+        self.ipfs_client = ipfs_client
+        self.agent_did = agent_did
+        self.window_seconds = window_seconds if window_seconds is not None else float(
+            os.getenv("PROVENANCE_BATCH_WINDOW_SECONDS", "2.0")
+        )
+        self.max_batch_size = max_batch_size or int(os.getenv("PROVENANCE_BATCH_MAX_SIZE", "32"))
+        self.max_tracked = int(os.getenv("PROVENANCE_ANCHOR_HISTORY", "10000"))
+        self.db = db
+
+        self._batches: Dict[int, List[PendingAnchor]] = {}
+        self._timers: Dict[int, asyncio.Task] = {}
+        self._flushes: set = set()
+        self._anchors: Dict[str, PendingAnchor] = {}
+
+    async def submit(
+        self,
+        nft_token_id: int,
+        input_cid: str,
+        input_root: str,
+        output_cid: str,
+        execution_root: str,
+        trace_cid: str,
+    ) -> PendingAnchor:
+        """
+        Queue an execution for anchoring
+
+        Returns immediately with a pending handle; the same execution root submitted
+        twice returns the existing handle (rebuilt from the database once anchored).
+        """
+        key = normalize_root(execution_root)
+        existing = self._anchors.get(key) or await self._load(key)
+        if existing and existing.status != "failed":
+            return existing
+
+        anchor = PendingAnchor(
+            nft_token_id=nft_token_id,
+            input_cid=input_cid,
+            input_root=input_root,
+            output_cid=output_cid,
+            execution_root=execution_root,
+            trace_cid=trace_cid,
+        )
+        self._anchors[key] = anchor
+
+        batch = self._batches.setdefault(nft_token_id, [])
+        batch.append(anchor)
+        logger.info(f"Queued execution {key[:18]} for NFT #{nft_token_id} anchoring ({len(batch)}/{self.max_batch_size})")
+
+        if len(batch) >= self.max_batch_size:
+            self._start_flush(nft_token_id)
+        elif nft_token_id not in self._timers:
+            self._timers[nft_token_id] = asyncio.create_task(self._flush_after_window(nft_token_id))
+
+        return anchor
+
+    def get(self, execution_root: str) -> Optional[PendingAnchor]:
+        """Look up the in-memory handle for an execution root"""
+        return self._anchors.get(normalize_root(execution_root))
+
+    async def lookup(self, execution_root: str) -> Optional[PendingAnchor]:
+        """Look up the handle for an execution root, falling back to the database"""
+        key = normalize_root(execution_root)
+        return self._anchors.get(key) or await self._load(key)
+
+    async def _load(self, key: str) -> Optional[PendingAnchor]:
+        if self.db is None:
+            return None
+        row = await asyncio.to_thread(self.db.get_provenance_anchor, key)
+        return PendingAnchor.settled(row) if row else None
+
+    async def flush(self):
+        """Anchor every queued batch now (used on shutdown)"""
+        for nft_token_id in list(self._batches):
+            self._start_flush(nft_token_id)
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def _flush_after_window(self, nft_token_id: int):
+        await asyncio.sleep(self.window_seconds)
+        self._timers.pop(nft_token_id, None)
+        self._start_flush(nft_token_id)
+
+    def _start_flush(self, nft_token_id: int):
+        timer = self._timers.pop(nft_token_id, None)
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+
+        batch = self._batches.pop(nft_token_id, None)
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._anchor_batch(nft_token_id, batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _anchor_batch(self, nft_token_id: int, batch: List[PendingAnchor]):
+        """Send one Provenance record for a batch and resolve every handle in it"""
+        leaves = [normalize_root(a.execution_root) for a in batch]
+        tree = MerkleTree(leaves)
+        manifest_cid = None
+
+        try:
+            if len(batch) == 1:
+                # A one-leaf tree's root is the leaf itself, so record it as a plain execution
+                only = batch[0]
+                result = await self.somnia_client.record_provenance(
+                    nft_token_id=nft_token_id,
+                    input_cid=only.input_cid,
+                    input_root=only.input_root,
+                    output_cid=only.output_cid,
+                    execution_root=only.execution_root,
+                    trace_cid=only.trace_cid,
+                    agent_did=self.agent_did
+                )
+            else:
+                input_tree = MerkleTree([normalize_root(a.input_root) for a in batch])
+                manifest = {
+                    "type": BATCH_MANIFEST_TYPE,
+                    "version": 1,
+                    "nft_token_id": nft_token_id,
+                    "agent_did": self.agent_did,
+                    "batch_root": tree.root,
+                    "input_root": input_tree.root,
+                    "execution_roots": leaves,
+                    "executions": [
+                        {
+                            "input_cid": a.input_cid,
+                            "input_root": a.input_root,
+                            "output_cid": a.output_cid,
+                            "execution_root": a.execution_root,
+                            "trace_cid": a.trace_cid,
+                        }
+                        for a in batch
+                    ],
+                    "timestamp": int(time.time()),
+                }
+                manifest_cid = await self.ipfs_client.upload_json(
+                    manifest,
+                    f"batch-{tree.root.removeprefix('0x')[:10]}.json"
+                )
+                result = await self.somnia_client.record_provenance(
+                    nft_token_id=nft_token_id,
+                    input_cid=manifest_cid,
+                    input_root=input_tree.root,
+                    output_cid=manifest_cid,
+                    execution_root=tree.root,
+                    trace_cid=manifest_cid,
+                    agent_did=self.agent_did
+                )
+        except Exception as e:
+            logger.error(f"Anchoring batch of {len(batch)} for NFT #{nft_token_id} failed: {e}", exc_info=True)
+            for anchor in batch:
+                anchor.status = "failed"
+                anchor.error = str(e)
+                anchor._future.set_exception(e)
+                # Nobody may be waiting on the handle; mark the exception as retrieved
+                anchor._future.exception()
+            return
+
+        logger.info(
+            f"Anchored batch of {len(batch)} executions for NFT #{nft_token_id}: "
+            f"record {result['record_id']}, tx {result['tx_hash']}"
+        )
+
+        for index, anchor in enumerate(batch):
+            anchor.status = "anchored"
+            anchor.record_id = result["record_id"]
+            anchor.tx_hash = result["tx_hash"]
+            anchor.batch_root = tree.root
+            anchor.manifest_cid = manifest_cid
+            anchor.leaf_index = index
+            anchor.leaf_count = len(batch)
+            anchor.proof = tree.get_proof(index)
+
+        if self.db is not None:
+            try:
+                await asyncio.to_thread(self.db.store_provenance_anchors, [anchor.to_dict() for anchor in batch])
+            except Exception as e:
+                # The batch is on-chain either way; only lookups after a restart lose it
+                logger.error(f"Storing anchors of record {result['record_id']} failed: {e}")
+
+        for anchor in batch:
+            anchor._future.set_result(result)
+
+        self._prune()
+
+    def _prune(self):
+        """Forget the oldest settled handles once more than max_tracked are held"""
+        excess = len(self._anchors) - self.max_tracked
+        if excess <= 0:
+            return
+        for key in list(self._anchors):
+            if excess <= 0:
+                break
+            if self._anchors[key].status != "pending":
+                del self._anchors[key]
+                excess -= 1
@@ -0,0 +1,153 @@
+"""
+In-memory cache of positive NFT authentication decisions
+Entries expire after a TTL and are dropped as soon as a pushed Transfer event moves a token to or from the address
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from hexbytes import HexBytes
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+# ERC-721 Transfer(address indexed from, address indexed to, uint256 indexed tokenId)
+TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)")
+
+
+class AuthCache:
+    """
+    Authenticated addresses and their token IDs, served from memory
+
+    Only positive decisions are kept, so a user who has just minted is recognized
+    on their next request. While the log subscription is live, every Transfer of
+    the access NFT drops the sender's and receiver's entries as it is mined, and
+    entries live for ttl seconds. Without it a transfer is only noticed when the
+    entry expires, so entries then live for the shorter poll_ttl; the cache is
+    also cleared whenever the subscription connects or drops, since transfers in
+    between may have been missed.
+    """
+
+    def __init__(
+        self,
+        access_nft_address: str,
+        ttl: Optional[float] = None,
+        poll_ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        """
+        Args:
+            access_nft_address: Contract whose Transfer events invalidate entries
+            ttl: Seconds a decision is reused while Transfer events are pushed
+            poll_ttl: Seconds a decision is reused without the log subscription
+            max_entries: Addresses kept; least recently used ones are dropped past it
+        """
+        self.access_nft_address = Web3.to_checksum_address(access_nft_address)
+        self.ttl = ttl or float(os.getenv("AUTH_CACHE_TTL", "300"))
+        self.poll_ttl = poll_ttl or float(os.getenv("AUTH_CACHE_POLL_TTL", "15"))
+        self.max_entries = max_entries or int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+        self.live = False
+
+        # lowercase address -> (token ID, expiry)
+        self._entries: "OrderedDict[str, Tuple[Optional[int], float]]" = OrderedDict()
+        # In-flight chain reads, shared by concurrent checks of one address
+        self._reads: Dict[str, asyncio.Task] = {}
+        # Bumped by every invalidation, so a read that was in flight isn't stored over it
+        self._generation = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "live": self.live,
+            "ttl_seconds": self.ttl if self.live else self.poll_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+    def cached(self, address: str) -> Optional[Tuple[bool, Optional[int]]]:
+        """(True, token ID) if a fresh positive decision is held for address, else None"""
+        key = address.lower()
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    async def decision(
+        self,
+        address: str,
+        read: Callable[[], Awaitable[Tuple[bool, Optional[int]]]],
+    ) -> Tuple[bool, Optional[int]]:
+        """
+        Authentication state and token ID of address, from memory or one shared read
+
+        Args:
+            address: User's wallet address
+            read: Reads (authenticated, token ID) from the chain
+
+        Returns:
+            Whether the address is authenticated, and its token ID
+        """
+        cached = self.cached(address)
+        if cached is not None:
+            return cached
+
+        key = address.lower()
+        self.misses += 1
+        task = self._reads.get(key)
+        if task is None:
+            task = asyncio.create_task(self._read(key, read))
+            self._reads[key] = task
+            task.add_done_callback(lambda _: self._reads.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _read(self, key: str, read) -> Tuple[bool, Optional[int]]:
+        generation = self._generation
+        authenticated, token_id = await read()
+        if authenticated and self._generation == generation:
+            ttl = self.ttl if self.live else self.poll_ttl
+            self._entries[key] = (token_id, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return authenticated, token_id
+
+    def invalidate(self, address: Optional[str] = None):
+        """Forget one address, or every address when none is given"""
+        self._generation += 1
+        self.invalidations += 1
+        if address is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(address.lower(), None)
+
+    def subscription_filter(self) -> Optional[Dict[str, Any]]:
+        """eth_subscribe("logs") filter for the access NFT's Transfer events"""
+        return {"address": self.access_nft_address, "topics": ["0x" + TRANSFER_TOPIC.hex()]}
+
+    def set_live(self, live: bool):
+        """Switch TTLs; either way, drop everything a missed Transfer could have changed"""
+        self.live = live
+        self.invalidate()
+
+    def on_log(self, log):
+        """Drop the entries of both sides of a pushed (or reorged-out) Transfer"""
+        topics = [HexBytes(topic) for topic in log["topics"]]
+        if len(topics) < 3 or topics[0] != TRANSFER_TOPIC:
+            return
+        for topic in topics[1:3]:
+            address = "0x" + topic[-20:].hex()
+            if address != "0x" + "00" * 20:
+                self.invalidate(address)
+                logger.debug(f"Auth cache entry for {address} dropped on Transfer")
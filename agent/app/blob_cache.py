@@ -0,0 +1,288 @@
+"""
+On-disk content-addressed cache of IPFS content
+Blobs are keyed by CID, checked against it on insert and evicted least recently used past a size bound
+"""
+
+import os
+import re
+import mmap
+import asyncio
+import logging
+import tempfile
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from app.cid import verify
+
+logger = logging.getLogger(__name__)
+
+# CIDs are base58 or base32 strings; anything else never becomes a file name
+CID_PATTERN = re.compile(r"^[A-Za-z0-9]{10,128}$")
+
+Blob = Union[bytes, mmap.mmap]
+
+
+class BlobCache:
+    """
+    IPFS content by CID, stored as one file per CID
+
+    CIDs are immutable, so an entry never goes stale: it is only dropped to keep
+    the cache under max_bytes, least recently used first. Content is stored only
+    if its CID can be recomputed from it (see app.cid.verify), so a gateway that
+    serves the wrong bytes can't poison later reads. Concurrent misses for one CID
+    share one download. Hits of at least mmap_threshold bytes are returned
+    memory-mapped instead of read into memory.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        mmap_threshold: Optional[int] = None,
+    ):
+        """
+        Args:
+            directory: Where blobs are stored
+            max_bytes: Total size kept; least recently used blobs are dropped past it
+            mmap_threshold: Hits this large or larger are returned as read-only mmaps
+        """
+        self.directory = directory or os.getenv("IPFS_CACHE_DIR", "./data/ipfs-cache")
+        self.max_bytes = max_bytes or int(os.getenv("IPFS_CACHE_MAX_BYTES", str(1024 ** 3)))
+        self.mmap_threshold = mmap_threshold or int(os.getenv("IPFS_CACHE_MMAP_THRESHOLD", str(1024 ** 2)))
+
+        # CID -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        # In-flight downloads, shared by concurrent misses of one CID
+        self._downloads: Dict[str, asyncio.Task] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.unverified = 0
+        self.evictions = 0
+
+        self._load()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "unverified": self.unverified,
+            "evictions": self.evictions,
+        }
+
+    def _load(self):
+        """Index blobs left by a previous run, oldest access first"""
+        if not os.path.isdir(self.directory):
+            return
+        blobs = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and CID_PATTERN.match(entry.name):
+                stat = entry.stat()
+                blobs.append((stat.st_mtime, entry.name, stat.st_size))
+            elif entry.name.startswith(".tmp"):
+                os.unlink(entry.path)
+        for _, cid, size in sorted(blobs):
+            self._entries[cid] = size
+            self._size += size
+        self._evict()
+        if self._entries:
+            logger.info(f"IPFS cache: {len(self._entries)} blobs, {self._size} bytes in {self.directory}")
+
+    def _path(self, cid: str) -> str:
+        return os.path.join(self.directory, cid)
+
+    # ============ Reads ============
+
+    def cached(self, cid: str) -> Optional[Blob]:
+        """Content of cid if it is cached, else None"""
+        size = self._entries.get(cid)
+        if size is None:
+            return None
+        try:
+            with open(self._path(cid), "rb") as f:
+                if size >= self.mmap_threshold:
+                    blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    blob = f.read()
+            # The file's mtime carries the LRU order across restarts
+            os.utime(self._path(cid))
+        except OSError as e:
+            logger.warning(f"IPFS cache entry {cid} unreadable ({e}), dropping it")
+            self._drop(cid)
+            return None
+        self._entries.move_to_end(cid)
+        self.hits += 1
+        return blob
+
+    async def get(self, cid: str, download: Callable[[], Awaitable[bytes]]) -> Blob:
+        """
+        Content of cid, from disk or one shared download
+
+        Args:
+            cid: Content identifier
+            download: Fetches the content from the network
+
+        Returns:
+            The content; a read-only mmap for large hits
+        """
+        blob = self.cached(cid)
+        if blob is not None:
+            return blob
+
+        self.misses += 1
+        task = self._downloads.get(cid)
+        if task is None:
+            task = asyncio.create_task(self._download(cid, download))
+            self._downloads[cid] = task
+            task.add_done_callback(lambda _: self._downloads.pop(cid, None))
+        return await asyncio.shield(task)
+
+    async def _download(self, cid: str, download) -> bytes:
+        data = await download()
+        await self.put(cid, data)
+        return data
+
+    # ============ Writes ============
+
+    async def put(self, cid: str, data: bytes) -> bool:
+        """
+        Store content under its CID if it verifies against it
+
+        Returns:
+            Whether the content was stored
+        """
+        if cid in self._entries:
+            return True
+        if not CID_PATTERN.match(cid) or len(data) > self.max_bytes:
+            return False
+        # Hashing and writing a large document would otherwise stall the event loop
+        try:
+            stored = await asyncio.to_thread(self._write, cid, data)
+        except OSError as e:
+            logger.warning(f"Could not cache IPFS content for {cid}: {e}")
+            return False
+        return self._stored(cid, len(data), stored)
+
+    def writer(self) -> "BlobWriter":
+        """Start writing content whose CID is only known once it has been uploaded"""
+        os.makedirs(self.directory, exist_ok=True)
+        return BlobWriter(self)
+
+    async def commit(self, writer: "BlobWriter", cid: str) -> bool:
+        """
+        Store streamed content under its CID if it verifies against it
+
+        Returns:
+            Whether the content was stored
+        """
+        writer.close()
+        if writer.path is None:
+            return False
+        if cid in self._entries or not CID_PATTERN.match(cid):
+            writer.discard()
+            return cid in self._entries
+        try:
+            stored = await asyncio.to_thread(self._commit_file, writer.path, writer.size, cid)
+        except OSError as e:
+            logger.warning(f"Could not cache IPFS content for {cid}: {e}")
+            writer.discard()
+            return False
+        return self._stored(cid, writer.size, stored)
+
+    def _stored(self, cid: str, size: int, stored: bool) -> bool:
+        if not stored:
+            self.unverified += 1
+            logger.warning(f"IPFS content for {cid} does not match its CID under the default layout; not caching it")
+            return False
+        if cid not in self._entries:
+            self._entries[cid] = size
+            self._size += size
+            self._evict()
+        return True
+
+    def _write(self, cid: str, data: bytes) -> bool:
+        if not verify(cid, data):
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(cid))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return True
+
+    def _commit_file(self, path: str, size: int, cid: str) -> bool:
+        with open(path, "rb") as f:
+            # Hashed through a mapping, so verifying a large upload doesn't read it into memory
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            try:
+                verified = verify(cid, data)
+            finally:
+                if size:
+                    data.close()
+        if not verified:
+            os.unlink(path)
+            return False
+        os.replace(path, self._path(cid))
+        return True
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            cid = next(iter(self._entries))
+            self._drop(cid)
+            self.evictions += 1
+
+    def _drop(self, cid: str):
+        self._size -= self._entries.pop(cid, 0)
+        try:
+            # Open mmaps of the blob stay valid after the unlink
+            os.unlink(self._path(cid))
+        except FileNotFoundError:
+            pass
+
+
+class BlobWriter:
+    """
+    Content written into the cache directory as it streams past, e.g. to an upload
+
+    Gives up (and frees its file) once the content outgrows the cache, so the
+    write-through never holds more than max_bytes on disk.
+    """
+
+    def __init__(self, cache: BlobCache):
+        self.max_bytes = cache.max_bytes
+        fd, self.path = tempfile.mkstemp(prefix=".tmp", dir=cache.directory)
+        self._file = os.fdopen(fd, "wb")
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        if self._file is None:
+            return
+        if self.size + len(chunk) > self.max_bytes:
+            self.discard()
+            return
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Drop what was written; later writes are ignored"""
+        self.close()
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
@@ -0,0 +1,159 @@
+"""
+Block timestamp lookup for event decoding
+Persistent block-number to timestamp table with batched header fetching for misses
+"""
+
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from web3 import AsyncWeb3
+
+from app.database import DocumentDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class BlockTimestamps:
+    """
+    Resolves block timestamps without a header request per event
+
+    Lookups go memory -> SQLite -> chain. Misses are fetched together as one JSON-RPC
+    batch of eth_getBlockByNumber calls and persisted, so a block's header is read from
+    the node once. More than batch_size misses become several batches sent concurrently.
+
+    In "interpolate" mode only the lowest and highest missing blocks are fetched and
+    the blocks between them get a linearly interpolated timestamp. That is good to a
+    second or so on a chain with steady block times and is meant for display; the
+    interpolated values are never persisted, so a later exact lookup still fetches.
+    Callers that store what they get (the event indexers) pass exact=True.
+    """
+
+    def __init__(
+        self,
+        w3: AsyncWeb3,
+        db: DocumentDatabase,
+        mode: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        memory_size: Optional[int] = None,
+    ):
+        """
+        Args:
+            w3: Async Web3 instance
+            db: Database holding the block_timestamps table
+            mode: "exact" (default) or "interpolate"
+            batch_size: Headers per JSON-RPC batch request
+            memory_size: Timestamps kept in the in-process LRU
+        """
+        self.w3 = w3
+        self.db = db
+        self.mode = (mode or os.getenv("BLOCK_TIMESTAMP_MODE", "exact")).lower()
+        self.batch_size = batch_size or int(os.getenv("BLOCK_TIMESTAMP_BATCH_SIZE", "100"))
+        self.memory_size = memory_size or int(os.getenv("BLOCK_TIMESTAMP_MEMORY_SIZE", "50000"))
+        self._memory: "OrderedDict[int, int]" = OrderedDict()
+
+        # Metrics
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.fetched = 0
+        self.interpolated = 0
+        self.batches = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "fetched": self.fetched,
+            "interpolated": self.interpolated,
+            "batches": self.batches,
+        }
+
+    def _remember(self, timestamps: Dict[int, int]):
+        for number, timestamp in timestamps.items():
+            self._memory[number] = timestamp
+            self._memory.move_to_end(number)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    async def get_many(self, block_numbers: Iterable[int], exact: bool = False) -> Dict[int, int]:
+        """
+        Get timestamps for a set of blocks
+
+        Args:
+            block_numbers: Block numbers (duplicates are fine)
+            exact: Fetch every missing header even in "interpolate" mode
+
+        Returns:
+            Mapping of every requested block number to its timestamp
+        """
+        wanted = sorted(set(block_numbers))
+        result: Dict[int, int] = {}
+
+        missing = []
+        for number in wanted:
+            if number in self._memory:
+                self._memory.move_to_end(number)
+                result[number] = self._memory[number]
+            else:
+                missing.append(number)
+        self.memory_hits += len(result)
+        if not missing:
+            return result
+
+        # SQLite calls stay off the event loop during large backfills
+        stored = await asyncio.to_thread(self.db.get_block_timestamps, missing)
+        self.db_hits += len(stored)
+        self._remember(stored)
+        result.update(stored)
+        missing = [number for number in missing if number not in stored]
+        if not missing:
+            return result
+
+        if self.mode == "interpolate" and not exact and len(missing) > 2:
+            anchors = await self._fetch([missing[0], missing[-1]])
+            result.update(anchors)
+            result.update(self._interpolate(missing, anchors))
+        else:
+            result.update(await self._fetch(missing))
+        return result
+
+    async def _fetch(self, block_numbers: List[int]) -> Dict[int, int]:
+        """Read headers for block_numbers in JSON-RPC batches and persist them"""
+        chunks = [
+            block_numbers[start:start + self.batch_size]
+            for start in range(0, len(block_numbers), self.batch_size)
+        ]
+        results = await asyncio.gather(*[self._fetch_batch(chunk) for chunk in chunks])
+
+        fetched: Dict[int, int] = {}
+        for chunk_result in results:
+            fetched.update(chunk_result)
+
+        self.fetched += len(fetched)
+        await asyncio.to_thread(self.db.store_block_timestamps, fetched)
+        self._remember(fetched)
+        return fetched
+
+    async def _fetch_batch(self, block_numbers: List[int]) -> Dict[int, int]:
+        self.batches += 1
+        async with self.w3.batch_requests() as batch:
+            for number in block_numbers:
+                batch.add(self.w3.eth.get_block(number))
+            blocks = await batch.async_execute()
+        return {number: block['timestamp'] for number, block in zip(block_numbers, blocks)}
+
+    def _interpolate(self, block_numbers: List[int], anchors: Dict[int, int]) -> Dict[int, int]:
+        """Estimate timestamps between the two fetched anchor blocks"""
+        low, high = block_numbers[0], block_numbers[-1]
+        low_time, high_time = anchors[low], anchors[high]
+        seconds_per_block = (high_time - low_time) / (high - low)
+
+        estimates = {
+            number: round(low_time + (number - low) * seconds_per_block)
+            for number in block_numbers[1:-1]
+        }
+        self.interpolated += len(estimates)
+        return estimates
@@ -5,16 +5,27 @@ Handles contract calls and transactions
 
 import os
 import json
+import asyncio
 import logging
-import random
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from pathlib import Path
 
-from web3 import Web3
-from web3.contract import Contract
+from web3 import AsyncWeb3, Web3
+from web3.contract import AsyncContract
 from eth_account import Account
 
 from app.database import DocumentDatabase
+from app.events import EventDecoder
+from app.multicall import MulticallAggregator
+from app.read_cache import ChainReadCache
+from app.rpc_pool import RPCPool
+from app.transactions import (
+    NonceManager,
+    ReceiptTracker,
+    TransactionBuilder,
+    is_nonce_error,
+    is_out_of_gas_error,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +33,9 @@ logger = logging.getLogger(__name__)
 class SomniaClient:
     """Client for interacting with Somnia L1 contracts"""
     
+    # Attempts per write when the node reports our nonce as already used
+    MAX_SEND_ATTEMPTS = 3
+    
     def __init__(
         self,
         rpc_url: Optional[str] = None,
@@ -29,10 +43,19 @@ class SomniaClient:
         access_nft_address: Optional[str] = None,
         agent_registry_address: Optional[str] = None,
         provenance_address: Optional[str] = None,
+        rpc_pool: Optional[RPCPool] = None,
     ):
-        self.rpc_url = rpc_url or os.getenv("SOMNIA_RPC_URL")
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
-        logger.info(f"Connected to Somnia L1: {self.rpc_url}")
+        # eth_chainId is cached by the provider: web3 validates every eth_call and
+        # eth_estimateGas against it, which would otherwise double their round trips
+        cache_options = {"cache_allowed_requests": True, "cacheable_requests": {"eth_chainId"}}
+        if rpc_pool is None:
+            rpc_pool = RPCPool([rpc_url], **cache_options) if rpc_url else RPCPool.from_env(**cache_options)
+        self.rpc_pool = rpc_pool
+        self.rpc_url = rpc_pool.endpoints[0].url
+        # AsyncWeb3 keeps RPC round trips (receipt polling in particular) off the event loop;
+        # the pool hedges reads across endpoints and keeps writes on one of them
+        self.w3 = AsyncWeb3(rpc_pool)
+        logger.info(f"Connected to Somnia L1: {rpc_pool}")
         
         # Account
         self.private_key = private_key or os.getenv("DEPLOYER_PRIVATE_KEY") or os.getenv("AGENT_PRIVATE_KEY")
@@ -41,6 +64,21 @@ class SomniaClient:
         else:
             self.account = None
         
+        # Local nonce allocation lets writes pipeline instead of one tx per block
+        self.nonce_manager = NonceManager(self.w3, self.account.address, fill_gap=self._fill_nonce_gap) if self.account else None
+        # Chain id, fee suggestions and gas limits are cached instead of read per write
+        self.tx_builder = TransactionBuilder(self.w3, self.account.address) if self.account else None
+        self.receipts = ReceiptTracker(
+            self.w3,
+            poll_interval=float(os.getenv("RECEIPT_POLL_INTERVAL", "0.25"))
+        )
+        
+        # View calls issued close together share one Multicall3 eth_call
+        self.multicall = MulticallAggregator(self.w3)
+        
+        # Receipt and backfill logs are decoded through one topic0-keyed registry
+        self.events = EventDecoder()
+        
         # Contract addresses
         self.access_nft_address = access_nft_address or os.getenv("ACCESS_NFT_ADDRESS")
         self.agent_registry_address = agent_registry_address or os.getenv("AGENT_REGISTRY_ADDRESS")
@@ -55,8 +93,15 @@ class SomniaClient:
         
         # Initialize database for document caching
         self.db = DocumentDatabase()
+        
+        # Records and receipts that can no longer change are read from the chain once
+        self.reads = ChainReadCache(self.w3, self.multicall, self.db)
     
-    def _load_contract(self, name: str, address: Optional[str]) -> Optional[Contract]:
+    async def close(self):
+        """Close the keep-alive HTTP sessions held by the RPC pool"""
+        await self.w3.provider.disconnect()
+    
+    def _load_contract(self, name: str, address: Optional[str]) -> Optional[AsyncContract]:
         """Load contract from ABI"""
         if not address:
             return None
@@ -94,6 +139,87 @@ class SomniaClient:
             logger.error(f"Failed to load CompanyDropbox contract: {e}")
             return None
     
+    async def _send_transaction(
+        self,
+        contract_function,
+        tx_params: Optional[Dict[str, Any]] = None,
+        fallback_gas: Optional[int] = None,
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Build, sign and broadcast a contract call using the local nonce manager
+        
+        Does not wait for the receipt, so callers can keep many transactions in flight.
+        If the node reports the nonce as already used, the manager resyncs and the
+        call is retried with a fresh nonce; if it rejects the gas limit, the cached
+        limit is dropped and the call is rebuilt with a fresh estimate.
+        
+        Args:
+            contract_function: Bound contract function to call
+            tx_params: Explicit transaction fields (gas, gasPrice, ...) overriding the cached ones
+            fallback_gas: Gas limit to use if estimation fails (estimation errors raise otherwise)
+            
+        Returns:
+            Transaction hash and the transaction that was sent
+        """
+        for attempt in range(1, self.MAX_SEND_ATTEMPTS + 1):
+            nonce = await self.nonce_manager.allocate()
+            tx = None
+            try:
+                tx = await self.tx_builder.build(contract_function, nonce, tx_params, fallback_gas)
+                signed = self.account.sign_transaction(tx)
+                tx_hash = await self.w3.eth.send_raw_transaction(signed.raw_transaction)
+            except Exception as e:
+                if is_nonce_error(e) and attempt < self.MAX_SEND_ATTEMPTS:
+                    logger.warning(f"Nonce {nonce} rejected ({e}), resyncing (attempt {attempt})")
+                    self.nonce_manager.mark_sent(nonce)
+                    await self.nonce_manager.resync()
+                    continue
+                self.nonce_manager.release(nonce)
+                if tx is not None and is_out_of_gas_error(e) and attempt < self.MAX_SEND_ATTEMPTS:
+                    logger.warning(f"Gas limit {tx['gas']} rejected ({e}), re-estimating (attempt {attempt})")
+                    self.tx_builder.invalidate_gas(tx)
+                    continue
+                raise
+            
+            self.nonce_manager.mark_sent(nonce)
+            logger.debug(f"Transaction built: nonce={tx['nonce']}, gas={tx['gas']}")
+            return tx_hash, tx
+    
+    async def _fill_nonce_gap(self, nonce: int) -> bytes:
+        """Consume a released nonce with a zero-value transfer to self so later transactions aren't stuck behind it"""
+        tx = {
+            'to': self.account.address,
+            'value': 0,
+            'gas': 21000,
+            'nonce': nonce,
+            'chainId': await self.tx_builder.chain_id(),
+            **await self.tx_builder.fees(),
+        }
+        signed = self.account.sign_transaction(tx)
+        return await self.w3.eth.send_raw_transaction(signed.raw_transaction)
+    
+    async def _transact(self, contract_function, timeout: float = 120, fallback_gas: Optional[int] = None):
+        """
+        Send a contract call and wait for its receipt
+        
+        A transaction that runs out of gas on a cached limit is sent once more
+        with a fresh estimate (the failed one changed nothing but the nonce).
+        
+        Returns:
+            Transaction hash and receipt of the last attempt
+        """
+        tx_hash, tx = await self._send_transaction(contract_function, fallback_gas=fallback_gas)
+        logger.info(f"Transaction sent: {tx_hash.hex()}")
+        receipt = await self.receipts.wait(tx_hash, timeout=timeout)
+        
+        if self.tx_builder.ran_out_of_gas(tx, receipt):
+            logger.warning(f"Transaction {tx_hash.hex()} ran out of gas at limit {tx['gas']}, resending with a fresh estimate")
+            tx_hash, tx = await self._send_transaction(contract_function, fallback_gas=fallback_gas)
+            logger.info(f"Transaction sent: {tx_hash.hex()}")
+            receipt = await self.receipts.wait(tx_hash, timeout=timeout)
+        
+        return tx_hash, receipt
+    
     async def check_nft_ownership(self, token_id: int, user_address: str) -> bool:
         """Check if user owns a specific NFT"""
         # If ABI/contract not loaded (development or missing artifacts), allow access
@@ -105,7 +231,7 @@ class SomniaClient:
             return True
 
         try:
-            owner = self.access_nft.functions.ownerOf(token_id).call()
+            owner = await self.multicall.call(self.access_nft.functions.ownerOf(token_id))
             return owner.lower() == user_address.lower()
         except Exception:
             return False
@@ -116,7 +242,7 @@ class SomniaClient:
             logger.warning("AccessNFT contract not loaded - returning empty CID (dev mode)")
             return ""
 
-        return self.access_nft.functions.tokenURI(token_id).call()
+        return await self.multicall.call(self.access_nft.functions.tokenURI(token_id))
     
     async def register_agent(
         self,
@@ -134,42 +260,10 @@ class SomniaClient:
         logger.info(f"Registering agent: {did}")
         logger.debug(f"Agent name: {name}, metadata: {metadata_cid}")
         
-        # Estimate gas first
-        try:
-            gas_estimate = self.agent_registry.functions.registerAgent(
-                did,
-                name,
-                metadata_cid
-            ).estimate_gas({'from': self.account.address})
-            
-            # Add 50% buffer to gas estimate
-            gas_limit = int(gas_estimate * 1.5)
-            logger.info(f"Gas estimate: {gas_estimate}, using limit: {gas_limit}")
-        except Exception as e:
-            logger.error(f"Gas estimation failed: {e}")
-            raise
-        
-        # Build transaction
-        tx = self.agent_registry.functions.registerAgent(
-            did,
-            name,
-            metadata_cid
-        ).build_transaction({
-            'from': self.account.address,
-            'nonce': self.w3.eth.get_transaction_count(self.account.address),
-            'gas': gas_limit,
-            'gasPrice': self.w3.eth.gas_price,
-        })
-        
-        logger.debug(f"Transaction built: nonce={tx['nonce']}, gas={tx['gas']}, gasPrice={tx['gasPrice']}")
-        
-        # Sign and send
-        signed = self.account.sign_transaction(tx)
-        tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
-        logger.info(f"Transaction sent: {tx_hash.hex()}")
-        
-        # Wait for confirmation
-        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+        # Gas limit, fees and chain id come from the transaction builder's caches
+        tx_hash, receipt = await self._transact(
+            self.agent_registry.functions.registerAgent(did, name, metadata_cid)
+        )
         
         if receipt['status'] == 1:
             logger.info(
@@ -198,7 +292,40 @@ class SomniaClient:
         if not self.agent_registry:
             return False
         
-        return self.agent_registry.functions.isActiveAgent(did).call()
+        return await self.multicall.call(self.agent_registry.functions.isActiveAgent(did))
+    
+    async def is_execution_recorded(self, execution_root: str) -> Optional[int]:
+        """
+        Look up the provenance record already anchoring an execution root
+        
+        A confirmed row in the local ProvenanceRecorded mirror answers without a round
+        trip, as does an execution ProvenanceAnchor anchored inside a batch (only the
+        batch's Merkle root is on-chain). Other roots (the mirror trails the head, and
+        unconfirmed rows can still be reorganized away) fall back to one
+        executionRootToRecordId view call, the mapping recordDerivative checks before
+        reverting with DuplicateExecution.
+        
+        Args:
+            execution_root: bytes32 hex string (with or without 0x)
+            
+        Returns:
+            Record ID, or None if the root has not been recorded
+        """
+        if not self.provenance:
+            raise ValueError("Provenance contract not loaded")
+        
+        root = execution_root.lower().removeprefix("0x")
+        mirrored = self.db.get_provenance_by_root(root)
+        if mirrored and mirrored['confirmed']:
+            return mirrored['record_id']
+        
+        batched = self.db.get_provenance_anchor(root)
+        if batched and batched['leaf_count'] > 1:
+            return batched['record_id']
+        
+        # The mapping stores recordId + 1 so that 0 means "not recorded"
+        stored = await self.multicall.call(self.provenance.functions.executionRootToRecordId(bytes.fromhex(root)))
+        return stored - 1 if stored else None
     
     async def record_provenance(
         self,
@@ -214,6 +341,10 @@ class SomniaClient:
         """
         Record provenance on-chain with proper gas estimation and logging
         
+        An execution root that is already recorded (a retried or replayed execution)
+        returns the existing record with already_recorded=True instead of sending a
+        transaction that would revert with DuplicateExecution.
+        
         Returns:
             Dict with tx_hash and record_id
         """
@@ -223,6 +354,19 @@ class SomniaClient:
         if not self.account:
             raise ValueError("No account configured")
         
+        root_hex = execution_root.hex() if isinstance(execution_root, bytes) else execution_root
+        existing_id = await self.is_execution_recorded(root_hex)
+        if existing_id is not None:
+            existing = self.db.get_provenance_record(existing_id)
+            logger.info(f"Execution root {root_hex} already recorded as record {existing_id}; skipping transaction")
+            return {
+                "tx_hash": existing['tx_hash'].removeprefix("0x") if existing else None,
+                "record_id": existing_id,
+                "block_number": existing['block_number'] if existing else None,
+                "gas_used": 0,
+                "already_recorded": True
+            }
+        
         logger.info(f"Recording provenance for NFT #{nft_token_id} by agent {agent_did}")
         logger.debug(f"Input CID: {input_cid}, Output CID: {output_cid}, Trace: {trace_cid}")
         
@@ -239,9 +383,9 @@ class SomniaClient:
             else:
                 execution_root = bytes.fromhex(execution_root)
         
-        # Estimate gas
-        try:            
-            gas_estimate = self.provenance.functions.recordDerivative(
+        # Gas limit, fees and chain id come from the transaction builder's caches
+        tx_hash, receipt = await self._transact(
+            self.provenance.functions.recordDerivative(
                 nft_token_id,
                 input_cid,
                 input_root,
@@ -250,52 +394,17 @@ class SomniaClient:
                 trace_cid,
                 agent_did,
                 proof_cid
-            ).estimate_gas({'from': self.account.address})
-            gas_limit = int(gas_estimate * 1.5)
-            logger.info(f"Gas estimate: {gas_estimate}, using limit: {gas_limit}")
-        except Exception as e:
-            logger.error(f"Gas estimation failed: {e}")
-            gas_limit = 1000000  # Fallback
-            logger.warning(f"Using fallback gas limit: {gas_limit}")
-        
-        # Build transaction
-        tx = self.provenance.functions.recordDerivative(
-            nft_token_id,
-            input_cid,
-            input_root,
-            output_cid,
-            execution_root,
-            trace_cid,
-            agent_did,
-            proof_cid
-        ).build_transaction({
-            'from': self.account.address,
-            'nonce': self.w3.eth.get_transaction_count(self.account.address),
-            'gas': gas_limit,
-            'gasPrice': self.w3.eth.gas_price,
-        })
-        
-        # Sign and send
-        signed = self.account.sign_transaction(tx)
-        tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
-        logger.info(f"Provenance transaction sent: {tx_hash.hex()}")
-        
-        # Wait for confirmation
-        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            ),
+            fallback_gas=1000000
+        )
+        logger.info(f"Provenance transaction mined: {tx_hash.hex()}")
         
-        # Extract record ID from logs
+        # Extract record ID from the ProvenanceRecorded log
         record_id = None
-        if receipt['logs']:
-            # Decode ProvenanceRecorded event
-            event = self.provenance.events.ProvenanceRecorded()
-            for log in receipt['logs']:
-                try:
-                    decoded = event.process_log(log)
-                    record_id = decoded['args']['recordId']
-                    logger.info(f"Provenance recorded with ID: {record_id}")
-                    break
-                except Exception:
-                    continue
+        event = self.events.find(receipt['logs'], self.provenance.events.ProvenanceRecorded)
+        if event:
+            record_id = event['args']['recordId']
+            logger.info(f"Provenance recorded with ID: {record_id}")
         
         if receipt['status'] == 1:
             logger.info(
@@ -316,23 +425,107 @@ class SomniaClient:
             "tx_hash": tx_hash.hex(),
             "record_id": record_id,
             "block_number": receipt['blockNumber'],
-            "gas_used": receipt['gasUsed']
+            "gas_used": receipt['gasUsed'],
+            "already_recorded": False
         }
     
-    async def get_records_by_nft(self, token_id: int) -> List[int]:
-        """Get all provenance record IDs for an NFT"""
+    async def get_records_by_nft(self, token_id: int, block_identifier: Any = "latest") -> List[int]:
+        """
+        Get all provenance record IDs for an NFT
+        
+        Args:
+            token_id: NFT token ID
+            block_identifier: "latest", or a block number to read a snapshot at
+                (snapshots at final blocks are memoized)
+        """
         if not self.provenance:
             raise ValueError("Provenance contract not loaded")
         
-        return self.provenance.functions.getRecordsByNFT(token_id).call()
+        return await self.reads.call(self.provenance.functions.getRecordsByNFT(token_id), block_identifier)
     
     async def get_record(self, record_id: int) -> Dict[str, Any]:
         """Get a specific provenance record"""
         if not self.provenance:
             raise ValueError("Provenance contract not loaded")
         
-        record = self.provenance.functions.getRecord(record_id).call()
+        record = await self.reads.call(self.provenance.functions.getRecord(record_id))
+        return self._format_record(record)
+    
+    async def get_records(self, record_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Get many provenance records with batched reads
+        
+        Memoized records are served without a read. The rest are read at the final
+        block in JSON-RPC batches of PROVENANCE_READ_BATCH_SIZE, with up to
+        PROVENANCE_READ_CONCURRENCY batches in flight at once, so reading hundreds of
+        records costs a handful of round trips instead of one each.
+        
+        Args:
+            record_ids: Record IDs to read
+            
+        Returns:
+            Records in the same order as record_ids
+        """
+        if not self.provenance:
+            raise ValueError("Provenance contract not loaded")
+        
+        if not record_ids:
+            return []
+        
+        records = await self.reads.lookup(self.provenance, "getRecord", [(record_id,) for record_id in record_ids])
+        missing = [
+            self.provenance.functions.getRecord(record_id)
+            for record_id, record in zip(record_ids, records) if record is None
+        ]
+        
+        if missing:
+            batch_size = int(os.getenv("PROVENANCE_READ_BATCH_SIZE", "100"))
+            semaphore = asyncio.Semaphore(int(os.getenv("PROVENANCE_READ_CONCURRENCY", "4")))
+            final_block = await self.reads.final_block()
+            
+            async def read_chunk(chunk: List[Any]) -> List[Any]:
+                async with semaphore:
+                    return await self._get_record_batch(chunk, final_block)
+            
+            chunks = await asyncio.gather(*[
+                read_chunk(missing[start:start + batch_size])
+                for start in range(0, len(missing), batch_size)
+            ])
+            read = iter(record for chunk in chunks for record in chunk)
+            records = [record if record is not None else next(read) for record in records]
+        
+        return [self._format_record(record) for record in records]
+    
+    async def _get_record_batch(self, functions: List[Any], final_block: int) -> List[Any]:
+        """
+        Read one chunk of getRecord calls as a single JSON-RPC batch
         
+        The chunk is read at the final block and memoized. A record newer than the final
+        block fails that batch, so it is sent again at latest and not memoized.
+        """
+        try:
+            records = await self._batch_call(functions, final_block)
+            await self.reads.remember(functions, records)
+            return records
+        except Exception:
+            pass
+        
+        try:
+            return await self._batch_call(functions, "latest")
+        except Exception as e:
+            # Some RPC endpoints reject batch requests; concurrent single calls still avoid N+1 latency
+            logger.warning(f"Batched getRecord failed ({e}), falling back to individual calls")
+            return await asyncio.gather(*[function.call() for function in functions])
+    
+    async def _batch_call(self, functions: List[Any], block_identifier: Any) -> List[Any]:
+        async with self.w3.batch_requests() as batch:
+            for function in functions:
+                batch.add(function.call(block_identifier=block_identifier))
+            return await batch.async_execute()
+    
+    @staticmethod
+    def _format_record(record) -> Dict[str, Any]:
+        """Convert a getRecord tuple into the record dictionary used by the API"""
         return {
             "nftTokenId": record[0],
             "inputCID": record[1],
@@ -385,42 +578,15 @@ class SomniaClient:
         else:
             document_hash_bytes = document_hash
         
-        # Estimate gas first
-        try:
-            gas_estimate = self.company_dropbox.functions.uploadDocument(
+        # Gas limit, fees and chain id come from the transaction builder's caches
+        tx_hash, receipt = await self._transact(
+            self.company_dropbox.functions.uploadDocument(
                 cid,
                 document_hash_bytes,
                 filename,
                 file_size
-            ).estimate_gas({'from': self.account.address})
-            
-            # Add 50% buffer to gas estimate
-            gas_limit = int(gas_estimate * 1.5)
-            logger.info(f"Gas estimate: {gas_estimate}, using limit: {gas_limit}")
-        except Exception as e:
-            logger.error(f"Gas estimation failed: {e}")
-            raise
-        
-        # Build transaction
-        tx = self.company_dropbox.functions.uploadDocument(
-            cid,
-            document_hash_bytes,
-            filename,
-            file_size
-        ).build_transaction({
-            'from': self.account.address,
-            'nonce': self.w3.eth.get_transaction_count(self.account.address),
-            'gas': gas_limit,
-        })
-        
-        # Sign and send
-        signed_tx = self.account.sign_transaction(tx)
-        tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        
-        logger.info(f"Transaction sent: {tx_hash.hex()}")
-        
-        # Wait for receipt
-        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            )
+        )
         
         if receipt['status'] != 1:
             logger.error("Transaction failed")
@@ -428,14 +594,10 @@ class SomniaClient:
         
         # Parse DocumentUploaded event to get document_id
         document_id = None
-        for log in receipt['logs']:
-            try:
-                event = self.company_dropbox.events.DocumentUploaded().process_log(log)
-                document_id = event['args']['documentId']
-                logger.info(f"Document recorded with ID: {document_id}")
-                break
-            except:
-                continue
+        event = self.events.find(receipt['logs'], self.company_dropbox.events.DocumentUploaded)
+        if event:
+            document_id = event['args']['documentId']
+            logger.info(f"Document recorded with ID: {document_id}")
         
         return {
             "tx_hash": tx_hash.hex(),
@@ -446,7 +608,7 @@ class SomniaClient:
             "filename": filename
         }
     
-    def verify_document_on_chain(self, tx_hash: str, expected_block: int, expected_data: Dict[str, Any]) -> bool:
+    async def verify_document_on_chain(self, tx_hash: str, expected_block: int, expected_data: Dict[str, Any]) -> bool:
         """
         Verify a cached document exists on blockchain with matching data
         Used to detect cache tampering
@@ -460,8 +622,8 @@ class SomniaClient:
             True if document verified on chain, False if tampered
         """
         try:
-            # Get transaction receipt from blockchain
-            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            # Get transaction receipt from blockchain (memoized once its block is final)
+            receipt = await self.reads.get_receipt(tx_hash)
             
             # Verify block number matches
             if receipt['blockNumber'] != expected_block:
@@ -474,29 +636,22 @@ class SomniaClient:
                 return False
             
             # Verify event exists in logs
-            event_signature = self.w3.keccak(text="DocumentUploaded(uint256,address,uint256,string,bytes32,string)").hex()
+            event = self.events.find(receipt['logs'], self.company_dropbox.events.DocumentUploaded)
+            if not event:
+                logger.warning(f"DocumentUploaded event not found in tx {tx_hash}")
+                return False
             
-            for log in receipt['logs']:
-                try:
-                    if log['topics'][0].hex() == event_signature:
-                        # Parse event data
-                        decoded = self.company_dropbox.events.DocumentUploaded().process_log(log)
-                        args = decoded['args']
-                        
-                        # Verify document data matches cache
-                        if (args['ipfsHash'] == expected_data.get('ipfs_hash') and
-                            args['documentHash'].hex() if isinstance(args['documentHash'], bytes) else args['documentHash'] == expected_data.get('document_hash') and
-                            args['fileName'] == expected_data.get('filename')):
-                            logger.debug(f"Document verified: tx {tx_hash}")
-                            return True
-                        else:
-                            logger.warning(f"Document data mismatch for tx {tx_hash}")
-                            return False
-                except Exception as e:
-                    # Not our event or parsing error
-                    continue
+            # Verify document data matches cache
+            args = event['args']
+            document_hash = args['documentHash'].hex() if isinstance(args['documentHash'], bytes) else args['documentHash']
+            expected_hash = (expected_data.get('document_hash') or '').lower().removeprefix('0x')
+            if (args['ipfsHash'] == expected_data.get('ipfs_hash') and
+                    document_hash.lower().removeprefix('0x') == expected_hash and
+                    args['fileName'] == expected_data.get('filename')):
+                logger.debug(f"Document verified: tx {tx_hash}")
+                return True
             
-            logger.warning(f"DocumentUploaded event not found in tx {tx_hash}")
+            logger.warning(f"Document data mismatch for tx {tx_hash}")
             return False
             
         except Exception as e:
@@ -505,132 +660,27 @@ class SomniaClient:
     
     async def get_user_documents(self, user_address: str) -> list[Dict[str, Any]]:
         """
-        Get all documents uploaded by a user using hybrid cache approach:
-        1. Check SQLite cache first
-        2. Verify random 10% sample against blockchain
-        3. Query only new blocks since last sync
-        4. Update cache with new documents
+        Get all documents uploaded by a user
+        
+        Reads the local index filled by the background DocumentIndexer (one global
+        cursor over DocumentUploaded), so no chain round trips happen per request.
+        Documents from blocks above the confirmation depth come first, marked
+        confirmed=False; they can still disappear if their block is reorganized away.
         
         Args:
             user_address: Ethereum address of the user
             
         Returns:
-            List of document records with metadata
+            List of document records with metadata, most recent first
         """
-        if not self.company_dropbox:
-            raise ValueError("CompanyDropbox contract not loaded")
-        
-        logger.info(f"Fetching documents for user: {user_address}")
-        
-        try:
-            # Step 1: Check cache first
-            cached_docs = self.db.get_user_documents(user_address)
-            logger.info(f"Cache hit: {len(cached_docs)} documents")
-            
-            # Step 2: Random verification (10% sample) to detect tampering
-            if cached_docs:
-                verification_rate = float(os.getenv("CACHE_VERIFICATION_RATE", "0.1"))
-                sample_size = max(1, int(len(cached_docs) * verification_rate))
-                sample_docs = random.sample(cached_docs, sample_size)
-                
-                logger.info(f"Verifying {len(sample_docs)}/{len(cached_docs)} documents")
-                
-                for doc in sample_docs:
-                    is_valid = self.verify_document_on_chain(
-                        doc['tx_hash'],
-                        doc['block_number'],
-                        doc
-                    )
-                    
-                    if not is_valid:
-                        logger.warning(f"Cache tampered! Document {doc['document_id']} failed verification. Clearing cache.")
-                        self.db.clear_user_cache(user_address)
-                        cached_docs = []
-                        break
-                else:
-                    logger.info(f"Verified {len(sample_docs)}/{len(cached_docs)} documents - all valid")
-            
-            # Step 3: Incremental sync - query only new blocks
-            current_block = self.w3.eth.block_number
-            logger.info(f"Current block: {current_block}")
-            
-            # Get last synced block, default to deployment block
-            DEPLOYMENT_BLOCK = int(os.getenv("COMPANY_DROPBOX_DEPLOYMENT_BLOCK", "219187000"))
-            last_synced_block = self.db.get_last_synced_block(user_address)
-            from_block = last_synced_block + 1 if last_synced_block else DEPLOYMENT_BLOCK
-            
-            # Only query if there are new blocks
-            new_documents = []
-            if current_block >= from_block:
-                logger.info(f"Syncing blocks {from_block} to {current_block} ({current_block - from_block + 1} blocks)")
-                
-                # Query in batches to avoid Somnia's 1000 block limit
-                BATCH_SIZE = int(os.getenv("BLOCKCHAIN_QUERY_BATCH_SIZE", "500"))
-                
-                for batch_start in range(from_block, current_block + 1, BATCH_SIZE):
-                    batch_end = min(batch_start + BATCH_SIZE - 1, current_block)
-                    
-                    try:
-                        event_filter = self.company_dropbox.events.DocumentUploaded.create_filter(
-                            from_block=batch_start,
-                            to_block=batch_end,
-                            argument_filters={'uploader': user_address}
-                        )
-                        
-                        batch_events = event_filter.get_all_entries()
-                        
-                        if batch_events:
-                            logger.info(f"Found {len(batch_events)} new events in batch {batch_start}-{batch_end}")
-                            
-                            # Process new events
-                            for event in batch_events:
-                                args = event['args']
-                                
-                                # Get block timestamp
-                                block = self.w3.eth.get_block(event['blockNumber'])
-                                
-                                doc = {
-                                    "user_address": user_address,
-                                    "document_id": args['documentId'],
-                                    "filename": args['fileName'],
-                                    "ipfs_hash": args['ipfsHash'],
-                                    "document_hash": args['documentHash'].hex() if isinstance(args['documentHash'], bytes) else args['documentHash'],
-                                    "token_id": args['tokenId'],
-                                    "timestamp": block['timestamp'],
-                                    "tx_hash": event['transactionHash'].hex(),
-                                    "block_number": event['blockNumber']
-                                }
-                                new_documents.append(doc)
-                                
-                    except Exception as batch_error:
-                        logger.warning(f"Error in batch {batch_start}-{batch_end}: {batch_error}")
-                        continue
-                
-                # Step 4: Update cache with new documents
-                if new_documents:
-                    self.db.insert_documents_batch(new_documents)
-                    logger.info(f"Cached {len(new_documents)} new documents")
-                    
-                # Update sync status
-                self.db.update_sync_status(user_address, current_block)
-                logger.info(f"Updated sync status to block {current_block}")
-            else:
-                logger.info("No new blocks to sync")
-            
-            # Step 5: Combine cached and new documents
-            all_documents = cached_docs + new_documents
-            
-            # Sort by timestamp descending (most recent first)
-            all_documents.sort(key=lambda x: x['timestamp'], reverse=True)
-            
-            logger.info(f"Returning {len(all_documents)} total documents ({len(cached_docs)} cached, {len(new_documents)} new)")
-            
-            return all_documents
-            
-        except Exception as e:
-            logger.error(f"Error fetching documents: {e}")
-            # Return empty list instead of raising error - graceful handling for no documents
-            return []
+        tentative = self.db.get_user_tentative_documents(user_address)
+        confirmed = self.db.get_user_documents(user_address)
+        documents = (
+            [{**doc, "confirmed": False} for doc in tentative]
+            + [{**doc, "confirmed": True} for doc in confirmed]
+        )
+        logger.info(f"Index returned {len(documents)} documents for user {user_address} ({len(tentative)} unconfirmed)")
+        return documents
 
 
 # ============ Example Usage ============
@@ -669,5 +719,4 @@ async def example_usage():
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(example_usage())
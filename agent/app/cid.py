@@ -0,0 +1,192 @@
+"""
+Content identifier (CID) checks for IPFS content
+Recomputes the CID of fetched bytes for the layouts Pinata and `ipfs add` produce by default
+"""
+
+import base64
+import hashlib
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+# Multicodec codes
+RAW = 0x55
+DAG_PB = 0x70
+SHA2_256 = 0x12
+IDENTITY = 0x00
+
+# `ipfs add` defaults: 256 KiB chunks, balanced DAG with up to 174 links per node
+CHUNK_SIZE = 262144
+MAX_LINKS = 174
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+@dataclass
+class CID:
+    """A parsed CID: version, content codec and multihash"""
+    version: int
+    codec: int
+    hash_code: int
+    digest: bytes
+
+
+def _base58_decode(text: str) -> bytes:
+    number = 0
+    for char in text:
+        number = number * 58 + BASE58_ALPHABET.index(char)
+    leading_zeros = len(text) - len(text.lstrip("1"))
+    return b"\x00" * leading_zeros + number.to_bytes((number.bit_length() + 7) // 8, "big")
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def parse_cid(text: str) -> CID:
+    """
+    Parse a CIDv0 (base58 "Qm...") or a base32/base58 CIDv1
+
+    Raises:
+        ValueError: Not a CID this module understands
+    """
+    try:
+        if len(text) == 46 and text.startswith("Qm"):
+            multihash = _base58_decode(text)
+            version, codec, offset = 0, DAG_PB, 0
+        else:
+            if text[0] == "b":
+                raw = base64.b32decode(text[1:].upper() + "=" * (-len(text[1:]) % 8))
+            elif text[0] == "z":
+                raw = _base58_decode(text[1:])
+            else:
+                raise ValueError(f"unsupported multibase prefix {text[0]!r}")
+            version, offset = _read_varint(raw, 0)
+            codec, offset = _read_varint(raw, offset)
+            multihash = raw
+            if version != 1:
+                raise ValueError(f"unsupported CID version {version}")
+        hash_code, offset = _read_varint(multihash, offset)
+        length, offset = _read_varint(multihash, offset)
+        digest = bytes(multihash[offset:offset + length])
+    except (ValueError, IndexError) as e:
+        raise ValueError(f"Invalid CID {text!r}: {e}")
+    if len(digest) != length:
+        raise ValueError(f"Invalid CID {text!r}: truncated multihash")
+    return CID(version, codec, hash_code, digest)
+
+
+# ============ UnixFS (dag-pb) file layout ============
+
+def _multihash(block: bytes) -> bytes:
+    return bytes([SHA2_256, 32]) + hashlib.sha256(block).digest()
+
+
+def _file_node(links: List[Tuple[bytes, int]], data: bytes, filesize: int, blocksizes: List[int]) -> bytes:
+    """dag-pb PBNode bytes of a UnixFS File node (links are serialized before data)"""
+    unixfs = b"\x08\x02"  # Type: File
+    if data:
+        unixfs += b"\x12" + _varint(len(data)) + data
+    unixfs += b"\x18" + _varint(filesize)
+    for size in blocksizes:
+        unixfs += b"\x20" + _varint(size)
+
+    node = bytearray()
+    for link_hash, tsize in links:
+        link = b"\x0a" + _varint(len(link_hash)) + link_hash + b"\x12\x00" + b"\x18" + _varint(tsize)
+        node += b"\x12" + _varint(len(link)) + link
+    node += b"\x0a" + _varint(len(unixfs)) + unixfs
+    return bytes(node)
+
+
+class _BalancedDAG:
+    """
+    Root multihash of data imported with the default balanced layout
+
+    CIDv0 imports wrap each chunk in a UnixFS File node and link by multihash;
+    CIDv1 imports (raw_leaves) keep chunks as raw blocks and link by CIDv1.
+    """
+
+    def __init__(self, data: bytes, raw_leaves: bool):
+        self.raw_leaves = raw_leaves
+        view = memoryview(data)
+        self.chunks: Iterator[bytes] = (bytes(view[i:i + CHUNK_SIZE]) for i in range(0, len(data), CHUNK_SIZE))
+        self.pending = next(self.chunks, None)
+
+    def _next_chunk(self) -> bytes:
+        chunk, self.pending = self.pending, next(self.chunks, None)
+        return chunk
+
+    def _link_hash(self, codec: int, block: bytes) -> bytes:
+        if self.raw_leaves:
+            return b"\x01" + _varint(codec) + _multihash(block)
+        return _multihash(block)
+
+    def _leaf(self) -> Tuple[bytes, int, int, int]:
+        """(link hash, codec, cumulative size, file size) of the next chunk"""
+        chunk = self._next_chunk()
+        if self.raw_leaves:
+            return self._link_hash(RAW, chunk), RAW, len(chunk), len(chunk)
+        block = _file_node([], chunk, len(chunk), [])
+        return self._link_hash(DAG_PB, block), DAG_PB, len(block), len(chunk)
+
+    def _fill(self, children: List[Tuple[bytes, int, int, int]], depth: int) -> Tuple[bytes, int, int, int]:
+        while len(children) < MAX_LINKS and self.pending is not None:
+            children.append(self._leaf() if depth == 1 else self._fill([], depth - 1))
+        filesize = sum(child[3] for child in children)
+        block = _file_node([(child[0], child[2]) for child in children], b"", filesize, [child[3] for child in children])
+        tsize = len(block) + sum(child[2] for child in children)
+        return self._link_hash(DAG_PB, block), DAG_PB, tsize, filesize
+
+    def root(self) -> Tuple[int, bytes]:
+        """(codec, multihash) of the root block"""
+        if self.pending is None:
+            block = _file_node([], b"", 0, [])
+            return DAG_PB, _multihash(block)
+        root = self._leaf()
+        depth = 1
+        while self.pending is not None:
+            root = self._fill([root], depth)
+            depth += 1
+        link_hash, codec = root[0], root[1]
+        # Drop the CIDv1 prefix (version and codec) to get the multihash back
+        return codec, link_hash if not self.raw_leaves else link_hash[1 + len(_varint(codec)):]
+
+
+def verify(cid: str, data: bytes) -> bool:
+    """
+    Whether data is the content addressed by cid
+
+    Raw CIDs are checked exactly. UnixFS (dag-pb) CIDs are checked by rebuilding
+    the DAG with the `ipfs add` defaults (Pinata's for CIDv0, raw leaves for
+    CIDv1), so content imported with another chunker or layout also reads False.
+    """
+    try:
+        parsed = parse_cid(cid)
+    except ValueError:
+        return False
+    if parsed.hash_code == IDENTITY:
+        return parsed.codec == RAW and parsed.digest == data
+    if parsed.hash_code != SHA2_256:
+        return False
+    if parsed.codec == RAW:
+        return hashlib.sha256(data).digest() == parsed.digest
+    if parsed.codec == DAG_PB:
+        codec, multihash = _BalancedDAG(data, raw_leaves=parsed.version == 1).root()
+        return codec == DAG_PB and multihash[2:] == parsed.digest
+    return False
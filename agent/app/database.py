@@ -3,6 +3,7 @@ Document Cache Database Manager
 Provides SQLite-based caching for blockchain document events
 """
 
+import json
 import sqlite3
 import logging
 import os
@@ -50,6 +51,9 @@ class DocumentDatabase:
         cursor = conn.cursor()
         
         try:
+            # WAL lets /documents/list read while the indexer writes
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
             # Documents table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS documents (
@@ -93,6 +97,143 @@ class DocumentDatabase:
                 )
             ''')
             
+            # Block timestamps, so event decoding does not fetch a header per event
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS block_timestamps (
+                    block_number INTEGER PRIMARY KEY,
+                    timestamp INTEGER NOT NULL
+                )
+            ''')
+            
+            # Global event indexer cursors (one row per indexed event stream)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS indexer_cursor (
+                    name TEXT PRIMARY KEY,
+                    last_block INTEGER NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Documents from blocks newer than the confirmation depth; they move to
+            # documents once final and are dropped if their block is reorganized away
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tentative_documents (
+                    user_address TEXT NOT NULL,
+                    document_id INTEGER NOT NULL,
+                    filename TEXT NOT NULL,
+                    ipfs_hash TEXT NOT NULL,
+                    document_hash TEXT NOT NULL,
+                    token_id INTEGER NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    tx_hash TEXT NOT NULL,
+                    block_number INTEGER NOT NULL,
+                    block_hash TEXT NOT NULL,
+                    PRIMARY KEY(user_address, document_id)
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tentative_block_number 
+                ON tentative_documents(block_number)
+            ''')
+            
+            # Hashes of the blocks an indexer has seen above its cursor (plus the cursor
+            # block itself), used to notice when the chain below us changed
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS indexed_blocks (
+                    name TEXT NOT NULL,
+                    block_number INTEGER NOT NULL,
+                    block_hash TEXT NOT NULL,
+                    parent_hash TEXT NOT NULL,
+                    PRIMARY KEY(name, block_number)
+                )
+            ''')
+            
+            # Mirror of Provenance records, filled from ProvenanceRecorded events;
+            # rows from blocks newer than the confirmation depth have confirmed = 0
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS provenance_records (
+                    record_id INTEGER PRIMARY KEY,
+                    nft_token_id INTEGER NOT NULL,
+                    input_cid TEXT NOT NULL,
+                    input_root TEXT NOT NULL,
+                    output_cid TEXT NOT NULL,
+                    execution_root TEXT NOT NULL,
+                    trace_cid TEXT NOT NULL,
+                    agent_did_hash TEXT NOT NULL,
+                    executor TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    proof_cid TEXT NOT NULL,
+                    verified INTEGER NOT NULL DEFAULT 0,
+                    tx_hash TEXT NOT NULL,
+                    block_number INTEGER NOT NULL,
+                    block_hash TEXT NOT NULL,
+                    confirmed INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_provenance_nft
+                ON provenance_records(nft_token_id, record_id)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_provenance_agent
+                ON provenance_records(agent_did_hash, record_id)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_provenance_execution_root
+                ON provenance_records(execution_root)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_provenance_timestamp
+                ON provenance_records(timestamp)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_provenance_block_number
+                ON provenance_records(block_number)
+            ''')
+            
+            # Where each execution anchored by ProvenanceAnchor ended up; a batched
+            # execution's own root is never on-chain, only its batch's Merkle root
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS provenance_anchors (
+                    execution_root TEXT PRIMARY KEY,
+                    nft_token_id INTEGER NOT NULL,
+                    input_cid TEXT NOT NULL,
+                    input_root TEXT NOT NULL,
+                    output_cid TEXT NOT NULL,
+                    trace_cid TEXT NOT NULL,
+                    record_id INTEGER NOT NULL,
+                    tx_hash TEXT,
+                    batch_root TEXT NOT NULL,
+                    manifest_cid TEXT,
+                    leaf_index INTEGER NOT NULL,
+                    leaf_count INTEGER NOT NULL,
+                    proof TEXT NOT NULL,
+                    anchored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Memoized chain reads (immutable results and snapshots at final blocks)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS chain_reads (
+                    cache_key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_chain_reads_last_used
+                ON chain_reads(last_used)
+            ''')
+            
             conn.commit()
             logger.info("Database tables created successfully")
             
@@ -299,99 +440,1173 @@ class DocumentDatabase:
         finally:
             conn.close()
     
-    def clear_user_cache(self, user_address: str):
+    def get_indexer_cursor(self, name: str) -> Optional[int]:
         """
-        Clear all cached documents for a user (used when tamper detected)
+        Get the last block fully indexed by a global event indexer
         
         Args:
-            user_address: Ethereum address of user
+            name: Indexer stream name
+            
+        Returns:
+            Last indexed block number or None if the indexer never ran
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT last_block
+                FROM indexer_cursor
+                WHERE name = ?
+            ''', (name,))
+            
+            row = cursor.fetchone()
+            return row['last_block'] if row else None
+            
+        except Exception as e:
+            logger.error(f"Error getting indexer cursor: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    def index_documents(self, name: str, documents: List[Dict[str, Any]], through_block: int) -> int:
+        """
+        Insert indexed documents and advance the indexer cursor in one transaction
+        
+        Args:
+            name: Indexer stream name
+            documents: Document dictionaries found up to through_block
+            through_block: Block number the indexer has now fully processed
+            
+        Returns:
+            Number of documents inserted
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            inserted_count = 0
+            if documents:
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO documents 
+                    (user_address, document_id, filename, ipfs_hash, document_hash, 
+                     token_id, timestamp, tx_hash, block_number)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (
+                        doc['user_address'].lower(),
+                        doc['document_id'],
+                        doc['filename'],
+                        doc['ipfs_hash'],
+                        doc['document_hash'],
+                        doc['token_id'],
+                        doc['timestamp'],
+                        doc['tx_hash'],
+                        doc['block_number']
+                    )
+                    for doc in documents
+                ])
+                inserted_count = cursor.rowcount
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO indexer_cursor 
+                (name, last_block, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', (name, through_block))
+            
+            conn.commit()
+            return inserted_count
+            
+        except Exception as e:
+            logger.error(f"Error indexing documents: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def rewind_indexer(self, name: str, block_number: int):
+        """
+        Drop indexed (and all tentative) documents above a block and move the cursor back to it
+        
+        Args:
+            name: Indexer stream name
+            block_number: Last block to keep; everything after it is re-indexed
         """
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # Delete documents
             cursor.execute('''
                 DELETE FROM documents
-                WHERE user_address = ?
-            ''', (user_address.lower(),))
+                WHERE block_number > ?
+            ''', (block_number,))
+            removed = cursor.rowcount
             
-            # Delete sync status
+            # Anything tentative sits above the old cursor, so it goes too
+            cursor.execute('DELETE FROM tentative_documents')
             cursor.execute('''
-                DELETE FROM sync_status
-                WHERE user_address = ?
-            ''', (user_address.lower(),))
+                DELETE FROM indexed_blocks
+                WHERE name = ? AND block_number > ?
+            ''', (name, block_number))
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO indexer_cursor 
+                (name, last_block, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', (name, block_number))
             
             conn.commit()
-            logger.warning(f"Cleared cache for user {user_address}")
+            logger.warning(f"Rewound indexer {name} to block {block_number} ({removed} documents dropped)")
             
         except Exception as e:
-            logger.error(f"Error clearing cache: {e}")
+            logger.error(f"Error rewinding indexer: {e}")
             conn.rollback()
+            raise
         finally:
             conn.close()
     
-    def get_document_by_tx(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+    def get_indexed_blocks(self, name: str) -> Dict[int, Dict[str, str]]:
         """
-        Get a document by transaction hash
+        Get the block hashes an indexer recorded above (and at) its cursor
         
         Args:
-            tx_hash: Transaction hash
+            name: Indexer stream name
             
         Returns:
-            Document dictionary or None if not found
+            Mapping of block number to {'block_hash', 'parent_hash'}
         """
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
-                SELECT document_id, user_address, filename, ipfs_hash, document_hash,
-                       token_id, timestamp, tx_hash, block_number
-                FROM documents
-                WHERE tx_hash = ?
-            ''', (tx_hash.lower(),))
+                SELECT block_number, block_hash, parent_hash
+                FROM indexed_blocks
+                WHERE name = ?
+            ''', (name,))
             
-            row = cursor.fetchone()
+            return {
+                row['block_number']: {'block_hash': row['block_hash'], 'parent_hash': row['parent_hash']}
+                for row in cursor.fetchall()
+            }
             
-            if row:
-                return {
-                    'document_id': row['document_id'],
-                    'user_address': row['user_address'],
-                    'filename': row['filename'],
-                    'ipfs_hash': row['ipfs_hash'],
-                    'document_hash': row['document_hash'],
-                    'token_id': row['token_id'],
-                    'timestamp': row['timestamp'],
-                    'tx_hash': row['tx_hash'],
-                    'block_number': row['block_number']
-                }
-            return None
+        except Exception as e:
+            logger.error(f"Error getting indexed blocks: {e}")
+            return {}
+        finally:
+            conn.close()
+    
+    def store_tentative(
+        self,
+        name: str,
+        documents: List[Dict[str, Any]],
+        blocks: List[Dict[str, Any]],
+        from_block: Optional[int] = None,
+        to_block: Optional[int] = None
+    ):
+        """
+        Store unconfirmed documents together with the hashes of the blocks they were read from
+        
+        Args:
+            name: Indexer stream name
+            documents: Document dictionaries including block_hash
+            blocks: {'number', 'block_hash', 'parent_hash'} for every block covered
+            from_block: With to_block, a range whose existing tentative rows (e.g. pushed
+                        by a log subscription before the blocks were verified) are replaced
+            to_block: Last block of that range
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            if from_block is not None and to_block is not None:
+                cursor.execute('''
+                    DELETE FROM tentative_documents
+                    WHERE block_number BETWEEN ? AND ?
+                ''', (from_block, to_block))
+            
+            cursor.executemany('''
+                INSERT OR REPLACE INTO indexed_blocks
+                (name, block_number, block_hash, parent_hash)
+                VALUES (?, ?, ?, ?)
+            ''', [(name, block['number'], block['block_hash'], block['parent_hash']) for block in blocks])
+            
+            cursor.executemany('''
+                INSERT OR REPLACE INTO tentative_documents
+                (user_address, document_id, filename, ipfs_hash, document_hash,
+                 token_id, timestamp, tx_hash, block_number, block_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    doc['user_address'].lower(),
+                    doc['document_id'],
+                    doc['filename'],
+                    doc['ipfs_hash'],
+                    doc['document_hash'],
+                    doc['token_id'],
+                    doc['timestamp'],
+                    doc['tx_hash'],
+                    doc['block_number'],
+                    doc['block_hash']
+                )
+                for doc in documents
+            ])
+            
+            conn.commit()
             
         except Exception as e:
-            logger.error(f"Error getting document by tx: {e}")
-            return None
+            logger.error(f"Error storing tentative documents: {e}")
+            conn.rollback()
+            raise
         finally:
             conn.close()
     
-    def get_cache_stats(self) -> Dict[str, Any]:
+    def remove_tentative(self, documents: List[Dict[str, Any]]) -> int:
         """
-        Get cache statistics
+        Drop specific tentative documents, e.g. logs a node reported as removed by a reorg
+        
+        Args:
+            documents: Document dictionaries with user_address, document_id and block_hash
         
         Returns:
-            Dictionary with cache statistics
+            Number of tentative documents dropped
         """
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # Total documents
-            cursor.execute('SELECT COUNT(*) as count FROM documents')
-            total_docs = cursor.fetchone()['count']
+            cursor.executemany('''
+                DELETE FROM tentative_documents
+                WHERE user_address = ? AND document_id = ? AND block_hash = ?
+            ''', [
+                (doc['user_address'].lower(), doc['document_id'], doc['block_hash'])
+                for doc in documents
+            ])
+            removed = cursor.rowcount
+            conn.commit()
+            return removed
+        
+        except Exception as e:
+            logger.error(f"Error removing tentative documents: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def rollback_tentative(self, name: str, from_block: int) -> int:
+        """
+        Drop tentative documents and recorded hashes from a reorganized block upwards
+        
+        Args:
+            name: Indexer stream name
+            from_block: First block that is no longer on the canonical chain
             
-            # Total users
-            cursor.execute('SELECT COUNT(DISTINCT user_address) as count FROM documents')
-            total_users = cursor.fetchone()['count']
+        Returns:
+            Number of tentative documents dropped
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                DELETE FROM tentative_documents
+                WHERE block_number >= ?
+            ''', (from_block,))
+            removed = cursor.rowcount
+            
+            cursor.execute('''
+                DELETE FROM indexed_blocks
+                WHERE name = ? AND block_number >= ?
+            ''', (name, from_block))
+            
+            conn.commit()
+            return removed
+            
+        except Exception as e:
+            logger.error(f"Error rolling back tentative documents: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def finalize_tentative(self, name: str, through_block: int) -> int:
+        """
+        Promote tentative documents up to a confirmed block and advance the cursor to it
+        
+        Recorded hashes below through_block are pruned; through_block's own hash is
+        kept as the anchor the next tentative block must link to.
+        
+        Args:
+            name: Indexer stream name
+            through_block: Last block now considered final
+            
+        Returns:
+            Number of documents promoted
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT OR IGNORE INTO documents
+                (user_address, document_id, filename, ipfs_hash, document_hash,
+                 token_id, timestamp, tx_hash, block_number)
+                SELECT user_address, document_id, filename, ipfs_hash, document_hash,
+                       token_id, timestamp, tx_hash, block_number
+                FROM tentative_documents
+                WHERE block_number <= ?
+            ''', (through_block,))
+            promoted = cursor.rowcount
+            
+            cursor.execute('''
+                DELETE FROM tentative_documents
+                WHERE block_number <= ?
+            ''', (through_block,))
+            
+            cursor.execute('''
+                DELETE FROM indexed_blocks
+                WHERE name = ? AND block_number < ?
+            ''', (name, through_block))
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO indexer_cursor 
+                (name, last_block, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', (name, through_block))
+            
+            conn.commit()
+            return promoted
+            
+        except Exception as e:
+            logger.error(f"Error finalizing tentative documents: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def get_user_tentative_documents(self, user_address: str) -> List[Dict[str, Any]]:
+        """
+        Get a user's documents from blocks that are not yet confirmed
+        
+        Args:
+            user_address: Ethereum address of user
+            
+        Returns:
+            List of document dictionaries, most recent first
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT document_id, filename, ipfs_hash, document_hash,
+                       token_id, timestamp, tx_hash, block_number
+                FROM tentative_documents
+                WHERE user_address = ?
+                ORDER BY timestamp DESC
+            ''', (user_address.lower(),))
+            
+            return [dict(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            logger.error(f"Error retrieving tentative documents: {e}")
+            return []
+        finally:
+            conn.close()
+    
+    def sample_documents(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Get a random sample of indexed documents (used for on-chain spot checks)
+        
+        Args:
+            limit: Maximum number of documents to return
+            
+        Returns:
+            List of document dictionaries including user_address
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT document_id, user_address, filename, ipfs_hash, document_hash,
+                       token_id, timestamp, tx_hash, block_number
+                FROM documents
+                ORDER BY RANDOM()
+                LIMIT ?
+            ''', (limit,))
+            
+            return [dict(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            logger.error(f"Error sampling documents: {e}")
+            return []
+        finally:
+            conn.close()
+    
+    def get_block_timestamps(self, block_numbers: List[int]) -> Dict[int, int]:
+        """
+        Look up cached block timestamps
+        
+        Args:
+            block_numbers: Block numbers to look up
+            
+        Returns:
+            Mapping of block number to timestamp for the blocks that are cached
+        """
+        if not block_numbers:
+            return {}
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            found = {}
+            numbers = list(block_numbers)
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(numbers), 500):
+                chunk = numbers[start:start + 500]
+                cursor.execute(f'''
+                    SELECT block_number, timestamp
+                    FROM block_timestamps
+                    WHERE block_number IN ({",".join("?" * len(chunk))})
+                ''', chunk)
+                found.update({row['block_number']: row['timestamp'] for row in cursor.fetchall()})
+            return found
+            
+        except Exception as e:
+            logger.error(f"Error getting block timestamps: {e}")
+            return {}
+        finally:
+            conn.close()
+    
+    def store_block_timestamps(self, timestamps: Dict[int, int]):
+        """
+        Cache block timestamps (only exact values read from block headers)
+        
+        Args:
+            timestamps: Mapping of block number to timestamp
+        """
+        if not timestamps:
+            return
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO block_timestamps (block_number, timestamp)
+                VALUES (?, ?)
+            ''', list(timestamps.items()))
+            conn.commit()
+            
+        except Exception as e:
+            logger.error(f"Error storing block timestamps: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
+    
+    def clear_user_cache(self, user_address: str):
+        """
+        Clear all cached documents for a user (used when tamper detected)
+        
+        Args:
+            user_address: Ethereum address of user
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # Delete documents
+            cursor.execute('''
+                DELETE FROM documents
+                WHERE user_address = ?
+            ''', (user_address.lower(),))
+            
+            # Delete sync status
+            cursor.execute('''
+                DELETE FROM sync_status
+                WHERE user_address = ?
+            ''', (user_address.lower(),))
+            
+            conn.commit()
+            logger.warning(f"Cleared cache for user {user_address}")
+            
+        except Exception as e:
+            logger.error(f"Error clearing cache: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
+    
+    def get_document_by_tx(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a document by transaction hash
+        
+        Args:
+            tx_hash: Transaction hash
+            
+        Returns:
+            Document dictionary or None if not found
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT document_id, user_address, filename, ipfs_hash, document_hash,
+                       token_id, timestamp, tx_hash, block_number
+                FROM documents
+                WHERE tx_hash = ?
+            ''', (tx_hash.lower(),))
+            
+            row = cursor.fetchone()
+            
+            if row:
+                return {
+                    'document_id': row['document_id'],
+                    'user_address': row['user_address'],
+                    'filename': row['filename'],
+                    'ipfs_hash': row['ipfs_hash'],
+                    'document_hash': row['document_hash'],
+                    'token_id': row['token_id'],
+                    'timestamp': row['timestamp'],
+                    'tx_hash': row['tx_hash'],
+                    'block_number': row['block_number']
+                }
+            return None
+            
+        except Exception as e:
+            logger.error(f"Error getting document by tx: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    # ============ Provenance mirror ============
+
+    @staticmethod
+    def _provenance_row(record: Dict[str, Any], confirmed: bool) -> tuple:
+        return (
+            record['record_id'],
+            record['nft_token_id'],
+            record['input_cid'],
+            record['input_root'],
+            record['output_cid'],
+            record['execution_root'].lower(),
+            record['trace_cid'],
+            record['agent_did_hash'].lower(),
+            record['executor'],
+            record['timestamp'],
+            record['proof_cid'],
+            int(record['verified']),
+            record['tx_hash'],
+            record['block_number'],
+            record['block_hash'],
+            int(confirmed)
+        )
+
+    def index_provenance(self, name: str, records: List[Dict[str, Any]], through_block: int) -> int:
+        """
+        Store confirmed provenance records and advance an indexer cursor atomically
+        
+        Args:
+            name: Indexer stream name
+            records: Provenance record dictionaries
+            through_block: Last block covered by this batch
+            
+        Returns:
+            Number of records written
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO provenance_records
+                (record_id, nft_token_id, input_cid, input_root, output_cid, execution_root,
+                 trace_cid, agent_did_hash, executor, timestamp, proof_cid, verified,
+                 tx_hash, block_number, block_hash, confirmed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [self._provenance_row(record, True) for record in records])
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO indexer_cursor
+                (name, last_block, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', (name, through_block))
+            
+            conn.commit()
+            return len(records)
+            
+        except Exception as e:
+            logger.error(f"Error indexing provenance records: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def store_tentative_provenance(
+        self,
+        name: str,
+        records: List[Dict[str, Any]],
+        blocks: List[Dict[str, Any]],
+        from_block: Optional[int] = None,
+        to_block: Optional[int] = None
+    ):
+        """
+        Store unconfirmed provenance records with the hashes of the blocks they were read from
+        
+        Args:
+            name: Indexer stream name
+            records: Provenance record dictionaries including block_hash
+            blocks: {'number', 'block_hash', 'parent_hash'} for every block covered
+            from_block: With to_block, a range whose existing unconfirmed rows are replaced
+            to_block: Last block of that range
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            if from_block is not None and to_block is not None:
+                cursor.execute('''
+                    DELETE FROM provenance_records
+                    WHERE confirmed = 0 AND block_number BETWEEN ? AND ?
+                ''', (from_block, to_block))
+                
+            cursor.executemany('''
+                INSERT OR REPLACE INTO indexed_blocks
+                (name, block_number, block_hash, parent_hash)
+                VALUES (?, ?, ?, ?)
+            ''', [(name, block['number'], block['block_hash'], block['parent_hash']) for block in blocks])
+            
+            cursor.executemany('''
+                INSERT OR REPLACE INTO provenance_records
+                (record_id, nft_token_id, input_cid, input_root, output_cid, execution_root,
+                 trace_cid, agent_did_hash, executor, timestamp, proof_cid, verified,
+                 tx_hash, block_number, block_hash, confirmed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [self._provenance_row(record, False) for record in records])
+            
+            conn.commit()
+            
+        except Exception as e:
+            logger.error(f"Error storing tentative provenance records: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def remove_tentative_provenance(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Drop specific unconfirmed provenance records, e.g. logs removed by a reorg
+        
+        Args:
+            records: Record dictionaries with record_id and block_hash
+            
+        Returns:
+            Number of records dropped
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                DELETE FROM provenance_records
+                WHERE record_id = ? AND block_hash = ? AND confirmed = 0
+            ''', [(record['record_id'], record['block_hash']) for record in records])
+            removed = cursor.rowcount
+            conn.commit()
+            return removed
+            
+        except Exception as e:
+            logger.error(f"Error removing tentative provenance records: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def rollback_tentative_provenance(self, name: str, from_block: int) -> int:
+        """
+        Drop unconfirmed provenance records and recorded hashes from a reorganized block upwards
+        
+        Args:
+            name: Indexer stream name
+            from_block: First block that is no longer on the canonical chain
+            
+        Returns:
+            Number of records dropped
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                DELETE FROM provenance_records
+                WHERE confirmed = 0 AND block_number >= ?
+            ''', (from_block,))
+            removed = cursor.rowcount
+            
+            cursor.execute('''
+                DELETE FROM indexed_blocks
+                WHERE name = ? AND block_number >= ?
+            ''', (name, from_block))
+            
+            conn.commit()
+            return removed
+            
+        except Exception as e:
+            logger.error(f"Error rolling back tentative provenance records: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def finalize_tentative_provenance(self, name: str, through_block: int) -> int:
+        """
+        Mark provenance records up to a confirmed block as final and advance the cursor to it
+        
+        Args:
+            name: Indexer stream name
+            through_block: Last block now considered final
+            
+        Returns:
+            Number of records confirmed
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE provenance_records
+                SET confirmed = 1
+                WHERE confirmed = 0 AND block_number <= ?
+            ''', (through_block,))
+            promoted = cursor.rowcount
+            
+            cursor.execute('''
+                DELETE FROM indexed_blocks
+                WHERE name = ? AND block_number < ?
+            ''', (name, through_block))
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO indexer_cursor
+                (name, last_block, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', (name, through_block))
+            
+            conn.commit()
+            return promoted
+            
+        except Exception as e:
+            logger.error(f"Error finalizing tentative provenance records: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def rewind_provenance(self, name: str, block_number: int):
+        """
+        Drop mirrored provenance records above a block (and all unconfirmed ones) and move the cursor back
+        
+        Args:
+            name: Indexer stream name
+            block_number: New cursor; records after this block are re-indexed
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                DELETE FROM provenance_records
+                WHERE block_number > ? OR confirmed = 0
+            ''', (block_number,))
+            removed = cursor.rowcount
+            
+            cursor.execute('''
+                DELETE FROM indexed_blocks
+                WHERE name = ? AND block_number > ?
+            ''', (name, block_number))
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO indexer_cursor
+                (name, last_block, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', (name, block_number))
+            
+            conn.commit()
+            logger.warning(f"Rewound provenance mirror {name} to block {block_number}, dropped {removed} records")
+            
+        except Exception as e:
+            logger.error(f"Error rewinding provenance mirror: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def get_provenance_record(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get one mirrored provenance record
+        
+        Args:
+            record_id: On-chain record ID
+            
+        Returns:
+            Record dictionary or None if not mirrored
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT * FROM provenance_records WHERE record_id = ?', (record_id,))
+            row = cursor.fetchone()
+            return self._provenance_dict(row) if row else None
+            
+        except Exception as e:
+            logger.error(f"Error retrieving provenance record: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def get_provenance_by_root(self, execution_root: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the mirrored provenance record anchoring an execution root
+        
+        Args:
+            execution_root: bytes32 hex string (with or without 0x)
+            
+        Returns:
+            Record dictionary or None if not mirrored
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT * FROM provenance_records
+                WHERE execution_root = ?
+            ''', ("0x" + execution_root.lower().removeprefix("0x"),))
+            row = cursor.fetchone()
+            return self._provenance_dict(row) if row else None
+            
+        except Exception as e:
+            logger.error(f"Error retrieving provenance by execution root: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def get_provenance_by_nft(self, token_id: int, limit: int = 50, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get one page of mirrored provenance records for an NFT, newest first
+        
+        Args:
+            token_id: NFT token ID
+            limit: Page size
+            before: Only records with a lower record ID (the last ID of the previous page)
+            
+        Returns:
+            List of record dictionaries
+        """
+        return self._provenance_page('nft_token_id', token_id, limit, before)
+
+    def get_provenance_by_agent(self, agent_did_hash: str, limit: int = 50, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get one page of mirrored provenance records submitted by an agent, newest first
+        
+        Args:
+            agent_did_hash: keccak256 of the agent DID as a 0x hex string
+            limit: Page size
+            before: Only records with a lower record ID (the last ID of the previous page)
+            
+        Returns:
+            List of record dictionaries
+        """
+        return self._provenance_page('agent_did_hash', agent_did_hash.lower(), limit, before)
+
+    def _provenance_page(self, column: str, value: Any, limit: int, before: Optional[int]) -> List[Dict[str, Any]]:
+        """Keyset page over one of the (column, record_id) indexes"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(f'''
+                SELECT * FROM provenance_records
+                WHERE {column} = ? AND record_id < ?
+                ORDER BY record_id DESC
+                LIMIT ?
+            ''', (value, before if before is not None else 2 ** 63 - 1, limit))
+            
+            return [self._provenance_dict(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            logger.error(f"Error retrieving provenance records by {column}: {e}")
+            return []
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _provenance_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        record['verified'] = bool(record['verified'])
+        record['confirmed'] = bool(record['confirmed'])
+        return record
+    
+    def store_provenance_anchors(self, anchors: List[Dict[str, Any]]) -> int:
+        """
+        Remember where settled executions were anchored
+        
+        The first anchoring of an execution root is kept if it is stored again.
+        
+        Args:
+            anchors: PendingAnchor.to_dict() of anchored executions
+            
+        Returns:
+            Number of new rows
+        """
+        if not anchors:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                INSERT OR IGNORE INTO provenance_anchors
+                (execution_root, nft_token_id, input_cid, input_root, output_cid, trace_cid,
+                 record_id, tx_hash, batch_root, manifest_cid, leaf_index, leaf_count, proof)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    "0x" + anchor['execution_root'].lower().removeprefix("0x"),
+                    anchor['nft_token_id'],
+                    anchor['input_cid'],
+                    anchor['input_root'],
+                    anchor['output_cid'],
+                    anchor['trace_cid'],
+                    anchor['record_id'],
+                    anchor['tx_hash'],
+                    "0x" + anchor['batch_root'].lower().removeprefix("0x"),
+                    anchor['manifest_cid'],
+                    anchor['leaf_index'],
+                    anchor['leaf_count'],
+                    json.dumps(anchor['proof'])
+                )
+                for anchor in anchors
+            ])
+            stored = cursor.rowcount
+            conn.commit()
+            return stored
+            
+        except Exception as e:
+            logger.error(f"Error storing provenance anchors: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def get_provenance_anchor(self, execution_root: str) -> Optional[Dict[str, Any]]:
+        """
+        Get where an execution was anchored
+        
+        Args:
+            execution_root: bytes32 hex string (with or without 0x)
+            
+        Returns:
+            Anchor dictionary (record_id, batch_root, manifest_cid, proof, ...) or None
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT * FROM provenance_anchors
+                WHERE execution_root = ?
+            ''', ("0x" + execution_root.lower().removeprefix("0x"),))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            anchor = dict(row)
+            anchor['proof'] = json.loads(anchor['proof'])
+            return anchor
+            
+        except Exception as e:
+            logger.error(f"Error retrieving provenance anchor: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    def get_chain_reads(self, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up memoized chain reads and mark them as recently used
+        
+        Args:
+            cache_keys: Keys built by ChainReadCache
+            
+        Returns:
+            Mapping of key to its value (JSON text) and expires_at, for the keys that are cached
+        """
+        if not cache_keys:
+            return {}
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            found = {}
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(cache_keys), 500):
+                chunk = cache_keys[start:start + 500]
+                cursor.execute(f'''
+                    SELECT cache_key, value, expires_at
+                    FROM chain_reads
+                    WHERE cache_key IN ({",".join("?" * len(chunk))})
+                ''', chunk)
+                found.update({row['cache_key']: dict(row) for row in cursor.fetchall()})
+            
+            if found:
+                now = datetime.now().timestamp()
+                cursor.executemany('''
+                    UPDATE chain_reads SET last_used = ? WHERE cache_key = ?
+                ''', [(now, key) for key in found])
+                conn.commit()
+            return found
+            
+        except Exception as e:
+            logger.error(f"Error getting chain reads: {e}")
+            return {}
+        finally:
+            conn.close()
+    
+    def store_chain_reads(self, entries: List[tuple]) -> int:
+        """
+        Memoize chain reads, replacing any earlier values for their keys
+        
+        Args:
+            entries: (cache_key, value as JSON text, expires_at) tuples; expires_at is
+                the Unix time after which the value is stale, or None for immutable reads
+            
+        Returns:
+            Change in the table's total value size, in bytes
+        """
+        if not entries:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            keys = [entry[0] for entry in entries]
+            replaced = 0
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                cursor.execute(f'''
+                    SELECT COALESCE(SUM(size), 0) as size
+                    FROM chain_reads
+                    WHERE cache_key IN ({",".join("?" * len(chunk))})
+                ''', chunk)
+                replaced += cursor.fetchone()['size']
+            
+            now = datetime.now().timestamp()
+            rows = [(key, value, len(value.encode('utf-8')), expires_at, now) for key, value, expires_at in entries]
+            cursor.executemany('''
+                INSERT OR REPLACE INTO chain_reads (cache_key, value, size, expires_at, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+            conn.commit()
+            return sum(row[2] for row in rows) - replaced
+            
+        except Exception as e:
+            logger.error(f"Error storing chain reads: {e}")
+            conn.rollback()
+            return 0
+        finally:
+            conn.close()
+    
+    def get_chain_reads_size(self) -> int:
+        """Total size in bytes of the memoized values"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT COALESCE(SUM(size), 0) as size FROM chain_reads')
+            return cursor.fetchone()['size']
+            
+        except Exception as e:
+            logger.error(f"Error getting chain read cache size: {e}")
+            return 0
+        finally:
+            conn.close()
+            
+    def evict_chain_reads(self, max_bytes: int) -> Dict[str, int]:
+        """
+        Drop least recently used chain reads until the total size fits in max_bytes
+        
+        Args:
+            max_bytes: Size the memoized values must fit in afterwards
+            
+        Returns:
+            Dictionary with evicted (entries removed) and size (bytes left)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT COALESCE(SUM(size), 0) as size FROM chain_reads')
+            size = cursor.fetchone()['size']
+            evicted = 0
+            while size > max_bytes:
+                cursor.execute('''
+                    SELECT cache_key, size FROM chain_reads ORDER BY last_used LIMIT 100
+                ''')
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                victims = []
+                for row in rows:
+                    if size <= max_bytes:
+                        break
+                    victims.append((row['cache_key'],))
+                    size -= row['size']
+                cursor.executemany('DELETE FROM chain_reads WHERE cache_key = ?', victims)
+                evicted += len(victims)
+            conn.commit()
+            return {'evicted': evicted, 'size': size}
+            
+        except Exception as e:
+            logger.error(f"Error evicting chain reads: {e}")
+            conn.rollback()
+            return {'evicted': 0, 'size': self.get_chain_reads_size()}
+        finally:
+            conn.close()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+        
+        Returns:
+            Dictionary with cache statistics
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # Total documents
+            cursor.execute('SELECT COUNT(*) as count FROM documents')
+            total_docs = cursor.fetchone()['count']
+            
+            # Documents from unconfirmed blocks
+            cursor.execute('SELECT COUNT(*) as count FROM tentative_documents')
+            tentative_docs = cursor.fetchone()['count']
+            
+            # Total users
+            cursor.execute('SELECT COUNT(DISTINCT user_address) as count FROM documents')
+            total_users = cursor.fetchone()['count']
+            
+            # Mirrored provenance records
+            cursor.execute('SELECT COUNT(*) as count FROM provenance_records')
+            provenance_records = cursor.fetchone()['count']
+            
+            # Memoized chain reads
+            cursor.execute('SELECT COUNT(*) as count FROM chain_reads')
+            chain_reads = cursor.fetchone()['count']
             
             # Database size
             cursor.execute("SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()")
@@ -399,7 +1614,10 @@ class DocumentDatabase:
             
             return {
                 'total_documents': total_docs,
+                'tentative_documents': tentative_docs,
                 'total_users': total_users,
+                'provenance_records': provenance_records,
+                'chain_reads': chain_reads,
                 'database_size_bytes': db_size,
                 'database_size_mb': round(db_size / (1024 * 1024), 2)
             }
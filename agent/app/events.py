@@ -0,0 +1,210 @@
+"""
+Topic-indexed contract event decoding
+Registered events are compiled once and logs are dispatched on topic0, so only matching logs are decoded
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from eth_abi import decode as abi_decode
+from eth_utils.abi import collapse_if_tuple, event_abi_to_log_topic
+from web3 import Web3
+
+
+def _as_bytes(value: Any) -> bytes:
+    """Log topics and data arrive as HexBytes from web3 and as 0x strings from raw JSON-RPC"""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+
+def _is_dynamic(abi_type: str) -> bool:
+    return abi_type in ("string", "bytes") or abi_type.endswith("]") or abi_type.startswith("(")
+
+
+def _word_decoder(abi_type: str) -> Optional[Callable[[bytes], Any]]:
+    """Decoder for one 32-byte word of an elementary static type (None for other types)"""
+    if abi_type.startswith("uint"):
+        return lambda word: int.from_bytes(word, "big")
+    if abi_type.startswith("int"):
+        return lambda word: int.from_bytes(word, "big", signed=True)
+    if abi_type == "address":
+        return lambda word: Web3.to_checksum_address(word[12:])
+    if abi_type == "bool":
+        return lambda word: word != b"\0" * 32
+    if abi_type.startswith("bytes") and abi_type != "bytes":
+        size = int(abi_type[5:])
+        return lambda word: word[:size]
+    return None
+
+
+def _compile_data_decoder(types: List[str]) -> Callable[[bytes], Tuple[Any, ...]]:
+    """
+    Build a decoder for the non-indexed part of a log
+
+    Heads of elementary static types and string/bytes tails are sliced directly;
+    anything else (arrays, tuples) goes through eth_abi.
+    """
+    plans = []
+    for abi_type in types:
+        if abi_type in ("string", "bytes"):
+            plans.append((True, abi_type == "string"))
+            continue
+        word = _word_decoder(abi_type)
+        if word is None:
+            return lambda data: abi_decode(types, data)
+        plans.append((False, word))
+
+    def decode(data: bytes) -> Tuple[Any, ...]:
+        values = []
+        for index, (dynamic, how) in enumerate(plans):
+            head = data[32 * index:32 * index + 32]
+            if len(head) != 32:
+                raise ValueError("log data shorter than its ABI head")
+            if not dynamic:
+                values.append(how(head))
+                continue
+            offset = int.from_bytes(head, "big")
+            length = int.from_bytes(data[offset:offset + 32], "big")
+            body = data[offset + 32:offset + 32 + length]
+            if len(body) != length:
+                raise ValueError("log data shorter than a dynamic value's length")
+            values.append(body.decode("utf-8") if how else body)
+        return tuple(values)
+
+    return decode
+
+
+class CompiledEvent:
+    """One event ABI with its topic0, argument names and decoders resolved up front"""
+
+    def __init__(self, event_abi: Dict[str, Any], address: Optional[str] = None):
+        """
+        Args:
+            event_abi: ABI entry of the event
+            address: Emitting contract; logs from other addresses are not decoded
+        """
+        if event_abi.get("anonymous"):
+            raise ValueError(f"Anonymous event {event_abi['name']} has no topic0 to dispatch on")
+        self.name = event_abi["name"]
+        self.address = Web3.to_checksum_address(address) if address else None
+        self.address_key = self.address.lower() if self.address else None
+        self.topic = bytes(event_abi_to_log_topic(event_abi))
+
+        inputs = event_abi["inputs"]
+        indexed = [i for i in inputs if i.get("indexed")]
+        data = [i for i in inputs if not i.get("indexed")]
+        self.topic_names = [i["name"] for i in indexed]
+        # Indexed dynamic values are stored as their keccak hash, which is all that can be returned
+        self.topic_decoders = [
+            (lambda word: word) if _is_dynamic(collapse_if_tuple(i)) else _word_decoder(collapse_if_tuple(i))
+            for i in indexed
+        ]
+        self.data_names = [i["name"] for i in data]
+        self.decode_data = _compile_data_decoder([collapse_if_tuple(i) for i in data])
+
+        if any(decoder is None for decoder in self.topic_decoders):
+            raise ValueError(f"Unsupported indexed argument type in event {self.name}")
+
+    def decode(self, log: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Decode a log already known to carry this event's topic0
+
+        Returns:
+            The same shape as web3's process_log: args, event and the log's position fields
+        """
+        topics = log["topics"]
+        if len(topics) != len(self.topic_decoders) + 1:
+            raise ValueError(f"{self.name} log has {len(topics) - 1} indexed topics, expected {len(self.topic_decoders)}")
+
+        args = {
+            name: decoder(_as_bytes(topic))
+            for name, decoder, topic in zip(self.topic_names, self.topic_decoders, topics[1:])
+        }
+        args.update(zip(self.data_names, self.decode_data(_as_bytes(log["data"]))))
+        return {
+            "args": args,
+            "event": self.name,
+            "logIndex": log["logIndex"],
+            "transactionIndex": log["transactionIndex"],
+            "transactionHash": log["transactionHash"],
+            "address": log["address"],
+            "blockHash": log["blockHash"],
+            "blockNumber": log["blockNumber"],
+        }
+
+
+class EventDecoder:
+    """
+    Registry of compiled events keyed by topic0
+
+    A log is looked up by its first topic and emitting address, so logs of other
+    events are skipped with one dict lookup instead of a failed decode attempt.
+    decode_many is the bulk path for backfills: it binds the lookups once and
+    decodes thousands of logs in one tight loop.
+    """
+
+    def __init__(self):
+        self._by_topic: Dict[bytes, List[CompiledEvent]] = {}
+        self._by_key: Dict[Tuple[Optional[str], str], CompiledEvent] = {}
+
+    def register(self, contract_event) -> CompiledEvent:
+        """
+        Compile a web3 contract event (e.g. contract.events.DocumentUploaded) once
+
+        Registering the same contract event again returns the compiled one.
+        """
+        key = (contract_event.address, contract_event.event_name)
+        compiled = self._by_key.get(key)
+        if compiled is None:
+            compiled = CompiledEvent(contract_event.abi, contract_event.address)
+            self._by_key[key] = compiled
+            self._by_topic.setdefault(compiled.topic, []).append(compiled)
+        return compiled
+
+    def _match(self, log: Dict[str, Any]) -> Optional[CompiledEvent]:
+        topics = log["topics"]
+        if not topics:
+            return None
+        candidates = self._by_topic.get(_as_bytes(topics[0]))
+        if not candidates:
+            return None
+        address = log["address"].lower()
+        for compiled in candidates:
+            if compiled.address_key is None or compiled.address_key == address:
+                return compiled
+        return None
+
+    def decode(self, log: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Decode a log of any registered event (None if it is not one)"""
+        compiled = self._match(log)
+        return compiled.decode(log) if compiled else None
+
+    def find(self, logs: Iterable[Dict[str, Any]], contract_event) -> Optional[Dict[str, Any]]:
+        """First log in logs (e.g. a receipt's) that is contract_event, decoded"""
+        compiled = self.register(contract_event)
+        for log in logs:
+            if self._match(log) is compiled:
+                return compiled.decode(log)
+        return None
+
+    def decode_many(self, logs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Bulk-decode logs of registered events, skipping any others
+
+        Raises:
+            ValueError: A log with a registered topic0 and address does not decode
+        """
+        by_topic = self._by_topic
+        decoded = []
+        append = decoded.append
+        for log in logs:
+            topics = log["topics"]
+            candidates = by_topic.get(_as_bytes(topics[0])) if topics else None
+            if not candidates:
+                continue
+            address = log["address"].lower()
+            for compiled in candidates:
+                if compiled.address_key is None or compiled.address_key == address:
+                    append(compiled.decode(log))
+                    break
+        return decoded
@@ -0,0 +1,141 @@
+"""
+Multi-gateway IPFS fetches
+Health-scored gateways, with hedged requests that race the next-best gateway when the first is slow to respond
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.hedging import HedgedPool, UpstreamHealth
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PUBLIC_GATEWAYS = ["https://ipfs.io/ipfs/", "https://dweb.link/ipfs/"]
+
+
+def gateways_from_env() -> List[str]:
+    """
+    IPFS_GATEWAYS (comma separated), or the Pinata dedicated gateway, a local node's
+    gateway and the public gateways, in that order, for whichever are configured
+    """
+    urls = [url for url in map(str.strip, os.getenv("IPFS_GATEWAYS", "").split(",")) if _is_http_url(url)]
+    if urls:
+        return urls
+    for name in ("PINATA_GATEWAY_URL", "IPFS_LOCAL_GATEWAY_URL"):
+        if _is_http_url(os.getenv(name, "")):
+            urls.append(os.getenv(name))
+    return urls + DEFAULT_PUBLIC_GATEWAYS
+
+
+def _is_http_url(url: str) -> bool:
+    if not url:
+        return False
+    if urlsplit(url).scheme not in ("http", "https"):
+        logger.warning(f"Ignoring an IPFS gateway setting that is not an http(s) URL ({len(url)} chars)")
+        return False
+    return True
+
+
+class GatewayHealth(UpstreamHealth):
+    """Time-to-first-byte and error tracking for one gateway"""
+
+    KIND = "IPFS gateway"
+    DEFAULT_LATENCY = 0.2
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, window: int = 200):
+        super().__init__(url if url.endswith("/") else url + "/", window)
+        self.headers = headers or {}
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"gateway": self.name, **super().metrics()}
+
+
+class GatewayPool(HedgedPool):
+    """
+    Fetches content by CID from whichever of several gateways answers first
+
+    A fetch starts on the best-scoring healthy gateway. If that gateway hasn't
+    sent response headers within its recent p95 time to first byte, the same
+    fetch also starts on the next best one, and so on; the first gateway to
+    respond with content keeps the download and the others are cancelled. A
+    gateway that errors (including 404s: it may just not have the content) is
+    failed over immediately, and one failing repeatedly sits out a cooldown.
+    Scoring and the race itself are HedgedPool's.
+    """
+
+    def __init__(
+        self,
+        urls: Optional[List[str]] = None,
+        request_timeout: Optional[float] = None,
+        hedge_min_delay: Optional[float] = None,
+        hedge_max_delay: Optional[float] = None,
+        cooldown: Optional[float] = None,
+        failures_before_cooldown: int = 3,
+    ):
+        """
+        Args:
+            urls: Gateway URL prefixes (content is at prefix + CID); defaults to gateways_from_env()
+            request_timeout: Seconds before a fetch from one gateway fails
+            hedge_min_delay: Lower bound on the wait before racing another gateway
+            hedge_max_delay: Upper bound (and the delay used before p95 is known)
+            cooldown: Seconds a failing gateway is skipped
+            failures_before_cooldown: Consecutive failures that trigger the cooldown
+        """
+        urls = urls or gateways_from_env()
+        self.request_timeout = request_timeout or float(os.getenv("IPFS_GATEWAY_TIMEOUT", "30"))
+        pinata_token = os.getenv("PINATA_GATEWAY_TOKEN")
+        self.gateways = [
+            GatewayHealth(url, {"x-pinata-gateway-token": pinata_token} if pinata_token and ".mypinata.cloud" in url else None)
+            for url in urls
+        ]
+        super().__init__(
+            self.gateways,
+            hedge_min_delay=hedge_min_delay if hedge_min_delay is not None else float(os.getenv("IPFS_HEDGE_MIN_DELAY", "0.1")),
+            hedge_max_delay=hedge_max_delay or float(os.getenv("IPFS_HEDGE_MAX_DELAY", "2.0")),
+            cooldown=cooldown or float(os.getenv("IPFS_GATEWAY_COOLDOWN", "60")),
+            failures_before_cooldown=failures_before_cooldown,
+        )
+
+    def __str__(self) -> str:
+        return f"IPFS gateways: {', '.join(g.name for g in self.gateways)}"
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.hedging_metrics(),
+            "gateways": [gateway.metrics() for gateway in self.gateways],
+        }
+
+    async def _attempt(self, http: httpx.AsyncClient, gateway: GatewayHealth, cid: str, responded: asyncio.Future) -> bytes:
+        """Fetch from one gateway, resolving responded with the time to first byte once content starts arriving"""
+        started = time.monotonic()
+        try:
+            async with http.stream("GET", f"{gateway.url}{cid}", headers=gateway.headers, timeout=self.request_timeout) as response:
+                response.raise_for_status()
+                responded.set_result(time.monotonic() - started)
+                content = await response.aread()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            gateway.record_failure(self.cooldown, self.failures_before_cooldown)
+            raise
+        gateway.record_success(responded.result())
+        return content
+
+    async def fetch(self, http: httpx.AsyncClient, cid: str) -> bytes:
+        """
+        Content of cid from the fastest responding gateway
+
+        Args:
+            http: Client the requests are sent with
+            cid: Content identifier
+
+        Raises:
+            The last gateway's error if every gateway failed
+        """
+        return await self._race(lambda gateway, responded: self._attempt(http, gateway, cid, responded), f"Fetch of {cid}")
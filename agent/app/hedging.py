@@ -0,0 +1,240 @@
+"""
+Health-scored upstreams and hedged requests across them
+Shared by the RPC endpoint pool and the IPFS gateway pool
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# An attempt on one upstream; it resolves the future with its latency once that upstream has answered
+Attempt = Callable[["UpstreamHealth", asyncio.Future], Awaitable[T]]
+
+
+def redact_url(url: str) -> str:
+    """scheme://host of an upstream URL; paths and queries often carry API keys"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc.rsplit('@', 1)[-1]}"
+
+
+class UpstreamHealth:
+    """Latency and error tracking for one upstream (an RPC endpoint or an IPFS gateway)"""
+
+    # Named in log messages
+    KIND = "Upstream"
+    # Latency assumed before the first measurement
+    DEFAULT_LATENCY = 0.05
+
+    def __init__(self, url: str, window: int = 200):
+        self.url = url
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.wins = 0
+
+    @property
+    def name(self) -> str:
+        return redact_url(self.url)
+
+    @property
+    def is_down(self) -> bool:
+        return time.monotonic() < self.down_until
+
+    def score(self) -> float:
+        """Lower is better: smoothed latency inflated by the recent error rate"""
+        latency = self.latency_ewma if self.latency_ewma is not None else self.DEFAULT_LATENCY
+        return latency * (1 + 10 * self.error_ewma)
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def record_latency(self, latency: float):
+        self.latencies.append(latency)
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.record_latency(latency)
+        self.error_ewma *= 0.8
+        self.consecutive_failures = 0
+
+    def record_failure(self, cooldown: float, failures_before_cooldown: int):
+        self.requests += 1
+        self.failures += 1
+        self.error_ewma = 0.8 * self.error_ewma + 0.2
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= failures_before_cooldown:
+            self.down_until = time.monotonic() + cooldown
+            logger.warning(f"{self.KIND} {self.name} marked down for {cooldown:.0f}s after {self.consecutive_failures} failures")
+
+    def metrics(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "down": self.is_down,
+            "requests": self.requests,
+            "failures": self.failures,
+            "wins": self.wins,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "latency_p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+            "latency_p95_ms": round(self.p95() * 1000, 1) if self.p95() is not None else None,
+            "error_ewma": round(self.error_ewma, 4),
+            "score": round(self.score(), 4),
+        }
+
+
+class HedgedPool:
+    """
+    Requests raced across health-scored upstreams
+
+    A request starts on the best-scoring healthy upstream. If that upstream hasn't
+    answered within its recent p95 latency, the same request also starts on the
+    next best one, and so on; the first upstream to answer keeps the request and
+    the others are cancelled. An upstream that fails is replaced by the next one
+    straight away, and one failing repeatedly sits out a cooldown.
+
+    What "answered" means is up to the attempt: an RPC call answers when its
+    response arrives, a gateway fetch once its response headers do (the body is
+    then read from that gateway alone, failing over if it breaks off).
+    """
+
+    def __init__(
+        self,
+        upstreams: List[UpstreamHealth],
+        hedge_min_delay: float,
+        hedge_max_delay: float,
+        cooldown: float,
+        failures_before_cooldown: int,
+    ):
+        """
+        Args:
+            upstreams: Upstreams to rank and race
+            hedge_min_delay: Lower bound on the wait before racing another upstream
+            hedge_max_delay: Upper bound (and the delay used before p95 is known)
+            cooldown: Seconds a failing upstream is skipped
+            failures_before_cooldown: Consecutive failures that trigger the cooldown
+        """
+        self.upstreams = upstreams
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.cooldown = cooldown
+        self.failures_before_cooldown = failures_before_cooldown
+
+        # Metrics
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def hedging_metrics(self) -> Dict[str, Any]:
+        return {
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+        }
+
+    def _ranked(self, exclude: Set[int] = frozenset()) -> List[UpstreamHealth]:
+        """Upstreams best first; down upstreams only if nothing else is left"""
+        candidates = [u for u in self.upstreams if id(u) not in exclude]
+        healthy = [u for u in candidates if not u.is_down]
+        return sorted(healthy or candidates, key=lambda u: u.score())
+
+    def _hedge_delay(self, upstream: UpstreamHealth) -> float:
+        p95 = upstream.p95()
+        if p95 is None:
+            return self.hedge_max_delay
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    async def _race(self, attempt: Attempt, description: str) -> T:
+        """
+        Result of the first upstream to answer
+
+        Args:
+            attempt: Runs the request on one upstream, resolving the future it is
+                given once that upstream has answered
+            description: What is being requested, for log messages
+
+        Raises:
+            The last upstream's error if every upstream failed
+        """
+        loop = asyncio.get_running_loop()
+        ranked = self._ranked()
+        # Attempt -> (upstream, start time, future resolved when it answers)
+        attempts: Dict[asyncio.Task, Tuple[UpstreamHealth, float, asyncio.Future]] = {}
+        last_error: Optional[Exception] = None
+        hedge_at = 0.0
+
+        def launch():
+            nonlocal hedge_at
+            if not ranked:
+                return
+            upstream = ranked.pop(0)
+            answered = loop.create_future()
+            task = asyncio.create_task(attempt(upstream, answered))
+            attempts[task] = (upstream, time.monotonic(), answered)
+            hedge_at = time.monotonic() + self._hedge_delay(upstream)
+
+        def cancel(keep: Optional[asyncio.Task] = None):
+            for task, (upstream, started, answered) in list(attempts.items()):
+                if task is keep:
+                    continue
+                task.cancel()
+                del attempts[task]
+                # The loser was at least this slow; without this it would keep ranking first
+                upstream.record_latency(answered.result() if answered.done() else time.monotonic() - started)
+
+        launch()
+        primary = next(iter(attempts))
+        try:
+            while attempts:
+                leader = next((task for task, (_, _, answered) in attempts.items() if answered.done()), None)
+                if leader is not None:
+                    if leader is not primary and primary in attempts:
+                        # A hedge answered while the primary was still outstanding
+                        self.hedge_wins += 1
+                    # Keep the upstream that answered and finish the request there
+                    cancel(keep=leader)
+                    upstream = attempts.pop(leader)[0]
+                    try:
+                        result = await leader
+                    except Exception as e:
+                        last_error = e
+                        self.failovers += 1
+                        logger.debug(f"{description} failed on {upstream.name} after it answered ({e}), trying another {upstream.KIND.lower()}")
+                        launch()
+                        continue
+                    upstream.wins += 1
+                    return result
+
+                waiting = set(attempts) | {answered for _, _, answered in attempts.values()}
+                timeout = max(0.0, hedge_at - time.monotonic()) if ranked else None
+                done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # No answer from anyone within the learned threshold: race the next upstream
+                    self.hedged += 1
+                    launch()
+                    continue
+
+                for task in [t for t in done if t in attempts and not attempts[t][2].done()]:
+                    # Failed before answering: replace it right away
+                    upstream = attempts.pop(task)[0]
+                    last_error = task.exception()
+                    self.failovers += 1
+                    logger.debug(f"{description} failed on {upstream.name} ({last_error}), trying another {upstream.KIND.lower()}")
+                    launch()
+            raise last_error
+        finally:
+            cancel()
@@ -0,0 +1,725 @@
+"""
+Global contract event indexers
+Follow CompanyDropbox DocumentUploaded and Provenance ProvenanceRecorded with one cursor each and
+fill DocumentDatabase, finalizing blocks only once they are a confirmation depth deep
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from web3 import Web3
+
+from app.block_times import BlockTimestamps
+from app.database import DocumentDatabase
+from app.log_fetcher import BlockRangeFetcher
+
+logger = logging.getLogger(__name__)
+
+
+class EventIndexer:
+    """
+    Background indexer for one contract event
+
+    One cursor (the last fully indexed block) covers every emitter, so a new user
+    costs nothing: queries read the local table. Ranges are fetched by a
+    BlockRangeFetcher, so a cold start or long downtime is caught up with several
+    adaptive windows in flight; windows are still committed in block order, so
+    the cursor never skips an unfetched range.
+
+    Only blocks at least `confirmations` below the head are final. Newer events go
+    to a tentative tier together with the hash and parent hash of every block they
+    were read from. Each poll checks that the newest recorded block is still
+    canonical; if a parent hash changed, only the tentative blocks above the fork
+    point are rolled back and re-read. Tentative rows are promoted once deep enough.
+
+    With a LogSubscriber attached, events pushed over the WebSocket are written to
+    the tentative tier as they arrive (on_log) and the poll interval stretches to
+    push_poll_interval. The next poll re-reads those blocks with their headers and
+    replaces what was pushed, so a pushed row is never promoted unverified.
+
+    The cursor and the end of the tentative tier are cached in memory. They are
+    re-read in the worker thread that runs each poll's reads and each tier write,
+    so the properties (read by the list endpoints) never touch SQLite on the loop.
+
+    Subclasses name the event and its settings, decode rows and map the tier
+    operations onto their table.
+    """
+
+    CURSOR_NAME = ""
+    EVENT_NAME = ""
+    # Settings are read from {ENV_PREFIX}_POLL_INTERVAL, {ENV_PREFIX}_CONFIRMATIONS, ...
+    ENV_PREFIX = ""
+    DEPLOYMENT_BLOCK_ENV = ""
+    # Used when DEPLOYMENT_BLOCK_ENV is unset; None makes the variable required
+    DEFAULT_DEPLOYMENT_BLOCK: Optional[str] = None
+    LABEL = "Event indexer"
+    # Plural row name used in metrics and log messages
+    ROWS = "rows"
+    # False when the event carries its own timestamp
+    NEEDS_BLOCK_TIMESTAMPS = True
+
+    def __init__(
+        self,
+        somnia_client,
+        db: Optional[DocumentDatabase] = None,
+        poll_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ):
+        """
+        Args:
+            somnia_client: SomniaClient with the indexed contract loaded
+            db: Database to index into (defaults to the client's database)
+            poll_interval: Seconds between polls once caught up
+            batch_size: Initial blocks per eth_getLogs window (widened while sparse)
+            concurrency: Windows fetched in parallel during bulk catch-up
+        """
+        self.somnia_client = somnia_client
+        self.db = db or somnia_client.db
+        self.poll_interval = poll_interval or float(os.getenv(f"{self.ENV_PREFIX}_POLL_INTERVAL", "2.0"))
+        self.block_times = BlockTimestamps(somnia_client.w3, self.db)
+        self.fetcher = BlockRangeFetcher(
+            self._fetch_window,
+            concurrency=concurrency or int(os.getenv(f"{self.ENV_PREFIX}_CONCURRENCY", "8")),
+            initial_window=batch_size,
+        )
+        # Rows are committed together with the cursor in batches of at least this many blocks
+        self.commit_blocks = int(os.getenv(f"{self.ENV_PREFIX}_COMMIT_BLOCKS", "10000"))
+        # None until configured; start() refuses to run without it
+        deployment_block = os.getenv(self.DEPLOYMENT_BLOCK_ENV) or self.DEFAULT_DEPLOYMENT_BLOCK
+        self.deployment_block = int(deployment_block) if deployment_block else None
+        self.confirmations = int(os.getenv(f"{self.ENV_PREFIX}_CONFIRMATIONS", "20"))
+        # Polling only confirms and promotes while a log subscription delivers new events
+        self.push_poll_interval = float(os.getenv(f"{self.ENV_PREFIX}_PUSH_POLL_INTERVAL", "15"))
+        # Seconds between audit() runs; None disables them
+        self.audit_interval: Optional[float] = None
+
+        self._task: Optional[asyncio.Task] = None
+        self._last_audit = time.monotonic()
+        self._wake = asyncio.Event()
+        self._live_logs: List[Any] = []
+        self._live_task: Optional[asyncio.Task] = None
+        self.live = False
+        # Loaded once here, at startup; refreshed off the loop from then on
+        self._cache_state(*self._read_state())
+
+        # Metrics
+        self.head_block: Optional[int] = None
+        self.rows_indexed = 0
+        self.last_poll_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.catching_up = False
+        self.reorgs = 0
+        self.tentative_rolled_back = 0
+        self.live_rows = 0
+
+    @property
+    def contract(self):
+        raise NotImplementedError
+
+    @property
+    def event(self):
+        return getattr(self.contract.events, self.EVENT_NAME)
+
+    @property
+    def decoder(self):
+        """Compiled decoder for the indexed event from the client's topic0 registry"""
+        return self.somnia_client.events.register(self.event)
+
+    @property
+    def cursor(self) -> int:
+        """Last block fully indexed (one before the deployment block if never run)"""
+        return self._cursor
+
+    @property
+    def tentative_through(self) -> int:
+        """Last block read into the tentative tier (the cursor if the tier is empty)"""
+        return self._tentative_through
+
+    def _read_state(self) -> Tuple[Dict[int, Dict[str, str]], int]:
+        """Recorded tentative blocks and the cursor, from the database"""
+        stored = self.db.get_indexer_cursor(self.CURSOR_NAME)
+        cursor = stored if stored is not None else (self.deployment_block or 0) - 1
+        return self.db.get_indexed_blocks(self.CURSOR_NAME), cursor
+
+    def _cache_state(self, recorded: Dict[int, Dict[str, str]], cursor: int):
+        self._cursor = cursor
+        self._tentative_through = max([number for number in recorded if number > cursor], default=cursor)
+
+    async def _in_thread(self, operation: Callable[..., Any], *args) -> Any:
+        """Run a tier operation in a worker thread and refresh the cached cursor after it"""
+        def run():
+            return operation(*args), self._read_state()
+
+        result, state = await asyncio.to_thread(run)
+        self._cache_state(*state)
+        return result
+
+    @property
+    def lag_blocks(self) -> Optional[int]:
+        """Blocks between the chain head seen at the last poll and the cursor"""
+        if self.head_block is None:
+            return None
+        return max(0, self.head_block - self.cursor)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Indexer state for /metrics and the list endpoints"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "cursor_block": self.cursor,
+            "tentative_through_block": self.tentative_through,
+            "confirmations": self.confirmations,
+            "head_block": self.head_block,
+            "lag_blocks": self.lag_blocks,
+            "catching_up": self.catching_up,
+            f"{self.ROWS}_indexed": self.rows_indexed,
+            "reorgs": self.reorgs,
+            "tentative_rolled_back": self.tentative_rolled_back,
+            "live": self.live,
+            f"live_{self.ROWS}": self.live_rows,
+            "fetcher": self.fetcher.metrics(),
+            "block_timestamps": self.block_times.metrics(),
+            "last_poll_age_seconds": round(time.time() - self.last_poll_at, 3) if self.last_poll_at else None,
+            "last_error": self.last_error,
+        }
+
+    def start(self):
+        """Start following the chain in the background"""
+        if not self.contract:
+            logger.warning(f"{self.LABEL} disabled: contract not loaded")
+            return
+        if self.deployment_block is None:
+            self.last_error = f"{self.DEPLOYMENT_BLOCK_ENV} is not set"
+            logger.error(f"{self.LABEL} disabled: set {self.DEPLOYMENT_BLOCK_ENV} to the contract's deployment block")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"{self.LABEL} started at block {self.cursor + 1}")
+
+    async def stop(self):
+        """Stop the background loop (the cursor is already persisted)"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync_once()
+                if self.audit_interval and time.monotonic() - self._last_audit >= self.audit_interval:
+                    self._last_audit = time.monotonic()
+                    await self.audit()
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"{self.LABEL} poll failed: {e}", exc_info=True)
+
+            interval = self.push_poll_interval if self.live else self.poll_interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def subscription_filter(self) -> Optional[Dict[str, Any]]:
+        """eth_subscribe("logs") filter for the indexed event"""
+        if not self.contract or self.deployment_block is None:
+            return None
+        return {"address": self.contract.address, "topics": [self.event.topic]}
+
+    def set_live(self, live: bool):
+        """Switch between push and polling mode; either way, poll now to cover any gap"""
+        self.live = live
+        self._wake.set()
+
+    def on_log(self, log):
+        """Queue a pushed log; queued logs are stored together"""
+        self._live_logs.append(log)
+        if self._live_task is None:
+            self._live_task = asyncio.create_task(self._store_live())
+
+    async def _store_live(self):
+        try:
+            while self._live_logs:
+                logs, self._live_logs = self._live_logs, []
+                await self._ingest_live(logs)
+        except Exception as e:
+            # Polling reads the same blocks shortly anyway
+            logger.warning(f"Storing pushed {self.EVENT_NAME} logs failed: {e}")
+        finally:
+            self._live_task = None
+
+    async def _ingest_live(self, logs: List[Any]):
+        decoder = self.decoder
+        tentative_through = self.tentative_through
+        added, removed = [], []
+        for log in logs:
+            decoded = decoder.decode(log)
+            if log.get('removed'):
+                removed.append(decoded)
+            elif decoded['blockNumber'] > tentative_through:
+                # Blocks at or below tentative_through were read (and hashed) by a poll already
+                added.append(decoded)
+
+        if removed:
+            # A reorg is under way: drop what it took and let a poll find the fork point
+            await self._in_thread(self._remove_tentative, [self._decode(e, 0) for e in removed])
+            self._wake.set()
+
+        if added:
+            rows = await self._complete(await self._decode_many(added))
+            await self._in_thread(self._store_tentative, rows, [])
+            self.live_rows += len(rows)
+            logger.info(f"Stored {len(rows)} pushed {self.ROWS} from block {rows[-1]['block_number']}")
+
+    async def sync_once(self, target_block: Optional[int] = None) -> int:
+        """
+        Index everything between the cursor and target_block (the chain head by default)
+
+        Blocks more than `confirmations` deep are finalized; the rest land in the
+        tentative tier.
+
+        Returns:
+            Number of new rows finalized
+        """
+        head = await self.somnia_client.w3.eth.block_number
+        self.head_block = head
+        self.last_poll_at = time.time()
+        target = min(target_block, head) if target_block is not None else head
+        safe = target - self.confirmations
+
+        recorded, cursor = await asyncio.to_thread(self._read_state)
+        self._cache_state(recorded, cursor)
+        tentative_through = self.tentative_through
+
+        # The tentative tier must still be on the canonical chain before any of it is promoted
+        if tentative_through > cursor and not await self._verify_tentative(recorded, tentative_through):
+            return 0
+
+        indexed = 0
+        if tentative_through > cursor and safe > cursor:
+            promote_through = min(safe, tentative_through)
+            promoted = await self._in_thread(self._finalize, promote_through)
+            self.rows_indexed += promoted
+            indexed += promoted
+            cursor = promote_through
+
+        if safe > cursor:
+            indexed += await self._index_final(cursor + 1, safe)
+            cursor = safe
+
+        from_block = max(cursor, tentative_through) + 1
+        if from_block <= target:
+            await self._index_tentative(from_block, target, recorded)
+        return indexed
+
+    async def _index_final(self, from_block: int, to_block: int) -> int:
+        """Bulk-index blocks that are already past the confirmation depth"""
+        self.catching_up = to_block - from_block + 1 > self.fetcher.window
+        if self.catching_up:
+            logger.info(f"{self.LABEL} catching up {to_block - from_block + 1} blocks from {from_block}")
+
+        indexed = 0
+        pending: List[Dict[str, Any]] = []
+        uncommitted_from = from_block
+        through_block = None
+        try:
+            async for _, end, rows in self.fetcher.iter_ranges(from_block, to_block):
+                pending.extend(rows)
+                through_block = end
+                if end - uncommitted_from + 1 >= self.commit_blocks or len(pending) >= 1000:
+                    indexed += await self._commit(pending, through_block)
+                    pending, uncommitted_from = [], end + 1
+        finally:
+            # Also reached when a window fails for good: keep the contiguous prefix
+            if through_block is not None and through_block >= uncommitted_from:
+                indexed += await self._commit(pending, through_block)
+            self.catching_up = False
+        return indexed
+
+    async def _index_tentative(self, from_block: int, to_block: int, recorded: Dict[int, Dict[str, str]]):
+        """
+        Read unconfirmed blocks into the tentative tier, recording their hashes
+
+        The header of from_block - 1 is read too: it must match the hash recorded
+        for it (if any), which ties the new blocks to the ones already indexed.
+        """
+        numbers = list(range(from_block - 1, to_block + 1))
+        headers, events = await asyncio.gather(
+            self._fetch_headers(numbers),
+            self._fetch_events(from_block, to_block),
+        )
+
+        for number in numbers[1:]:
+            if headers[number]['parentHash'] != headers[number - 1]['hash']:
+                logger.info(f"Chain moved while reading blocks {from_block}-{to_block}; retrying next poll")
+                return
+
+        anchor = recorded.get(from_block - 1)
+        if anchor and anchor['block_hash'] != headers[from_block - 1]['hash'].to_0x_hex():
+            await self._rollback_to_fork(recorded)
+            return
+
+        rows = []
+        for event in events:
+            header = headers[event['blockNumber']]
+            if event['blockHash'] != header['hash']:
+                logger.info(f"Logs and headers disagree at block {event['blockNumber']}; retrying next poll")
+                return
+            rows.append(self._decode(event, header['timestamp']))
+        rows = await self._complete(rows)
+
+        blocks = [
+            {
+                'number': number,
+                'block_hash': headers[number]['hash'].to_0x_hex(),
+                'parent_hash': headers[number]['parentHash'].to_0x_hex(),
+            }
+            for number in numbers
+        ]
+        await self._in_thread(self._store_tentative, rows, blocks, from_block, to_block)
+        if rows:
+            logger.info(f"Indexed {len(rows)} tentative {self.ROWS} in blocks {from_block}-{to_block}")
+
+    async def _verify_tentative(self, recorded: Dict[int, Dict[str, str]], tentative_through: int) -> bool:
+        """
+        Check the newest tentative block is still canonical (which vouches for its ancestors)
+
+        Returns:
+            False if a reorg was found and rolled back
+        """
+        header = await self.somnia_client.w3.eth.get_block(tentative_through)
+        if header['hash'].to_0x_hex() == recorded[tentative_through]['block_hash']:
+            return True
+        await self._rollback_to_fork(recorded)
+        return False
+
+    async def _rollback_to_fork(self, recorded: Dict[int, Dict[str, str]]):
+        """Find the newest recorded block still on the chain and drop everything above it"""
+        self.reorgs += 1
+        numbers = sorted(recorded)
+        headers = await self._fetch_headers(numbers)
+        canonical = [
+            number for number in numbers
+            if headers.get(number) is not None and headers[number]['hash'].to_0x_hex() == recorded[number]['block_hash']
+        ]
+
+        cursor = self.cursor
+        if canonical and canonical[-1] >= cursor:
+            fork_block = canonical[-1] + 1
+            removed = await self._in_thread(self._rollback, fork_block)
+            self.tentative_rolled_back += removed
+            logger.warning(f"Reorg from block {fork_block}: dropped {removed} tentative {self.ROWS}")
+            return
+
+        # Deeper than the confirmation depth: the finalized tail is suspect as well
+        rewind_to = max(self.deployment_block - 1, cursor - self.confirmations)
+        logger.error(f"Reorg reached finalized block {cursor}; re-indexing from block {rewind_to + 1}")
+        await self._in_thread(self._rewind, rewind_to)
+
+    async def _fetch_headers(self, block_numbers: List[int]) -> Dict[int, Any]:
+        """Block headers for block_numbers, read in JSON-RPC batches"""
+        w3 = self.somnia_client.w3
+        batch_size = self.block_times.batch_size
+
+        async def read(chunk: List[int]) -> List[Any]:
+            async with w3.batch_requests() as batch:
+                for number in chunk:
+                    batch.add(w3.eth.get_block(number))
+                return await batch.async_execute()
+
+        chunks = [block_numbers[start:start + batch_size] for start in range(0, len(block_numbers), batch_size)]
+        results = await asyncio.gather(*[read(chunk) for chunk in chunks])
+        return {
+            number: header
+            for chunk, headers in zip(chunks, results)
+            for number, header in zip(chunk, headers)
+        }
+
+    async def catch_up(self, target_block: Optional[int] = None) -> int:
+        """Bulk-index from the cursor to target_block (or the head), e.g. from a cold start"""
+        started = time.monotonic()
+        start_cursor = self.cursor
+        indexed = await self.sync_once(target_block)
+        elapsed = time.monotonic() - started
+        covered = self.cursor - start_cursor
+        logger.info(
+            f"Catch-up indexed {covered} blocks ({indexed} {self.ROWS}) in {elapsed:.1f}s; "
+            f"lag now {self.lag_blocks} blocks"
+        )
+        return indexed
+
+    async def _commit(self, rows: List[Dict[str, Any]], through_block: int) -> int:
+        """Store rows and move the cursor to through_block in one transaction"""
+        stored = await self._in_thread(self._store_final, rows, through_block)
+        self.rows_indexed += stored
+        if rows:
+            logger.info(f"Indexed {stored} {self.ROWS} through block {through_block}")
+        return stored
+
+    async def _fetch_events(self, from_block: int, to_block: int) -> List[Any]:
+        """Decoded events for one block window"""
+        decoder = self.decoder
+        logs = await self.somnia_client.w3.eth.get_logs({
+            "address": self.contract.address,
+            "topics": ["0x" + decoder.topic.hex()],
+            "fromBlock": from_block,
+            "toBlock": to_block,
+        })
+        # Bulk path: thousands of logs per window during a backfill
+        return self.somnia_client.events.decode_many(logs)
+
+    async def _fetch_window(self, from_block: int, to_block: int) -> List[Dict[str, Any]]:
+        """Fetch and decode events for one finalized block window"""
+        events = await self._fetch_events(from_block, to_block)
+        if not events:
+            return []
+        return await self._complete(await self._decode_many(events))
+
+    async def _decode_many(self, events: List[Any]) -> List[Dict[str, Any]]:
+        """Decode events, looking up block timestamps if the event lacks one"""
+        if not self.NEEDS_BLOCK_TIMESTAMPS:
+            return [self._decode(event, None) for event in events]
+
+        # One batched header round trip at most, usually none; rows are stored, so never estimates
+        timestamps = await self.block_times.get_many((event['blockNumber'] for event in events), exact=True)
+        return [self._decode(event, timestamps[event['blockNumber']]) for event in events]
+
+    @staticmethod
+    def _decode(event, timestamp: Optional[int]) -> Dict[str, Any]:
+        """Turn one event into a table row (including block_number and block_hash)"""
+        raise NotImplementedError
+
+    async def _complete(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill in row fields the event does not carry"""
+        return rows
+
+    async def audit(self):
+        """Periodic consistency check, run every audit_interval seconds when set"""
+
+    # Table operations for the two tiers; called from a worker thread
+
+    def _store_final(self, rows: List[Dict[str, Any]], through_block: int) -> int:
+        raise NotImplementedError
+
+    def _store_tentative(
+        self,
+        rows: List[Dict[str, Any]],
+        blocks: List[Dict[str, Any]],
+        from_block: Optional[int] = None,
+        to_block: Optional[int] = None,
+    ):
+        raise NotImplementedError
+
+    def _remove_tentative(self, rows: List[Dict[str, Any]]) -> int:
+        raise NotImplementedError
+
+    def _finalize(self, through_block: int) -> int:
+        raise NotImplementedError
+
+    def _rollback(self, from_block: int) -> int:
+        raise NotImplementedError
+
+    def _rewind(self, block_number: int):
+        raise NotImplementedError
+
+
+class DocumentIndexer(EventIndexer):
+    """
+    Background indexer for CompanyDropbox DocumentUploaded events
+
+    /documents/list reads its table; a sample of indexed rows is audited against
+    transaction receipts every audit_interval seconds.
+    """
+
+    CURSOR_NAME = "company_dropbox.DocumentUploaded"
+    EVENT_NAME = "DocumentUploaded"
+    ENV_PREFIX = "DOCUMENT_INDEXER"
+    DEPLOYMENT_BLOCK_ENV = "COMPANY_DROPBOX_DEPLOYMENT_BLOCK"
+    DEFAULT_DEPLOYMENT_BLOCK = "219187000"
+    LABEL = "Document indexer"
+    ROWS = "documents"
+
+    def __init__(self, somnia_client, **kwargs):
+        super().__init__(somnia_client, **kwargs)
+        self.audit_interval = float(os.getenv("DOCUMENT_INDEXER_AUDIT_INTERVAL", "300"))
+        self.audit_sample_size = int(os.getenv("DOCUMENT_INDEXER_AUDIT_SAMPLE", "10"))
+
+    @property
+    def contract(self):
+        return self.somnia_client.company_dropbox
+
+    @staticmethod
+    def _decode(event, timestamp: Optional[int]) -> Dict[str, Any]:
+        args = event['args']
+        return {
+            "user_address": args['uploader'].lower(),
+            "document_id": args['documentId'],
+            "filename": args['fileName'],
+            "ipfs_hash": args['ipfsHash'],
+            "document_hash": args['documentHash'].hex() if isinstance(args['documentHash'], bytes) else args['documentHash'],
+            "token_id": args['tokenId'],
+            "timestamp": timestamp,
+            "tx_hash": event['transactionHash'].to_0x_hex(),
+            "block_number": event['blockNumber'],
+            "block_hash": event['blockHash'].to_0x_hex(),
+        }
+
+    def _store_final(self, rows, through_block):
+        return self.db.index_documents(self.CURSOR_NAME, rows, through_block)
+
+    def _store_tentative(self, rows, blocks, from_block=None, to_block=None):
+        self.db.store_tentative(self.CURSOR_NAME, rows, blocks, from_block, to_block)
+
+    def _remove_tentative(self, rows):
+        return self.db.remove_tentative(rows)
+
+    def _finalize(self, through_block):
+        return self.db.finalize_tentative(self.CURSOR_NAME, through_block)
+
+    def _rollback(self, from_block):
+        return self.db.rollback_tentative(self.CURSOR_NAME, from_block)
+
+    def _rewind(self, block_number):
+        self.db.rewind_indexer(self.CURSOR_NAME, block_number)
+
+    async def audit(self):
+        """
+        Spot-check a random sample of indexed rows against their transaction receipts
+
+        A row that no longer matches the chain means the local table was altered (or
+        the block was reorganized away); everything from that block on is dropped
+        and re-indexed.
+        """
+        sample = await asyncio.to_thread(self.db.sample_documents, self.audit_sample_size)
+        if not sample:
+            return
+
+        results = await asyncio.gather(*[
+            self.somnia_client.verify_document_on_chain(doc['tx_hash'], doc['block_number'], doc)
+            for doc in sample
+        ])
+
+        bad_blocks = [doc['block_number'] for doc, valid in zip(sample, results) if not valid]
+        if bad_blocks:
+            rewind_to = min(bad_blocks) - 1
+            logger.warning(f"Index audit found {len(bad_blocks)}/{len(sample)} mismatched documents; re-indexing from block {rewind_to + 1}")
+            await self._in_thread(self._rewind, rewind_to)
+        else:
+            logger.info(f"Index audit verified {len(sample)} documents")
+
+
+class ProvenanceIndexer(EventIndexer):
+    """
+    Background mirror of Provenance ProvenanceRecorded events
+
+    The event carries the record ID, NFT, agent DID hash, execution root, output CID
+    and timestamp; the remaining fields (input CID and root, trace CID, executor,
+    proof CID, verified) are read with one batched getRecord per window. The
+    /provenance/nft, /provenance/agent and /provenance/root endpoints query its table.
+    """
+
+    CURSOR_NAME = "provenance.ProvenanceRecorded"
+    EVENT_NAME = "ProvenanceRecorded"
+    ENV_PREFIX = "PROVENANCE_INDEXER"
+    DEPLOYMENT_BLOCK_ENV = "PROVENANCE_DEPLOYMENT_BLOCK"
+    LABEL = "Provenance indexer"
+    ROWS = "records"
+    NEEDS_BLOCK_TIMESTAMPS = False
+
+    @property
+    def contract(self):
+        return self.somnia_client.provenance
+
+    @staticmethod
+    def _decode(event, timestamp: Optional[int]) -> Dict[str, Any]:
+        args = event['args']
+        return {
+            "record_id": args['recordId'],
+            "nft_token_id": args['nftTokenId'],
+            "input_cid": "",
+            "input_root": "",
+            "output_cid": args['outputCID'],
+            "execution_root": Web3.to_hex(args['executionRoot']),
+            "trace_cid": "",
+            "agent_did_hash": Web3.to_hex(args['agentDIDHash']),
+            "executor": "",
+            "timestamp": args['timestamp'],
+            "proof_cid": "",
+            "verified": False,
+            "tx_hash": event['transactionHash'].to_0x_hex(),
+            "block_number": event['blockNumber'],
+            "block_hash": event['blockHash'].to_0x_hex(),
+        }
+
+    async def _complete(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Read the fields the event leaves out with batched getRecord calls"""
+        if not rows:
+            return rows
+
+        records = await self.somnia_client.get_records([row['record_id'] for row in rows])
+        for row, record in zip(rows, records):
+            # A lagging or reorganized node may hold a different record under this ID
+            if record['executionRoot'].lower().removeprefix("0x") != row['execution_root'][2:]:
+                raise ValueError(f"getRecord({row['record_id']}) does not match its ProvenanceRecorded log")
+            row.update({
+                "input_cid": record['inputCID'],
+                "input_root": "0x" + record['inputRoot'].lower().removeprefix("0x"),
+                "trace_cid": record['traceCID'],
+                "executor": record['executor'],
+                "proof_cid": record['proofCID'],
+                "verified": record['verified'],
+            })
+        return rows
+
+    def _store_final(self, rows, through_block):
+        return self.db.index_provenance(self.CURSOR_NAME, rows, through_block)
+
+    def _store_tentative(self, rows, blocks, from_block=None, to_block=None):
+        self.db.store_tentative_provenance(self.CURSOR_NAME, rows, blocks, from_block, to_block)
+
+    def _remove_tentative(self, rows):
+        return self.db.remove_tentative_provenance(rows)
+
+    def _finalize(self, through_block):
+        return self.db.finalize_tentative_provenance(self.CURSOR_NAME, through_block)
+
+    def _rollback(self, from_block):
+        return self.db.rollback_tentative_provenance(self.CURSOR_NAME, from_block)
+
+    def _rewind(self, block_number):
+        self.db.rewind_provenance(self.CURSOR_NAME, block_number)
+
+
+async def _catch_up_from_cli():
+    from app.chains import SomniaClient
+
+    client = SomniaClient()
+    try:
+        for indexer in (DocumentIndexer(client), ProvenanceIndexer(client)):
+            if not indexer.contract:
+                continue
+            await indexer.catch_up()
+            print(f"{indexer.LABEL}: indexed through block {indexer.cursor} (head {indexer.head_block})")
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    # Bulk catch-up before starting the API, e.g. on a fresh database:
+    #   python -m app.indexer
+    from pathlib import Path
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_catch_up_from_cli())
@@ -5,31 +5,159 @@ Supports Pinata and local IPFS node
 
 import os
 import json
+import hashlib
 import logging
+import secrets
 import httpx
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterable, AsyncIterator, List
 from pathlib import Path
 
+from .blob_cache import Blob, BlobCache
+from .gateways import GatewayPool
+
+try:
+    import h2  # noqa: F401 - httpx's optional HTTP/2 support (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+async def _read_file(file_path: Path, chunk_size: int) -> AsyncIterator[bytes]:
+    """A file's content in chunks"""
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+async def _multipart(
+    boundary: str,
+    fields: Dict[str, str],
+    filename: str,
+    content: AsyncIterable[bytes]
+) -> AsyncIterator[bytes]:
+    """multipart/form-data body with form fields and one streamed "file" part"""
+    for name, value in fields.items():
+        yield (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+        ).encode()
+    # Quotes and line breaks would end the header early
+    safe_name = filename.replace("\\", "_").replace('"', "_").replace("\r", "_").replace("\n", "_")
+    yield (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{safe_name}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    async for chunk in content:
+        yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
 class IPFSClient:
-    """Wrapper for IPFS operations (Pinata or local node)"""
+    """
+    Wrapper for IPFS operations (Pinata or local node)
+    
+    Uploads and fetches share one pooled httpx client, so connections (and TLS
+    sessions) to Pinata and the gateway are reused across requests instead of
+    being set up per call; HTTP/2 is negotiated when h2 is installed. The pool
+    is opened by open() on app startup (or lazily by the first request) and
+    released by close() on shutdown. Fetches are raced across a set of
+    gateways (see GatewayPool).
+    """
     
     def __init__(
         self,
         use_pinata: bool = True,
         pinata_jwt: Optional[str] = None,
-        ipfs_gateway: str = "https://ipfs.io/ipfs/"
+        ipfs_gateway: Optional[str] = None,
+        ipfs_gateways: Optional[List[str]] = None,
+        pinata_api_url: Optional[str] = None,
+        ipfs_api_url: Optional[str] = None,
+        http2: Optional[bool] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        cache: Optional[BlobCache] = None
     ):
+        """
+        Args:
+            use_pinata: Pin through Pinata rather than a local IPFS node
+            pinata_jwt: Pinata API token
+            ipfs_gateway: A single gateway URL prefix to fetch content from
+            ipfs_gateways: Gateway URL prefixes fetches are raced across (IPFS_GATEWAYS by default)
+            pinata_api_url: Pinata API base URL
+            ipfs_api_url: Local IPFS node's HTTP API base URL
+            http2: Negotiate HTTP/2 (needs httpx[http2]); defaults to on when available
+            max_connections: Connections the pool may hold open across all hosts
+            max_keepalive_connections: Idle connections kept for reuse
+            keepalive_expiry: Seconds an idle connection is kept
+            cache: Local content cache for fetches (IPFS_CACHE_ENABLED creates one by default)
+        """
         self.use_pinata = use_pinata
         self.pinata_jwt = pinata_jwt or os.getenv("PINATA_JWT")
-        self.ipfs_gateway = ipfs_gateway
+        self.gateways = GatewayPool(ipfs_gateways or ([ipfs_gateway] if ipfs_gateway else None))
+        self.ipfs_gateway = self.gateways.gateways[0].url
+        self.pinata_api_url = (pinata_api_url or os.getenv("PINATA_API_URL", "https://api.pinata.cloud")).rstrip("/")
+        self.ipfs_api_url = (ipfs_api_url or os.getenv("IPFS_API_URL", "http://127.0.0.1:5001")).rstrip("/")
         
         if use_pinata and not self.pinata_jwt:
             raise ValueError("PINATA_JWT not provided")
         
-        logger.info(f"IPFS client initialized: {'Pinata' if use_pinata else 'Local node'}")
+        if http2 is None:
+            http2 = os.getenv("IPFS_HTTP2", "true").lower() == "true"
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("IPFS_HTTP2 is on but h2 is not installed (pip install httpx[http2]); using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections or int(os.getenv("IPFS_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=max_keepalive_connections or int(os.getenv("IPFS_MAX_KEEPALIVE_CONNECTIONS", "10")),
+            keepalive_expiry=keepalive_expiry or float(os.getenv("IPFS_KEEPALIVE_EXPIRY", "30"))
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self.upload_chunk_size = int(os.getenv("IPFS_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+        
+        if cache is None and os.getenv("IPFS_CACHE_ENABLED", "true").lower() == "true":
+            cache = BlobCache()
+        self.cache = cache
+        
+        # Metrics
+        self.requests = 0
+        self.clients_opened = 0
+        
+        logger.info(f"IPFS client initialized: {'Pinata' if use_pinata else 'Local node'}, {self.gateways}")
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "open": self._client is not None,
+            "max_connections": self.limits.max_connections,
+            "requests": self.requests,
+            "clients_opened": self.clients_opened,
+            "cache": self.cache.metrics() if self.cache else None,
+            "gateways": self.gateways.metrics(),
+        }
+    
+    # ============ Connection pool ============
+    
+    async def open(self):
+        """Open the shared connection pool (idempotent)"""
+        self._http()
+    
+    async def close(self):
+        """Close the shared connection pool; a later request opens a new one"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+    
+    def _http(self) -> httpx.AsyncClient:
+        """The shared client, opened on first use"""
+        if self._client is None:
+            # Per-request timeouts are passed by each call
+            self._client = httpx.AsyncClient(http2=self.http2, limits=self.limits, timeout=30.0)
+            self.clients_opened += 1
+        self.requests += 1
+        return self._client
     
     async def upload_file(
         self,
@@ -42,10 +170,57 @@ class IPFSClient:
         Returns:
             CID (content identifier)
         """
-        if self.use_pinata:
-            return await self._upload_to_pinata(file_path, metadata)
-        else:
-            return await self._upload_to_local_node(file_path)
+        result = await self.upload_stream(_read_file(file_path, self.upload_chunk_size), file_path.name, metadata)
+        return result["cid"]
+    
+    async def upload_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        filename: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Upload content to IPFS as it arrives, without holding it in memory
+        
+        The chunks are sent as the file part of a chunked multipart request, and
+        hashed (and written through to the local cache) on the way.
+        
+        Args:
+            chunks: The content, in pieces
+            filename: Name of the file part
+            metadata: Pinata metadata ("name" and "keyvalues")
+        
+        Returns:
+            CID, SHA-256 (hex) and size of the content
+        """
+        digest = hashlib.sha256()
+        size = 0
+        writer = self.cache.writer() if self.cache else None
+        
+        async def content() -> AsyncIterator[bytes]:
+            nonlocal size
+            async for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                if writer:
+                    writer.write(chunk)
+                yield chunk
+        
+        try:
+            if self.use_pinata:
+                cid = await self._upload_to_pinata(content(), filename, metadata)
+            else:
+                cid = await self._upload_to_local_node(content(), filename)
+        except BaseException:
+            if writer:
+                writer.discard()
+            raise
+        
+        logger.info(f"File uploaded successfully: CID={cid}, size: {size} bytes")
+        if writer:
+            # Analyses of a just-uploaded document then read it locally
+            await self.cache.commit(writer, cid)
+        return {"cid": cid, "sha256": digest.hexdigest(), "size": size}
     
     async def upload_json(
         self,
@@ -65,45 +240,37 @@ class IPFSClient:
     
     async def _upload_to_pinata(
         self,
-        file_path: Path,
+        content: AsyncIterable[bytes],
+        filename: str,
         metadata: Optional[Dict[str, Any]] = None
     ) -> str:
-        """Upload file to Pinata"""
-        url = "https://api.pinata.cloud/pinning/pinFileToIPFS"
+        """Stream a file to Pinata"""
+        url = f"{self.pinata_api_url}/pinning/pinFileToIPFS"
+        
+        fields = {}
+        if metadata:
+            fields["pinataMetadata"] = json.dumps({
+                "name": metadata.get("name", filename),
+                "keyvalues": metadata.get("keyvalues", {})
+            })
+        boundary = secrets.token_hex(16)
         
         headers = {
-            "Authorization": f"Bearer {self.pinata_jwt}"
+            "Authorization": f"Bearer {self.pinata_jwt}",
+            "Content-Type": f"multipart/form-data; boundary={boundary}"
         }
         
         try:
-            # Read file content first
-            with open(file_path, "rb") as f:
-                file_content = f.read()
-            
-            # Prepare multipart data
-            files = {"file": (file_path.name, file_content)}
-            
-            # Optional metadata
-            data = {}
-            if metadata:
-                data["pinataMetadata"] = json.dumps({
-                    "name": metadata.get("name", file_path.name),
-                    "keyvalues": metadata.get("keyvalues", {})
-                })
-            
-            logger.info(f"Uploading file to Pinata: {file_path.name}, size: {len(file_content)} bytes")
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    url,
-                    headers=headers,
-                    files=files,
-                    data=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                cid = result["IpfsHash"]
-                logger.info(f"File uploaded successfully: CID={cid}")
-                return cid
+            logger.info(f"Uploading file to Pinata: {filename}")
+            response = await self._http().post(
+                url,
+                headers=headers,
+                content=_multipart(boundary, fields, filename, content),
+                timeout=60.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["IpfsHash"]
         except Exception as e:
             logger.error(f"Pinata upload failed: {str(e)}", exc_info=True)
             raise
@@ -114,7 +281,7 @@ class IPFSClient:
         filename: str
     ) -> str:
         """Upload JSON to Pinata"""
-        url = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
+        url = f"{self.pinata_api_url}/pinning/pinJSONToIPFS"
         
         headers = {
             "Authorization": f"Bearer {self.pinata_jwt}",
@@ -128,51 +295,57 @@ class IPFSClient:
             }
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["IpfsHash"]
+        response = await self._http().post(
+            url,
+            headers=headers,
+            json=payload,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result["IpfsHash"]
     
-    async def _upload_to_local_node(self, file_path: Path) -> str:
-        """Upload to local IPFS node via HTTP API"""
-        url = "http://127.0.0.1:5001/api/v0/add"
+    async def _upload_to_local_node(self, content: AsyncIterable[bytes], filename: str) -> str:
+        """Stream a file to a local IPFS node via its HTTP API"""
+        url = f"{self.ipfs_api_url}/api/v0/add"
+        boundary = secrets.token_hex(16)
         
-        with open(file_path, "rb") as f:
-            files = {"file": f}
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, files=files)
-                response.raise_for_status()
-                result = response.json()
-                return result["Hash"]
+        response = await self._http().post(
+            url,
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            content=_multipart(boundary, {}, filename, content),
+            timeout=5.0
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result["Hash"]
     
     async def _upload_json_to_local_node(self, data: Dict[str, Any]) -> str:
         """Upload JSON to local IPFS node"""
-        import tempfile
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(data, f)
-            temp_path = f.name
+        async def content() -> AsyncIterator[bytes]:
+            yield json.dumps(data).encode()
         
-        try:
-            cid = await self._upload_to_local_node(Path(temp_path))
-            return cid
-        finally:
-            os.unlink(temp_path)
+        return await self._upload_to_local_node(content(), "data.json")
     
     async def fetch(self, cid: str) -> bytes:
         """Fetch content from IPFS by CID"""
-        url = f"{self.ipfs_gateway}{cid}"
+        content = await self.fetch_view(cid)
+        return content if isinstance(content, bytes) else content[:]
+    
+    async def fetch_view(self, cid: str) -> Blob:
+        """
+        Fetch content from IPFS by CID, from the local cache when possible
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            return response.content
+        Returns:
+            The content; large cache hits come back as a read-only mmap rather than read into memory
+        """
+        if self.cache:
+            return await self.cache.get(cid, lambda: self._download(cid))
+        return await self._download(cid)
+    
+    async def _download(self, cid: str) -> bytes:
+        """Fetch content from the fastest responding gateway"""
+        return await self.gateways.fetch(self._http(), cid)
     
     async def fetch_json(self, cid: str) -> Dict[str, Any]:
         """Fetch JSON content from IPFS"""
@@ -227,6 +400,7 @@ async def example_usage():
         print(f"Uploaded file: {file_cid}")
     finally:
         os.unlink(temp_path)
+        await client.close()
 
 
 if __name__ == "__main__":
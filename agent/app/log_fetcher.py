@@ -0,0 +1,197 @@
+"""
+Parallel, adaptive block-range fetching for eth_getLogs scans
+Runs several windows at once, resizes them from the results and never skips a failed range
+"""
+
+import os
+import heapq
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Node error fragments meaning the window (or its result set) was too large
+RANGE_ERRORS = (
+    "block range",
+    "range too large",
+    "range is too large",
+    "exceed maximum block range",
+    "query returned more than",
+    "too many results",
+    "response size exceeded",
+    "limit exceeded",
+    "log response size",
+)
+
+
+def is_range_error(error: Exception) -> bool:
+    """Check whether an eth_getLogs call failed because the window should be smaller"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in RANGE_ERRORS)
+
+
+class RangeFetchError(Exception):
+    """A block window kept failing after every retry"""
+
+    def __init__(self, from_block: int, to_block: int, cause: Exception):
+        super().__init__(f"Blocks {from_block}-{to_block} failed after retries: {cause}")
+        self.from_block = from_block
+        self.to_block = to_block
+        self.cause = cause
+
+
+class BlockRangeFetcher:
+    """
+    Fetches [from_block, to_block] as windows through a bounded pool of concurrent calls
+
+    Results are yielded strictly in block order and only once every earlier block has
+    been fetched, so a caller can advance its cursor to the end of each yielded window.
+    Windows double while they come back sparse (up to max_window) and halve when the
+    node rejects the range or times out; the rejected window is split and both halves
+    are fetched. Other failures are retried with backoff; a window that still fails
+    raises RangeFetchError after everything before it has been yielded.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[int, int], Awaitable[List[Any]]],
+        concurrency: Optional[int] = None,
+        initial_window: Optional[int] = None,
+        max_window: Optional[int] = None,
+        min_window: int = 1,
+        target_results: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        timeout: Optional[float] = None,
+        retry_backoff: float = 0.5,
+    ):
+        """
+        Args:
+            fetch: Coroutine fetching the items of one inclusive block window
+            concurrency: Windows in flight at once
+            initial_window: Starting window size in blocks
+            max_window: Largest window ever requested (Somnia caps eth_getLogs at 1000)
+            min_window: Smallest window a rejected range is split down to
+            target_results: Results per window to aim for; fewer than a quarter widens
+            max_attempts: Attempts per window for errors that splitting cannot fix
+            timeout: Seconds before a window call is abandoned and split
+            retry_backoff: Base delay before a retry, doubled per attempt
+        """
+        self.fetch = fetch
+        self.concurrency = concurrency or int(os.getenv("LOG_FETCH_CONCURRENCY", "8"))
+        self.max_window = max_window or int(os.getenv("LOG_FETCH_MAX_WINDOW", "1000"))
+        self.min_window = min_window
+        self.window = min(initial_window or int(os.getenv("BLOCKCHAIN_QUERY_BATCH_SIZE", "500")), self.max_window)
+        self.target_results = target_results or int(os.getenv("LOG_FETCH_TARGET_RESULTS", "2000"))
+        self.max_attempts = max_attempts or int(os.getenv("LOG_FETCH_MAX_ATTEMPTS", "5"))
+        self.timeout = timeout or float(os.getenv("LOG_FETCH_TIMEOUT", "20"))
+        self.retry_backoff = retry_backoff
+
+        # Metrics
+        self.requests = 0
+        self.splits = 0
+        self.retries = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "window": self.window,
+            "max_window": self.max_window,
+            "requests": self.requests,
+            "splits": self.splits,
+            "retries": self.retries,
+        }
+
+    async def _fetch_window(self, from_block: int, to_block: int, attempt: int) -> List[Any]:
+        if attempt:
+            await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+        self.requests += 1
+        return await asyncio.wait_for(self.fetch(from_block, to_block), self.timeout)
+
+    def _adapt(self, span: int, count: int):
+        """Resize the window from the result count of a successful span"""
+        if count < self.target_results // 4 and span >= self.window:
+            self.window = min(self.max_window, self.window * 2)
+        elif count > self.target_results:
+            self.window = max(self.min_window, self.window // 2)
+
+    async def iter_ranges(self, from_block: int, to_block: int) -> AsyncIterator[Tuple[int, int, List[Any]]]:
+        """
+        Yield (from_block, to_block, items) windows covering the range in order
+
+        Raises:
+            RangeFetchError: A window failed max_attempts times; nothing after it is yielded
+        """
+        # Split and retried windows, lowest start first so the ordered prefix unblocks soonest
+        queued: List[Tuple[int, int, int]] = []
+        in_flight: Dict[asyncio.Task, Tuple[int, int, int]] = {}
+        completed: Dict[int, Tuple[int, List[Any]]] = {}
+        next_start = from_block
+        emit_from = from_block
+        failure: Optional[RangeFetchError] = None
+        # Bound how far fetching may run ahead of a slow early window
+        max_buffered = self.concurrency * 4
+
+        try:
+            while True:
+                while len(in_flight) < self.concurrency:
+                    if queued:
+                        start, end, attempt = heapq.heappop(queued)
+                        if failure is not None and start > failure.from_block:
+                            # Nothing past a failed window will be yielded
+                            continue
+                    elif failure is None and next_start <= to_block and len(completed) < max_buffered:
+                        start, end, attempt = next_start, min(next_start + self.window - 1, to_block), 0
+                        next_start = end + 1
+                    else:
+                        break
+                    task = asyncio.create_task(self._fetch_window(start, end, attempt))
+                    in_flight[task] = (start, end, attempt)
+
+                if not in_flight:
+                    if failure is not None:
+                        raise failure
+                    break
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    start, end, attempt = in_flight.pop(task)
+                    span = end - start + 1
+                    try:
+                        items = task.result()
+                    except Exception as e:
+                        if is_range_error(e) and span > self.min_window:
+                            middle = start + span // 2 - 1
+                            heapq.heappush(queued, (start, middle, 0))
+                            heapq.heappush(queued, (middle + 1, end, 0))
+                            self.splits += 1
+                            if not isinstance(e, asyncio.TimeoutError):
+                                # The node enforces a limit; stop widening past a fraction of this span
+                                self.max_window = max(self.min_window, min(self.max_window, span * 3 // 4))
+                            self.window = max(self.min_window, min(self.window, span // 2))
+                            logger.info(f"Split blocks {start}-{end} after '{e}'; window now {self.window}")
+                        elif attempt + 1 < self.max_attempts:
+                            heapq.heappush(queued, (start, end, attempt + 1))
+                            self.retries += 1
+                            logger.warning(f"Retrying blocks {start}-{end} (attempt {attempt + 2}/{self.max_attempts}): {e}")
+                        elif failure is None or start < failure.from_block:
+                            failure = RangeFetchError(start, end, e)
+                        continue
+
+                    self._adapt(span, len(items))
+                    completed[start] = (end, items)
+
+                while emit_from in completed:
+                    end, items = completed.pop(emit_from)
+                    yield emit_from, end, items
+                    emit_from = end + 1
+
+                if failure is not None and emit_from == failure.from_block:
+                    # Everything before the failed window has been yielded
+                    raise failure
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
@@ -4,20 +4,30 @@ Combines: NFT authentication + IPFS storage + Verifiable execution + Somnia anch
 """
 
 import os
+import hmac
+import json
 from typing import Optional, List, Dict, Any
 from pathlib import Path
 import asyncio
 import logging
 import time
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, BackgroundTasks, Request, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from web3 import Web3
 
 from .verifiable import VerifiableAgent, DIDKey
 from .ipfs import IPFSClient
 from .chains import SomniaClient
+from .anchoring import ProvenanceAnchor, PendingAnchor, BATCH_MANIFEST_TYPE
+from .indexer import DocumentIndexer, ProvenanceIndexer
+from .subscriber import LogSubscriber
+from .agent_status import AgentStatus
+from .sessions import Session, SessionError, SessionManager
 from .agent import AIAgent
 from .crossmint import CrossmintClient
 from .logging_config import setup_logging, log_transaction, log_performance
@@ -55,11 +65,72 @@ async def record_document_async(
         logger.error(f"[Background] Failed to record document on chain: {e}", exc_info=True)
 
 
+# Completion hook for provenance anchoring audit trail
+def audit_provenance_anchor(anchor: PendingAnchor):
+    """Write the blockchain audit entry once a batched provenance anchor settles"""
+    if anchor.status != "anchored":
+        logger.error(f"[Background] Provenance anchoring failed for {anchor.execution_root}: {anchor.error}")
+        return
+    
+    audit_logger.log_blockchain_tx(
+        operation="record_provenance",
+        tx_hash=anchor.tx_hash,
+        did=AGENT_DID,
+        status="success",
+        nft_token_id=anchor.nft_token_id,
+        record_id=anchor.record_id,
+        batch_size=anchor.leaf_count
+    )
+
+
+# Background services live for the lifetime of the app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start the event indexers, agent status and log subscription, open the IPFS connection pool,
+    and run the startup registration check in the background; on shutdown flush pending anchors and close clients
+    """
+    if os.getenv("DOCUMENT_INDEXER_ENABLED", "true").lower() == "true":
+        document_indexer.start()
+        log_subscriber.add_follower(document_indexer)
+    if os.getenv("PROVENANCE_INDEXER_ENABLED", "true").lower() == "true":
+        provenance_indexer.start()
+        log_subscriber.add_follower(provenance_indexer)
+    agent_status.start()
+    if somnia_client.agent_registry:
+        log_subscriber.add_follower(agent_status)
+    if nft_authenticator:
+        log_subscriber.add_follower(nft_authenticator.auth_cache)
+        log_subscriber.add_follower(session_manager)
+    if log_subscriber.followers:
+        log_subscriber.start()
+    await ipfs_client.open()
+    
+    # The registration check may send a transaction; readiness doesn't wait for it
+    startup_task = asyncio.create_task(startup_event())
+    
+    yield
+    
+    startup_task.cancel()
+    try:
+        await startup_task
+    except asyncio.CancelledError:
+        pass
+    await agent_status.stop()
+    await log_subscriber.stop()
+    await document_indexer.stop()
+    await provenance_indexer.stop()
+    await provenance_anchor.flush()
+    await somnia_client.close()
+    await ipfs_client.close()
+
+
 # Initialize FastAPI
 app = FastAPI(
     title="Somnia AI Agents API",
     description="NFT-gated AI agents with verifiable execution on Somnia L1",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS - Allow all origins for development
@@ -119,7 +190,6 @@ AGENT_DID = os.getenv("AGENT_DID")
 AGENT_JWK = os.getenv("AGENT_JWK")
 
 if AGENT_JWK:
-    import json
     AGENT_DID_KEY = DIDKey.from_jwk(json.loads(AGENT_JWK))
     logger.info(f"Loaded agent DID from environment: {AGENT_DID}")
 elif not AGENT_DID:
@@ -133,15 +203,33 @@ elif not AGENT_DID:
 ipfs_client = IPFSClient(use_pinata=True)
 somnia_client = SomniaClient()
 
+# Batches provenance records so executions share one anchor transaction
+provenance_anchor = ProvenanceAnchor(somnia_client, ipfs_client, AGENT_DID, db=somnia_client.db)
+
+# Follows DocumentUploaded for every uploader; /documents/list reads its table
+document_indexer = DocumentIndexer(somnia_client)
+
+# Mirrors ProvenanceRecorded; /provenance/nft, /provenance/agent and /provenance/root read its table
+provenance_indexer = ProvenanceIndexer(somnia_client)
+
+# Pushes new events to the enabled indexers over SOMNIA_WS_URL (they poll over HTTP without it)
+log_subscriber = LogSubscriber()
+
+# Registration status of AGENT_DID for / and /agent/info, kept current from AgentRegistry events
+agent_status = AgentStatus(somnia_client, AGENT_DID)
+
 # NFT Authentication System (NEW - based on research paper architecture)
 from .nft_auth import NFTAuthenticator
 try:
-    nft_authenticator = NFTAuthenticator()
+    nft_authenticator = NFTAuthenticator(w3=somnia_client.w3, multicall=somnia_client.multicall)
     logger.info("✅ NFT Authentication system initialized")
 except Exception as e:
     logger.warning(f"⚠️ NFT Authentication not available: {e}")
     nft_authenticator = None
 
+# Wallet sign-in; gated endpoints accept the session token it issues instead of a chain check
+session_manager = SessionManager()
+
 logger.info("Initialized IPFS and Somnia clients")
 
 # ============ Models ============
@@ -149,11 +237,12 @@ logger.info("Initialized IPFS and Somnia clients")
 class ExecutionRequest(BaseModel):
     """Request to execute AI on a document"""
     nft_token_id: int = Field(..., description="NFT token ID for access control")
-    user_address: str = Field(..., description="User's Ethereum address")
+    user_address: Optional[str] = Field(None, description="User's Ethereum address (taken from the session token if omitted)")
     document_cid: str = Field(..., description="IPFS CID of document to analyze")
     prompt: str = Field(..., description="Prompt for AI agent")
     model: str = Field(default="gemini-2.0-flash", description="AI model to use")
     provider: str = Field(default="gemini", description="AI provider (moonshot, gemini, deepseek, mistral, mai)")
+    wait_for_anchor: bool = Field(default=False, description="Wait for the provenance batch to be anchored before responding")
 
 
 class ExecutionResponse(BaseModel):
@@ -162,8 +251,9 @@ class ExecutionResponse(BaseModel):
     output_cid: str
     execution_root: str
     trace_cid: str
-    tx_hash: str
+    tx_hash: str  # Empty while the provenance anchor is pending
     output_text: str
+    anchor: Optional[Dict[str, Any]] = None
 
 
 class AgentInfo(BaseModel):
@@ -187,6 +277,56 @@ class ProvenanceRecord(BaseModel):
     executor: str
 
 
+class MirroredProvenanceRecord(ProvenanceRecord):
+    """Provenance record from the local ProvenanceRecorded mirror"""
+    agent_did_hash: str
+    proof_cid: str
+    verified: bool
+    tx_hash: str
+    block_number: int
+    confirmed: bool = Field(..., description="False while the block is within the confirmation depth")
+    batch: Optional[Dict[str, Any]] = Field(None, description="Inclusion proof when the execution was anchored in a batch")
+
+
+class ProvenancePage(BaseModel):
+    """One page of mirrored provenance records, newest first"""
+    records: List[MirroredProvenanceRecord]
+    next_cursor: Optional[int] = Field(None, description="Pass as `before` for the next page")
+    indexed_through_block: int
+    tentative_through_block: int
+
+
+class SignInChallengeRequest(BaseModel):
+    """Wallet address starting a sign-in"""
+    address: str = Field(..., description="User's Ethereum address")
+
+
+class SignInChallengeResponse(BaseModel):
+    """EIP-4361 message for the wallet to sign"""
+    message: str
+    nonce: str
+    expires_at: float
+
+
+class SessionRequest(BaseModel):
+    """Signed sign-in message"""
+    message: str = Field(..., description="Message from /auth/challenge, unchanged")
+    signature: str = Field(..., description="personal_sign signature over the message")
+
+
+class BulkAuthRequest(BaseModel):
+    """Wallets to check in one request"""
+    addresses: List[str] = Field(..., description="Ethereum addresses; duplicates are answered once")
+
+
+class SessionResponse(BaseModel):
+    """Session token for the Authorization: Bearer header"""
+    token: str
+    address: str
+    token_id: Optional[int]
+    expires_at: float
+
+
 # ============ Dependencies ============
 
 def get_verifiable_agent() -> VerifiableAgent:
@@ -196,6 +336,45 @@ def get_verifiable_agent() -> VerifiableAgent:
     return VerifiableAgent(AGENT_DID_KEY)
 
 
+def get_session(authorization: Optional[str] = Header(None)) -> Optional[Session]:
+    """Session from an Authorization: Bearer token, validated locally (None without the header)"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Authorization must be a Bearer session token")
+    try:
+        return session_manager.validate(token.strip())
+    except SessionError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+
+async def authenticate_user(user_address: Optional[str], session: Optional[Session]) -> Dict[str, Any]:
+    """
+    NFT authentication for a request, from its session token or an on-chain check
+    
+    Returns:
+        require_nft_authentication-style result, with the authenticated user_address
+    """
+    if session:
+        if user_address and user_address.lower() != session.address.lower():
+            raise HTTPException(status_code=403, detail="user_address does not match the session")
+        return {
+            "authenticated": True,
+            "token_id": session.token_id,
+            "user_address": session.address,
+            "message": "Session verified"
+        }
+    
+    if not user_address:
+        raise HTTPException(
+            status_code=401,
+            detail="Sign in via /auth/challenge and /auth/session, or pass user_address"
+        )
+    auth_result = await nft_authenticator.require_nft_authentication(user_address)
+    return {**auth_result, "user_address": user_address}
+
+
 def get_ai_agent(provider: str = None, model: str = None) -> AIAgent:
     """Get AI agent instance with optional provider and model override"""
     return AIAgent(provider=provider, model=model)
@@ -211,14 +390,33 @@ async def root():
         "service": "Somnia AI Agents",
         "version": "1.0.0",
         "agent_did": AGENT_DID,
+        "agent_registered": agent_status.active,
         "status": "operational"
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Operational metrics for background services"""
+    return {
+        "document_indexer": document_indexer.metrics(),
+        "provenance_indexer": provenance_indexer.metrics(),
+        "log_subscriber": log_subscriber.metrics(),
+        "agent_status": agent_status.metrics(),
+        "auth_cache": nft_authenticator.auth_cache.metrics() if nft_authenticator else None,
+        "sessions": session_manager.metrics(),
+        "multicall": somnia_client.multicall.metrics(),
+        "chain_reads": somnia_client.reads.metrics(),
+        "rpc_pool": somnia_client.rpc_pool.metrics(),
+        "ipfs": ipfs_client.metrics(),
+        "document_cache": somnia_client.db.get_cache_stats(),
+    }
+
+
 @app.get("/agent/info", response_model=AgentInfo)
 async def get_agent_info():
-    """Get agent information"""
-    is_registered = await somnia_client.is_agent_active(AGENT_DID)
+    """Get agent information (registration status from memory)"""
+    is_registered = await agent_status.get()
     
     return AgentInfo(
         did=AGENT_DID,
@@ -254,6 +452,7 @@ async def register_agent(
         name=name,
         metadata_cid=metadata_cid
     )
+    agent_status.set(True, "registration")
     
     return {
         "did": AGENT_DID,
@@ -262,21 +461,71 @@ async def register_agent(
     }
 
 
+@app.post("/auth/challenge", response_model=SignInChallengeResponse)
+async def create_sign_in_challenge(request: SignInChallengeRequest):
+    """Start a wallet sign-in: returns a single-use EIP-4361 message to sign"""
+    try:
+        return SignInChallengeResponse(**session_manager.challenge(request.address))
+    except SessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/auth/session", response_model=SessionResponse)
+async def create_session(request: SessionRequest):
+    """
+    Finish a wallet sign-in: checks the signature and the Access NFT once, then
+    issues a session token that gated endpoints verify without chain calls
+    """
+    if not nft_authenticator:
+        raise HTTPException(status_code=503, detail="NFT authentication system not configured")
+    
+    try:
+        address = session_manager.verify_signature(request.message, request.signature)
+    except SessionError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    
+    auth_result = await nft_authenticator.require_nft_authentication(address)
+    if not auth_result["authenticated"]:
+        raise HTTPException(
+            status_code=403,
+            detail={
+                "error": "NFT_AUTH_REQUIRED",
+                "message": auth_result["message"],
+                "action": "Please mint an Access NFT first"
+            }
+        )
+    
+    session = session_manager.issue(address, auth_result["token_id"])
+    logger.info(f"Session issued - User: {address}, Token ID: {auth_result['token_id']}")
+    return SessionResponse(
+        token=session["token"],
+        address=address,
+        token_id=auth_result["token_id"],
+        expires_at=session["expires_at"]
+    )
+
+
 @app.get("/auth/check")
-async def check_nft_authentication(user_address: str):
+async def check_nft_authentication(
+    user_address: Optional[str] = None,
+    session: Optional[Session] = Depends(get_session)
+):
     """
     Check if user has NFT authentication token
     Part of research paper's architecture - NFT must be minted first
+    A valid session token answers without a chain call
     """
-    if not nft_authenticator:
+    if not nft_authenticator and not session:
         return {
             "authenticated": False,
             "error": "NFT authentication system not configured"
         }
     
     try:
-        auth_result = nft_authenticator.require_nft_authentication(user_address)
+        auth_result = await authenticate_user(user_address, session)
         return auth_result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error checking authentication: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -288,31 +537,77 @@ async def check_nft_authentication(user_address: str):
     }
 
 
+def is_admin(admin_key: Optional[str]) -> bool:
+    """Whether admin_key matches AUTH_BULK_ADMIN_KEY (always False while it is unset)"""
+    expected = os.getenv("AUTH_BULK_ADMIN_KEY", "")
+    return bool(expected and admin_key) and hmac.compare_digest(admin_key.encode(), expected.encode())
+
+
+@app.post("/auth/check/bulk")
+async def check_nft_authentication_bulk(
+    request: BulkAuthRequest,
+    session: Optional[Session] = Depends(get_session),
+    x_admin_key: Optional[str] = Header(None)
+):
+    """
+    Check NFT authentication for many wallets at once
+    Streams one JSON object per distinct address (application/x-ndjson) as results
+    resolve: cached decisions first, then aggregated chain reads
+    Requires a session token, or X-Admin-Key for batches above AUTH_BULK_SESSION_MAX_ADDRESSES
+    """
+    admin = is_admin(x_admin_key)
+    if not admin and not session:
+        raise HTTPException(status_code=401, detail="Session token or X-Admin-Key required")
+    if not nft_authenticator:
+        raise HTTPException(status_code=503, detail="NFT authentication system not configured")
+    
+    if admin:
+        max_addresses = int(os.getenv("AUTH_BULK_MAX_ADDRESSES", "10000"))
+    else:
+        max_addresses = int(os.getenv("AUTH_BULK_SESSION_MAX_ADDRESSES", "100"))
+    if len(request.addresses) > max_addresses:
+        raise HTTPException(status_code=413, detail=f"At most {max_addresses} addresses per request")
+    
+    async def results():
+        async for result in nft_authenticator.require_nft_authentication_many(request.addresses):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+async def read_upload(file: UploadFile):
+    """An uploaded file's content in IPFS_UPLOAD_CHUNK_SIZE pieces"""
+    while chunk := await file.read(ipfs_client.upload_chunk_size):
+        yield chunk
+
+
 @app.post("/documents/upload")
 async def upload_document(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    user_address: str = Form(...)
+    user_address: Optional[str] = Form(None),
+    session: Optional[Session] = Depends(get_session)
 ):
     """
     Upload document to IPFS (requires NFT authentication FIRST)
     Architecture from research paper:
-    1. Verify user has minted NFT
+    1. Verify user has minted NFT (a session token from /auth/session proves it without a chain call)
     2. Authenticate via NFT ownership
-    3. Upload document to IPFS
+    3. Stream document to IPFS, hashing it on the way (memory use doesn't grow with file size)
     4. Record on blockchain in background (non-blocking)
     """
     
     try:
         # STEP 1: Verify NFT Authentication (CRITICAL)
-        if not user_address:
+        if not user_address and not session:
             raise HTTPException(
                 status_code=401,
-                detail="user_address required for NFT authentication"
+                detail="Session token or user_address required for NFT authentication"
             )
         
-        if nft_authenticator:
-            auth_result = nft_authenticator.require_nft_authentication(user_address)
+        if nft_authenticator or session:
+            auth_result = await authenticate_user(user_address, session)
+            user_address = auth_result["user_address"]
             
             if not auth_result["authenticated"]:
                 logger.warning(f"❌ Upload blocked - User {user_address} not authenticated")
@@ -331,70 +626,49 @@ async def upload_document(
             logger.warning("⚠️ NFT authentication not configured, allowing upload")
             token_id = None
         
-        # STEP 2: Save file temporarily
-        import tempfile
-        import hashlib
-        temp_dir = Path(tempfile.gettempdir())
-        temp_path = temp_dir / file.filename
-        
         logger.info(f"=== UPLOAD STARTED === File: {file.filename}, User: {user_address}")
         
-        content = await file.read()
-        logger.info(f"Read {len(content)} bytes from upload")
-        
-        # Calculate document hash for verification (SHA-256)
-        document_hash = hashlib.sha256(content).hexdigest()
-        logger.info(f"Document hash: {document_hash}")
-        
-        with open(temp_path, "wb") as f:
-            f.write(content)
+        # STEP 2: Stream to IPFS, hashing (SHA-256) on the way
+        result = await ipfs_client.upload_stream(
+            read_upload(file),
+            file.filename,
+            metadata={
+                "name": file.filename,
+                "uploader": user_address,
+                "nft_token_id": str(token_id) if token_id else ""
+            }
+        )
+        cid = result["cid"]
+        document_hash = result["sha256"]
+        file_size = result["size"]
         
-        logger.info(f"Saved to: {temp_path}")
+        logger.info(f"=== UPLOAD SUCCESS === CID: {cid}, {file_size} bytes, hash: {document_hash}")
         
-        try:
-            # STEP 3: Upload to IPFS
-            cid = await ipfs_client.upload_file(
-                temp_path,
-                metadata={
-                    "name": file.filename,
-                    "uploader": user_address,
-                    "nft_token_id": str(token_id) if token_id else "",
-                    "document_hash": document_hash
-                }
+        # STEP 3: Record on blockchain in background (non-blocking)
+        if somnia_client and token_id:
+            background_tasks.add_task(
+                record_document_async,
+                cid=cid,
+                document_hash=document_hash,
+                filename=file.filename,
+                file_size=file_size,
+                token_id=token_id,
+                blockchain_client=somnia_client
             )
-            
-            logger.info(f"=== UPLOAD SUCCESS === CID: {cid}")
-            
-            # STEP 4: Record on blockchain in background (non-blocking)
-            if somnia_client and token_id:
-                background_tasks.add_task(
-                    record_document_async,
-                    cid=cid,
-                    document_hash=document_hash,
-                    filename=file.filename,
-                    file_size=len(content),
-                    token_id=token_id,
-                    blockchain_client=somnia_client
-                )
-                logger.info(f"[Background] Queued blockchain recording task for {file.filename}")
-            
-            # STEP 5: Return data immediately (blockchain recording happens in background)
-            return {
-                "success": True,
-                "cid": cid,
-                "filename": file.filename,
-                "document_hash": document_hash,
-                "token_id": token_id,
-                "uploader": user_address,
-                "file_size": len(content),
-                "gateway_url": f"https://gateway.pinata.cloud/ipfs/{cid}",
-                "message": "Document uploaded successfully. Blockchain recording in progress."
-            }
+            logger.info(f"[Background] Queued blockchain recording task for {file.filename}")
         
-        finally:
-            if temp_path.exists():
-                temp_path.unlink()
-                logger.info(f"Cleaned up temp file: {temp_path}")
+        # STEP 4: Return data immediately (blockchain recording happens in background)
+        return {
+            "success": True,
+            "cid": cid,
+            "filename": file.filename,
+            "document_hash": document_hash,
+            "token_id": token_id,
+            "uploader": user_address,
+            "file_size": file_size,
+            "gateway_url": f"https://gateway.pinata.cloud/ipfs/{cid}",
+            "message": "Document uploaded successfully. Blockchain recording in progress."
+        }
             
     except HTTPException:
         raise
@@ -404,22 +678,27 @@ async def upload_document(
 
 
 @app.get("/documents/list")
-async def list_user_documents(user_address: str):
+async def list_user_documents(
+    user_address: Optional[str] = None,
+    session: Optional[Session] = Depends(get_session)
+):
     """
     List all documents uploaded by a user from blockchain registry
-    Queries DocumentUploaded events from CompanyDropbox contract
+    Reads the local DocumentUploaded index kept current by the background indexer
     
-    Returns document metadata sorted by most recent first
+    Returns document metadata sorted by most recent first, plus how far
+    the index trails the chain head
     """
-    if not nft_authenticator:
+    if not nft_authenticator and not session:
         raise HTTPException(
             status_code=503,
             detail="NFT authentication system not configured"
         )
     
     try:
-        # Verify user has NFT
-        auth_result = nft_authenticator.require_nft_authentication(user_address)
+        # Verify user has NFT (from the session token when there is one)
+        auth_result = await authenticate_user(user_address, session)
+        user_address = auth_result["user_address"]
         
         if not auth_result["authenticated"]:
             raise HTTPException(
@@ -427,7 +706,7 @@ async def list_user_documents(user_address: str):
                 detail="NFT authentication required to view documents"
             )
         
-        # Query blockchain for user's documents
+        # Read the user's documents from the local index
         if not somnia_client:
             raise HTTPException(
                 status_code=503,
@@ -446,6 +725,9 @@ async def list_user_documents(user_address: str):
             "token_id": auth_result["token_id"],
             "documents": documents,
             "count": len(documents),
+            "indexed_through_block": document_indexer.cursor,
+            "tentative_through_block": document_indexer.tentative_through,
+            "index_lag_blocks": document_indexer.lag_blocks,
             "message": f"Found {len(documents)} documents"
         }
     
@@ -460,7 +742,8 @@ async def list_user_documents(user_address: str):
 async def execute_agent(
     request: ExecutionRequest,
     background_tasks: BackgroundTasks,
-    verifiable_agent: VerifiableAgent = Depends(get_verifiable_agent)
+    verifiable_agent: VerifiableAgent = Depends(get_verifiable_agent),
+    session: Optional[Session] = Depends(get_session)
 ):
     """
     Execute AI agent on NFT-gated document
@@ -471,30 +754,40 @@ async def execute_agent(
     - Each execution specifies which document CID to analyze
     
     Flow:
-    1. Verify NFT ownership (access control)
+    1. Verify NFT ownership (access control; a session token proves it without a chain call)
     2. Fetch specified document from IPFS by CID
     3. Commit inputs (inputRoot)
     4. Execute AI with trace logging
     5. Compute executionRoot
     6. Upload trace + output to IPFS
-    7. Record provenance on Somnia
+    7. Queue provenance for batched anchoring on Somnia
     """
     
     try:
-        # Create AI agent with specified provider and model
-        ai_agent = AIAgent(provider=request.provider, model=request.model)
-        logger.info(f"Using AI provider: {request.provider}, model: {request.model}")
-        
         # 1. Verify NFT ownership (acts as access token)
-        owns_nft = await somnia_client.check_nft_ownership(
-            token_id=request.nft_token_id,
-            user_address=request.user_address
-        )
+        if nft_authenticator or session:
+            auth_result = await authenticate_user(request.user_address, session)
+            user_address = auth_result["user_address"]
+            owns_nft = auth_result["authenticated"] and auth_result["token_id"] == request.nft_token_id
+            if auth_result["authenticated"] and not owns_nft:
+                # A token other than the one the address authenticated with: check that token on chain
+                owns_nft = await somnia_client.check_nft_ownership(
+                    token_id=request.nft_token_id,
+                    user_address=user_address
+                )
+        else:
+            if not request.user_address:
+                raise HTTPException(status_code=401, detail="Session token or user_address required for NFT authentication")
+            user_address = request.user_address
+            owns_nft = await somnia_client.check_nft_ownership(
+                token_id=request.nft_token_id,
+                user_address=user_address
+            )
         
         if not owns_nft:
             # Audit log: Access denied
             audit_logger.log_access(
-                user_id=request.user_address,
+                user_id=user_address,
                 resource=f"document:{request.document_cid}",
                 action="ai_execution",
                 granted=False,
@@ -502,22 +795,26 @@ async def execute_agent(
             )
             raise HTTPException(
                 status_code=403,
-                detail=f"Access denied: Address {request.user_address} does not own NFT #{request.nft_token_id}"
+                detail=f"Access denied: Address {user_address} does not own NFT #{request.nft_token_id}"
             )
         
-        logger.info(f"✅ NFT Access Verified - User: {request.user_address}, Token: #{request.nft_token_id}, Document: {request.document_cid}")
+        logger.info(f"✅ NFT Access Verified - User: {user_address}, Token: #{request.nft_token_id}, Document: {request.document_cid}")
         
         # Audit log: Access granted
         audit_logger.log_access(
-            user_id=request.user_address,
+            user_id=user_address,
             resource=f"document:{request.document_cid}",
             action="ai_execution",
             granted=True,
             reason=f"NFT #{request.nft_token_id} ownership verified"
         )
         
-        # 2. Fetch specified document from IPFS
-        document_content = await ipfs_client.fetch(request.document_cid)
+        # Create AI agent with specified provider and model
+        ai_agent = AIAgent(provider=request.provider, model=request.model)
+        logger.info(f"Using AI provider: {request.provider}, model: {request.model}")
+        
+        # 2. Fetch specified document from IPFS (repeat analyses read it from the local cache)
+        document_content = await ipfs_client.fetch_view(request.document_cid)
         
         # Try to determine if it's a PDF
         is_pdf = document_content[:4] == b'%PDF'
@@ -528,7 +825,8 @@ async def execute_agent(
             from PyPDF2 import PdfReader
             
             logger.info(f"📄 Detected PDF document: {request.document_cid}")
-            pdf_file = io.BytesIO(document_content)
+            # A memory-mapped cache hit is already a seekable file-like object
+            pdf_file = io.BytesIO(document_content) if isinstance(document_content, bytes) else document_content
             pdf_reader = PdfReader(pdf_file)
             
             # Extract text from all pages
@@ -540,7 +838,7 @@ async def execute_agent(
             logger.info(f"📄 Extracted text from PDF: {len(pdf_reader.pages)} pages, {len(document_text)} chars")
         else:
             # Regular text document
-            document_text = document_content.decode('utf-8')
+            document_text = str(document_content, 'utf-8')
             logger.info(f"📄 Fetched text document from IPFS: {request.document_cid} ({len(document_text)} chars)")
         
         # 3. Commit inputs
@@ -585,17 +883,22 @@ async def execute_agent(
         }
         output_cid = await ipfs_client.upload_json(output_data, f"output-{execution_root[:10]}.json")
         
-        # 9. Record provenance on Somnia
-        result = await somnia_client.record_provenance(
+        # 9. Queue provenance for batched anchoring on Somnia
+        anchor = await provenance_anchor.submit(
             nft_token_id=request.nft_token_id,
             input_cid=request.document_cid,
             input_root=input_root,
             output_cid=output_cid,
             execution_root=execution_root,
-            trace_cid=trace_cid,
-            agent_did=AGENT_DID
+            trace_cid=trace_cid
         )
         
+        if request.wait_for_anchor:
+            await anchor.wait()
+        else:
+            # Audit log: Blockchain transaction (written once the batch lands)
+            anchor.add_done_callback(audit_provenance_anchor)
+        
         # Audit log: AI execution completed
         audit_logger.log_ai_execution(
             did=AGENT_DID,
@@ -603,36 +906,38 @@ async def execute_agent(
             response_hash=execution_root[:20],
             model=request.model,
             tokens=len(output_text),  # Approximate token count
-            user_address=request.user_address,
+            user_address=user_address,
             document_cid=request.document_cid,
             output_cid=output_cid,
             trace_cid=trace_cid,
-            tx_hash=result["tx_hash"]
+            tx_hash=anchor.tx_hash
         )
         
-        # Audit log: Blockchain transaction
-        audit_logger.log_blockchain_tx(
-            operation="record_provenance",
-            tx_hash=result["tx_hash"],
-            did=AGENT_DID,
-            gas_used=result.get("gas_used"),
-            status="success",
-            nft_token_id=request.nft_token_id,
-            record_id=result["record_id"]
-        )
+        if request.wait_for_anchor:
+            # Audit log: Blockchain transaction
+            audit_logger.log_blockchain_tx(
+                operation="record_provenance",
+                tx_hash=anchor.tx_hash,
+                did=AGENT_DID,
+                status="success",
+                nft_token_id=request.nft_token_id,
+                record_id=anchor.record_id,
+                batch_size=anchor.leaf_count
+            )
         
-        logger.info(f"✅ AI Execution Complete - Output CID: {output_cid}, TX: {result['tx_hash']}")
+        logger.info(f"✅ AI Execution Complete - Output CID: {output_cid}, Anchor: {anchor.status}")
         
         # Reset agent state
         verifiable_agent.reset()
         
         return ExecutionResponse(
-            record_id=result["record_id"],
+            record_id=anchor.record_id,
             output_cid=output_cid,
             execution_root=execution_root,
             trace_cid=trace_cid,
-            tx_hash=result["tx_hash"],
-            output_text=output_text
+            tx_hash=anchor.tx_hash or "",
+            output_text=output_text,
+            anchor=anchor.to_dict()
         )
     
     except HTTPException:
@@ -668,9 +973,9 @@ async def get_provenance_by_nft(token_id: int):
     
     record_ids = await somnia_client.get_records_by_nft(token_id)
     
+    # One batched read for all records instead of a getRecord round trip each
     records = []
-    for record_id in record_ids:
-        record = await somnia_client.get_record(record_id)
+    for record_id, record in zip(record_ids, await somnia_client.get_records(record_ids)):
         records.append(ProvenanceRecord(
             record_id=record_id,
             nft_token_id=record["nftTokenId"],
@@ -686,6 +991,88 @@ async def get_provenance_by_nft(token_id: int):
     return records
 
 
+def _provenance_page(records: List[Dict[str, Any]], limit: int) -> ProvenancePage:
+    """Wrap mirror rows with the keyset cursor and how far the mirror has read"""
+    return ProvenancePage(
+        records=[MirroredProvenanceRecord(**record) for record in records],
+        next_cursor=records[-1]["record_id"] if len(records) == limit else None,
+        indexed_through_block=provenance_indexer.cursor,
+        tentative_through_block=provenance_indexer.tentative_through,
+    )
+
+
+@app.get("/provenance/nft", response_model=ProvenancePage)
+async def list_provenance_by_nft(
+    token_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = None
+):
+    """
+    Page through the provenance records of an NFT from the local mirror
+    
+    Newest first; pass next_cursor as `before` to get the following page.
+    """
+    records = provenance_indexer.db.get_provenance_by_nft(token_id, limit, before)
+    return _provenance_page(records, limit)
+
+
+@app.get("/provenance/agent", response_model=ProvenancePage)
+async def list_provenance_by_agent(
+    did: Optional[str] = None,
+    did_hash: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = None
+):
+    """
+    Page through the provenance records submitted by an agent from the local mirror
+    
+    The agent is given by its DID or by keccak256 of the DID as stored on-chain.
+    """
+    if did:
+        did_hash = Web3.keccak(text=did).to_0x_hex()
+    elif did_hash:
+        did_hash = "0x" + did_hash.lower().removeprefix("0x")
+    else:
+        raise HTTPException(status_code=400, detail="Either did or did_hash is required")
+    
+    records = provenance_indexer.db.get_provenance_by_agent(did_hash, limit, before)
+    return _provenance_page(records, limit)
+
+
+def _provenance_for_root(execution_root: str) -> Optional[Dict[str, Any]]:
+    """Mirrored record whose executionRoot is the root, or that anchored it as part of a batch"""
+    db = provenance_indexer.db
+    record = db.get_provenance_by_root(execution_root)
+    if record:
+        return record
+    
+    anchor = db.get_provenance_anchor(execution_root)
+    if not anchor:
+        return None
+    record = db.get_provenance_record(anchor['record_id'])
+    if not record:
+        return None
+    record['batch'] = {
+        key: anchor[key]
+        for key in ('execution_root', 'batch_root', 'manifest_cid', 'leaf_index', 'leaf_count', 'proof')
+    }
+    return record
+
+
+@app.get("/provenance/root/{execution_root}", response_model=MirroredProvenanceRecord)
+async def get_provenance_by_root(execution_root: str):
+    """
+    Get the provenance record that anchored an execution root from the local mirror
+    
+    A batched execution's root is not on-chain; its batch's record is returned with
+    the inclusion proof under `batch`.
+    """
+    record = await asyncio.to_thread(_provenance_for_root, execution_root)
+    if not record:
+        raise HTTPException(status_code=404, detail="No provenance record indexed for this execution root")
+    return MirroredProvenanceRecord(**record)
+
+
 @app.get("/provenance/trace/{cid}")
 async def get_execution_trace(cid: str):
     """Fetch execution trace from IPFS"""
@@ -696,8 +1083,24 @@ async def get_execution_trace(cid: str):
         raise HTTPException(status_code=404, detail=f"Trace not found: {str(e)}")
 
 
+@app.get("/provenance/anchor/{execution_root}")
+async def get_provenance_anchor(execution_root: str):
+    """Get the anchoring status and inclusion proof of an execution"""
+    anchor = await provenance_anchor.lookup(execution_root)
+    if not anchor:
+        raise HTTPException(status_code=404, detail="No anchor known for this execution root")
+    return anchor.to_dict()
+
+
+def _same_root(a: Optional[str], b: Optional[str]) -> bool:
+    """Compare bytes32 hex strings regardless of 0x prefix and case"""
+    if a is None or b is None:
+        return False
+    return a.lower().removeprefix("0x") == b.lower().removeprefix("0x")
+
+
 @app.get("/provenance/verify/{record_id}")
-async def verify_provenance(record_id: int):
+async def verify_provenance(record_id: int, execution_root: Optional[str] = None):
     """
     Verify a provenance record
     
@@ -706,6 +1109,10 @@ async def verify_provenance(record_id: int):
     2. Fetch trace from IPFS
     3. Recompute Merkle root
     4. Compare with on-chain executionRoot
+    
+    For batched records the trace is a batch manifest: the batch root is recomputed
+    from its execution roots. Pass execution_root to also check that execution's
+    inclusion proof and recompute its own trace root.
     """
     
     # Get record from blockchain
@@ -714,8 +1121,12 @@ async def verify_provenance(record_id: int):
     # Fetch trace from IPFS
     trace = await ipfs_client.fetch_json(record["traceCID"])
     
-    # Recompute execution root
     from .verifiable import MerkleTree
+    
+    if trace.get("type") == BATCH_MANIFEST_TYPE:
+        return await _verify_batched_provenance(record_id, record, trace, execution_root)
+    
+    # Recompute execution root
     step_hashes = trace.get("step_hashes", [])
     
     if step_hashes:
@@ -725,7 +1136,7 @@ async def verify_provenance(record_id: int):
         recomputed_root = None
     
     # Compare
-    matches = recomputed_root == record["executionRoot"]
+    matches = _same_root(recomputed_root, record["executionRoot"])
     
     return {
         "record_id": record_id,
@@ -737,6 +1148,62 @@ async def verify_provenance(record_id: int):
     }
 
 
+async def _verify_batched_provenance(
+    record_id: int,
+    record: Dict[str, Any],
+    manifest: Dict[str, Any],
+    execution_root: Optional[str]
+) -> Dict[str, Any]:
+    """Verify a record anchored by ProvenanceAnchor from its batch manifest"""
+    from .verifiable import MerkleTree
+    
+    leaves = manifest.get("execution_roots", [])
+    recomputed_root = MerkleTree(leaves).root if leaves else None
+    batch_verified = _same_root(recomputed_root, record["executionRoot"])
+    
+    result = {
+        "record_id": record_id,
+        "batched": True,
+        "on_chain_root": record["executionRoot"],
+        "recomputed_root": recomputed_root,
+        "verified": batch_verified,
+        "trace_cid": record["traceCID"],
+        "leaf_count": len(leaves),
+    }
+    
+    if execution_root is None:
+        return result
+    
+    wanted = "0x" + execution_root.lower().removeprefix("0x")
+    if wanted not in leaves:
+        raise HTTPException(status_code=404, detail="Execution root is not part of this batch")
+    
+    index = leaves.index(wanted)
+    execution = manifest["executions"][index]
+    proof = MerkleTree(leaves).get_proof(index)
+    included = MerkleTree.verify_proof(wanted, proof, index, len(leaves), record["executionRoot"])
+    
+    # Recompute the execution's own root from its trace
+    trace = await ipfs_client.fetch_json(execution["trace_cid"])
+    step_hashes = trace.get("step_hashes", [])
+    trace_root = MerkleTree(step_hashes).root if step_hashes else None
+    trace_verified = _same_root(trace_root, wanted)
+    
+    result["execution"] = {
+        "execution_root": wanted,
+        "leaf_index": index,
+        "proof": proof,
+        "included": included,
+        "recomputed_root": trace_root,
+        "trace_verified": trace_verified,
+        "trace_cid": execution["trace_cid"],
+        "output_cid": execution["output_cid"],
+        "step_count": len(trace.get("steps", []))
+    }
+    result["verified"] = batch_verified and included and trace_verified
+    return result
+
+
 # ============ Crossmint Endpoints (Wallet-as-a-Service) ============
 
 class CrossmintWalletRequest(BaseModel):
@@ -877,14 +1344,14 @@ async def receive_frontend_logs(log: FrontendLog):
 # ============ Startup ============
 
 async def startup_event():
-    """Initialize on startup"""
+    """Registration check run in the background by lifespan; registers the agent if needed"""
     print(f"🤖 Somnia AI Agent starting...")
     print(f"   DID: {AGENT_DID}")
     print(f"   Address: {somnia_client.account.address if somnia_client.account else 'Not configured'}")
     
     # Check if agent is registered
     try:
-        is_registered = await somnia_client.is_agent_active(AGENT_DID)
+        is_registered = await agent_status.get()
         print(f"   Registered: {is_registered}")
         
         if not is_registered:
@@ -913,6 +1380,7 @@ async def startup_event():
                     name="Strategi AI Agent",
                     metadata_cid=metadata_cid
                 )
+                agent_status.set(True, "registration")
                 
                 print(f"   ✅ Agent registered successfully!")
                 print(f"   Transaction: {tx_hash}")
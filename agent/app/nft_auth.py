@@ -7,11 +7,16 @@ Implements the research paper's architecture:
 """
 
 import os
+import asyncio
 import logging
-from typing import Optional
-from web3 import Web3
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from web3 import AsyncWeb3, Web3
 from dotenv import load_dotenv
 
+from .auth_cache import AuthCache
+from .multicall import MulticallAggregator
+from .rpc_pool import RPCPool
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -22,10 +27,17 @@ class NFTAuthenticator:
     Based on: "Decentralized document storage with NFT Authentication using Blockchain technology"
     """
     
-    def __init__(self):
+    def __init__(self, w3: Optional[AsyncWeb3] = None, multicall: Optional[MulticallAggregator] = None):
+        """
+        Args:
+            w3: Async Web3 instance to share (a new RPC pool is made if omitted)
+            multicall: View-call aggregator to share with other chain clients
+        """
         # Connect to Somnia L1
-        rpc_url = os.getenv("SOMNIA_RPC_URL", "https://dream-rpc.somnia.network")
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        if w3 is None:
+            w3 = AsyncWeb3(RPCPool.from_env())
+        self.w3 = w3
+        self.multicall = multicall or MulticallAggregator(self.w3)
         
         # Load contract addresses
         self.access_nft_address = os.getenv("ACCESS_NFT_ADDRESS")
@@ -65,9 +77,14 @@ class NFTAuthenticator:
             abi=self.access_nft_abi
         )
         
+        # Positive decisions are reused until they expire or a Transfer touches the address
+        self.auth_cache = AuthCache(self.access_nft_address)
+        # Aggregated reads in flight at once during bulk checks
+        self.bulk_concurrency = int(os.getenv("AUTH_BULK_CONCURRENCY", "4"))
+        
         logger.info(f"NFT Authenticator initialized with contract: {self.access_nft_address}")
     
-    def verify_nft_authentication(self, user_address: str) -> bool:
+    async def verify_nft_authentication(self, user_address: str) -> bool:
         """
         Verify if user owns NFT authentication token
         
@@ -79,7 +96,9 @@ class NFTAuthenticator:
         """
         try:
             checksum_address = Web3.to_checksum_address(user_address)
-            has_nft = self.access_nft_contract.functions.isAuthenticated(checksum_address).call()
+            has_nft = await self.multicall.call(
+                self.access_nft_contract.functions.isAuthenticated(checksum_address)
+            )
             
             logger.info(f"NFT authentication check for {user_address}: {has_nft}")
             return has_nft
@@ -88,7 +107,7 @@ class NFTAuthenticator:
             logger.error(f"Error verifying NFT authentication: {e}")
             return False
     
-    def get_user_token_id(self, user_address: str) -> Optional[int]:
+    async def get_user_token_id(self, user_address: str) -> Optional[int]:
         """
         Get user's NFT token ID
         
@@ -98,21 +117,41 @@ class NFTAuthenticator:
         Returns:
             Token ID if user has NFT, None otherwise
         """
+        has_nft, token_id = await self._authentication_and_token_id(user_address)
+        return token_id if has_nft else None
+    
+    async def _authentication_and_token_id(self, user_address: str) -> Tuple[bool, Optional[int]]:
+        """Cached decision for the address, read from the chain on a miss (a failed read counts as unauthenticated)"""
         try:
-            if not self.verify_nft_authentication(user_address):
-                return None
-            
-            checksum_address = Web3.to_checksum_address(user_address)
-            token_id = self.access_nft_contract.functions.getUserTokenId(checksum_address).call()
-            
-            logger.info(f"User {user_address} has NFT token ID: {token_id}")
-            return token_id
-            
+            return await self.auth_cache.decision(user_address, lambda: self._read_authentication(user_address))
         except Exception as e:
-            logger.error(f"Error getting token ID: {e}")
-            return None
+            logger.error(f"Error verifying NFT authentication: {e}")
+            return False, None
+    
+    async def _read_authentication(self, user_address: str, log_level: int = logging.INFO) -> Tuple[bool, Optional[int]]:
+        """
+        Issue isAuthenticated and getUserTokenId together so they share one aggregated eth_call
+        
+        Raises:
+            Exception: If isAuthenticated could not be read
+        """
+        checksum_address = Web3.to_checksum_address(user_address)
+        has_nft, token_id = await asyncio.gather(
+            self.multicall.call(self.access_nft_contract.functions.isAuthenticated(checksum_address)),
+            self.multicall.call(self.access_nft_contract.functions.getUserTokenId(checksum_address)),
+            return_exceptions=True
+        )
+        
+        if isinstance(has_nft, Exception):
+            raise has_nft
+        if isinstance(token_id, Exception):
+            # getUserTokenId reverts for users without a token
+            token_id = None
+        
+        logger.log(log_level, f"NFT authentication check for {user_address}: {has_nft}, token ID: {token_id}")
+        return has_nft, token_id
     
-    def require_nft_authentication(self, user_address: str) -> dict:
+    async def require_nft_authentication(self, user_address: str) -> dict:
         """
         Check NFT authentication and return status
         
@@ -122,8 +161,66 @@ class NFTAuthenticator:
         Returns:
             Dictionary with authentication status and details
         """
-        has_nft = self.verify_nft_authentication(user_address)
+        has_nft, token_id = await self._authentication_and_token_id(user_address)
+        return self._auth_result(has_nft, token_id)
+    
+    async def require_nft_authentication_many(self, user_addresses: List[str]) -> AsyncIterator[Dict]:
+        """
+        Check NFT authentication for many addresses, yielding results as they resolve
+        
+        Addresses are deduplicated case-insensitively. Ones with a cached decision are
+        answered first without chain calls; the rest are read in groups whose
+        isAuthenticated and getUserTokenId calls share one Multicall3 aggregate.
+        An address whose read fails gets an error row with authenticated set to
+        None rather than a negative answer, so callers can retry it.
         
+        Args:
+            user_addresses: Wallet addresses, duplicates allowed
+            
+        Yields:
+            require_nft_authentication results with the address they belong to
+        """
+        pending = []
+        seen = set()
+        for address in user_addresses:
+            if address.lower() in seen:
+                continue
+            seen.add(address.lower())
+            if not Web3.is_address(address):
+                yield {"address": address, "authenticated": False, "error": "Invalid address"}
+                continue
+            cached = self.auth_cache.cached(address)
+            if cached is not None:
+                yield {"address": address, **self._auth_result(*cached)}
+            else:
+                pending.append(address)
+        
+        # Two inner calls per address, so a group fills one aggregate3
+        group_size = max(1, self.multicall.max_calls // 2)
+        semaphore = asyncio.Semaphore(self.bulk_concurrency)
+        
+        def read(address: str):
+            # Per-address results are logged at debug level; a bulk check can cover thousands
+            return self.auth_cache.decision(address, lambda: self._read_authentication(address, logging.DEBUG))
+        
+        async def check_group(group: List[str]) -> List[Dict]:
+            async with semaphore:
+                decisions = await asyncio.gather(*[read(address) for address in group], return_exceptions=True)
+            failed = [decision for decision in decisions if isinstance(decision, Exception)]
+            if failed:
+                logger.error(f"Bulk NFT authentication: {len(failed)} of {len(group)} reads failed: {failed[0]}")
+            return [
+                {"address": address, "authenticated": None, "error": f"Authentication check failed: {decision}"}
+                if isinstance(decision, Exception) else {"address": address, **self._auth_result(*decision)}
+                for address, decision in zip(group, decisions)
+            ]
+        
+        groups = [pending[start:start + group_size] for start in range(0, len(pending), group_size)]
+        for finished in asyncio.as_completed([check_group(group) for group in groups]):
+            for result in await finished:
+                yield result
+    
+    def _auth_result(self, has_nft: bool, token_id: Optional[int]) -> dict:
         if not has_nft:
             return {
                 "authenticated": False,
@@ -131,8 +228,6 @@ class NFTAuthenticator:
                 "message": "You must mint an Access NFT before uploading documents"
             }
         
-        token_id = self.get_user_token_id(user_address)
-        
         return {
             "authenticated": True,
             "token_id": token_id,
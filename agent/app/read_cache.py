@@ -0,0 +1,285 @@
+"""
+Memoization of chain reads that can no longer change
+Results are keyed by (contract, function, args, block tag) and kept in memory and SQLite under an LRU size bound
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from hexbytes import HexBytes
+from web3 import AsyncWeb3
+from web3.exceptions import ContractLogicError
+
+from app.database import DocumentDatabase
+from app.multicall import MulticallAggregator
+
+logger = logging.getLogger(__name__)
+
+# Block tag under which reads of immutable functions are stored: they are made at the final block
+FINAL = "final"
+
+
+@dataclass(frozen=True)
+class ReadPolicy:
+    """
+    Whether one function's result may be reused
+
+    immutable: The result never changes once its block is final. Mutable functions are
+        only memoized as snapshots at an explicit final block number.
+    settled: For immutable functions with a field that can still change (e.g. a record's
+        verified flag), whether this result has reached its last state. Unsettled results
+        are reused for ChainReadCache.unsettled_ttl seconds instead of forever.
+    """
+    immutable: bool = False
+    settled: Optional[Callable[[Any], bool]] = None
+
+
+READ_POLICIES: Dict[str, ReadPolicy] = {
+    # Every field is fixed by recordProvenance except verified, which verifyProof only sets to true
+    "getRecord": ReadPolicy(immutable=True, settled=lambda record: bool(record[10])),
+    # Grows with every record for the NFT
+    "getRecordsByNFT": ReadPolicy(immutable=False),
+    "getRecordsByAgent": ReadPolicy(immutable=False),
+    "eth_getTransactionReceipt": ReadPolicy(immutable=True),
+}
+
+
+def _encode(value: Any) -> Any:
+    """JSON-safe form of a decoded read (bytes are tagged so they come back as HexBytes)"""
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": bytes(value).hex()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if hasattr(value, "items"):
+        return {key: _encode(item) for key, item in value.items()}
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict):
+        if "__bytes__" in value:
+            return HexBytes(bytes.fromhex(value["__bytes__"]))
+        return {key: _decode(item) for key, item in value.items()}
+    return value
+
+
+class ChainReadCache:
+    """
+    Memoizes reads whose result is fixed once the chain has moved past them
+
+    A read is memoized only when it cannot be reorged away: immutable functions are read
+    at the final block (head minus confirmations), and anything newer, such as a record
+    from the last few blocks, is passed through to the chain uncached. Mutable functions
+    are memoized only for an explicit block number that is already final.
+
+    Lookups go memory -> SQLite -> chain. The SQLite table is bounded to max_bytes of
+    values and the least recently used entries are evicted past that. Only the
+    in-memory LRU is touched on the event loop; SQLite work runs in a worker thread.
+    """
+
+    def __init__(
+        self,
+        w3: AsyncWeb3,
+        multicall: MulticallAggregator,
+        db: DocumentDatabase,
+        confirmations: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        memory_size: Optional[int] = None,
+    ):
+        """
+        Args:
+            w3: Async Web3 instance
+            multicall: Aggregator used for reads that are passed through at latest
+            db: Database holding the chain_reads table
+            confirmations: Blocks below head before a read is memoized
+            max_bytes: Bound on the size of the values kept in SQLite
+            memory_size: Reads kept in the in-process LRU
+        """
+        self.w3 = w3
+        self.multicall = multicall
+        self.db = db
+        self.confirmations = confirmations if confirmations is not None else int(os.getenv("CHAIN_READ_CONFIRMATIONS", "20"))
+        self.max_bytes = max_bytes or int(os.getenv("CHAIN_READ_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.memory_size = memory_size or int(os.getenv("CHAIN_READ_MEMORY_SIZE", "10000"))
+        self.unsettled_ttl = float(os.getenv("CHAIN_READ_UNSETTLED_TTL", "30"))
+        self.head_ttl = float(os.getenv("CHAIN_READ_HEAD_TTL", "2"))
+        self._memory: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._head: Optional[int] = None
+        self._head_read_at = 0.0
+        self._size = db.get_chain_reads_size()
+
+        # Metrics
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.passed_through = 0
+        self.stored = 0
+        self.evicted = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "passed_through": self.passed_through,
+            "stored": self.stored,
+            "evicted": self.evicted,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+    async def final_block(self) -> int:
+        """Newest block deep enough that reads at or below it cannot be reorged away"""
+        now = time.monotonic()
+        if self._head is None or now - self._head_read_at > self.head_ttl:
+            self._head = await self.w3.eth.block_number
+            self._head_read_at = now
+        return max(0, self._head - self.confirmations)
+
+    @staticmethod
+    def _key(address: str, fn_name: str, args: Tuple[Any, ...], block_identifier: Any) -> str:
+        encoded = json.dumps(_encode(list(args)), separators=(",", ":"))
+        return f"{address.lower()}:{fn_name}:{encoded}:{block_identifier}"
+
+    @classmethod
+    def _function_key(cls, contract_function, block_identifier: Any) -> str:
+        return cls._key(contract_function.address, contract_function.fn_name, contract_function.args, block_identifier)
+
+    def _remember(self, key: str, value: Any, expires_at: Optional[float]):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    async def _lookup(self, keys: List[str]) -> List[Optional[Any]]:
+        """Memoized values for keys (None where missing or expired), memory first, then one SQLite query"""
+        now = time.time()
+        values: List[Optional[Any]] = []
+        missing = []
+        for key in keys:
+            entry = self._memory.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                values.append(entry[0])
+                continue
+            values.append(None)
+            missing.append(key)
+        if not missing:
+            return values
+
+        stored = await asyncio.to_thread(self.db.get_chain_reads, missing)
+        for index, key in enumerate(keys):
+            row = stored.get(key)
+            if values[index] is not None or row is None:
+                continue
+            if row["expires_at"] is not None and row["expires_at"] <= now:
+                continue
+            values[index] = _decode(json.loads(row["value"]))
+            self._remember(key, values[index], row["expires_at"])
+            self.db_hits += 1
+        return values
+
+    async def _store(self, entries: List[Tuple[str, Any, ReadPolicy]]):
+        """Memoize (key, value, policy) entries in memory and in one SQLite transaction"""
+        rows = []
+        for key, value, policy in entries:
+            settled = policy.settled is None or policy.settled(value)
+            expires_at = None if settled else time.time() + self.unsettled_ttl
+            self._remember(key, value, expires_at)
+            rows.append((key, json.dumps(_encode(value), separators=(",", ":")), expires_at))
+        self._size += await asyncio.to_thread(self.db.store_chain_reads, rows)
+        self.stored += len(rows)
+        if self._size > self.max_bytes:
+            # Evict down to 90% so a full cache doesn't scan for victims on every store
+            result = await asyncio.to_thread(self.db.evict_chain_reads, int(self.max_bytes * 0.9))
+            self.evicted += result["evicted"]
+            self._size = result["size"]
+
+    async def lookup(self, contract, fn_name: str, args_list: List[Tuple[Any, ...]]) -> List[Optional[Any]]:
+        """
+        Memoized results of one immutable function for many argument tuples, without touching the chain
+
+        Takes the arguments rather than bound functions so a page of hits doesn't pay for
+        building a web3 contract function per read.
+
+        Returns:
+            One entry per argument tuple: its result, or None if it has to be read
+        """
+        if not READ_POLICIES.get(fn_name, ReadPolicy()).immutable:
+            return [None] * len(args_list)
+        return await self._lookup([self._key(contract.address, fn_name, args, FINAL) for args in args_list])
+
+    async def remember(self, contract_functions: List[Any], values: List[Any]):
+        """Memoize results the caller read at final_block() itself (e.g. in a JSON-RPC batch)"""
+        await self._store([
+            (self._function_key(function, FINAL), value, READ_POLICIES[function.fn_name])
+            for function, value in zip(contract_functions, values)
+            if READ_POLICIES.get(function.fn_name, ReadPolicy()).immutable
+        ])
+
+    async def call(self, contract_function, block_identifier: Any = "latest") -> Any:
+        """
+        Read a contract view function, from the memo when its result cannot change
+
+        Args:
+            contract_function: Bound contract function, e.g. provenance.functions.getRecord(7)
+            block_identifier: "latest" or a block number
+
+        Returns:
+            The decoded result, as contract_function.call() would return it
+        """
+        policy = READ_POLICIES.get(contract_function.fn_name, ReadPolicy())
+        pinned = isinstance(block_identifier, int)
+        if not pinned and not policy.immutable:
+            self.passed_through += 1
+            return await self.multicall.call(contract_function)
+
+        key = self._function_key(contract_function, block_identifier if pinned else FINAL)
+        value = (await self._lookup([key]))[0]
+        if value is not None:
+            return value
+        self.misses += 1
+
+        final_block = await self.final_block()
+        if pinned:
+            value = await contract_function.call(block_identifier=block_identifier)
+            if block_identifier <= final_block:
+                # State at a final block never changes, whatever the function
+                await self._store([(key, value, ReadPolicy(immutable=True))])
+            return value
+
+        try:
+            value = await contract_function.call(block_identifier=final_block)
+        except ContractLogicError:
+            # Not there at the final block yet (e.g. a record from the last few blocks)
+            self.passed_through += 1
+            return await self.multicall.call(contract_function)
+        await self._store([(key, value, policy)])
+        return value
+
+    async def get_receipt(self, tx_hash: str) -> Dict[str, Any]:
+        """
+        Transaction receipt, memoized once its block is final
+
+        Raises:
+            TransactionNotFound: The transaction is not mined
+        """
+        key = f"eth:getTransactionReceipt:{tx_hash.lower().removeprefix('0x')}:{FINAL}"
+        receipt = (await self._lookup([key]))[0]
+        if receipt is not None:
+            return receipt
+        self.misses += 1
+
+        receipt = await self.w3.eth.get_transaction_receipt(tx_hash)
+        if receipt["blockNumber"] <= await self.final_block():
+            await self._store([(key, receipt, READ_POLICIES["eth_getTransactionReceipt"])])
+        return receipt
@@ -0,0 +1,201 @@
+"""
+Multi-endpoint JSON-RPC provider for Somnia
+Health-scored endpoints behind keep-alive sessions, hedged reads and a sticky write endpoint
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+from web3 import AsyncWeb3
+from web3._utils.caching import async_handle_request_caching
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from app.hedging import HedgedPool, UpstreamHealth
+
+logger = logging.getLogger(__name__)
+
+# Methods that change node state or depend on the node that saw them first. They
+# always go to the sticky endpoint and are never re-issued elsewhere.
+STICKY_METHODS = frozenset({
+    "eth_sendRawTransaction",
+    "eth_sendTransaction",
+    # The pending nonce must come from the node our transactions are sent to
+    "eth_getTransactionCount",
+    "eth_newFilter",
+    "eth_newBlockFilter",
+    "eth_newPendingTransactionFilter",
+    "eth_getFilterChanges",
+    "eth_getFilterLogs",
+    "eth_uninstallFilter",
+})
+
+
+class RPCEndpointHealth(UpstreamHealth):
+    """Latency and error tracking for one endpoint, with the provider that reaches it"""
+
+    KIND = "RPC endpoint"
+
+    def __init__(self, url: str, provider: AsyncWeb3.AsyncHTTPProvider, window: int = 200):
+        super().__init__(url, window)
+        self.provider = provider
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"endpoint": self.name, **super().metrics()}
+
+
+class RPCPool(HedgedPool, AsyncJSONBaseProvider):
+    """
+    AsyncWeb3 provider spreading requests over several Somnia RPC endpoints
+
+    Each endpoint is an AsyncHTTPProvider with its own keep-alive session. Reads go to
+    the best-scoring healthy endpoint; if no answer arrives within that endpoint's
+    recent p95 latency the same request is also sent to the next best one and the
+    first answer wins, so one slow node no longer sets the tail latency of every
+    request. Transport failures fail over to the next endpoint; an endpoint failing
+    repeatedly sits out a cooldown. Scoring and the race itself are HedgedPool's.
+
+    Writes (and nonce and filter calls) stick to one endpoint so a node always sees
+    our transactions in nonce order; it only changes after that endpoint fails.
+    JSON-RPC batches fail over but are not hedged.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        request_timeout: Optional[float] = None,
+        hedge_min_delay: Optional[float] = None,
+        hedge_max_delay: Optional[float] = None,
+        cooldown: Optional[float] = None,
+        failures_before_cooldown: int = 3,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            urls: Endpoint URLs; the first is the initial write endpoint
+            request_timeout: Seconds before a single request to one endpoint fails
+            hedge_min_delay: Lower bound on the wait before hedging a read
+            hedge_max_delay: Upper bound (and the delay used before p95 is known)
+            cooldown: Seconds a failing endpoint is skipped
+            failures_before_cooldown: Consecutive failures that trigger the cooldown
+            **kwargs: Passed to AsyncJSONBaseProvider (request caching options)
+        """
+        AsyncJSONBaseProvider.__init__(self, **kwargs)
+        if not urls:
+            raise ValueError("RPCPool needs at least one endpoint URL")
+
+        self.request_timeout = request_timeout or float(os.getenv("RPC_REQUEST_TIMEOUT", "10"))
+        self.endpoints = [
+            RPCEndpointHealth(url, AsyncWeb3.AsyncHTTPProvider(
+                url,
+                request_kwargs={"timeout": aiohttp.ClientTimeout(total=self.request_timeout)},
+                # Failing over to another endpoint beats retrying the same one
+                exception_retry_configuration=None,
+            ))
+            for url in urls
+        ]
+        HedgedPool.__init__(
+            self,
+            self.endpoints,
+            hedge_min_delay=hedge_min_delay if hedge_min_delay is not None else float(os.getenv("RPC_HEDGE_MIN_DELAY", "0.05")),
+            hedge_max_delay=hedge_max_delay or float(os.getenv("RPC_HEDGE_MAX_DELAY", "1.0")),
+            cooldown=cooldown or float(os.getenv("RPC_ENDPOINT_COOLDOWN", "30")),
+            failures_before_cooldown=failures_before_cooldown,
+        )
+        self._write_endpoint = self.endpoints[0]
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "RPCPool":
+        """Pool over SOMNIA_RPC_URLS (comma separated), or just SOMNIA_RPC_URL"""
+        urls = []
+        for url in os.getenv("SOMNIA_RPC_URLS", "").split(","):
+            url = url.strip()
+            if not url:
+                continue
+            if urlsplit(url).scheme not in ("http", "https"):
+                # Not logged verbatim: a malformed entry may still carry an API key
+                logger.warning(f"Ignoring a SOMNIA_RPC_URLS entry that is not an http(s) URL ({len(url)} chars)")
+                continue
+            urls.append(url)
+        if not urls:
+            urls = [os.getenv("SOMNIA_RPC_URL", "https://dream-rpc.somnia.network")]
+        return cls(urls, **kwargs)
+
+    def __str__(self) -> str:
+        return f"RPC pool of {len(self.endpoints)}: {', '.join(e.name for e in self.endpoints)}"
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "write_endpoint": self._write_endpoint.name,
+            **self.hedging_metrics(),
+            "endpoints": [endpoint.metrics() for endpoint in self.endpoints],
+        }
+
+    async def _send(
+        self,
+        endpoint: RPCEndpointHealth,
+        method: RPCEndpoint,
+        params: Any,
+        answered: Optional[asyncio.Future] = None,
+    ) -> RPCResponse:
+        started = time.monotonic()
+        try:
+            response = await endpoint.provider.make_request(method, params)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            endpoint.record_failure(self.cooldown, self.failures_before_cooldown)
+            raise
+        latency = time.monotonic() - started
+        endpoint.record_success(latency)
+        if answered is not None:
+            answered.set_result(latency)
+        return response
+
+    @async_handle_request_caching
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if method in STICKY_METHODS:
+            return await self._sticky_request(method, params)
+        return await self._hedged_request(method, params)
+
+    async def _sticky_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        endpoint = self._write_endpoint
+        try:
+            return await self._send(endpoint, method, params)
+        except Exception as e:
+            # Not retried elsewhere (a send may have reached the node); later calls move on
+            replacement = self._ranked(exclude={id(endpoint)})
+            if replacement and endpoint.is_down:
+                self._write_endpoint = replacement[0]
+                logger.warning(f"Write endpoint {endpoint.name} failed ({e}); switching to {self._write_endpoint.name}")
+            raise
+
+    async def _hedged_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return await self._race(lambda endpoint, answered: self._send(endpoint, method, params, answered), method)
+
+    async def make_batch_request(
+        self, requests: List[Tuple[RPCEndpoint, Any]]
+    ) -> Any:
+        last_error: Optional[Exception] = None
+        for endpoint in self._ranked():
+            started = time.monotonic()
+            try:
+                response = await endpoint.provider.make_batch_request(requests)
+            except Exception as e:
+                endpoint.record_failure(self.cooldown, self.failures_before_cooldown)
+                self.failovers += 1
+                last_error = e
+                logger.debug(f"Batch of {len(requests)} failed on {endpoint.name} ({e}), trying another endpoint")
+                continue
+            endpoint.record_success(time.monotonic() - started)
+            return response
+        raise last_error
+
+    async def disconnect(self) -> None:
+        for endpoint in self.endpoints:
+            await endpoint.provider.disconnect()
@@ -0,0 +1,314 @@
+"""
+Wallet sign-in and signed session tokens
+One EIP-4361 (Sign-In with Ethereum) signature and one NFT check issue a token that gated endpoints verify locally
+"""
+
+import os
+import re
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from hexbytes import HexBytes
+from web3 import Web3
+
+from app.auth_cache import TRANSFER_TOPIC
+
+logger = logging.getLogger(__name__)
+
+NONCE_PATTERN = re.compile(r"^Nonce: (\w+)$", re.MULTILINE)
+
+
+class SessionError(Exception):
+    """Sign-in or session token rejected"""
+
+
+@dataclass
+class Session:
+    """An authenticated wallet, as carried by a session token"""
+    address: str
+    token_id: Optional[int]
+    issued_at: float
+    expires_at: float
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class SessionManager:
+    """
+    Issues and validates HMAC-signed session tokens
+
+    Sign-in is a challenge (a single-use EIP-4361 message with a server nonce),
+    the wallet's personal_sign signature over it, and one NFT check by the caller.
+    The token then carries the address and access token ID, and validating it is
+    a signature and expiry check with no chain I/O.
+
+    Tokens are revoked by the access NFT's Transfer events, pushed through the log
+    subscription: a transfer to or from an address invalidates every token issued
+    to it before the event. Whenever the subscription (re)connects, tokens issued
+    before then are invalidated too, since transfers in between may have been
+    missed. While no subscription is live, transfers go unnoticed, so tokens are
+    then only accepted for poll_ttl seconds after they were issued (the same
+    window AuthCache reuses a decision for without pushed events).
+    """
+
+    def __init__(
+        self,
+        access_nft_address: Optional[str] = None,
+        secret: Optional[str] = None,
+        ttl: Optional[float] = None,
+        poll_ttl: Optional[float] = None,
+        challenge_ttl: Optional[float] = None,
+        domain: Optional[str] = None,
+        uri: Optional[str] = None,
+        chain_id: Optional[int] = None,
+        max_challenges: Optional[int] = None,
+        max_challenges_per_address: Optional[int] = None,
+    ):
+        """
+        Args:
+            access_nft_address: Contract whose Transfer events revoke sessions
+            secret: HMAC key for tokens (a random per-process key if unset)
+            ttl: Seconds a session token is valid while Transfer events are pushed
+            poll_ttl: Seconds a session token is valid without the log subscription
+            challenge_ttl: Seconds a sign-in message can be signed and submitted
+            domain: Domain named in the sign-in message (the frontend's host)
+            uri: URI named in the sign-in message
+            chain_id: Chain ID named in the sign-in message
+            max_challenges: Pending sign-ins kept; the oldest are dropped past it
+            max_challenges_per_address: Pending sign-ins kept per address
+
+        Raises:
+            ValueError: A secret that looks like a misread config line (whitespace or a leading #)
+        """
+        self.access_nft_address = access_nft_address or os.getenv("ACCESS_NFT_ADDRESS")
+        secret = secret or os.getenv("SESSION_SECRET")
+        if not secret:
+            logger.warning("SESSION_SECRET not set; session tokens won't survive a restart or work across workers")
+            secret = secrets.token_hex(32)
+        elif secret.startswith("#") or any(c.isspace() for c in secret):
+            # e.g. an inline comment after a blank SESSION_SECRET= read as the value
+            raise ValueError("SESSION_SECRET must not contain whitespace or start with '#'")
+        self._secret = secret.encode()
+        self.ttl = ttl or float(os.getenv("SESSION_TTL", "900"))
+        self.poll_ttl = min(self.ttl, poll_ttl or float(os.getenv("AUTH_CACHE_POLL_TTL", "15")))
+        self.challenge_ttl = challenge_ttl or float(os.getenv("SESSION_CHALLENGE_TTL", "300"))
+        self.domain = domain or os.getenv("SESSION_DOMAIN", "localhost:3000")
+        self.uri = uri or os.getenv("SESSION_URI", f"http://{self.domain}")
+        self.chain_id = chain_id or int(os.getenv("SOMNIA_CHAIN_ID", "50312"))
+        self.max_challenges = max_challenges or int(os.getenv("SESSION_MAX_CHALLENGES", "10000"))
+        self.max_challenges_per_address = max_challenges_per_address or int(os.getenv("SESSION_MAX_CHALLENGES_PER_ADDRESS", "5"))
+        self.live = False
+
+        # nonce -> (lowercase address, message, expiry) for sign-ins not yet completed, oldest first
+        self._challenges: Dict[str, Tuple[str, str, float]] = {}
+        # lowercase address -> time of the last Transfer touching it
+        self._revoked: Dict[str, float] = {}
+        # Tokens issued before this are rejected (set when the subscription connects)
+        self._not_before = 0.0
+
+        # Metrics
+        self.sessions_issued = 0
+        self.sessions_validated = 0
+        self.sessions_rejected = 0
+        self.revocations = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "live": self.live,
+            "ttl_seconds": self.ttl if self.live else self.poll_ttl,
+            "pending_challenges": len(self._challenges),
+            "revoked_addresses": len(self._revoked),
+            "sessions_issued": self.sessions_issued,
+            "sessions_validated": self.sessions_validated,
+            "sessions_rejected": self.sessions_rejected,
+            "revocations": self.revocations,
+        }
+
+    # ============ Sign-in ============
+
+    def challenge(self, address: str) -> Dict[str, Any]:
+        """
+        A single-use sign-in message for the wallet to sign
+
+        Args:
+            address: Wallet address signing in
+
+        Returns:
+            The message, its nonce and when it stops being accepted
+        """
+        if not Web3.is_address(address):
+            raise SessionError(f"Invalid address: {address}")
+        now = time.time()
+        key = address.lower()
+        self._challenges = {nonce: entry for nonce, entry in self._challenges.items() if entry[2] > now}
+        # Bounded per address and overall, so repeated requests can't grow the table
+        pending = [nonce for nonce, entry in self._challenges.items() if entry[0] == key]
+        for nonce in pending[:max(0, len(pending) - self.max_challenges_per_address + 1)]:
+            del self._challenges[nonce]
+        while len(self._challenges) >= self.max_challenges:
+            del self._challenges[next(iter(self._challenges))]
+
+        nonce = secrets.token_hex(16)
+        expires_at = now + self.challenge_ttl
+        message = (
+            f"{self.domain} wants you to sign in with your Ethereum account:\n"
+            f"{Web3.to_checksum_address(address)}\n"
+            f"\n"
+            f"Sign in to access your documents.\n"
+            f"\n"
+            f"URI: {self.uri}\n"
+            f"Version: 1\n"
+            f"Chain ID: {self.chain_id}\n"
+            f"Nonce: {nonce}\n"
+            f"Issued At: {_iso(now)}\n"
+            f"Expiration Time: {_iso(expires_at)}"
+        )
+        self._challenges[nonce] = (key, message, expires_at)
+        return {"message": message, "nonce": nonce, "expires_at": expires_at}
+
+    def verify_signature(self, message: str, signature: str) -> str:
+        """
+        Check a signed sign-in message and consume its nonce
+
+        Args:
+            message: The message returned by challenge(), unchanged
+            signature: personal_sign signature over it
+
+        Returns:
+            Checksum address that signed in
+
+        Raises:
+            SessionError: Unknown, expired or altered message, or a signature by another key
+        """
+        match = NONCE_PATTERN.search(message)
+        challenge = self._challenges.pop(match.group(1), None) if match else None
+        if challenge is None:
+            raise SessionError("Unknown or already used sign-in nonce")
+        address, expected_message, expires_at = challenge
+        if expires_at < time.time():
+            raise SessionError("Sign-in message expired")
+        if message != expected_message:
+            raise SessionError("Sign-in message was altered")
+
+        try:
+            signer = Account.recover_message(encode_defunct(text=message), signature=signature)
+        except Exception as e:
+            raise SessionError(f"Invalid signature: {e}")
+        if signer.lower() != address:
+            raise SessionError("Signature does not match the signing-in address")
+        return signer
+
+    # ============ Tokens ============
+
+    def issue(self, address: str, token_id: Optional[int]) -> Dict[str, Any]:
+        """
+        Sign a session token for an address whose NFT has been checked
+
+        Without a live log subscription the token expires after poll_ttl.
+
+        Returns:
+            The token and its expiry
+        """
+        issued_at = time.time()
+        payload = {
+            "sub": Web3.to_checksum_address(address),
+            "tid": token_id,
+            "iat": issued_at,
+            "exp": issued_at + (self.ttl if self.live else self.poll_ttl),
+        }
+        body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        self.sessions_issued += 1
+        return {"token": f"{body}.{self._sign(body)}", "expires_at": payload["exp"]}
+
+    def validate(self, token: str) -> Session:
+        """
+        Session carried by a token, checked locally
+
+        Raises:
+            SessionError: Bad signature, expired, revoked by a Transfer, or older than
+                poll_ttl while no subscription is live
+        """
+        try:
+            session = self._validate(token)
+        except SessionError:
+            self.sessions_rejected += 1
+            raise
+        self.sessions_validated += 1
+        return session
+
+    def _validate(self, token: str) -> Session:
+        body, _, signature = token.partition(".")
+        if not hmac.compare_digest(signature, self._sign(body)):
+            raise SessionError("Invalid session token")
+        try:
+            payload = json.loads(_b64decode(body))
+        except ValueError:
+            raise SessionError("Invalid session token")
+
+        session = Session(payload["sub"], payload["tid"], payload["iat"], payload["exp"])
+        now = time.time()
+        if session.expires_at < now:
+            raise SessionError("Session expired")
+        if not self.live and session.issued_at < now - self.poll_ttl:
+            # Issued while live, but transfers since the subscription dropped would go unnoticed
+            raise SessionError("Session expired; sign in again")
+        revoked_at = max(self._revoked.get(session.address.lower(), 0.0), self._not_before)
+        if session.issued_at <= revoked_at:
+            raise SessionError("Session revoked; sign in again")
+        return session
+
+    def _sign(self, body: str) -> str:
+        return _b64encode(hmac.new(self._secret, body.encode(), hashlib.sha256).digest())
+
+    def revoke(self, address: str):
+        """Reject every token issued to address so far"""
+        now = time.time()
+        self._revoked[address.lower()] = now
+        self.revocations += 1
+        # Revocations only matter for tokens that haven't expired on their own
+        self._revoked = {key: at for key, at in self._revoked.items() if at > now - self.ttl}
+
+    # ============ Log subscription follower ============
+
+    def subscription_filter(self) -> Optional[Dict[str, Any]]:
+        """eth_subscribe("logs") filter for the access NFT's Transfer events"""
+        if not self.access_nft_address:
+            return None
+        return {"address": Web3.to_checksum_address(self.access_nft_address), "topics": ["0x" + TRANSFER_TOPIC.hex()]}
+
+    def set_live(self, live: bool):
+        """On (re)connect, tokens from before can't be vouched for: transfers may have been missed"""
+        if live and not self.live:
+            self._not_before = time.time()
+        self.live = live
+
+    def on_log(self, log):
+        """Revoke both sides of a pushed (or reorged-out) Transfer"""
+        topics = [HexBytes(topic) for topic in log["topics"]]
+        if len(topics) < 3 or topics[0] != TRANSFER_TOPIC:
+            return
+        for topic in topics[1:3]:
+            address = "0x" + topic[-20:].hex()
+            if address != "0x" + "00" * 20:
+                self.revoke(address)
+                logger.info(f"Sessions for {address} revoked on Transfer")
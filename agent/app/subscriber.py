@@ -0,0 +1,150 @@
+"""
+Live contract log subscription over the Somnia WebSocket endpoint
+Pushes eth_subscribe("logs") events to the indexers; they fall back to HTTP polling while disconnected
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from web3 import AsyncWeb3, WebSocketProvider
+
+from app.hedging import redact_url
+
+logger = logging.getLogger(__name__)
+
+
+class LogSubscriber:
+    """
+    Feeds contract events to the indexers and the agent status as the node emits them
+
+    Each follower provides subscription_filter(), on_log(log) and set_live(live).
+    One WebSocket connection carries an eth_subscribe("logs") per
+    follower and hands every pushed log to that follower, so a new event reaches
+    the local store about a block after it is mined instead of a poll interval later.
+
+    Followers keep their own cursor and keep polling, only less often while the
+    subscription is live. When the socket drops they go back to their normal poll
+    interval; set_live() also wakes them, so after a reconnect the blocks missed in
+    between are backfilled from the cursor straight away.
+    """
+
+    def __init__(
+        self,
+        ws_url: Optional[str] = None,
+        reconnect_delay: Optional[float] = None,
+        max_reconnect_delay: Optional[float] = None,
+    ):
+        """
+        Args:
+            ws_url: Somnia WebSocket RPC URL (subscriptions are disabled when empty)
+            reconnect_delay: Seconds before the first reconnect attempt
+            max_reconnect_delay: Cap for the doubling delay between failed attempts
+        """
+        self.ws_url = ws_url if ws_url is not None else os.getenv("SOMNIA_WS_URL", "")
+        if self.ws_url and urlsplit(self.ws_url).scheme not in ("ws", "wss"):
+            logger.warning("SOMNIA_WS_URL is not a ws(s) URL; log subscriptions are disabled")
+            self.ws_url = ""
+        self.reconnect_delay = reconnect_delay or float(os.getenv("LOG_SUBSCRIPTION_RECONNECT_DELAY", "1.0"))
+        self.max_reconnect_delay = max_reconnect_delay or float(os.getenv("LOG_SUBSCRIPTION_MAX_RECONNECT_DELAY", "60"))
+        self.followers: List[Any] = []
+        self.connected = False
+
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.connects = 0
+        self.disconnects = 0
+        self.logs_received = 0
+        self.last_log_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.ws_url)
+
+    def add_follower(self, follower):
+        """Subscribe follower's log filter on every (re)connect"""
+        self.followers.append(follower)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "endpoint": redact_url(self.ws_url) if self.ws_url else None,
+            "connected": self.connected,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "logs_received": self.logs_received,
+            "last_log_age_seconds": round(time.time() - self.last_log_at, 3) if self.last_log_at else None,
+            "last_error": self.last_error,
+        }
+
+    def start(self):
+        """Start the subscription loop in the background"""
+        if not self.enabled:
+            logger.info("SOMNIA_WS_URL not set; indexers poll over HTTP only")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Log subscriber started on {redact_url(self.ws_url)}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while True:
+            connects = self.connects
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Log subscription failed ({e}); indexers are polling")
+            if self.connects > connects:
+                # A session was established before this drop; start the backoff over
+                delay = self.reconnect_delay
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _listen(self):
+        async with AsyncWeb3(WebSocketProvider(self.ws_url)) as w3:
+            routes: Dict[str, Any] = {}
+            for follower in self.followers:
+                log_filter = follower.subscription_filter()
+                if log_filter is not None:
+                    routes[await w3.eth.subscribe("logs", log_filter)] = follower
+
+            self._set_connected(True)
+            try:
+                async for payload in w3.socket.process_subscriptions():
+                    follower = routes.get(payload.get("subscription"))
+                    if follower is None:
+                        continue
+                    self.logs_received += 1
+                    self.last_log_at = time.time()
+                    follower.on_log(payload["result"])
+            finally:
+                self._set_connected(False)
+
+    def _set_connected(self, connected: bool):
+        if connected:
+            self.connects += 1
+            self.last_error = None
+            logger.info(f"Log subscription live for {len(self.followers)} followers")
+        elif self.connected:
+            self.disconnects += 1
+            logger.warning("Log subscription disconnected; indexers fall back to polling")
+        self.connected = connected
+        for follower in self.followers:
+            follower.set_live(connected)
@@ -0,0 +1,475 @@
+"""
+Transaction pipeline for the agent account
+Local nonce allocation, cached transaction building and asynchronous receipt tracking so many
+writes can be in flight at once
+"""
+
+import os
+import asyncio
+import heapq
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from web3 import AsyncWeb3
+from web3.exceptions import TimeExhausted
+
+logger = logging.getLogger(__name__)
+
+# Node error fragments meaning our local nonce view is behind the chain
+NONCE_TOO_LOW_ERRORS = (
+    "nonce too low",
+    "already known",
+    "nonce has already been used",
+    "replacement transaction underpriced",
+)
+
+
+# Node error fragments meaning the gas limit we sent was too low
+OUT_OF_GAS_ERRORS = (
+    "out of gas",
+    "intrinsic gas too low",
+    "gas too low",
+    "gas limit reached",
+)
+
+
+def is_nonce_error(error: Exception) -> bool:
+    """Check whether a send failed because the nonce was already consumed"""
+    message = str(error).lower()
+    return any(fragment in message for fragment in NONCE_TOO_LOW_ERRORS)
+
+
+def is_out_of_gas_error(error: Exception) -> bool:
+    """Check whether a send failed because the gas limit was too low"""
+    message = str(error).lower()
+    return any(fragment in message for fragment in OUT_OF_GAS_ERRORS)
+
+
+class NonceManager:
+    """
+    Hands out sequential nonces for one account without a round trip per transaction
+
+    The first allocation (and any resync) reads the pending transaction count from the
+    chain; after that nonces are assigned locally. Nonces of transactions that never
+    reached the node are released and handed out again first, so a failed send does
+    not leave a gap that would stall every later transaction. If a released nonce sits
+    below nonces already allocated and no new send takes it within gap_fill_delay,
+    fill_gap is called to consume it (e.g. with a zero-value transfer to self).
+    """
+
+    def __init__(
+        self,
+        w3: AsyncWeb3,
+        address: str,
+        idle_resync_seconds: float = 30.0,
+        fill_gap: Optional[Callable[[int], Awaitable[Any]]] = None,
+        gap_fill_delay: float = 2.0,
+    ):
+        """
+        Args:
+            w3: Async Web3 instance
+            address: Account the nonces belong to
+            idle_resync_seconds: Re-read the chain nonce before allocating if nothing
+                is in flight and the last sync is older than this
+            fill_gap: Sends a transaction with the given nonce; without it a gap waits
+                for the next allocation
+            gap_fill_delay: Seconds a gap may wait for a new send before it is filled
+        """
+        self.w3 = w3
+        self.address = address
+        self.idle_resync_seconds = idle_resync_seconds
+        self.fill_gap = fill_gap
+        self.gap_fill_delay = gap_fill_delay
+
+        self._lock = asyncio.Lock()
+        self._next: Optional[int] = None
+        self._released: List[int] = []
+        self._in_flight: set = set()
+        self._last_sync = 0.0
+        self._gap_tasks: set = set()
+
+        # Metrics
+        self.resyncs = 0
+        self.gaps_filled = 0
+
+    async def _sync(self):
+        """Load the pending nonce from the chain (caller holds the lock)"""
+        chain_nonce = await self.w3.eth.get_transaction_count(self.address, "pending")
+        # Nonces we already handed out above the chain's view are still ours
+        in_flight_next = max(self._in_flight) + 1 if self._in_flight else 0
+        self._next = max(chain_nonce, in_flight_next)
+        # A released nonce at or above the new next one would be handed out twice
+        self._released = [n for n in set(self._released) if chain_nonce <= n < self._next and n not in self._in_flight]
+        heapq.heapify(self._released)
+        self._last_sync = time.monotonic()
+        logger.debug(f"Nonce synced for {self.address}: chain={chain_nonce}, next={self._next}")
+
+    async def allocate(self) -> int:
+        """Reserve the next nonce"""
+        async with self._lock:
+            idle = not self._in_flight and time.monotonic() - self._last_sync > self.idle_resync_seconds
+            if self._next is None or idle:
+                await self._sync()
+
+            if self._released:
+                nonce = heapq.heappop(self._released)
+            else:
+                nonce = self._next
+                self._next += 1
+
+            self._in_flight.add(nonce)
+            return nonce
+
+    async def resync(self):
+        """
+        Re-read the chain (after 'nonce too low' and similar)
+
+        Nonces other senders hold but haven't broadcast yet stay allocated; the
+        rejected one must be marked sent or released before calling this.
+        """
+        async with self._lock:
+            await self._sync()
+            self.resyncs += 1
+            logger.info(f"Nonce manager resynced: next nonce {self._next}")
+
+    def release(self, nonce: int):
+        """Return a nonce whose transaction was never accepted by the node"""
+        if nonce not in self._in_flight:
+            return
+        self._in_flight.discard(nonce)
+        if self._return(nonce) and self.fill_gap is not None:
+            self._schedule_gap_fill(nonce, self.gap_fill_delay)
+
+    def _return(self, nonce: int) -> bool:
+        """Put a nonce back for reuse; True if nonces above it are allocated (a gap)"""
+        heapq.heappush(self._released, nonce)
+        # Released nonces at the top are simply not handed out yet
+        while self._next is not None and self._released and max(self._released) == self._next - 1:
+            self._released.remove(self._next - 1)
+            self._next -= 1
+        heapq.heapify(self._released)
+        return nonce in self._released
+
+    def _schedule_gap_fill(self, nonce: int, delay: float):
+        task = asyncio.create_task(self._fill_gap_later(nonce, delay))
+        self._gap_tasks.add(task)
+        task.add_done_callback(self._gap_tasks.discard)
+
+    async def _fill_gap_later(self, nonce: int, delay: float):
+        await asyncio.sleep(delay)
+        async with self._lock:
+            if nonce not in self._released:
+                # Taken by a new send, or no longer below anything allocated
+                return
+            self._released.remove(nonce)
+            heapq.heapify(self._released)
+            self._in_flight.add(nonce)
+        try:
+            await self.fill_gap(nonce)
+        except Exception as e:
+            if is_nonce_error(e):
+                # Something else already used it, so there is no gap
+                self.mark_sent(nonce)
+                return
+            retry = min(60.0, delay * 2)
+            logger.warning(f"Filling nonce gap {nonce} failed ({e}); retrying in {retry:.0f}s unless a send takes it")
+            self._in_flight.discard(nonce)
+            if self._return(nonce):
+                self._schedule_gap_fill(nonce, retry)
+            return
+        self.mark_sent(nonce)
+        self.gaps_filled += 1
+        logger.info(f"Filled nonce gap {nonce} for {self.address}")
+
+    def mark_sent(self, nonce: int):
+        """Mark a nonce as accepted (or consumed) by the node"""
+        self._in_flight.discard(nonce)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+
+class TransactionBuilder:
+    """
+    Builds contract-call transactions without re-reading chain metadata per write
+
+    contract_function.build_transaction() costs a chainId, a gas price (or fee
+    history) and an estimate_gas round trip on every call. Here the chain id is read
+    once, fee suggestions are cached for fee_ttl seconds, and gas limits are cached
+    per (contract, selector, calldata size bucket) with a safety buffer, so a steady
+    stream of the same write signs with no metadata round trips at all. A cached
+    limit is dropped when a transaction built with it runs out of gas; the next
+    build for that key estimates again.
+    """
+
+    def __init__(
+        self,
+        w3: AsyncWeb3,
+        address: str,
+        fee_mode: Optional[str] = None,
+        fee_ttl: Optional[float] = None,
+        gas_buffer: Optional[float] = None,
+        size_bucket: Optional[int] = None,
+    ):
+        """
+        Args:
+            w3: Async Web3 instance
+            address: Sending account (used for gas estimation)
+            fee_mode: "legacy" (gasPrice), "eip1559" (maxFeePerGas) or "auto" (by base fee)
+            fee_ttl: Seconds a fee suggestion is reused
+            gas_buffer: Multiplier applied to gas estimates
+            size_bucket: Calldata bytes per gas cache bucket
+        """
+        self.w3 = w3
+        self.address = address
+        self.fee_mode = (fee_mode or os.getenv("TX_FEE_MODE", "legacy")).lower()
+        self.fee_ttl = fee_ttl if fee_ttl is not None else float(os.getenv("TX_FEE_TTL_SECONDS", "3"))
+        self.gas_buffer = gas_buffer or float(os.getenv("TX_GAS_BUFFER", "1.5"))
+        self.size_bucket = size_bucket or int(os.getenv("TX_GAS_SIZE_BUCKET", "64"))
+
+        self._chain_id: Optional[int] = None
+        self._eip1559: Optional[bool] = None if self.fee_mode == "auto" else self.fee_mode == "eip1559"
+        self._fees: Optional[Dict[str, int]] = None
+        self._fees_at = 0.0
+        self._fee_lock = asyncio.Lock()
+        self._gas_limits: Dict[Tuple[str, bytes, int], int] = {}
+        self._estimating: Dict[Tuple[str, bytes, int], asyncio.Task] = {}
+
+        # Metrics
+        self.builds = 0
+        self.chain_id_reads = 0
+        self.fee_reads = 0
+        self.gas_estimates = 0
+        self.gas_cache_hits = 0
+        self.gas_invalidations = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "builds": self.builds,
+            "chain_id_reads": self.chain_id_reads,
+            "fee_reads": self.fee_reads,
+            "gas_estimates": self.gas_estimates,
+            "gas_cache_hits": self.gas_cache_hits,
+            "gas_invalidations": self.gas_invalidations,
+            "cached_gas_limits": len(self._gas_limits),
+        }
+
+    def gas_key(self, to: str, data: Any) -> Tuple[str, bytes, int]:
+        """Cache key for a call: same contract function with similarly sized arguments"""
+        data = bytes.fromhex(data[2:]) if isinstance(data, str) else bytes(data)
+        return (to, data[:4], len(data) // self.size_bucket)
+
+    async def chain_id(self) -> int:
+        """Chain id, read from the node once"""
+        if self._chain_id is None:
+            self.chain_id_reads += 1
+            self._chain_id = await self.w3.eth.chain_id
+        return self._chain_id
+
+    async def fees(self) -> Dict[str, int]:
+        """Fee fields for a new transaction, refreshed at most every fee_ttl seconds"""
+        async with self._fee_lock:
+            if self._fees is None or time.monotonic() - self._fees_at > self.fee_ttl:
+                self._fees = await self._read_fees()
+                self._fees_at = time.monotonic()
+            return dict(self._fees)
+
+    async def _read_fees(self) -> Dict[str, int]:
+        self.fee_reads += 1
+        if self._eip1559 is False:
+            return {'gasPrice': await self.w3.eth.gas_price}
+
+        latest, priority_fee = await asyncio.gather(
+            self.w3.eth.get_block("latest"),
+            self.w3.eth.max_priority_fee,
+        )
+        base_fee = latest.get('baseFeePerGas')
+        if base_fee is None:
+            # No base fee on this chain, stay on legacy pricing from now on
+            self._eip1559 = False
+            return {'gasPrice': await self.w3.eth.gas_price}
+
+        self._eip1559 = True
+        # Room for the base fee to double before the transaction stops being includable
+        return {
+            'maxPriorityFeePerGas': priority_fee,
+            'maxFeePerGas': 2 * base_fee + priority_fee,
+        }
+
+    async def gas_limit(self, contract_function, data: bytes, fallback: Optional[int] = None) -> int:
+        """
+        Buffered gas limit for a call, estimated only on a cache miss
+
+        Concurrent builds of the same key share one estimate_gas call.
+
+        Args:
+            contract_function: Bound contract function being sent
+            data: Its encoded calldata
+            fallback: Limit to use (uncached) if estimation fails; re-raises when None
+        """
+        key = self.gas_key(contract_function.address, data)
+        cached = self._gas_limits.get(key)
+        if cached is not None:
+            self.gas_cache_hits += 1
+            return cached
+
+        task = self._estimating.get(key)
+        if task is None:
+            task = asyncio.create_task(self._estimate(key, contract_function))
+            self._estimating[key] = task
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            if fallback is None:
+                raise
+            logger.warning(f"Gas estimation failed ({e}), using fallback gas limit: {fallback}")
+            return fallback
+
+    async def _estimate(self, key: Tuple[str, bytes, int], contract_function) -> int:
+        try:
+            self.gas_estimates += 1
+            estimate = await contract_function.estimate_gas({'from': self.address})
+            limit = int(estimate * self.gas_buffer)
+            self._gas_limits[key] = limit
+            logger.info(f"Gas estimate for {contract_function.fn_name}: {estimate}, using limit: {limit}")
+            return limit
+        finally:
+            self._estimating.pop(key, None)
+
+    def invalidate_gas(self, tx: Dict[str, Any]):
+        """Forget the cached gas limit a transaction was built with so the next build re-estimates"""
+        key = self.gas_key(tx['to'], tx['data'])
+        if self._gas_limits.pop(key, None) is not None:
+            self.gas_invalidations += 1
+            logger.info(f"Dropped cached gas limit for 0x{key[1].hex()} on {key[0]} (calldata bucket {key[2]})")
+
+    def ran_out_of_gas(self, tx: Dict[str, Any], receipt) -> bool:
+        """
+        Check a receipt for an out-of-gas failure and drop the gas limit it used
+
+        Args:
+            tx: Transaction dict returned by build()
+            receipt: Its receipt
+
+        Returns:
+            True if the transaction failed having used its whole gas limit
+        """
+        if receipt['status'] == 1 or receipt['gasUsed'] < tx['gas']:
+            return False
+        self.invalidate_gas(tx)
+        return True
+
+    async def build(
+        self,
+        contract_function,
+        nonce: int,
+        overrides: Optional[Dict[str, Any]] = None,
+        fallback_gas: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build an unsigned transaction for a contract call
+
+        Args:
+            contract_function: Bound contract function, e.g. contract.functions.registerAgent(...)
+            nonce: Nonce allocated for the transaction
+            overrides: Explicit fields (gas, gasPrice, value, ...) that skip the cached values
+            fallback_gas: Gas limit to use if estimation fails
+
+        Returns:
+            Transaction dict ready for account.sign_transaction()
+        """
+        overrides = dict(overrides or {})
+        data = contract_function._encode_transaction_data()
+        self.builds += 1
+
+        chain_id, fees, gas = await asyncio.gather(
+            self.chain_id(),
+            self.fees(),
+            self.gas_limit(contract_function, data, fallback_gas) if 'gas' not in overrides else asyncio.sleep(0, overrides['gas']),
+        )
+        if any(field in overrides for field in ('gasPrice', 'maxFeePerGas')):
+            fees = {}
+
+        return {
+            'chainId': chain_id,
+            'from': self.address,
+            'to': contract_function.address,
+            'data': data,
+            'value': 0,
+            'nonce': nonce,
+            'gas': gas,
+            **fees,
+            **overrides,
+        }
+
+
+class ReceiptTracker:
+    """
+    Waits for many transaction receipts with a single polling loop
+
+    Each tracked hash gets a future; one background task polls all outstanding
+    hashes concurrently each interval and resolves futures as receipts land.
+    """
+
+    def __init__(self, w3: AsyncWeb3, poll_interval: float = 0.25):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self._pending: Dict[bytes, asyncio.Future] = {}
+        self._deadlines: Dict[bytes, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def track(self, tx_hash: bytes, timeout: float = 120.0) -> asyncio.Future:
+        """Start tracking a transaction hash and return a future for its receipt"""
+        tx_hash = bytes(tx_hash)
+        if tx_hash in self._pending:
+            return self._pending[tx_hash]
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tx_hash] = future
+        self._deadlines[tx_hash] = time.monotonic() + timeout
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll_loop())
+        return future
+
+    async def wait(self, tx_hash: bytes, timeout: float = 120.0):
+        """Wait for the receipt of a transaction"""
+        return await self.track(tx_hash, timeout)
+
+    async def _fetch(self, tx_hash: bytes):
+        try:
+            return await self.w3.eth.get_transaction_receipt(tx_hash)
+        except Exception:
+            # TransactionNotFound until mined, transient RPC errors retry next tick
+            return None
+
+    async def _poll_loop(self):
+        while self._pending:
+            await asyncio.sleep(self.poll_interval)
+
+            hashes = list(self._pending)
+            receipts = await asyncio.gather(*[self._fetch(h) for h in hashes])
+            now = time.monotonic()
+
+            for tx_hash, receipt in zip(hashes, receipts):
+                future = self._pending.get(tx_hash)
+                if future is None:
+                    continue
+                if receipt is not None:
+                    if not future.done():
+                        future.set_result(receipt)
+                elif now >= self._deadlines[tx_hash]:
+                    if not future.done():
+                        future.set_exception(TimeExhausted(
+                            f"Transaction 0x{tx_hash.hex()} is not in the chain after timeout"
+                        ))
+                else:
+                    continue
+                del self._pending[tx_hash]
+                del self._deadlines[tx_hash]
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
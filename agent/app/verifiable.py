@@ -141,14 +141,17 @@ class MerkleTree:
                 left = level[i]
                 right = level[i + 1] if i + 1 < len(level) else left
                 
-                # Combine hashes (remove 0x prefix from right)
-                combined = Web3.keccak(hexstr=left + right[2:]).hex()
-                next_level.append(combined)
+                next_level.append(self._hash_pair(left, right))
             
             tree.append(next_level)
         
         return tree
     
+    @staticmethod
+    def _hash_pair(left: str, right: str) -> str:
+        """Combine two sibling hashes (remove 0x prefix from right)"""
+        return Web3.keccak(hexstr=left + right[2:]).hex()
+    
     @property
     def root(self) -> str:
         """Get Merkle root"""
@@ -175,6 +178,47 @@ class MerkleTree:
             index = index // 2
         
         return proof
+    
+    @staticmethod
+    def verify_proof(leaf: str, proof: List[str], index: int, leaf_count: int, root: str) -> bool:
+        """
+        Check a proof from get_proof against a root
+        
+        Args:
+            leaf: The leaf hash being proven
+            proof: Sibling hashes from get_proof
+            index: Position of the leaf in the tree
+            leaf_count: Number of leaves in the tree (needed to replay odd levels)
+            root: Expected Merkle root
+            
+        Returns:
+            True if the leaf is included under root
+        """
+        if index >= leaf_count:
+            return False
+        
+        node = leaf
+        siblings = iter(proof)
+        size = leaf_count
+        
+        try:
+            while size > 1:
+                if index % 2 == 1:
+                    node = MerkleTree._hash_pair(next(siblings), node)
+                elif index + 1 < size:
+                    node = MerkleTree._hash_pair(node, next(siblings))
+                else:
+                    # Odd node at the end of a level is paired with itself
+                    node = MerkleTree._hash_pair(node, node)
+                index //= 2
+                size = (size + 1) // 2
+        except StopIteration:
+            return False
+        
+        if next(siblings, None) is not None:
+            return False
+        
+        return node.lower().removeprefix("0x") == root.lower().removeprefix("0x")
 
 
 class VerifiableAgent:
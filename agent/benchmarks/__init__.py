@@ -0,0 +1 @@
+# Chain-path benchmarks - run from agent/ with: python -m benchmarks.<name>
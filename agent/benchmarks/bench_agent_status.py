@@ -0,0 +1,96 @@
+"""
+GET /agent/info served from the in-memory agent status vs. an isActiveAgent call per request
+Also times app startup now that the registration check runs in the background, against the local stand-in chain
+
+Usage (from agent/):
+    python -m benchmarks.bench_agent_status --requests 200 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.stand_in_chain import AGENT_REGISTRY_ADDRESS, StandInChain
+
+IS_ACTIVE_AGENT_ABI = [
+    {
+        "inputs": [{"name": "did", "type": "string"}],
+        "name": "isActiveAgent",
+        "outputs": [{"name": "", "type": "bool"}],
+        "stateMutability": "view",
+        "type": "function",
+    }
+]
+
+
+async def main(requests: int, latency: float):
+    chain = StandInChain(block_time=1.0, rpc_latency=latency)
+    url = await chain.start()
+
+    workdir = tempfile.mkdtemp(prefix="bench-agent-status-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "PINATA_JWT": "stand-in",
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "DOCUMENT_INDEXER_ENABLED": "false",
+        "PROVENANCE_INDEXER_ENABLED": "false",
+    })
+
+    from app import main as api
+
+    logging.disable(logging.WARNING)
+    client = api.somnia_client
+    client.agent_registry = client.w3.eth.contract(address=AGENT_REGISTRY_ADDRESS, abi=IS_ACTIVE_AGENT_ABI)
+
+    print(f"Stand-in chain at {url}, {latency * 1000:.0f} ms RPC latency, {requests} requests per mode")
+
+    started = time.perf_counter()
+    async with api.lifespan(api.app):
+        ready = (time.perf_counter() - started) * 1000
+        while api.agent_status.active is None:
+            await asyncio.sleep(0.001)
+        known = (time.perf_counter() - started) * 1000
+        print(f"Startup: ready after {ready:.1f} ms, registration status known after {known:.1f} ms")
+
+        print(f"{'mode':>32} {'p50 ms':>8} {'p95 ms':>8} {'RPC/req':>8}")
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            async def per_request_read():
+                # What /agent/info did before: one isActiveAgent eth_call per request
+                return await client.is_agent_active(api.AGENT_DID)
+
+            for label, run in [
+                ("isActiveAgent per request", per_request_read),
+                ("/agent/info (memory)", lambda: http.get("/agent/info")),
+                ("/ (memory)", lambda: http.get("/")),
+            ]:
+                latencies = []
+                requests_before = chain.request_count
+                for _ in range(requests):
+                    request_started = time.perf_counter()
+                    await run()
+                    latencies.append((time.perf_counter() - request_started) * 1000)
+                latencies.sort()
+                print(
+                    f"{label:>32} {statistics.median(latencies):>8.2f} "
+                    f"{latencies[int(len(latencies) * 0.95)]:>8.2f} "
+                    f"{(chain.request_count - requests_before) / requests:>8.2f}"
+                )
+
+        print(f"Agent status: {api.agent_status.metrics()}")
+
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
@@ -0,0 +1,76 @@
+"""
+NFT auth checks served from the AuthCache vs. isAuthenticated + getUserTokenId per request
+Runs require_nft_authentication for a pool of users against the local stand-in chain
+
+Usage (from agent/):
+    python -m benchmarks.bench_auth_cache --users 50 --checks 1000 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+from web3 import Web3
+
+from benchmarks.stand_in_chain import StandInChain
+
+ACCESS_NFT_ADDRESS = "0x" + "44" * 20
+
+
+async def main(users: int, checks: int, latency: float, concurrency: int):
+    chain = StandInChain(block_time=1.0, rpc_latency=latency)
+    url = await chain.start()
+    os.environ.update({"SOMNIA_RPC_URL": url, "ACCESS_NFT_ADDRESS": ACCESS_NFT_ADDRESS})
+
+    from app.nft_auth import NFTAuthenticator
+
+    logging.disable(logging.WARNING)
+    authenticator = NFTAuthenticator()
+    addresses = [Web3.to_checksum_address(f"0x{i + 1:040x}") for i in range(users)]
+
+    print(f"Stand-in chain at {url}: {users} users, {checks} checks, concurrency {concurrency}, {latency * 1000:.0f} ms RPC latency")
+    print(f"{'mode':>28} {'p50 ms':>8} {'p95 ms':>8} {'checks/s':>9} {'RPC/check':>10}")
+
+    async def uncached(address):
+        # What every check did before: both views on the chain
+        return await authenticator._read_authentication(address)
+
+    for label, check in [
+        ("chain read per check", uncached),
+        ("AuthCache", authenticator.require_nft_authentication),
+    ]:
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def run(i):
+            async with semaphore:
+                started = time.perf_counter()
+                await check(addresses[i % users])
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        requests_before = chain.request_count
+        started = time.perf_counter()
+        await asyncio.gather(*[run(i) for i in range(checks)])
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        print(
+            f"{label:>28} {statistics.median(latencies):>8.2f} {latencies[int(len(latencies) * 0.95)]:>8.2f} "
+            f"{checks / elapsed:>9.0f} {(chain.request_count - requests_before) / checks:>10.3f}"
+        )
+
+    print(f"Auth cache: {authenticator.auth_cache.metrics()}")
+    await authenticator.w3.provider.disconnect()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--checks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.checks, args.latency, args.concurrency))
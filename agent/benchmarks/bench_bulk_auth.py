@@ -0,0 +1,104 @@
+"""
+Checking thousands of wallets with one /auth/check/bulk request vs. one /auth/check per wallet
+Runs against the local stand-in chain (Multicall3 deployed), with a share of repeated addresses
+
+Usage (from agent/):
+    python -m benchmarks.bench_bulk_auth --wallets 2000 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+from web3 import Web3
+
+from benchmarks.stand_in_chain import StandInChain
+
+ACCESS_NFT_ADDRESS = "0x" + "44" * 20
+
+
+async def main(wallets: int, duplicates: float, latency: float, concurrency: int):
+    chain = StandInChain(block_time=1.0, rpc_latency=latency)
+    url = await chain.start()
+
+    workdir = tempfile.mkdtemp(prefix="bench-bulk-auth-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "PINATA_JWT": "stand-in",
+        "ACCESS_NFT_ADDRESS": ACCESS_NFT_ADDRESS,
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "DOCUMENT_INDEXER_ENABLED": "false",
+        "PROVENANCE_INDEXER_ENABLED": "false",
+        "AUTH_BULK_ADMIN_KEY": "bench",
+    })
+
+    from app import main as api
+
+    logging.disable(logging.WARNING)
+    distinct = [Web3.to_checksum_address(f"0x{i + 1:040x}") for i in range(wallets)]
+    addresses = distinct + distinct[:int(wallets * duplicates)]
+    print(
+        f"Stand-in chain at {url}: {len(addresses)} addresses ({wallets} distinct), "
+        f"{latency * 1000:.0f} ms RPC latency"
+    )
+    print(f"{'mode':>36} {'elapsed ms':>11} {'first ms':>9} {'RPC calls':>10} {'HTTP reqs':>10}")
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        async def per_wallet():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def check(address):
+                async with semaphore:
+                    return (await http.get("/auth/check", params={"user_address": address})).json()
+
+            return await asyncio.gather(*[check(address) for address in addresses])
+
+        async def bulk():
+            results = []
+            async with http.stream(
+                "POST", "/auth/check/bulk", json={"addresses": addresses}, headers={"X-Admin-Key": "bench"}
+            ) as response:
+                async for line in response.aiter_lines():
+                    if line:
+                        if not results:
+                            first[0] = time.perf_counter()
+                        results.append(json.loads(line))
+            return results
+
+        for label, run, cold in [
+            (f"/auth/check x{len(addresses)} (c={concurrency})", per_wallet, True),
+            ("/auth/check/bulk (cold cache)", bulk, True),
+            ("/auth/check/bulk (warm cache)", bulk, False),
+        ]:
+            if cold:
+                api.nft_authenticator.auth_cache.invalidate()
+            first = [None]
+            requests_before, http_before = chain.request_count, chain.http_request_count
+            started = time.perf_counter()
+            results = await run()
+            elapsed = (time.perf_counter() - started) * 1000
+            first_ms = f"{(first[0] - started) * 1000:.1f}" if first[0] else "n/a"
+            assert sum(result["authenticated"] for result in results) >= wallets
+            print(
+                f"{label:>36} {elapsed:>11.1f} {first_ms:>9} {chain.request_count - requests_before:>10} "
+                f"{chain.http_request_count - http_before:>10}"
+            )
+
+    print(f"Multicall: {api.somnia_client.multicall.metrics()}")
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wallets", type=int, default=2000)
+    parser.add_argument("--duplicates", type=float, default=0.25, help="Share of addresses repeated in the request")
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent /auth/check calls in per-wallet mode")
+    args = parser.parse_args()
+    asyncio.run(main(args.wallets, args.duplicates, args.latency, args.concurrency))
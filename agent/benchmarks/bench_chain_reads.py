@@ -0,0 +1,127 @@
+"""
+Repeated immutable chain reads with and without the ChainReadCache memo, against the local stand-in chain
+Times getRecord, the batched get_records behind /provenance/nft/{token_id} and verify_document_on_chain receipts
+
+Usage (from agent/):
+    python -m benchmarks.bench_chain_reads --records 500 --documents 20 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app.read_cache import ChainReadCache
+from benchmarks.stand_in_chain import COMPANY_DROPBOX_ADDRESS, PROVENANCE_ABI, PROVENANCE_ADDRESS, StandInChain
+
+# Throwaway key - only ever used against the stand-in chain
+BENCH_PRIVATE_KEY = "0x" + "4c" * 32
+
+
+class NoMemo(ChainReadCache):
+    """What the client did before: every read goes to the chain"""
+
+    async def lookup(self, contract, fn_name, args_list):
+        return [None] * len(args_list)
+
+    async def remember(self, contract_functions, values):
+        pass
+
+    async def call(self, contract_function, block_identifier="latest"):
+        return await self.multicall.call(contract_function)
+
+    async def get_receipt(self, tx_hash):
+        return await self.w3.eth.get_transaction_receipt(tx_hash)
+
+
+async def timed(chain, label, repeat, run):
+    latencies = []
+    requests_before = chain.request_count
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await run()
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:>44} {statistics.median(latencies):>9.2f} {max(latencies):>9.2f} "
+        f"{(chain.request_count - requests_before) / repeat:>9.1f}"
+    )
+
+
+async def main(records: int, documents: int, latency: float, repeat: int):
+    chain = StandInChain(block_time=0.05, rpc_latency=latency)
+    url = await chain.start()
+    chain.seed_provenance(records * 10, [1], ["did:key:bench-agent"], records)
+
+    workdir = tempfile.mkdtemp(prefix="bench-chain-reads-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "DEPLOYER_PRIVATE_KEY": BENCH_PRIVATE_KEY,
+        "COMPANY_DROPBOX_ADDRESS": COMPANY_DROPBOX_ADDRESS,
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "CHAIN_READ_CONFIRMATIONS": "5",
+    })
+
+    from app.chains import SomniaClient
+
+    logging.disable(logging.WARNING)
+    client = SomniaClient()
+    client.provenance = client.w3.eth.contract(address=PROVENANCE_ADDRESS, abi=PROVENANCE_ABI)
+
+    uploads = [
+        await client.record_document_on_chain(f"QmBench{i}", "0x" + f"{i:064x}", f"bench-{i}.pdf", 1024, 1)
+        for i in range(documents)
+    ]
+    while chain.head["number"] < uploads[-1]["block_number"] + client.reads.confirmations:
+        await asyncio.sleep(0.05)
+
+    print(f"Stand-in chain at {url}: {records} records, {documents} documents, {latency * 1000:.0f} ms RPC latency")
+    print(f"{'read':>44} {'p50 ms':>9} {'max ms':>9} {'RPC/op':>9}")
+
+    record_ids = list(range(records))
+
+    memo = client.reads
+    client.reads = NoMemo(client.w3, client.multicall, client.db)
+    await timed(chain, "getRecord, no memo", repeat, lambda: client.get_record(7))
+    await timed(chain, f"get_records x{records}, no memo", 3, lambda: client.get_records(record_ids))
+
+    async def verify_all():
+        for i, upload in enumerate(uploads):
+            expected = {"ipfs_hash": upload["cid"], "document_hash": f"{i:064x}", "filename": upload["filename"]}
+            assert await client.verify_document_on_chain("0x" + upload["tx_hash"], upload["block_number"], expected)
+
+    await timed(chain, f"verify {documents} receipts, no memo", 3, verify_all)
+
+    client.reads = memo
+    await client.get_record(7)
+    await timed(chain, "getRecord, memo in memory", repeat, lambda: client.get_record(7))
+
+    # A restarted process: empty in-memory LRU over the same SQLite table
+    client.reads = ChainReadCache(client.w3, client.multicall, client.db)
+    await timed(chain, "getRecord, memo in SQLite (first read)", 1, lambda: client.get_record(7))
+
+    await timed(chain, f"get_records x{records}, memo (first read)", 1, lambda: client.get_records(record_ids))
+    await timed(chain, f"get_records x{records}, memo", repeat, lambda: client.get_records(record_ids))
+
+    # Restarted again: every record now comes from SQLite
+    client.reads = ChainReadCache(client.w3, client.multicall, client.db)
+    await timed(chain, f"get_records x{records}, memo in SQLite", 1, lambda: client.get_records(record_ids))
+
+    await verify_all()
+    await timed(chain, f"verify {documents} receipts, memo", repeat, verify_all)
+
+    print(f"Memo: {client.reads.metrics()}")
+    await client.close()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.records, args.documents, args.latency, args.repeat))
@@ -0,0 +1,101 @@
+"""
+Cold-start DocumentUploaded indexing against the local stand-in chain
+Compares sequential window fetching with bulk catch-up and times /documents/list reads
+
+Usage (from agent/):
+    python -m benchmarks.bench_document_indexer --blocks 200000 --users 50 --latency 0.02
+    python -m benchmarks.bench_document_indexer --max-range 300 --fail-rate 0.05   # hostile RPC
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+import statistics
+import tempfile
+import time
+
+from web3 import Web3
+
+from benchmarks.stand_in_chain import COMPANY_DROPBOX_ADDRESS, StandInChain
+
+
+async def main(blocks: int, users: int, per_user: int, latency: float, levels, max_range, fail_rate):
+    chain = StandInChain(block_time=1.0, rpc_latency=latency, max_log_range=max_range, log_failure_rate=fail_rate)
+    url = await chain.start()
+    deployment_block = chain.head["number"]
+
+    uploaders = [Web3.to_checksum_address(f"0x{i + 1:040x}") for i in range(users)]
+    seeded = chain.seed_documents(blocks, uploaders, per_user)
+
+    workdir = tempfile.mkdtemp(prefix="bench-indexer-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "PINATA_JWT": "stand-in",
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "COMPANY_DROPBOX_ADDRESS": COMPANY_DROPBOX_ADDRESS,
+        "COMPANY_DROPBOX_DEPLOYMENT_BLOCK": str(deployment_block),
+    })
+
+    from app.chains import SomniaClient
+    from app.database import DocumentDatabase
+    from app.indexer import DocumentIndexer
+
+    logging.disable(logging.WARNING)
+    client = SomniaClient()
+
+    batch_size = int(os.getenv("BLOCKCHAIN_QUERY_BATCH_SIZE", "500"))
+    windows = math.ceil(blocks / batch_size)
+    print(f"Stand-in chain at {url}: {blocks} blocks, {seeded} documents from {users} uploaders, {latency * 1000:.0f} ms RPC latency")
+    print(f"A per-user scan from the deployment block costs {windows} eth_getLogs calls per new user")
+    print(
+        f"{'concurrency':>11} {'elapsed s':>10} {'blocks/s':>10} {'RPC calls':>10} {'HTTP reqs':>10} {'headers':>8} "
+        f"{'splits':>7} {'retries':>8} {'window':>7} {'docs':>6} {'lag':>5}"
+    )
+
+    db = None
+    for concurrency in levels:
+        db = DocumentDatabase(os.path.join(workdir, f"documents-{concurrency}.db"))
+        indexer = DocumentIndexer(client, db=db, concurrency=concurrency)
+        calls_before = chain.request_count
+        http_before = chain.http_request_count
+        headers_before = chain.method_counts.get("eth_getBlockByNumber", 0)
+        started = time.perf_counter()
+        await indexer.catch_up()
+        elapsed = time.perf_counter() - started
+        stats = db.get_cache_stats()
+        fetcher = indexer.fetcher.metrics()
+        print(
+            f"{concurrency:>11} {elapsed:>10.2f} {blocks / elapsed:>10.0f} {chain.request_count - calls_before:>10} "
+            f"{chain.http_request_count - http_before:>10} "
+            f"{chain.method_counts.get('eth_getBlockByNumber', 0) - headers_before:>8} "
+            f"{fetcher['splits']:>7} {fetcher['retries']:>8} {fetcher['window']:>7} "
+            f"{stats['total_documents']:>6} {indexer.lag_blocks:>5}"
+        )
+
+    # /documents/list is now an indexed read, whoever asks
+    read_latencies = []
+    for uploader in uploaders:
+        started = time.perf_counter()
+        await client.get_user_documents(uploader)
+        read_latencies.append(time.perf_counter() - started)
+    print(f"Indexed reads for {users} users: p50 {statistics.median(read_latencies) * 1000:.2f} ms, max {max(read_latencies) * 1000:.2f} ms")
+
+    await client.close()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--per-user", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8], help="Catch-up concurrency levels")
+    parser.add_argument("--max-range", type=int, default=None, help="Stand-in eth_getLogs block range limit")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of eth_getLogs calls that fail")
+    args = parser.parse_args()
+    asyncio.run(main(
+        args.blocks, args.users, args.per_user, args.latency, args.levels, args.max_range, args.fail_rate
+    ))
@@ -0,0 +1,109 @@
+"""
+Replaying already-recorded executions through record_provenance, against the local stand-in chain
+Compares sending the doomed transaction with the isExecutionRecorded pre-check (chain view call and mirror hit)
+
+Usage (from agent/):
+    python -m benchmarks.bench_duplicate_executions --executions 20 --block-time 0.25
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from web3 import Web3
+
+from benchmarks.stand_in_chain import PROVENANCE_ABI, PROVENANCE_ADDRESS, StandInChain
+
+# Throwaway key - only ever used against the stand-in chain
+BENCH_PRIVATE_KEY = "0x" + "4c" * 32
+AGENT_DID = "did:key:bench-agent"
+
+
+def execution(i):
+    return {
+        "nft_token_id": 1,
+        "input_cid": f"QmInput{i}",
+        "input_root": Web3.keccak(text=f"input-{i}").to_0x_hex(),
+        "output_cid": f"QmOutput{i}",
+        "execution_root": Web3.keccak(text=f"execution-{i}").to_0x_hex(),
+        "trace_cid": f"QmTrace{i}",
+        "agent_did": AGENT_DID,
+    }
+
+
+async def replay(chain, client, executions, expected, label):
+    latencies, correct = [], 0
+    requests_before = chain.request_count
+    sends_before = chain.method_counts.get("eth_sendRawTransaction", 0)
+    for i in range(executions):
+        started = time.perf_counter()
+        result = await client.record_provenance(**execution(i))
+        latencies.append((time.perf_counter() - started) * 1000)
+        correct += result["record_id"] == expected[i]
+    print(
+        f"{label:>28} {statistics.median(latencies):>9.1f} {max(latencies):>9.1f} "
+        f"{chain.method_counts.get('eth_sendRawTransaction', 0) - sends_before:>6} "
+        f"{(chain.request_count - requests_before) / executions:>10.1f} {correct:>5}/{executions}"
+    )
+
+
+async def main(executions: int, block_time: float):
+    chain = StandInChain(block_time=block_time)
+    url = await chain.start()
+
+    workdir = tempfile.mkdtemp(prefix="bench-duplicates-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "DEPLOYER_PRIVATE_KEY": BENCH_PRIVATE_KEY,
+        "PINATA_JWT": "stand-in",
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "PROVENANCE_DEPLOYMENT_BLOCK": str(chain.head["number"] + 1),
+        "PROVENANCE_INDEXER_CONFIRMATIONS": "2",
+    })
+
+    from app.chains import SomniaClient
+    from app.indexer import ProvenanceIndexer
+
+    logging.disable(logging.WARNING)
+    client = SomniaClient()
+    client.provenance = client.w3.eth.contract(address=PROVENANCE_ADDRESS, abi=PROVENANCE_ABI)
+
+    print(f"Stand-in chain at {url}, block time {block_time}s, {executions} executions replayed once per mode")
+    recorded = [await client.record_provenance(**execution(i)) for i in range(executions)]
+    expected = [result["record_id"] for result in recorded]
+
+    print(f"{'mode':>28} {'p50 ms':>9} {'max ms':>9} {'txs':>6} {'RPC/call':>10} {'right record':>11}")
+
+    # What record_provenance did before the pre-check: build, sign and wait on a transaction that reverts
+    check = client.is_execution_recorded
+
+    async def no_check(execution_root):
+        return None
+
+    client.is_execution_recorded = no_check
+    await replay(chain, client, executions, [None] * executions, "no pre-check (reverts)")
+    client.is_execution_recorded = check
+
+    await replay(chain, client, executions, expected, "pre-check, chain view call")
+
+    # Let the mirror confirm every original record
+    indexer = ProvenanceIndexer(client)
+    while indexer.cursor < max(result["block_number"] for result in recorded):
+        await indexer.sync_once()
+        await asyncio.sleep(block_time)
+    await replay(chain, client, executions, expected, "pre-check, mirror hit")
+
+    await client.close()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--executions", type=int, default=20)
+    parser.add_argument("--block-time", type=float, default=0.25)
+    args = parser.parse_args()
+    asyncio.run(main(args.executions, args.block_time))
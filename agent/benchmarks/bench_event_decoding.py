@@ -0,0 +1,120 @@
+"""
+Event decoding micro-benchmark: web3 process_log per log vs. the topic0 EventDecoder
+Covers finding one event in a receipt and bulk-decoding a backfill window (no network)
+
+Usage (from agent/):
+    python -m benchmarks.bench_event_decoding --receipts 5000 --backfill 20000
+"""
+
+import argparse
+import time
+
+from eth_abi import encode
+from hexbytes import HexBytes
+from web3 import AsyncWeb3, Web3
+from web3.datastructures import AttributeDict
+
+from app.contract_config import COMPANY_DROPBOX_ABI
+from app.events import EventDecoder
+from benchmarks.stand_in_chain import COMPANY_DROPBOX_ADDRESS
+
+UPLOADER = Web3.to_checksum_address("0x" + "ab" * 20)
+TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)")
+
+
+def upload_log(contract, i):
+    return AttributeDict({
+        "address": COMPANY_DROPBOX_ADDRESS,
+        "topics": [
+            HexBytes(contract.events.DocumentUploaded.topic),
+            HexBytes(i.to_bytes(32, "big")),
+            HexBytes(bytes.fromhex(UPLOADER[2:]).rjust(32, b"\0")),
+            HexBytes((1).to_bytes(32, "big")),
+        ],
+        "data": HexBytes(encode(
+            ["string", "bytes32", "string"], [f"QmDocument{i}", Web3.keccak(text=str(i)), f"file-{i}.pdf"]
+        )),
+        "blockNumber": 1_000_000 + i,
+        "blockHash": HexBytes(Web3.keccak(i.to_bytes(32, "big"))),
+        "transactionHash": HexBytes(Web3.keccak(text=f"tx-{i}")),
+        "transactionIndex": 0,
+        "logIndex": 3,
+    })
+
+
+def noise_log(i, index):
+    """An ERC-20 style Transfer emitted earlier in the same transaction"""
+    return AttributeDict({
+        "address": Web3.to_checksum_address(f"0x{index + 1:040x}"),
+        "topics": [HexBytes(TRANSFER_TOPIC), HexBytes(b"\0" * 32), HexBytes(b"\0" * 32)],
+        "data": HexBytes(i.to_bytes(32, "big")),
+        "blockNumber": 1_000_000 + i,
+        "blockHash": HexBytes(b"\0" * 32),
+        "transactionHash": HexBytes(b"\0" * 32),
+        "transactionIndex": 0,
+        "logIndex": index,
+    })
+
+
+def old_find(contract, logs):
+    """record_document_on_chain before: process_log on every log, swallowing mismatches"""
+    for log in logs:
+        try:
+            return contract.events.DocumentUploaded().process_log(log)
+        except Exception:
+            continue
+    return None
+
+
+def old_verify_find(contract, w3, logs):
+    """verify_document_on_chain before: keccak of the signature per call, then process_log"""
+    signature = w3.keccak(text="DocumentUploaded(uint256,address,uint256,string,bytes32,string)").hex()
+    for log in logs:
+        try:
+            if log["topics"][0].hex() == signature:
+                return contract.events.DocumentUploaded().process_log(log)
+        except Exception:
+            continue
+    return None
+
+
+def timed(label, count, run):
+    started = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:>44} {elapsed * 1e6 / count:>10.1f} {count / elapsed:>12.0f}")
+    return result
+
+
+def main(receipts: int, backfill: int):
+    w3 = AsyncWeb3()
+    contract = w3.eth.contract(address=COMPANY_DROPBOX_ADDRESS, abi=COMPANY_DROPBOX_ABI)
+    decoder = EventDecoder()
+
+    receipt_logs = [[noise_log(i, 0), noise_log(i, 1), noise_log(i, 2), upload_log(contract, i)] for i in range(receipts)]
+    window = [upload_log(contract, i) for i in range(backfill)]
+
+    print(f"{'path':>44} {'us/item':>10} {'items/s':>12}")
+    print(f"Receipts with 3 unrelated logs before the DocumentUploaded one ({receipts})")
+    old = timed("process_log on every log (try/except)", receipts,
+                lambda: [old_find(contract, logs) for logs in receipt_logs])
+    timed("keccak per call + process_log", receipts,
+          lambda: [old_verify_find(contract, w3, logs) for logs in receipt_logs])
+    new = timed("EventDecoder.find", receipts,
+                lambda: [decoder.find(logs, contract.events.DocumentUploaded) for logs in receipt_logs])
+    assert [dict(e["args"]) for e in old] == [e["args"] for e in new]
+
+    print(f"Backfill window of {backfill} DocumentUploaded logs")
+    event = contract.events.DocumentUploaded()
+    old = timed("process_log per log (ContractEvent.get_logs)", backfill,
+                lambda: [event.process_log(log) for log in window])
+    new = timed("EventDecoder.decode_many", backfill, lambda: decoder.decode_many(window))
+    assert [dict(e["args"]) for e in old] == [e["args"] for e in new]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=5000)
+    parser.add_argument("--backfill", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.receipts, args.backfill)
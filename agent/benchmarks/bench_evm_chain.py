@@ -0,0 +1,171 @@
+"""
+Chain-layer benchmarks against the real contracts on an in-process EVM (eth-tester/py-evm)
+Times record_provenance, DocumentUploaded backfill behind get_user_documents and NFT auth checks
+
+Needs eth-tester[py-evm], and py-solc-x with the OpenZeppelin sources (`npm install` in contracts/)
+unless hardhat artifacts are present (`npx hardhat compile`).
+
+Usage (from agent/):
+    python -m benchmarks.bench_evm_chain --records 50 --users 20 --per-user 5 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.evm_chain import EVMChain, require_contracts
+
+AGENT_DID = "did:key:z6MkBenchAgent"
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+    return statistics.median(ordered) * 1000, ordered[int(len(ordered) * 0.95)] * 1000
+
+
+async def bench_record_provenance(chain, client, token_id, records, concurrency):
+    print(f"record_provenance, {records} records:")
+    print(f"{'concurrency':>11} {'p50 ms':>9} {'p95 ms':>9} {'records/s':>10} {'RPC/record':>11}")
+    offset = 0
+    for level in concurrency:
+        semaphore = asyncio.Semaphore(level)
+        latencies = []
+
+        async def record(i):
+            async with semaphore:
+                started = time.perf_counter()
+                result = await client.record_provenance(
+                    token_id, f"QmInput{i}", f"{i:064x}", f"QmOutput{i}", f"{i + 1:064x}", f"QmTrace{i}", AGENT_DID
+                )
+                latencies.append(time.perf_counter() - started)
+                assert result["record_id"] is not None
+
+        requests_before = chain.request_count
+        started = time.perf_counter()
+        await asyncio.gather(*[record(offset + i) for i in range(records)])
+        elapsed = time.perf_counter() - started
+        offset += 2 * records
+        p50, p95 = percentiles(latencies)
+        print(
+            f"{level:>11} {p50:>9.2f} {p95:>9.2f} {records / elapsed:>10.1f} "
+            f"{(chain.request_count - requests_before) / records:>11.1f}"
+        )
+
+
+async def bench_document_backfill(chain, client, uploaders, per_user):
+    from app.database import DocumentDatabase
+    from app.indexer import DocumentIndexer
+
+    dropbox = chain.contracts["CompanyDropbox"]
+    for uploader in uploaders:
+        for i in range(per_user):
+            dropbox.functions.uploadDocument(f"QmDoc{i}", bytes(32), f"doc-{i}.pdf", 1024).transact({"from": uploader})
+    blocks = chain.w3.eth.block_number - chain.deployment_block
+
+    workdir = tempfile.mkdtemp(prefix="bench-evm-backfill-")
+    client.db = DocumentDatabase(os.path.join(workdir, "documents.db"))
+    indexer = DocumentIndexer(client, db=client.db)
+    requests_before = chain.request_count
+    started = time.perf_counter()
+    await indexer.catch_up()
+    elapsed = time.perf_counter() - started
+    documents = client.db.get_cache_stats()["total_documents"]
+    print(
+        f"DocumentUploaded backfill: {documents} documents over {blocks} blocks in {elapsed * 1000:.1f} ms, "
+        f"{chain.request_count - requests_before} RPC calls"
+    )
+    assert documents == len(uploaders) * per_user
+
+    latencies = []
+    for uploader in uploaders:
+        started = time.perf_counter()
+        assert len(await client.get_user_documents(uploader)) == per_user
+        latencies.append(time.perf_counter() - started)
+    p50, p95 = percentiles(latencies)
+    print(f"get_user_documents for {len(uploaders)} users: p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+
+
+async def bench_auth_checks(chain, authenticator, users, checks, concurrency):
+    print(f"require_nft_authentication, {checks} checks over {len(users)} users:")
+    print(f"{'concurrency':>11} {'p50 ms':>9} {'p95 ms':>9} {'checks/s':>10} {'RPC/check':>10}")
+    for level in concurrency:
+        semaphore = asyncio.Semaphore(level)
+        latencies = []
+
+        async def check(i):
+            async with semaphore:
+                started = time.perf_counter()
+                await authenticator.require_nft_authentication(users[i % len(users)])
+                latencies.append(time.perf_counter() - started)
+
+        requests_before = chain.request_count
+        started = time.perf_counter()
+        await asyncio.gather(*[check(i) for i in range(checks)])
+        elapsed = time.perf_counter() - started
+        p50, p95 = percentiles(latencies)
+        print(
+            f"{level:>11} {p50:>9.2f} {p95:>9.2f} {checks / elapsed:>10.1f} "
+            f"{(chain.request_count - requests_before) / checks:>10.2f}"
+        )
+
+
+async def main(records: int, users: int, per_user: int, checks: int, latency: float, concurrency):
+    # Compiles contracts/src (or raises with the reason it can't) before anything starts
+    require_contracts()
+
+    chain = EVMChain(rpc_latency=latency)
+    url = await chain.start()
+    addresses = chain.deploy_all(agent_did=AGENT_DID)
+    token_id = chain.mint_access_nft(chain.deployer)
+
+    uploaders = [chain.new_account() for _ in range(users)]
+    for uploader in uploaders:
+        chain.mint_company_access_nft(uploader)
+    # Half of the auth checks are for users without a CompanyAccessNFT
+    outsiders = [chain.new_account() for _ in range(users)]
+
+    workdir = tempfile.mkdtemp(prefix="bench-evm-chain-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "DEPLOYER_PRIVATE_KEY": chain.private_key(0),
+        "ACCESS_NFT_ADDRESS": addresses["AccessNFT"],
+        "AGENT_REGISTRY_ADDRESS": addresses["AgentRegistry"],
+        "PROVENANCE_ADDRESS": addresses["Provenance"],
+        "COMPANY_DROPBOX_ADDRESS": addresses["CompanyDropbox"],
+        "COMPANY_DROPBOX_DEPLOYMENT_BLOCK": str(chain.deployment_block),
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+    })
+
+    from app.chains import SomniaClient
+    from app.nft_auth import NFTAuthenticator
+
+    logging.disable(logging.WARNING)
+    client = SomniaClient()
+    print(f"EVM chain at {url}: contracts deployed at block {chain.deployment_block}, {latency * 1000:.0f} ms RPC latency")
+
+    await bench_record_provenance(chain, client, token_id, records, concurrency)
+    await bench_document_backfill(chain, client, uploaders, per_user)
+
+    # NFTAuthenticator reads CompanyAccessNFT, which the backend also calls ACCESS_NFT_ADDRESS
+    os.environ["ACCESS_NFT_ADDRESS"] = addresses["CompanyAccessNFT"]
+    authenticator = NFTAuthenticator(client.w3, client.multicall)
+    await bench_auth_checks(chain, authenticator, uploaders + outsiders, checks, concurrency)
+
+    await client.close()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--per-user", type=int, default=5)
+    parser.add_argument("--checks", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+    asyncio.run(main(args.records, args.users, args.per_user, args.checks, args.latency, args.concurrency))
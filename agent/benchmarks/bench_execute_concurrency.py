@@ -0,0 +1,177 @@
+"""
+/execute throughput vs. concurrency against the local stand-in chain
+IPFS and the LLM are replaced by in-memory stand-ins so only the chain path is measured
+
+Usage (from agent/):
+    python -m benchmarks.bench_execute_concurrency --block-time 0.25 --levels 1 4 16 64
+    python -m benchmarks.bench_execute_concurrency --no-wait   # respond before the anchor lands
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+from web3 import Web3
+
+from benchmarks.stand_in_chain import (
+    ACCESS_NFT_ABI,
+    ACCESS_NFT_ADDRESS,
+    PROVENANCE_ABI,
+    PROVENANCE_ADDRESS,
+    StandInChain,
+)
+
+# Throwaway key - only ever used against the stand-in chain
+BENCH_PRIVATE_KEY = "0x" + "4c" * 32
+BENCH_USER = Web3.to_checksum_address("0x" + "ab" * 20)
+
+
+class StandInIPFS:
+    """In-memory replacement for IPFSClient"""
+
+    def __init__(self):
+        self.blobs: Dict[str, bytes] = {}
+
+    def _put(self, content: bytes) -> str:
+        cid = "Qm" + Web3.keccak(content).hex()[:44]
+        self.blobs[cid] = content
+        return cid
+
+    async def upload_json(self, data: Dict[str, Any], filename: str = "data.json") -> str:
+        import json
+        return self._put(json.dumps(data, sort_keys=True).encode())
+
+    async def fetch(self, cid: str) -> bytes:
+        return self.blobs.get(cid, b"Stand-in document body used for chain benchmarks.")
+
+    async def fetch_json(self, cid: str) -> Dict[str, Any]:
+        import json
+        return json.loads(await self.fetch(cid))
+
+
+class StandInAIAgent:
+    """Replacement for AIAgent with a fixed think time"""
+
+    latency = 0.01
+
+    def __init__(self, provider: str = None, model: str = None):
+        self.provider = provider
+        self.model = model
+
+    async def execute(self, prompt: str, context: str, verifiable_agent=None) -> str:
+        await asyncio.sleep(self.latency)
+        return f"stand-in answer to: {prompt}"
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, requests: int, wait: bool) -> Dict[str, Any]:
+    """Drive `requests` /execute calls with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures: List[str] = []
+    probe_latencies: List[float] = []
+    done = asyncio.Event()
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/execute", json={
+                "nft_token_id": 1,
+                "user_address": BENCH_USER,
+                "document_cid": f"QmBenchDocument{i}",
+                "prompt": f"Summarise run {i}",
+                "wait_for_anchor": wait,
+            })
+            if response.status_code != 200:
+                failures.append(response.text)
+                return
+            latencies.append(time.perf_counter() - started)
+
+    async def probe():
+        # Health checks keep answering only if the event loop is never blocked
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get("/")
+            probe_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.05)
+
+    prober = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await prober
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "elapsed_s": elapsed,
+        "failed": len(failures),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "probe_max_ms": max(probe_latencies) * 1000 if probe_latencies else 0.0,
+    }
+
+
+async def main(block_time: float, levels: List[int], per_level: int, wait: bool, window: float):
+    chain = StandInChain(block_time=block_time, nft_owner=BENCH_USER)
+    url = await chain.start()
+
+    workdir = tempfile.mkdtemp(prefix="bench-execute-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "DEPLOYER_PRIVATE_KEY": BENCH_PRIVATE_KEY,
+        "PINATA_JWT": "stand-in",
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "PROVENANCE_BATCH_WINDOW_SECONDS": str(window),
+    })
+    os.environ.pop("ACCESS_NFT_ADDRESS", None)
+
+    from app import main as api
+
+    logging.disable(logging.ERROR)
+    api.ipfs_client = StandInIPFS()
+    api.provenance_anchor.ipfs_client = api.ipfs_client
+    api.AIAgent = StandInAIAgent
+    w3 = api.somnia_client.w3
+    api.somnia_client.provenance = w3.eth.contract(address=PROVENANCE_ADDRESS, abi=PROVENANCE_ABI)
+    api.somnia_client.access_nft = w3.eth.contract(address=ACCESS_NFT_ADDRESS, abi=ACCESS_NFT_ABI)
+
+    print(f"Stand-in chain at {url}, block time {block_time}s")
+    print(f"{'conc':>5} {'reqs':>5} {'failed':>7} {'elapsed s':>10} {'ok req/s':>9} {'p50 ms':>8} {'probe max ms':>13}")
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        for level in levels:
+            result = await run_level(client, level, max(per_level, level), wait)
+            print(
+                f"{result['concurrency']:>5} {result['requests']:>5} {result['failed']:>7} {result['elapsed_s']:>10.2f} "
+                f"{result['throughput_rps']:>9.2f} {result['p50_ms']:>8.0f} {result['probe_max_ms']:>13.1f}"
+            )
+
+        await api.provenance_anchor.flush()
+
+    executions = sum(max(per_level, level) for level in levels)
+    print(f"Provenance records anchored: {chain.record_count} for {executions} executions")
+    print(f"RPC requests served: {chain.request_count}")
+    writes = chain.method_counts.get("eth_sendRawTransaction", 0)
+    for method in ("eth_chainId", "eth_gasPrice", "eth_estimateGas", "eth_getTransactionCount"):
+        print(f"  {method}: {chain.method_counts.get(method, 0)} for {writes} transactions")
+    await api.somnia_client.close()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--block-time", type=float, default=0.25)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=16, help="Minimum requests per level")
+    parser.add_argument("--no-wait", action="store_true", help="Do not wait for provenance anchoring")
+    parser.add_argument("--window", type=float, default=0.25, help="Provenance batch window in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.block_time, args.levels, args.requests, not args.no_wait, args.window))
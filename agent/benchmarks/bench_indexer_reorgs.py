@@ -0,0 +1,129 @@
+"""
+Document indexing on a chain that reorganizes while uploads keep arriving
+Checks the finalized index matches the canonical chain and counts what each reorg cost
+
+Usage (from agent/):
+    python -m benchmarks.bench_indexer_reorgs --seconds 30 --max-depth 8 --confirmations 20
+    python -m benchmarks.bench_indexer_reorgs --deep   # one reorg deeper than the confirmation depth
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+from web3 import Web3
+
+from benchmarks.stand_in_chain import COMPANY_DROPBOX_ADDRESS, StandInChain
+
+
+def canonical_document_ids(chain: StandInChain, through_block: int):
+    return {
+        int(log["topics"][1], 16)
+        for log in chain.logs
+        if log["address"] == COMPANY_DROPBOX_ADDRESS and int(log["blockNumber"], 16) <= through_block
+    }
+
+
+async def main(seconds: float, block_time: float, confirmations: int, max_depth: int, reorg_every: float, deep: bool):
+    chain = StandInChain(block_time=block_time)
+    url = await chain.start()
+    deployment_block = chain.head["number"]
+    uploaders = [Web3.to_checksum_address(f"0x{i + 1:040x}") for i in range(20)]
+    chain.seed_documents(2_000, uploaders, 5)
+
+    workdir = tempfile.mkdtemp(prefix="bench-reorgs-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "PINATA_JWT": "stand-in",
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "COMPANY_DROPBOX_ADDRESS": COMPANY_DROPBOX_ADDRESS,
+        "COMPANY_DROPBOX_DEPLOYMENT_BLOCK": str(deployment_block),
+        "DOCUMENT_INDEXER_CONFIRMATIONS": str(confirmations),
+    })
+
+    from app.chains import SomniaClient
+    from app.indexer import DocumentIndexer
+
+    logging.disable(logging.ERROR)
+    client = SomniaClient()
+    indexer = DocumentIndexer(client)
+    await indexer.catch_up()
+    print(f"Stand-in chain at {url}: {block_time}s blocks, {confirmations} confirmations, reorgs up to {max_depth} deep every ~{reorg_every}s")
+
+    injected = []
+    orphaned_uploads = 0
+    stop = asyncio.Event()
+
+    async def churn():
+        nonlocal orphaned_uploads
+        upload = 0
+        next_reorg = time.monotonic() + reorg_every
+        while not stop.is_set():
+            for _ in range(random.randint(0, 3)):
+                chain.queue_upload(random.choice(uploaders), f"live-{upload}.txt")
+                upload += 1
+            if time.monotonic() >= next_reorg:
+                depth = random.randint(1, max_depth)
+                before = canonical_document_ids(chain, chain.head["number"])
+                chain.reorg(depth)
+                orphaned_uploads += len(before - canonical_document_ids(chain, chain.head["number"]))
+                injected.append(depth)
+                next_reorg = time.monotonic() + reorg_every
+            await asyncio.sleep(block_time)
+
+    async def poll():
+        while not stop.is_set():
+            await indexer.sync_once()
+            await asyncio.sleep(block_time / 2)
+
+    headers_before = chain.method_counts.get("eth_getBlockByNumber", 0)
+    calls_before = chain.request_count
+    polls = asyncio.gather(churn(), poll())
+    await asyncio.sleep(seconds)
+
+    if deep:
+        # Reach below the finalized cursor: only a rewind of the confirmed tail can fix this
+        depth = chain.head["number"] - indexer.cursor + confirmations // 2
+        chain.reorg(depth)
+        injected.append(depth)
+        await asyncio.sleep(block_time * 4)
+
+    stop.set()
+    await polls
+
+    # Let everything settle past the confirmation depth, then index it
+    settle_target = chain.head["number"]
+    while chain.head["number"] < settle_target + confirmations:
+        await asyncio.sleep(block_time)
+    await indexer.sync_once()
+
+    stats = client.db.get_cache_stats()
+    final_ids = {doc["document_id"] for user in uploaders for doc in client.db.get_user_documents(user)}
+    canonical = canonical_document_ids(chain, indexer.cursor)
+    metrics = indexer.metrics()
+    print(f"Reorgs injected: {len(injected)} (depths {sorted(injected)}), {orphaned_uploads} uploads orphaned by shallow ones")
+    print(f"Reorgs detected: {metrics['reorgs']}, tentative documents rolled back: {metrics['tentative_rolled_back']}")
+    print(f"Header reads: {chain.method_counts.get('eth_getBlockByNumber', 0) - headers_before} of {chain.request_count - calls_before} RPC calls")
+    print(
+        f"Finalized through block {indexer.cursor}: {stats['total_documents']} documents, "
+        f"{len(final_ids - canonical)} not on the canonical chain, {len(canonical - final_ids)} canonical ones missing"
+    )
+
+    await client.close()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--block-time", type=float, default=0.2)
+    parser.add_argument("--confirmations", type=int, default=20)
+    parser.add_argument("--max-depth", type=int, default=8, help="Deepest reorg injected during the run")
+    parser.add_argument("--reorg-every", type=float, default=2.0, help="Seconds between injected reorgs")
+    parser.add_argument("--deep", action="store_true", help="Finish with a reorg below the finalized cursor")
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.block_time, args.confirmations, args.max_depth, args.reorg_every, args.deep))
@@ -0,0 +1,88 @@
+"""
+IPFS fetches through the content-addressed blob cache vs. straight from the gateway
+Repeat fetches of a document and a trace, and a burst of concurrent first fetches, against the stand-in gateway
+
+Usage (from agent/):
+    python -m benchmarks.bench_ipfs_cache --fetches 50 --document-size 8388608 --rtt 0.04
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.stand_in_ipfs import StandInIPFS
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+    return statistics.median(ordered) * 1000, ordered[int(len(ordered) * 0.95)] * 1000
+
+
+async def repeat_fetches(server, fetch, name, cid, fetches):
+    latencies = []
+    requests_before = server.request_count
+    for _ in range(fetches):
+        started = time.perf_counter()
+        await fetch(cid)
+        latencies.append(time.perf_counter() - started)
+    p50, p95 = percentiles(latencies)
+    print(f"{name:>34} {p50:>9.2f} {p95:>9.2f} {server.request_count - requests_before:>16}")
+
+
+async def main(fetches: int, document_size: int, burst: int, rtt: float):
+    server = StandInIPFS(rtt=rtt)
+    url = await server.start()
+    os.environ["SSL_CERT_FILE"] = server.ca_file
+
+    from app.blob_cache import BlobCache
+    from app.ipfs import IPFSClient
+
+    logging.disable(logging.WARNING)
+    document_cid = server.pin(os.urandom(document_size))
+    trace_cid = server.pin(json.dumps({"steps": [{"step": i, "output": "x" * 200} for i in range(100)]}).encode())
+
+    uncached = IPFSClient(pinata_jwt="stand-in", ipfs_gateway=server.gateway, pinata_api_url=url)
+    uncached.cache = None
+    cache = BlobCache(tempfile.mkdtemp(prefix="bench-ipfs-cache-"))
+    cached = IPFSClient(pinata_jwt="stand-in", ipfs_gateway=server.gateway, pinata_api_url=url, cache=cache)
+    await uncached.open()
+    await cached.open()
+    print(
+        f"Stand-in gateway at {url}: {rtt * 1000:.0f} ms RTT, {document_size // 1024} KiB document, "
+        f"{fetches} fetches each"
+    )
+    print(f"{'mode':>34} {'p50 ms':>9} {'p95 ms':>9} {'gateway requests':>16}")
+    await repeat_fetches(server, uncached.fetch_view, "document, gateway", document_cid, fetches)
+    await repeat_fetches(server, cached.fetch_view, "document, cache (mmap hits)", document_cid, fetches)
+    await repeat_fetches(server, uncached.fetch_json, "trace JSON, gateway", trace_cid, fetches)
+    await repeat_fetches(server, cached.fetch_json, "trace JSON, cache", trace_cid, fetches)
+
+    # A burst of first fetches of one new document: one download between them
+    burst_cid = server.pin(os.urandom(document_size))
+    requests_before = server.request_count
+    started = time.perf_counter()
+    await asyncio.gather(*[cached.fetch_view(burst_cid) for _ in range(burst)])
+    print(
+        f"{burst} concurrent first fetches: {(time.perf_counter() - started) * 1000:.1f} ms, "
+        f"{server.request_count - requests_before} gateway requests"
+    )
+    print(f"Cache: {cache.metrics()}")
+
+    await uncached.close()
+    await cached.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetches", type=int, default=50)
+    parser.add_argument("--document-size", type=int, default=8 * 1024 * 1024, help="Bytes in the fetched document")
+    parser.add_argument("--burst", type=int, default=20, help="Concurrent first fetches of one document")
+    parser.add_argument("--rtt", type=float, default=0.04, help="Emulated network round trip in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.fetches, args.document_size, args.burst, args.rtt))
@@ -0,0 +1,106 @@
+"""
+IPFS fetches from one gateway vs. hedged across several, against stand-in gateways with slow tails
+Each gateway stalls a fraction of reads before responding, as public gateways do under load
+
+Usage (from agent/):
+    python -m benchmarks.bench_ipfs_gateways --fetches 300 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.stand_in_ipfs import StandInIPFS
+
+# (name, RTT, stalled fraction, stall seconds)
+GATEWAYS = [
+    ("public gateway A", 0.04, 0.08, 3.0),
+    ("public gateway B", 0.06, 0.05, 2.0),
+    ("dedicated gateway", 0.05, 0.02, 2.0),
+]
+
+
+def tail(latencies, q):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+
+async def run_mode(client, servers, cids, concurrency, name):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def fetch(cid):
+        async with semaphore:
+            started = time.perf_counter()
+            await client.fetch(cid)
+            latencies.append(time.perf_counter() - started)
+
+    requests_before = sum(server.request_count for server in servers)
+    await asyncio.gather(*[fetch(cid) for cid in cids])
+    requests = sum(server.request_count for server in servers) - requests_before
+    print(
+        f"{name:>22} {tail(latencies, 0.5):>9.1f} {tail(latencies, 0.95):>9.1f} {tail(latencies, 0.99):>9.1f} "
+        f"{max(latencies) * 1000:>9.1f} {requests / len(cids):>13.2f}"
+    )
+
+
+async def main(fetches: int, concurrency: int, seed: int):
+    servers = [
+        StandInIPFS(rtt=rtt, tail_probability=probability, tail_delay=stall, seed=seed + i)
+        for i, (_, rtt, probability, stall) in enumerate(GATEWAYS)
+    ]
+    for server in servers:
+        await server.start()
+    bundle = os.path.join(tempfile.mkdtemp(prefix="bench-ipfs-gateways-"), "ca.pem")
+    with open(bundle, "w") as f:
+        for server in servers:
+            f.write(open(server.ca_file).read())
+    os.environ["SSL_CERT_FILE"] = bundle
+    os.environ["IPFS_CACHE_ENABLED"] = "false"
+
+    from app.ipfs import IPFSClient
+
+    logging.disable(logging.WARNING)
+    single = IPFSClient(pinata_jwt="stand-in", ipfs_gateway=servers[0].gateway)
+    raced = IPFSClient(pinata_jwt="stand-in", ipfs_gateways=[server.gateway for server in servers])
+    await single.open()
+    await raced.open()
+
+    def new_cids():
+        cids = []
+        for _ in range(fetches):
+            content = os.urandom(16 * 1024)
+            cids.append([server.pin(content) for server in servers][0])
+        return cids
+
+    print(", ".join(f"{name}: {rtt * 1000:.0f} ms RTT, {p:.0%} stall {s:.0f} s" for name, rtt, p, s in GATEWAYS))
+    print(f"{fetches} fetches of distinct CIDs, concurrency {concurrency}")
+    print(f"{'mode':>22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'reqs/fetch':>13}")
+    # Warm-up, so the pool has learned each gateway's time to first byte
+    await run_mode(raced, servers, new_cids(), concurrency, "hedged (learning)")
+    await run_mode(single, servers, new_cids(), concurrency, "single gateway")
+    await run_mode(raced, servers, new_cids(), concurrency, "hedged")
+    for gateway in raced.gateways.metrics()["gateways"]:
+        print(
+            f"  {gateway['gateway']}: ttfb ewma {gateway['latency_ewma_ms']} ms, p95 {gateway['latency_p95_ms']} ms, "
+            f"wins {gateway['wins']}, errors {gateway['error_ewma']}"
+        )
+    metrics = raced.gateways.metrics()
+    print(f"  hedged {metrics['hedged']}, hedge wins {metrics['hedge_wins']}, failovers {metrics['failovers']}")
+
+    await single.close()
+    await raced.close()
+    for server in servers:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetches", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.fetches, args.concurrency, args.seed))
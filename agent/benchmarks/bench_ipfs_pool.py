@@ -0,0 +1,80 @@
+"""
+IPFSClient uploads and fetches over one pooled connection vs. a fresh connection per operation
+Runs against the local stand-in Pinata/gateway over TLS with an emulated network round trip
+
+Usage (from agent/):
+    python -m benchmarks.bench_ipfs_pool --operations 50 --rtt 0.04
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.stand_in_ipfs import StandInIPFS
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+    return statistics.median(ordered) * 1000, ordered[int(len(ordered) * 0.95)] * 1000
+
+
+async def run_mode(server, client, name, operations, file_path, reuse):
+    """Time each operation type; without reuse the pool is closed after every operation"""
+    trace = {"steps": [{"step": i, "output": "x" * 64} for i in range(20)]}
+    fetch_cid = server.pin(os.urandom(64 * 1024))
+    kinds = {
+        "upload_json": lambda i: client.upload_json({**trace, "n": i}, f"trace-{i}.json"),
+        "upload_file": lambda i: client.upload_file(file_path, {"name": f"doc-{i}"}),
+        "fetch": lambda i: client.fetch(fetch_cid),
+    }
+    for kind, operation in kinds.items():
+        latencies = []
+        connections_before = server.connections
+        for i in range(operations):
+            started = time.perf_counter()
+            await operation(i)
+            latencies.append(time.perf_counter() - started)
+            if not reuse:
+                await client.close()
+        p50, p95 = percentiles(latencies)
+        print(f"{name:>24} {kind:>12} {p50:>9.2f} {p95:>9.2f} {server.connections - connections_before:>12}")
+    await client.close()
+
+
+async def main(operations: int, rtt: float, file_size: int):
+    server = StandInIPFS(rtt=rtt)
+    url = await server.start()
+    os.environ["SSL_CERT_FILE"] = server.ca_file
+    # Every fetch goes to the gateway
+    os.environ["IPFS_CACHE_ENABLED"] = "false"
+
+    workdir = tempfile.mkdtemp(prefix="bench-ipfs-pool-")
+    file_path = Path(workdir) / "document.pdf"
+    file_path.write_bytes(os.urandom(file_size))
+
+    from app.ipfs import IPFSClient
+
+    logging.disable(logging.WARNING)
+    client = IPFSClient(pinata_jwt="stand-in", ipfs_gateway=server.gateway, pinata_api_url=url)
+    print(
+        f"Stand-in Pinata/gateway at {url}: {rtt * 1000:.0f} ms RTT, {file_size // 1024} KiB file, "
+        f"{operations} operations each, HTTP/2 {'on' if client.http2 else 'off (h2 not installed)'}"
+    )
+    print(f"{'mode':>24} {'operation':>12} {'p50 ms':>9} {'p95 ms':>9} {'connections':>12}")
+    await run_mode(server, client, "connection per operation", operations, file_path, reuse=False)
+    await run_mode(server, client, "shared pool", operations, file_path, reuse=True)
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=50)
+    parser.add_argument("--rtt", type=float, default=0.04, help="Emulated network round trip in seconds")
+    parser.add_argument("--file-size", type=int, default=256 * 1024, help="Bytes per uploaded file")
+    args = parser.parse_args()
+    asyncio.run(main(args.operations, args.rtt, args.file_size))
@@ -0,0 +1,126 @@
+"""
+Time from an upload being mined to it showing in /documents/list, polling vs log subscription
+Also drops the WebSocket mid-run to check the HTTP fallback backfills the gap
+
+Usage (from agent/):
+    python -m benchmarks.bench_log_subscription --seconds 20 --poll-interval 2.0
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from web3 import Web3
+
+from benchmarks.stand_in_chain import COMPANY_DROPBOX_ADDRESS, StandInChain
+
+UPLOADER = Web3.to_checksum_address("0x" + "ab" * 20)
+
+
+async def run_mode(chain, client, workdir, name, subscriber, seconds, upload_every, outage=None):
+    from app.database import DocumentDatabase
+    from app.indexer import DocumentIndexer
+
+    db = DocumentDatabase(os.path.join(workdir, f"documents-{name}.db"))
+    indexer = DocumentIndexer(client, db=db)
+    await indexer.catch_up()
+    indexer.start()
+    if subscriber:
+        subscriber.followers = [indexer]
+        subscriber.start()
+        while not subscriber.connected:
+            await asyncio.sleep(0.01)
+
+    uploaded = []
+    latencies = {}
+    first_block = chain.blocks[0]["number"]
+
+    async def upload():
+        while True:
+            uploaded.append(f"{name}-{len(uploaded)}.txt")
+            chain.queue_upload(UPLOADER, uploaded[-1])
+            await asyncio.sleep(upload_every)
+
+    async def watch():
+        while True:
+            now = time.monotonic()
+            for doc in await client.get_user_documents(UPLOADER):
+                if doc["filename"].startswith(f"{name}-") and doc["filename"] not in latencies:
+                    latencies[doc["filename"]] = now - chain.blocks[doc["block_number"] - first_block]["mined_at"]
+            await asyncio.sleep(0.01)
+
+    client.db = db
+    requests_before = chain.request_count
+    uploader = asyncio.create_task(upload())
+    watcher = asyncio.create_task(watch())
+    started = time.monotonic()
+    if outage:
+        await asyncio.sleep(seconds / 3)
+        await chain.drop_websockets(down_for=outage)
+        await asyncio.sleep(seconds * 2 / 3)
+    else:
+        await asyncio.sleep(seconds)
+    elapsed = time.monotonic() - started
+    requests = chain.request_count - requests_before
+
+    # Let the last uploads land before counting what is missing
+    uploader.cancel()
+    await asyncio.sleep(indexer.poll_interval + 1)
+    watcher.cancel()
+    if subscriber:
+        await subscriber.stop()
+    await indexer.stop()
+
+    missing = len([f for f in uploaded if f not in latencies])
+    latencies = sorted(latencies.values())
+    print(
+        f"{name:>22} {len(uploaded):>8} {statistics.median(latencies) * 1000:>9.0f} "
+        f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>9.0f} {latencies[-1] * 1000:>9.0f} "
+        f"{requests / elapsed:>10.1f} {missing:>8}"
+    )
+
+
+async def main(seconds: float, block_time: float, poll_interval: float, upload_every: float):
+    chain = StandInChain(block_time=block_time)
+    url = await chain.start()
+    workdir = tempfile.mkdtemp(prefix="bench-subscription-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "PINATA_JWT": "stand-in",
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "COMPANY_DROPBOX_ADDRESS": COMPANY_DROPBOX_ADDRESS,
+        "COMPANY_DROPBOX_DEPLOYMENT_BLOCK": str(chain.head["number"] + 1),
+        "DOCUMENT_INDEXER_POLL_INTERVAL": str(poll_interval),
+    })
+
+    from app.chains import SomniaClient
+    from app.subscriber import LogSubscriber
+
+    logging.disable(logging.WARNING)
+    client = SomniaClient()
+    print(f"Stand-in chain at {url}: {block_time}s blocks, an upload every {upload_every}s, {poll_interval}s poll interval")
+    print(f"{'mode':>22} {'uploads':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'RPC/s':>10} {'missing':>8}")
+
+    await run_mode(chain, client, workdir, "polling", None, seconds, upload_every)
+    await run_mode(chain, client, workdir, "subscription", LogSubscriber(chain.ws_url), seconds, upload_every)
+    await run_mode(
+        chain, client, workdir, "subscription+outage", LogSubscriber(chain.ws_url, reconnect_delay=0.5),
+        seconds, upload_every, outage=seconds / 3,
+    )
+
+    await client.close()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--block-time", type=float, default=0.25)
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--upload-every", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.block_time, args.poll_interval, args.upload_every))
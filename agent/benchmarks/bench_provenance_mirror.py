@@ -0,0 +1,112 @@
+"""
+Provenance queries answered from the local ProvenanceRecorded mirror vs. read from the chain
+Catches the mirror up over seeded history, then times the paginated endpoints against /provenance/nft/{token_id}
+
+Usage (from agent/):
+    python -m benchmarks.bench_provenance_mirror --blocks 50000 --nfts 20 --per-nft 100 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.stand_in_chain import PROVENANCE_ABI, PROVENANCE_ADDRESS, StandInChain
+
+AGENT_DIDS = [f"did:key:bench-agent-{i}" for i in range(5)]
+
+
+async def timed(http, path, repeat):
+    """Median and max latency in ms of repeat GETs, plus the last response"""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await http.get(path)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.text
+    return statistics.median(latencies), max(latencies), response.json()
+
+
+async def main(blocks: int, nfts: int, per_nft: int, latency: float, repeat: int):
+    chain = StandInChain(block_time=1.0, rpc_latency=latency)
+    url = await chain.start()
+    deployment_block = chain.head["number"] + 1
+    token_ids = list(range(1, nfts + 1))
+    seeded = chain.seed_provenance(blocks, token_ids, AGENT_DIDS, per_nft)
+
+    workdir = tempfile.mkdtemp(prefix="bench-provenance-mirror-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "PINATA_JWT": "stand-in",
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "PROVENANCE_DEPLOYMENT_BLOCK": str(deployment_block),
+    })
+
+    from app import main as api
+
+    logging.disable(logging.WARNING)
+    client = api.somnia_client
+    client.provenance = client.w3.eth.contract(address=PROVENANCE_ADDRESS, abi=PROVENANCE_ABI)
+    indexer = api.provenance_indexer
+
+    print(f"Stand-in chain at {url}: {blocks} blocks, {seeded} records over {nfts} NFTs, {latency * 1000:.0f} ms RPC latency")
+
+    requests_before = chain.request_count
+    started = time.perf_counter()
+    await indexer.catch_up()
+    elapsed = time.perf_counter() - started
+    mirrored = client.db.get_cache_stats()["provenance_records"]
+    print(
+        f"Mirror catch-up: {mirrored} records in {elapsed:.1f}s "
+        f"({chain.request_count - requests_before} RPC calls, cursor {indexer.cursor}, head {indexer.head_block})"
+    )
+    assert mirrored == seeded
+
+    token_id = token_ids[-1]
+    record = client.db.get_provenance_by_nft(token_id, 1)[0]
+    print(f"{'query':>44} {'p50 ms':>8} {'max ms':>8} {'rows':>6} {'RPC calls':>10}")
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+        for label, path in [
+            (f"chain  /provenance/nft/{token_id}", f"/provenance/nft/{token_id}"),
+            ("mirror /provenance/nft (all)", f"/provenance/nft?token_id={token_id}&limit=500"),
+            ("mirror /provenance/nft (page of 50)", f"/provenance/nft?token_id={token_id}&limit=50"),
+            ("mirror /provenance/agent (page of 50)", f"/provenance/agent?did={AGENT_DIDS[0]}&limit=50"),
+            ("mirror /provenance/root/{execution_root}", f"/provenance/root/{record['execution_root']}"),
+        ]:
+            requests_before = chain.request_count
+            p50, worst, body = await timed(http, path, repeat)
+            rows = len(body) if isinstance(body, list) else len(body["records"]) if "records" in body else 1
+            print(f"{label:>44} {p50:>8.1f} {worst:>8.1f} {rows:>6} {(chain.request_count - requests_before) / repeat:>10.1f}")
+
+        # Walking every page must return each record of the NFT exactly once
+        walked, before = [], None
+        while True:
+            query = f"/provenance/nft?token_id={token_id}&limit=30" + (f"&before={before}" if before is not None else "")
+            page = (await http.get(query)).json()
+            walked.extend(r["record_id"] for r in page["records"])
+            before = page["next_cursor"]
+            if before is None:
+                break
+        assert sorted(walked) == sorted(chain.records_by_nft[token_id]), "pagination lost or repeated records"
+        print(f"Paged through {len(walked)} records of NFT #{token_id} in pages of 30: none missing or repeated")
+
+    await client.close()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=50000)
+    parser.add_argument("--nfts", type=int, default=20)
+    parser.add_argument("--per-nft", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.blocks, args.nfts, args.per_nft, args.latency, args.repeat))
@@ -0,0 +1,73 @@
+"""
+GET /provenance/nft/{token_id} latency vs. number of records, against the local stand-in chain
+Compares the endpoint's batched read with one getRecord round trip per record
+
+Usage (from agent/):
+    python -m benchmarks.bench_provenance_reads --sizes 10 100 500 1000 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+from benchmarks.stand_in_chain import PROVENANCE_ABI, PROVENANCE_ADDRESS, StandInChain
+
+
+async def main(sizes: List[int], latency: float):
+    chain = StandInChain(block_time=1.0, rpc_latency=latency)
+    url = await chain.start()
+
+    workdir = tempfile.mkdtemp(prefix="bench-provenance-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "PINATA_JWT": "stand-in",
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+    })
+
+    from app import main as api
+
+    logging.disable(logging.WARNING)
+    client = api.somnia_client
+    client.provenance = client.w3.eth.contract(address=PROVENANCE_ADDRESS, abi=PROVENANCE_ABI)
+
+    print(f"Stand-in chain at {url}, {latency * 1000:.0f} ms RPC latency")
+    print(f"{'records':>8} {'sequential ms':>14} {'endpoint ms':>12} {'HTTP reqs':>10} {'speedup':>8}")
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+        for token_id, size in enumerate(sizes, start=1):
+            chain.seed_records(token_id, size)
+            record_ids = await client.get_records_by_nft(token_id)
+
+            started = time.perf_counter()
+            for record_id in record_ids:
+                await client.get_record(record_id)
+            sequential = time.perf_counter() - started
+
+            http_before = chain.http_request_count
+            started = time.perf_counter()
+            response = await http.get(f"/provenance/nft/{token_id}")
+            batched = time.perf_counter() - started
+            assert response.status_code == 200 and len(response.json()) == size, response.text
+
+            print(
+                f"{size:>8} {sequential * 1000:>14.0f} {batched * 1000:>12.0f} "
+                f"{chain.http_request_count - http_before:>10} {sequential / batched:>7.1f}x"
+            )
+
+    await client.close()
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.latency))
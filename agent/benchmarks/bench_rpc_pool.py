@@ -0,0 +1,107 @@
+"""
+Read latency through the RPC pool: one endpoint with a slow tail vs. that endpoint plus a healthy one
+Also checks that reads keep working when one configured endpoint is unreachable
+
+Usage (from agent/):
+    python -m benchmarks.bench_rpc_pool --reads 2000 --concurrency 16 --slow-rate 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+
+from web3 import AsyncWeb3
+
+from app.rpc_pool import RPCPool
+from benchmarks.stand_in_chain import StandInChain
+
+
+def _serve_chain(options: Dict[str, Any], urls: "multiprocessing.Queue"):
+    async def serve():
+        chain = StandInChain(**options)
+        urls.put(await chain.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def start_chain_process(**options: Any) -> Tuple[multiprocessing.Process, str]:
+    """Run a stand-in chain in its own process so the servers do not share the client's event loop"""
+    urls = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_chain, args=(options, urls), daemon=True)
+    process.start()
+    return process, urls.get(timeout=30)
+
+
+async def drive(pool: RPCPool, reads: int, concurrency: int) -> Dict[str, Any]:
+    """Issue `reads` block reads with at most `concurrency` in flight"""
+    w3 = AsyncWeb3(pool)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            if i % 2:
+                await w3.eth.block_number
+            else:
+                await w3.eth.get_block("latest")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(reads)])
+    elapsed = time.perf_counter() - started
+    await pool.disconnect()
+
+    latencies.sort()
+    return {
+        "elapsed_s": elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "hedged": pool.hedged,
+        "hedge_wins": pool.hedge_wins,
+        "failovers": pool.failovers,
+    }
+
+
+async def main(reads: int, concurrency: int, slow_rate: float, slow_seconds: float, latency: float):
+    flaky, flaky_url = start_chain_process(
+        block_time=1.0, rpc_latency=latency, slow_request_rate=slow_rate, slow_request_seconds=slow_seconds
+    )
+    healthy, healthy_url = start_chain_process(block_time=1.0, rpc_latency=latency * 1.5)
+
+    logging.disable(logging.WARNING)
+    print(f"{reads} reads, concurrency {concurrency}; flaky endpoint stalls {slow_rate:.0%} of requests for {slow_seconds}s")
+    print(f"{'pool':<22} {'elapsed s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'hedged':>7} {'won':>5} {'failover':>9}")
+
+    scenarios = [
+        ("flaky only", [flaky_url]),
+        ("flaky + healthy", [flaky_url, healthy_url]),
+        ("unreachable + healthy", ["http://127.0.0.1:9", healthy_url]),
+    ]
+    for name, urls in scenarios:
+        result = await drive(RPCPool(urls, hedge_max_delay=0.25), reads, concurrency)
+        print(
+            f"{name:<22} {result['elapsed_s']:>10.2f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+            f"{result['p99_ms']:>8.1f} {result['max_ms']:>8.0f} {result['hedged']:>7} {result['hedge_wins']:>5} {result['failovers']:>9}"
+        )
+
+    flaky.terminate()
+    healthy.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Fraction of flaky-endpoint requests that stall")
+    parser.add_argument("--slow-seconds", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.02, help="Base per-request latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.reads, args.concurrency, args.slow_rate, args.slow_seconds, args.latency))
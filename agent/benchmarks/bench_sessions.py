@@ -0,0 +1,98 @@
+"""
+Gated requests authenticated by a session token vs. by user_address, against the local stand-in chain
+Signs in once through /auth/challenge and /auth/session, then times /auth/check and /documents/list
+
+Usage (from agent/):
+    python -m benchmarks.bench_sessions --requests 200 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from benchmarks.stand_in_chain import StandInChain
+
+ACCESS_NFT_ADDRESS = "0x" + "44" * 20
+
+
+async def main(requests: int, latency: float):
+    chain = StandInChain(block_time=1.0, rpc_latency=latency)
+    url = await chain.start()
+
+    workdir = tempfile.mkdtemp(prefix="bench-sessions-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": url,
+        "PINATA_JWT": "stand-in",
+        "ACCESS_NFT_ADDRESS": ACCESS_NFT_ADDRESS,
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+        "DOCUMENT_INDEXER_ENABLED": "false",
+        "PROVENANCE_INDEXER_ENABLED": "false",
+        "SESSION_SECRET": "bench-secret",
+    })
+
+    from app import main as api
+
+    logging.disable(logging.WARNING)
+    wallet = Account.create()
+    print(f"Stand-in chain at {url}, {latency * 1000:.0f} ms RPC latency, {requests} requests per mode")
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        requests_before = chain.request_count
+        started = time.perf_counter()
+        challenge = (await http.post("/auth/challenge", json={"address": wallet.address})).json()
+        signature = wallet.sign_message(encode_defunct(text=challenge["message"])).signature.hex()
+        session = (await http.post("/auth/session", json={"message": challenge["message"], "signature": signature})).json()
+        print(
+            f"Sign-in: {(time.perf_counter() - started) * 1000:.1f} ms, "
+            f"{chain.request_count - requests_before} RPC calls, token ID {session['token_id']}"
+        )
+        bearer = {"Authorization": f"Bearer {session['token']}"}
+
+        def uncached(path):
+            async def run():
+                # What every gated request did before the auth cache: a chain check each time
+                api.nft_authenticator.auth_cache.invalidate()
+                return await http.get(path, params={"user_address": wallet.address})
+            return run
+
+        print(f"{'mode':>36} {'p50 ms':>8} {'p95 ms':>8} {'RPC/req':>8}")
+        for label, run in [
+            ("/auth/check?user_address (chain)", uncached("/auth/check")),
+            ("/auth/check?user_address (cache)", lambda: http.get("/auth/check", params={"user_address": wallet.address})),
+            ("/auth/check (session token)", lambda: http.get("/auth/check", headers=bearer)),
+            ("/documents/list?user_address (chain)", uncached("/documents/list")),
+            ("/documents/list (session token)", lambda: http.get("/documents/list", headers=bearer)),
+        ]:
+            latencies = []
+            requests_before = chain.request_count
+            for _ in range(requests):
+                request_started = time.perf_counter()
+                response = await run()
+                latencies.append((time.perf_counter() - request_started) * 1000)
+                assert response.status_code == 200, response.text
+            latencies.sort()
+            print(
+                f"{label:>36} {statistics.median(latencies):>8.2f} "
+                f"{latencies[int(len(latencies) * 0.95)]:>8.2f} "
+                f"{(chain.request_count - requests_before) / requests:>8.2f}"
+            )
+
+    print(f"Sessions: {api.session_manager.metrics()}")
+    await chain.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
@@ -0,0 +1,100 @@
+"""
+Document uploads streamed to IPFS vs. buffered the way /documents/upload used to
+Buffered reads the whole file, hashes it, writes a temp file and reads it back before posting it;
+streamed hashes and sends it in chunks. Peak Python memory is measured with tracemalloc.
+
+Usage (from agent/):
+    python -m benchmarks.bench_streaming_upload --size 67108864 --rtt 0.04
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.stand_in_ipfs import StandInIPFS
+
+
+async def buffered_upload(client, source: Path):
+    """The previous path: three full copies and a temp file named after the upload"""
+    with open(source, "rb") as f:
+        content = f.read()
+    document_hash = hashlib.sha256(content).hexdigest()
+    temp_path = Path(tempfile.gettempdir()) / source.name
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    try:
+        with open(temp_path, "rb") as f:
+            file_content = f.read()
+        response = await client._http().post(
+            f"{client.pinata_api_url}/pinning/pinFileToIPFS",
+            headers={"Authorization": f"Bearer {client.pinata_jwt}"},
+            files={"file": (source.name, file_content)},
+            timeout=60.0,
+        )
+        response.raise_for_status()
+        return response.json()["IpfsHash"], document_hash
+    finally:
+        temp_path.unlink()
+
+
+async def streamed_upload(client, source: Path):
+    async def chunks():
+        with open(source, "rb") as f:
+            while chunk := f.read(client.upload_chunk_size):
+                yield chunk
+
+    result = await client.upload_stream(chunks(), source.name)
+    return result["cid"], result["sha256"]
+
+
+async def main(size: int, rtt: float, repeats: int):
+    server = StandInIPFS(rtt=rtt, keep_content=False)
+    url = await server.start()
+    os.environ["SSL_CERT_FILE"] = server.ca_file
+    os.environ["IPFS_CACHE_ENABLED"] = "false"
+
+    from app.ipfs import IPFSClient
+
+    logging.disable(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="bench-streaming-upload-")
+    source = Path(workdir) / "document.pdf"
+    with open(source, "wb") as f:
+        for _ in range(size // (1024 * 1024)):
+            f.write(os.urandom(1024 * 1024))
+    client = IPFSClient(pinata_jwt="stand-in", ipfs_gateway=server.gateway, pinata_api_url=url)
+    await client.open()
+
+    print(f"Stand-in Pinata at {url}: {rtt * 1000:.0f} ms RTT, {size // (1024 * 1024)} MiB document, {repeats} uploads each")
+    print(f"{'mode':>10} {'p50 ms':>9} {'peak MiB':>9}")
+    results = {}
+    for name, upload in [("buffered", buffered_upload), ("streamed", streamed_upload)]:
+        latencies = []
+        peak = 0
+        for _ in range(repeats):
+            tracemalloc.start()
+            started = time.perf_counter()
+            results[name] = await upload(client, source)
+            latencies.append(time.perf_counter() - started)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        latencies.sort()
+        print(f"{name:>10} {latencies[len(latencies) // 2] * 1000:>9.1f} {peak / 2 ** 20:>9.1f}")
+    assert results["buffered"] == results["streamed"]
+
+    await client.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=64 * 1024 * 1024, help="Document size in bytes (whole MiB)")
+    parser.add_argument("--rtt", type=float, default=0.04, help="Emulated network round trip in seconds")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.size, args.rtt, args.repeats))
@@ -0,0 +1,89 @@
+"""
+Concurrent /auth/check requests against the local stand-in chain, with and without Multicall3
+Counts the eth_calls reaching the node and the request latency
+
+Usage (from agent/):
+    python -m benchmarks.bench_view_calls --levels 1 16 64 256 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+import httpx
+from web3 import Web3
+
+from benchmarks.stand_in_chain import ACCESS_NFT_ADDRESS, StandInChain
+
+
+async def run(multicall: bool, levels: List[int], latency: float):
+    chain = StandInChain(block_time=1.0, rpc_latency=latency, multicall=multicall)
+    url = await chain.start()
+
+    from app import main as api
+    from app.multicall import MulticallAggregator
+    from app.rpc_pool import RPCPool
+
+    # Point the already-imported app at this run's chain
+    api.somnia_client.w3.provider = RPCPool([url])
+    aggregator = MulticallAggregator(api.somnia_client.w3)
+    api.somnia_client.multicall = aggregator
+    api.nft_authenticator.w3 = api.somnia_client.w3
+    api.nft_authenticator.multicall = aggregator
+    api.nft_authenticator.access_nft_contract = api.somnia_client.w3.eth.contract(
+        address=ACCESS_NFT_ADDRESS, abi=api.nft_authenticator.access_nft_abi
+    )
+
+    print(f"Multicall3 {'deployed' if multicall else 'absent'}")
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+        for level in levels:
+            users = [Web3.to_checksum_address(f"0x{i + 1:040x}") for i in range(level)]
+            calls_before, http_before = chain.call_count, chain.http_request_count
+            latencies = []
+
+            async def check(user):
+                started = time.perf_counter()
+                response = await http.get("/auth/check", params={"user_address": user})
+                assert response.status_code == 200 and response.json()["authenticated"], response.text
+                latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*[check(user) for user in users])
+            elapsed = time.perf_counter() - started
+            print(
+                f"{level:>6} {chain.call_count - calls_before:>9} {chain.http_request_count - http_before:>10} "
+                f"{statistics.median(latencies) * 1000:>8.0f} {elapsed * 1000:>10.0f}"
+            )
+
+    await api.somnia_client.w3.provider.disconnect()
+    await chain.stop()
+
+
+async def main(levels: List[int], latency: float):
+    workdir = tempfile.mkdtemp(prefix="bench-views-")
+    os.environ.update({
+        "SOMNIA_RPC_URL": "http://127.0.0.1:1",
+        "PINATA_JWT": "stand-in",
+        "ACCESS_NFT_ADDRESS": ACCESS_NFT_ADDRESS,
+        "DATABASE_PATH": os.path.join(workdir, "documents.db"),
+    })
+    logging.disable(logging.WARNING)
+
+    print(f"{latency * 1000:.0f} ms RPC latency; each /auth/check needs isAuthenticated + getUserTokenId")
+    print(f"{'checks':>6} {'eth_calls':>9} {'HTTP reqs':>10} {'p50 ms':>8} {'total ms':>10}")
+    await run(False, levels, latency)
+    await run(True, levels, latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-request RPC latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.levels, args.latency))
@@ -0,0 +1,310 @@
+"""
+In-process EVM chain for exercising SomniaClient against the real contracts
+Serves JSON-RPC over HTTP from an eth-tester/py-evm backend and deploys contracts/src, compiled with py-solc-x
+"""
+
+import ast
+import asyncio
+import functools
+import json
+import posixpath
+import re
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+from eth_abi import encode
+from eth_tester import EthereumTester, PyEVMBackend
+from eth_tester.exceptions import TransactionFailed
+from web3 import EthereumTesterProvider, Web3
+
+from benchmarks.stand_in_chain import decode_raw_transaction
+
+CONTRACTS_DIR = Path(__file__).parent.parent.parent / "contracts"
+ARTIFACTS_DIR = CONTRACTS_DIR / "artifacts" / "src"
+# @openzeppelin/contracts, from `npm install` in contracts/
+NODE_MODULES_DIR = CONTRACTS_DIR / "node_modules"
+
+# Compiler settings from contracts/hardhat.config.js
+SOLC_VERSION = "0.8.20"
+SOLC_SETTINGS = {"optimizer": {"enabled": True, "runs": 200}, "viaIR": True}
+
+IMPORT_PATTERN = re.compile(r"""^\s*import\s+(?:[^"';]*\s+from\s+)?["']([^"']+)["']""", re.MULTILINE)
+
+# The contracts the backend talks to, in deployment order
+CONTRACTS = ["AccessNFT", "AgentRegistry", "Provenance", "CompanyAccessNFT", "CompanyDropbox"]
+
+# CompanyAccessNFT.MINT_PRICE
+MINT_PRICE = Web3.to_wei(0.01, "ether")
+
+# Error(string) selector, what a node puts in the error data of a require() revert
+ERROR_SELECTOR = Web3.keccak(text="Error(string)")[:4]
+
+
+class ContractsUnavailable(Exception):
+    """The contracts can't be compiled here (no solc, or no OpenZeppelin sources)"""
+
+
+def _hardhat_artifact_path(name: str) -> Path:
+    return ARTIFACTS_DIR / f"{name}.sol" / f"{name}.json"
+
+
+def _collect_sources() -> Dict[str, Dict[str, str]]:
+    """contracts/src and everything it imports, as solc standard-JSON sources"""
+    sources: Dict[str, Dict[str, str]] = {}
+    pending = [f"src/{path.name}" for path in sorted((CONTRACTS_DIR / "src").glob("*.sol"))]
+    while pending:
+        unit = pending.pop()
+        if unit in sources:
+            continue
+        path = NODE_MODULES_DIR / unit if unit.startswith("@") else CONTRACTS_DIR / unit
+        if not path.exists():
+            raise ContractsUnavailable(f"{unit} not found; run `npm install` in contracts/")
+        content = path.read_text()
+        sources[unit] = {"content": content}
+        for imported in IMPORT_PATTERN.findall(content):
+            if imported.startswith("."):
+                imported = posixpath.normpath(posixpath.join(posixpath.dirname(unit), imported))
+            pending.append(imported)
+    return sources
+
+
+@functools.lru_cache(maxsize=None)
+def compile_contracts() -> Dict[str, Dict[str, Any]]:
+    """
+    ABI and bytecode of every contract in contracts/src, compiled with solc SOLC_VERSION
+
+    solc is installed into py-solc-x's cache on first use.
+
+    Raises:
+        ContractsUnavailable: py-solc-x, solc or the OpenZeppelin sources are missing
+    """
+    try:
+        import solcx
+    except ImportError:
+        raise ContractsUnavailable("py-solc-x not installed (pip install -r requirements.txt)")
+    sources = _collect_sources()
+    try:
+        if SOLC_VERSION not in {str(version) for version in solcx.get_installed_solc_versions()}:
+            solcx.install_solc(SOLC_VERSION)
+    except Exception as e:
+        raise ContractsUnavailable(f"Could not install solc {SOLC_VERSION}: {e}")
+    output = solcx.compile_standard(
+        {
+            "language": "Solidity",
+            "sources": sources,
+            "settings": {**SOLC_SETTINGS, "outputSelection": {"src/*": {"*": ["abi", "evm.bytecode.object"]}}},
+        },
+        solc_version=SOLC_VERSION,
+    )
+    return {
+        name: {"abi": contract["abi"], "bytecode": "0x" + contract["evm"]["bytecode"]["object"]}
+        for unit, contracts in output["contracts"].items() if unit.startswith("src/")
+        for name, contract in contracts.items()
+    }
+
+
+def load_artifact(name: str) -> Dict[str, Any]:
+    """ABI and bytecode from `npx hardhat compile` in contracts/ if present, else compiled here"""
+    path = _hardhat_artifact_path(name)
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return compile_contracts()[name]
+
+
+def require_contracts():
+    """
+    Make sure every deployed contract can be loaded
+
+    Raises:
+        ContractsUnavailable: With the reason they can't
+    """
+    if not all(_hardhat_artifact_path(name).exists() for name in CONTRACTS):
+        compile_contracts()
+
+
+def _to_rpc(value: Any) -> Any:
+    """web3-formatted result -> JSON-RPC wire format (quantities and bytes as 0x hex)"""
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, Mapping):
+        return {key: _to_rpc(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_rpc(item) for item in value]
+    return value
+
+
+def _revert_error(e: TransactionFailed) -> Dict[str, Any]:
+    """A revert as a node reports it, so web3 raises ContractLogicError (or ContractCustomError) on the client side"""
+    reason = str(e.args[0]).removeprefix("execution reverted: ") if e.args else ""
+    if reason.startswith(("b'", 'b"')):
+        # Custom errors and bare reverts arrive as the repr of the undecoded revert data
+        return {"code": 3, "message": "execution reverted", "data": "0x" + ast.literal_eval(reason).hex()}
+    return {
+        "code": 3,
+        "message": f"execution reverted: {reason}",
+        "data": "0x" + (ERROR_SELECTOR + encode(["string"], [reason])).hex(),
+    }
+
+
+class EVMChain:
+    """
+    JSON-RPC server over an eth-tester chain that executes real contract bytecode
+
+    Unlike StandInChain, which answers the handful of calls the backend makes from
+    Python dictionaries, every call and transaction here runs through py-evm, so
+    reverts, gas use and events are the contracts' own. Each transaction is mined
+    into its own block as soon as it arrives; one whose nonce is ahead of the
+    sender's waits, as in a node's mempool, until the gap is filled.
+    """
+
+    def __init__(self, rpc_latency: float = 0.0):
+        """
+        Args:
+            rpc_latency: Artificial per-request latency in seconds
+        """
+        self.rpc_latency = rpc_latency
+        self.backend = PyEVMBackend()
+        self.tester = EthereumTester(self.backend)
+        # Requests go through web3's eth-tester middleware for parameter and result formatting
+        self.w3 = Web3(EthereumTesterProvider(self.tester))
+        self.accounts: List[str] = self.w3.eth.accounts
+        self.deployer = self.accounts[0]
+        self.contracts: Dict[str, Any] = {}
+        self.deployment_block = 0
+        # sender -> {nonce: raw transaction} for transactions that arrived ahead of their turn
+        self.queued: Dict[str, Dict[int, str]] = {}
+
+        self.request_count = 0
+        self.http_request_count = 0
+        self.method_counts: Dict[str, int] = {}
+
+        self._runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+
+    def private_key(self, index: int = 0) -> str:
+        """Key of a funded test account"""
+        return self.backend.account_keys[index].to_hex()
+
+    @property
+    def addresses(self) -> Dict[str, str]:
+        return {name: contract.address for name, contract in self.contracts.items()}
+
+    # ============ Lifecycle ============
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, returns the RPC URL"""
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post("/", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{bound_port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    # ============ Deployment ============
+
+    def deploy(self, name: str, *args: Any):
+        """Deploy a contract from its hardhat artifact (or the bytecode compiled here)"""
+        artifact = load_artifact(name)
+        factory = self.w3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"])
+        tx_hash = factory.constructor(*args).transact({"from": self.deployer})
+        receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        contract = self.w3.eth.contract(address=receipt["contractAddress"], abi=artifact["abi"])
+        self.contracts[name] = contract
+        return contract
+
+    def deploy_all(self, agent_did: Optional[str] = None) -> Dict[str, str]:
+        """
+        Deploy AccessNFT, AgentRegistry, Provenance, CompanyAccessNFT and CompanyDropbox
+
+        Args:
+            agent_did: Register this DID from the deployer account, so it can record provenance
+
+        Returns:
+            Contract name -> address
+        """
+        access_nft = self.deploy("AccessNFT")
+        agent_registry = self.deploy("AgentRegistry")
+        self.deploy("Provenance", access_nft.address, agent_registry.address)
+        company_access_nft = self.deploy("CompanyAccessNFT")
+        self.deploy("CompanyDropbox", company_access_nft.address)
+        self.deployment_block = self.w3.eth.block_number
+
+        if agent_did:
+            agent_registry.functions.registerAgent(agent_did, "bench agent", "").transact({"from": self.deployer})
+        return self.addresses
+
+    def mint_access_nft(self, owner: str, document_cid: str = "") -> int:
+        """Mint a Provenance AccessNFT to owner, returns the token ID"""
+        access_nft = self.contracts["AccessNFT"]
+        token_id = access_nft.functions.mint(owner, document_cid).call({"from": self.deployer})
+        access_nft.functions.mint(owner, document_cid).transact({"from": self.deployer})
+        return token_id
+
+    def mint_company_access_nft(self, account: str) -> int:
+        """Pay for a CompanyAccessNFT from account, which authenticates it for uploads"""
+        company_access_nft = self.contracts["CompanyAccessNFT"]
+        company_access_nft.functions.mintAccessNFT("").transact({"from": account, "value": MINT_PRICE})
+        return company_access_nft.functions.getUserTokenId(account).call()
+
+    def new_account(self, funding: int = Web3.to_wei(1, "ether")) -> str:
+        """A fresh funded account without any NFT"""
+        account = self.w3.eth.account.create()
+        self.tester.add_account(Web3.to_hex(account.key))
+        self.w3.eth.send_transaction({"from": self.deployer, "to": account.address, "value": funding})
+        return account.address
+
+    # ============ JSON-RPC ============
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.http_request_count += 1
+        if self.rpc_latency:
+            await asyncio.sleep(self.rpc_latency)
+        if isinstance(payload, list):
+            body = [self._dispatch(item) for item in payload]
+        else:
+            body = self._dispatch(payload)
+        return web.Response(text=json.dumps(body), content_type="application/json")
+
+    def _dispatch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        method = payload["method"]
+        self.request_count += 1
+        self.method_counts[method] = self.method_counts.get(method, 0) + 1
+        response = {"jsonrpc": "2.0", "id": payload.get("id")}
+        try:
+            if method == "eth_sendRawTransaction":
+                response["result"] = self._send_raw_transaction(*payload["params"])
+            else:
+                response["result"] = _to_rpc(self.w3.manager.request_blocking(method, payload.get("params", [])))
+        except TransactionFailed as e:
+            response["error"] = _revert_error(e)
+        except Exception as e:
+            response["error"] = {"code": -32000, "message": str(e) or type(e).__name__}
+        return response
+
+    def _send_raw_transaction(self, raw_hex: str) -> str:
+        tx = decode_raw_transaction(bytes.fromhex(raw_hex[2:]))
+        expected = self.w3.eth.get_transaction_count(tx["from"])
+        if tx["nonce"] < expected:
+            raise ValueError(f"nonce too low: next nonce {expected}, tx nonce {tx['nonce']}")
+        queued = self.queued.setdefault(tx["from"], {})
+        queued[tx["nonce"]] = raw_hex
+        # Mine this one and any queued successors it unblocks
+        while expected in queued:
+            self.w3.eth.send_raw_transaction(queued.pop(expected))
+            expected += 1
+        return "0x" + tx["hash"].hex()
@@ -0,0 +1,759 @@
+"""
+Local stand-in for the Somnia JSON-RPC endpoint
+Mines blocks on a fixed interval so receipt waits behave like the real chain, and pushes
+eth_subscribe logs over a WebSocket at /ws
+"""
+
+import asyncio
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import rlp
+from aiohttp import web
+from eth_abi import decode, encode
+from eth_account import Account
+from web3 import Web3
+
+CHAIN_ID = 50312
+
+# Selectors of the contract functions the backend calls
+SELECTORS = {
+    "ownerOf": Web3.keccak(text="ownerOf(uint256)")[:4],
+    "tokenURI": Web3.keccak(text="tokenURI(uint256)")[:4],
+    "isActiveAgent": Web3.keccak(text="isActiveAgent(string)")[:4],
+    "isAuthenticated": Web3.keccak(text="isAuthenticated(address)")[:4],
+    "getUserTokenId": Web3.keccak(text="getUserTokenId(address)")[:4],
+    "getRecordsByNFT": Web3.keccak(text="getRecordsByNFT(uint256)")[:4],
+    "getRecord": Web3.keccak(text="getRecord(uint256)")[:4],
+    "executionRootToRecordId": Web3.keccak(text="executionRootToRecordId(bytes32)")[:4],
+    "aggregate3": Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4],
+    "recordDerivative": Web3.keccak(
+        text="recordDerivative(uint256,string,bytes32,string,bytes32,string,string,string)"
+    )[:4],
+    "uploadDocument": Web3.keccak(text="uploadDocument(string,bytes32,string,uint256)")[:4],
+}
+
+PROVENANCE_RECORDED_TOPIC = Web3.keccak(
+    text="ProvenanceRecorded(uint256,uint256,bytes32,bytes32,string,uint256)"
+)
+DOCUMENT_UPLOADED_TOPIC = Web3.keccak(
+    text="DocumentUploaded(uint256,address,uint256,string,bytes32,string)"
+)
+
+# Minimal ABI fragments for the contracts the stand-in emulates
+PROVENANCE_ABI = [
+    {
+        "inputs": [
+            {"name": "nftTokenId", "type": "uint256"},
+            {"name": "inputCID", "type": "string"},
+            {"name": "inputRoot", "type": "bytes32"},
+            {"name": "outputCID", "type": "string"},
+            {"name": "executionRoot", "type": "bytes32"},
+            {"name": "traceCID", "type": "string"},
+            {"name": "agentDID", "type": "string"},
+            {"name": "proofCID", "type": "string"},
+        ],
+        "name": "recordDerivative",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "nonpayable",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "nftTokenId", "type": "uint256"}],
+        "name": "getRecordsByNFT",
+        "outputs": [{"name": "", "type": "uint256[]"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "recordId", "type": "uint256"}],
+        "name": "getRecord",
+        "outputs": [{
+            "name": "",
+            "type": "tuple",
+            "components": [
+                {"name": "nftTokenId", "type": "uint256"},
+                {"name": "inputCID", "type": "string"},
+                {"name": "inputRoot", "type": "bytes32"},
+                {"name": "outputCID", "type": "string"},
+                {"name": "executionRoot", "type": "bytes32"},
+                {"name": "traceCID", "type": "string"},
+                {"name": "agentDIDHash", "type": "bytes32"},
+                {"name": "executor", "type": "address"},
+                {"name": "timestamp", "type": "uint256"},
+                {"name": "proofCID", "type": "string"},
+                {"name": "verified", "type": "bool"},
+            ],
+        }],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "", "type": "bytes32"}],
+        "name": "executionRootToRecordId",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "recordId", "type": "uint256"},
+            {"indexed": True, "name": "nftTokenId", "type": "uint256"},
+            {"indexed": True, "name": "agentDIDHash", "type": "bytes32"},
+            {"indexed": False, "name": "executionRoot", "type": "bytes32"},
+            {"indexed": False, "name": "outputCID", "type": "string"},
+            {"indexed": False, "name": "timestamp", "type": "uint256"},
+        ],
+        "name": "ProvenanceRecorded",
+        "type": "event",
+    },
+]
+
+ACCESS_NFT_ABI = [
+    {
+        "inputs": [{"name": "tokenId", "type": "uint256"}],
+        "name": "ownerOf",
+        "outputs": [{"name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "tokenId", "type": "uint256"}],
+        "name": "tokenURI",
+        "outputs": [{"name": "", "type": "string"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+# ABI type of the Provenance.ProvenanceRecord struct returned by getRecord
+RECORD_TYPE = "(uint256,string,bytes32,string,bytes32,string,bytes32,address,uint256,string,bool)"
+
+PROVENANCE_ADDRESS = Web3.to_checksum_address("0x" + "11" * 20)
+ACCESS_NFT_ADDRESS = Web3.to_checksum_address("0x" + "22" * 20)
+AGENT_REGISTRY_ADDRESS = Web3.to_checksum_address("0x" + "33" * 20)
+COMPANY_DROPBOX_ADDRESS = Web3.to_checksum_address("0x" + "44" * 20)
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+
+def _hex(value: int) -> str:
+    return hex(value)
+
+
+def _word(value: bytes) -> str:
+    return "0x" + value.rjust(32, b"\0").hex()
+
+
+def _log_matches(log: Dict[str, Any], log_filter: Dict[str, Any]) -> bool:
+    """Address and topic part of an eth_getLogs / eth_subscribe filter"""
+    address = log_filter.get("address")
+    addresses = {a.lower() for a in ([address] if isinstance(address, str) else address or [])}
+    if addresses and log["address"].lower() not in addresses:
+        return False
+    for position, wanted in enumerate(log_filter.get("topics") or []):
+        if wanted is None:
+            continue
+        options = wanted if isinstance(wanted, list) else [wanted]
+        if position >= len(log["topics"]) or log["topics"][position] not in options:
+            return False
+    return True
+
+
+def decode_raw_transaction(raw: bytes) -> Dict[str, Any]:
+    """Decode a signed legacy or EIP-1559 transaction into its fields"""
+    sender = Account.recover_transaction(raw)
+    if raw[0] == 2:
+        fields = rlp.decode(raw[1:])
+        nonce, gas, to, data = fields[1], fields[4], fields[5], fields[7]
+    else:
+        fields = rlp.decode(raw)
+        nonce, gas, to, data = fields[0], fields[2], fields[3], fields[5]
+    return {
+        "from": sender,
+        "nonce": int.from_bytes(nonce, "big"),
+        "gas": int.from_bytes(gas, "big"),
+        "to": Web3.to_checksum_address(to) if to else None,
+        "data": bytes(data),
+        "hash": Web3.keccak(raw),
+    }
+
+
+class StandInChain:
+    """In-process JSON-RPC server that emulates the subset of Somnia the backend uses"""
+
+    def __init__(
+        self,
+        block_time: float = 0.25,
+        rpc_latency: float = 0.0,
+        nft_owner: Optional[str] = None,
+        start_block: int = 1_000_000,
+        max_log_range: Optional[int] = None,
+        log_failure_rate: float = 0.0,
+        multicall: bool = True,
+        slow_request_rate: float = 0.0,
+        slow_request_seconds: float = 1.0,
+    ):
+        """
+        Args:
+            block_time: Seconds between mined blocks
+            rpc_latency: Artificial per-request latency in seconds
+            nft_owner: Address returned by ownerOf for every token
+            start_block: Block number of the genesis block
+            max_log_range: Reject eth_getLogs spanning more blocks than this
+            log_failure_rate: Fraction of eth_getLogs calls failing with a transient error
+            multicall: Whether Multicall3 is "deployed" at its canonical address
+            slow_request_rate: Fraction of HTTP requests stalled (a node with a bad tail)
+            slow_request_seconds: How long a stalled request takes
+        """
+        self.block_time = block_time
+        self.rpc_latency = rpc_latency
+        self.max_log_range = max_log_range
+        self.log_failure_rate = log_failure_rate
+        self.multicall = multicall
+        self.slow_request_rate = slow_request_rate
+        self.slow_request_seconds = slow_request_seconds
+        self.call_count = 0
+        self.nft_owner = nft_owner or ("0x" + "00" * 20)
+        self.gas_price = 6_000_000_000
+
+        self.blocks: List[Dict[str, Any]] = []
+        self.logs: List[Dict[str, Any]] = []
+        self.receipts: Dict[bytes, Dict[str, Any]] = {}
+        self.pending: List[Dict[str, Any]] = []
+        self.nonces: Dict[str, int] = {}
+        self.mined_nonces: Dict[str, int] = {}
+        self.records_by_nft: Dict[int, List[int]] = {}
+        self.records: List[tuple] = []
+        # Block each record was created in, so reads pinned to older blocks revert like on a node
+        self.record_blocks: List[int] = []
+        # executionRoot -> recordId + 1, as in Provenance.executionRootToRecordId
+        self.execution_roots: Dict[bytes, int] = {}
+        self.queued_uploads: List[tuple] = []
+        self.reorg_count = 0
+        # Mixed into block hashes so blocks re-mined after a reorg get new hashes
+        self._fork_salt = b""
+        self.record_count = 0
+        self.document_count = 0
+        self.request_count = 0
+        self.http_request_count = 0
+        self.method_counts: Dict[str, int] = {}
+
+        self._start_block = start_block
+        self._runner: Optional[web.AppRunner] = None
+        self._miner: Optional[asyncio.Task] = None
+        self.url: Optional[str] = None
+        self.ws_url: Optional[str] = None
+
+        # WebSocket subscriptions: id -> (outgoing queue of the socket, log filter)
+        self._subscriptions: Dict[str, tuple] = {}
+        self._sockets: Dict[web.WebSocketResponse, asyncio.Queue] = {}
+        self._websocket_down_until = 0.0
+        self.pushed_logs = 0
+
+        self.methods: Dict[str, Callable[..., Any]] = {
+            "eth_chainId": lambda: _hex(CHAIN_ID),
+            "net_version": lambda: str(CHAIN_ID),
+            "eth_blockNumber": lambda: _hex(self.head["number"]),
+            "eth_gasPrice": lambda: _hex(self.gas_price),
+            "eth_maxPriorityFeePerGas": lambda: _hex(1_000_000_000),
+            "eth_estimateGas": lambda tx, *_: _hex(200_000),
+            "eth_getTransactionCount": self._get_transaction_count,
+            "eth_getBlockByNumber": self._get_block_by_number,
+            "eth_getCode": self._get_code,
+            "eth_call": self._call,
+            "eth_sendRawTransaction": self._send_raw_transaction,
+            "eth_getTransactionReceipt": self._get_transaction_receipt,
+            "eth_getLogs": self._get_logs,
+        }
+
+    # ============ Lifecycle ============
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and mining, returns the RPC URL"""
+        self._mine_block()
+        app = web.Application()
+        app.router.add_post("/", self._handle)
+        app.router.add_get("/ws", self._handle_websocket)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{bound_port}"
+        self.ws_url = f"ws://{host}:{bound_port}/ws"
+        self._miner = asyncio.create_task(self._mine_forever())
+        return self.url
+
+    async def stop(self):
+        """Stop mining and shut down the server"""
+        if self._miner:
+            self._miner.cancel()
+        await self.drop_websockets()
+        if self._runner:
+            await self._runner.cleanup()
+
+    # ============ Block production ============
+
+    @property
+    def head(self) -> Dict[str, Any]:
+        return self.blocks[-1]
+
+    async def _mine_forever(self):
+        while True:
+            await asyncio.sleep(self.block_time)
+            self._mine_block()
+
+    def _mine_block(self):
+        first_new_log = len(self.logs)
+        number = self.blocks[-1]["number"] + 1 if self.blocks else self._start_block
+        parent_hash = self.blocks[-1]["hash"] if self.blocks else b"\0" * 32
+        block_hash = Web3.keccak(number.to_bytes(32, "big") + parent_hash + self._fork_salt)
+        timestamp = int(time.time())
+        block = {"number": number, "hash": block_hash, "parentHash": parent_hash, "timestamp": timestamp, "mined_at": time.monotonic()}
+
+        uploads, self.queued_uploads = self.queued_uploads, []
+        for log_index, (uploader, file_name) in enumerate(uploads):
+            topics, data = self._document_uploaded(uploader, f"Qm{file_name}", Web3.keccak(text=file_name), file_name)
+            self.logs.append({
+                "address": COMPANY_DROPBOX_ADDRESS,
+                "topics": ["0x" + t.hex() for t in topics],
+                "data": "0x" + data.hex(),
+                "blockNumber": _hex(number),
+                "blockHash": "0x" + block_hash.hex(),
+                "transactionHash": "0x" + Web3.keccak(text=f"upload-{self.document_count}").hex(),
+                "transactionIndex": _hex(0),
+                "logIndex": _hex(log_index),
+                "removed": False,
+            })
+
+        included, self.pending = self.pending, []
+        for index, tx in enumerate(included):
+            logs = self._execute(tx, number, block_hash, index, timestamp)
+            status = "0x1" if logs is not None else "0x0"
+            logs = logs or []
+            self.receipts[tx["hash"]] = {
+                "transactionHash": "0x" + tx["hash"].hex(),
+                "transactionIndex": _hex(index),
+                "blockHash": "0x" + block_hash.hex(),
+                "blockNumber": _hex(number),
+                "from": tx["from"],
+                "to": tx["to"],
+                "cumulativeGasUsed": _hex(150_000 * (index + 1)),
+                "gasUsed": _hex(150_000),
+                "effectiveGasPrice": _hex(self.gas_price),
+                "contractAddress": None,
+                "logs": logs,
+                "logsBloom": "0x" + "00" * 256,
+                "status": status,
+                "type": "0x0",
+            }
+            self.logs.extend(logs)
+            self.mined_nonces[tx["from"]] = max(self.mined_nonces.get(tx["from"], 0), tx["nonce"] + 1)
+        self.blocks.append(block)
+        self._push_logs(self.logs[first_new_log:])
+
+    def queue_upload(self, uploader: str, file_name: str):
+        """Emit a DocumentUploaded event in the next mined block, without a transaction"""
+        self.queued_uploads.append((uploader, file_name))
+
+    def reorg(self, depth: int) -> int:
+        """
+        Replace the newest depth blocks with a competing branch of the same length
+
+        Events in the replaced blocks disappear (their transactions are not re-included).
+        Returns the first block number that changed.
+        """
+        fork_block = self.head["number"] - depth + 1
+        del self.blocks[-depth:]
+        # Subscribers are told about dropped logs the way geth does: re-sent with removed set
+        self._push_logs([
+            {**log, "removed": True} for log in self.logs if int(log["blockNumber"], 16) >= fork_block
+        ])
+        self.logs = [log for log in self.logs if int(log["blockNumber"], 16) < fork_block]
+        self.receipts = {
+            tx_hash: receipt for tx_hash, receipt in self.receipts.items()
+            if int(receipt["blockNumber"], 16) < fork_block
+        }
+        self.reorg_count += 1
+        self._fork_salt = self.reorg_count.to_bytes(8, "big")
+        for _ in range(depth):
+            self._mine_block()
+        return fork_block
+
+    def _execute(self, tx, number, block_hash, index, timestamp) -> Optional[List[Dict[str, Any]]]:
+        """Apply the state change of a mined transaction and return its logs (None if it reverted)"""
+        selector, args = tx["data"][:4], tx["data"][4:]
+
+        def make_log(address, topics, data):
+            return {
+                "address": address,
+                "topics": ["0x" + t.hex() for t in topics],
+                "data": "0x" + data.hex(),
+                "blockNumber": _hex(number),
+                "blockHash": "0x" + block_hash.hex(),
+                "transactionHash": "0x" + tx["hash"].hex(),
+                "transactionIndex": _hex(index),
+                "logIndex": _hex(0),
+                "removed": False,
+            }
+
+        if selector == SELECTORS["recordDerivative"]:
+            token_id, input_cid, input_root, output_cid, execution_root, trace_cid, agent_did, proof_cid = decode(
+                ["uint256", "string", "bytes32", "string", "bytes32", "string", "string", "string"], args
+            )
+            if execution_root in self.execution_roots:
+                # DuplicateExecution
+                return None
+            record_id = self.record_count
+            self.record_count += 1
+            self.execution_roots[execution_root] = record_id + 1
+            self.records_by_nft.setdefault(token_id, []).append(record_id)
+            self.records.append((
+                token_id, input_cid, input_root, output_cid, execution_root, trace_cid,
+                Web3.keccak(text=agent_did), tx["from"], timestamp, proof_cid, False,
+            ))
+            self.record_blocks.append(number)
+            return [make_log(
+                tx["to"],
+                [
+                    PROVENANCE_RECORDED_TOPIC,
+                    record_id.to_bytes(32, "big"),
+                    token_id.to_bytes(32, "big"),
+                    Web3.keccak(text=agent_did),
+                ],
+                encode(["bytes32", "string", "uint256"], [execution_root, output_cid, timestamp]),
+            )]
+
+        if selector == SELECTORS["uploadDocument"]:
+            ipfs_hash, document_hash, file_name, _ = decode(["string", "bytes32", "string", "uint256"], args)
+            return [make_log(tx["to"], *self._document_uploaded(tx["from"], ipfs_hash, document_hash, file_name))]
+
+        return []
+
+    def _document_uploaded(self, uploader: str, ipfs_hash: str, document_hash: bytes, file_name: str):
+        """Topics and data of the next DocumentUploaded event"""
+        self.document_count += 1
+        topics = [
+            DOCUMENT_UPLOADED_TOPIC,
+            self.document_count.to_bytes(32, "big"),
+            bytes.fromhex(uploader[2:]).rjust(32, b"\0"),
+            (1).to_bytes(32, "big"),
+        ]
+        return topics, encode(["string", "bytes32", "string"], [ipfs_hash, document_hash, file_name])
+
+    def seed_records(self, token_id: int, count: int, executor: Optional[str] = None) -> List[int]:
+        """Append count provenance records for an NFT without mining transactions"""
+        executor = executor or self.nft_owner
+        record_ids = []
+        for _ in range(count):
+            record_id = self.record_count
+            self.record_count += 1
+            root = Web3.keccak(text=f"seed-record-{record_id}")
+            self.execution_roots[bytes(root)] = record_id + 1
+            self.records.append((
+                token_id, f"QmSeedInput{record_id}", root, f"QmSeedOutput{record_id}", root,
+                f"QmSeedTrace{record_id}", Web3.keccak(text="did:key:seed"), executor,
+                int(time.time()), "", False,
+            ))
+            self.record_blocks.append(self.head["number"])
+            self.records_by_nft.setdefault(token_id, []).append(record_id)
+            record_ids.append(record_id)
+        return record_ids
+
+    def seed_documents(self, block_count: int, uploaders: List[str], per_uploader: int) -> int:
+        """
+        Append block_count historical blocks with DocumentUploaded events spread evenly
+
+        Lets indexer benchmarks start far behind the head without waiting for blocks
+        to be mined. Returns the number of documents seeded.
+        """
+        uploads = [(uploader, i) for i in range(per_uploader) for uploader in uploaders]
+        every = max(1, block_count // max(1, len(uploads)))
+        now = int(time.time())
+        seeded = 0
+
+        for offset in range(block_count):
+            number = self.head["number"] + 1
+            block_hash = Web3.keccak(number.to_bytes(32, "big") + self.head["hash"])
+            self.blocks.append({
+                "number": number,
+                "hash": block_hash,
+                "parentHash": self.head["hash"],
+                "timestamp": now - block_count + offset,
+            })
+
+            position, remainder = divmod(offset, every)
+            if remainder or position >= len(uploads):
+                continue
+            uploader, i = uploads[position]
+            topics, data = self._document_uploaded(
+                uploader, f"QmSeed{position}", Web3.keccak(text=f"seed-{position}"), f"seed-{i}.txt"
+            )
+            self.logs.append({
+                "address": COMPANY_DROPBOX_ADDRESS,
+                "topics": ["0x" + t.hex() for t in topics],
+                "data": "0x" + data.hex(),
+                "blockNumber": _hex(number),
+                "blockHash": "0x" + block_hash.hex(),
+                "transactionHash": "0x" + Web3.keccak(text=f"seed-tx-{position}").hex(),
+                "transactionIndex": _hex(0),
+                "logIndex": _hex(0),
+                "removed": False,
+            })
+            seeded += 1
+
+        return seeded
+
+    def seed_provenance(self, block_count: int, token_ids: List[int], agent_dids: List[str], per_token: int) -> int:
+        """
+        Append block_count historical blocks with ProvenanceRecorded events spread evenly
+
+        Records go round-robin over the NFTs and agents. Returns the number of records seeded.
+        """
+        total = len(token_ids) * per_token
+        every = max(1, block_count // max(1, total))
+        now = int(time.time())
+        seeded = 0
+
+        for offset in range(block_count):
+            number = self.head["number"] + 1
+            block_hash = Web3.keccak(number.to_bytes(32, "big") + self.head["hash"])
+            timestamp = now - block_count + offset
+            self.blocks.append({
+                "number": number,
+                "hash": block_hash,
+                "parentHash": self.head["hash"],
+                "timestamp": timestamp,
+            })
+
+            position, remainder = divmod(offset, every)
+            if remainder or position >= total:
+                continue
+            token_id = token_ids[position % len(token_ids)]
+            did_hash = Web3.keccak(text=agent_dids[position % len(agent_dids)])
+            record_id = self.record_count
+            self.record_count += 1
+            root = Web3.keccak(text=f"seed-execution-{record_id}")
+            self.execution_roots[bytes(root)] = record_id + 1
+            self.records.append((
+                token_id, f"QmSeedInput{record_id}", Web3.keccak(text=f"seed-input-{record_id}"),
+                f"QmSeedOutput{record_id}", root, f"QmSeedTrace{record_id}", did_hash, self.nft_owner,
+                timestamp, "", False,
+            ))
+            self.record_blocks.append(number)
+            self.records_by_nft.setdefault(token_id, []).append(record_id)
+            self.logs.append({
+                "address": PROVENANCE_ADDRESS,
+                "topics": [
+                    "0x" + PROVENANCE_RECORDED_TOPIC.hex(),
+                    _word(record_id.to_bytes(32, "big")),
+                    _word(token_id.to_bytes(32, "big")),
+                    "0x" + did_hash.hex(),
+                ],
+                "data": "0x" + encode(["bytes32", "string", "uint256"], [root, f"QmSeedOutput{record_id}", timestamp]).hex(),
+                "blockNumber": _hex(number),
+                "blockHash": "0x" + block_hash.hex(),
+                "transactionHash": "0x" + Web3.keccak(text=f"seed-record-tx-{record_id}").hex(),
+                "transactionIndex": _hex(0),
+                "logIndex": _hex(0),
+                "removed": False,
+            })
+            seeded += 1
+
+        return seeded
+
+    # ============ JSON-RPC ============
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.http_request_count += 1
+        if self.rpc_latency:
+            await asyncio.sleep(self.rpc_latency)
+        if self.slow_request_rate and random.random() < self.slow_request_rate:
+            await asyncio.sleep(self.slow_request_seconds)
+        if isinstance(payload, list):
+            body = [self._dispatch(item) for item in payload]
+        else:
+            body = self._dispatch(payload)
+        return web.Response(text=json.dumps(body), content_type="application/json")
+
+    def _dispatch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        method = payload["method"]
+        self.request_count += 1
+        self.method_counts[method] = self.method_counts.get(method, 0) + 1
+        response = {"jsonrpc": "2.0", "id": payload.get("id")}
+        handler = self.methods.get(method)
+        if handler is None:
+            response["error"] = {"code": -32601, "message": f"Method {method} not supported"}
+            return response
+        try:
+            response["result"] = handler(*payload.get("params", []))
+        except ValueError as e:
+            response["error"] = {"code": -32000, "message": str(e)}
+        return response
+
+    def _get_transaction_count(self, address: str, block: str = "latest") -> str:
+        nonces = self.nonces if block == "pending" else self.mined_nonces
+        return _hex(nonces.get(Web3.to_checksum_address(address), 0))
+
+    def _get_block_by_number(self, tag: Any, full: bool = False) -> Optional[Dict[str, Any]]:
+        if tag in ("latest", "pending", "safe", "finalized"):
+            block = self.head
+        elif tag == "earliest":
+            block = self.blocks[0]
+        else:
+            offset = int(tag, 16) - self._start_block
+            if offset < 0 or offset >= len(self.blocks):
+                return None
+            block = self.blocks[offset]
+        return {
+            "number": _hex(block["number"]),
+            "hash": "0x" + block["hash"].hex(),
+            "parentHash": "0x" + block["parentHash"].hex(),
+            "timestamp": _hex(block["timestamp"]),
+            "baseFeePerGas": _hex(self.gas_price),
+            "gasLimit": _hex(30_000_000),
+            "gasUsed": _hex(0),
+            "miner": "0x" + "00" * 20,
+            "transactions": [],
+        }
+
+    def _get_code(self, address: str, *_: Any) -> str:
+        if self.multicall and address.lower() == MULTICALL3_ADDRESS.lower():
+            return "0x6080"
+        return "0x"
+
+    def _call(self, tx: Dict[str, Any], block: str = "latest", *_: Any) -> str:
+        self.call_count += 1
+        data = bytes.fromhex(tx.get("data", tx.get("input", "0x"))[2:])
+        selector, args = data[:4], data[4:]
+        if self.multicall and selector == SELECTORS["aggregate3"]:
+            return self._aggregate3(args)
+        block_number = int(block, 16) if block.startswith("0x") else self.head["number"]
+        return self._view(selector, args, block_number)
+
+    def _aggregate3(self, args: bytes) -> str:
+        (calls,) = decode(["(address,bool,bytes)[]"], args)
+        results = []
+        for target, allow_failure, call_data in calls:
+            try:
+                results.append((True, bytes.fromhex(self._view(call_data[:4], call_data[4:])[2:])))
+            except ValueError:
+                if not allow_failure:
+                    raise ValueError("execution reverted: Multicall3: call failed")
+                results.append((False, b""))
+        return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+
+    def _view(self, selector: bytes, args: bytes, block_number: Optional[int] = None) -> str:
+        # Only getRecord honours the block tag; other views read the latest state
+        block_number = self.head["number"] if block_number is None else block_number
+        if selector == SELECTORS["ownerOf"]:
+            return _word(bytes.fromhex(self.nft_owner[2:]))
+        if selector in (SELECTORS["isActiveAgent"], SELECTORS["isAuthenticated"]):
+            return _word(b"\1")
+        if selector == SELECTORS["getUserTokenId"]:
+            return _word(b"\1")
+        if selector == SELECTORS["tokenURI"]:
+            return "0x" + encode(["string"], [""]).hex()
+        if selector == SELECTORS["getRecordsByNFT"]:
+            (token_id,) = decode(["uint256"], args)
+            return "0x" + encode(["uint256[]"], [self.records_by_nft.get(token_id, [])]).hex()
+        if selector == SELECTORS["executionRootToRecordId"]:
+            (root,) = decode(["bytes32"], args)
+            return _word(self.execution_roots.get(root, 0).to_bytes(32, "big"))
+        if selector == SELECTORS["getRecord"]:
+            (record_id,) = decode(["uint256"], args)
+            if record_id >= len(self.records) or self.record_blocks[record_id] > block_number:
+                raise ValueError("execution reverted: Invalid record ID")
+            return "0x" + encode([RECORD_TYPE], [self.records[record_id]]).hex()
+        raise ValueError("execution reverted")
+
+    def _send_raw_transaction(self, raw_hex: str) -> str:
+        tx = decode_raw_transaction(bytes.fromhex(raw_hex[2:]))
+        expected = self.nonces.get(tx["from"], 0)
+        if tx["nonce"] < expected:
+            raise ValueError(f"nonce too low: next nonce {expected}, tx nonce {tx['nonce']}")
+        self.nonces[tx["from"]] = max(expected, tx["nonce"] + 1)
+        self.pending.append(tx)
+        return "0x" + tx["hash"].hex()
+
+    def _get_transaction_receipt(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        return self.receipts.get(bytes.fromhex(tx_hash[2:]))
+
+    def _get_logs(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from_block = int(params.get("fromBlock", "0x0"), 16)
+        to_block = params.get("toBlock", "latest")
+        to_block = self.head["number"] if to_block == "latest" else int(to_block, 16)
+        if self.max_log_range and to_block - from_block + 1 > self.max_log_range:
+            raise ValueError(f"block range exceeds limit of {self.max_log_range}")
+        if random.random() < self.log_failure_rate:
+            raise ValueError("internal error: upstream unavailable")
+        return [
+            log for log in self.logs
+            if from_block <= int(log["blockNumber"], 16) <= to_block and _log_matches(log, params)
+        ]
+
+    # ============ WebSocket subscriptions ============
+
+    async def drop_websockets(self, down_for: float = 0.0):
+        """Close every WebSocket (as a node restart would) and refuse new ones for down_for seconds"""
+        self._websocket_down_until = time.monotonic() + down_for
+        for socket in list(self._sockets):
+            await socket.close()
+
+    async def _handle_websocket(self, request: web.Request) -> web.StreamResponse:
+        if time.monotonic() < self._websocket_down_until:
+            return web.Response(status=503)
+        socket = web.WebSocketResponse()
+        await socket.prepare(request)
+        outgoing: asyncio.Queue = asyncio.Queue()
+        self._sockets[socket] = outgoing
+        writer = asyncio.create_task(self._write_websocket(socket, outgoing))
+        try:
+            async for message in socket:
+                if message.type not in (web.WSMsgType.TEXT, web.WSMsgType.BINARY):
+                    continue
+                payload = json.loads(message.data)
+                method = payload.get("method")
+                if method == "eth_subscribe":
+                    self.method_counts[method] = self.method_counts.get(method, 0) + 1
+                    response = self._subscribe(outgoing, payload)
+                elif method == "eth_unsubscribe":
+                    removed = self._subscriptions.pop(payload["params"][0], None) is not None
+                    response = {"jsonrpc": "2.0", "id": payload.get("id"), "result": removed}
+                else:
+                    response = self._dispatch(payload)
+                outgoing.put_nowait(response)
+        finally:
+            writer.cancel()
+            del self._sockets[socket]
+            for subscription_id in [k for k, (queue, _) in self._subscriptions.items() if queue is outgoing]:
+                del self._subscriptions[subscription_id]
+        return socket
+
+    async def _write_websocket(self, socket: web.WebSocketResponse, outgoing: asyncio.Queue):
+        while True:
+            message = await outgoing.get()
+            await socket.send_str(json.dumps(message))
+
+    def _subscribe(self, outgoing: asyncio.Queue, payload: Dict[str, Any]) -> Dict[str, Any]:
+        kind, *rest = payload.get("params", [])
+        if kind != "logs":
+            return {"jsonrpc": "2.0", "id": payload.get("id"), "error": {"code": -32602, "message": f"{kind} not supported"}}
+        subscription_id = _hex(random.getrandbits(64))
+        self._subscriptions[subscription_id] = (outgoing, rest[0] if rest else {})
+        return {"jsonrpc": "2.0", "id": payload.get("id"), "result": subscription_id}
+
+    def _push_logs(self, logs: List[Dict[str, Any]]):
+        for subscription_id, (outgoing, log_filter) in self._subscriptions.items():
+            for log in logs:
+                if _log_matches(log, log_filter):
+                    self.pushed_logs += 1
+                    outgoing.put_nowait({
+                        "jsonrpc": "2.0",
+                        "method": "eth_subscription",
+                        "params": {"subscription": subscription_id, "result": log},
+                    })
@@ -0,0 +1,258 @@
+"""
+Local stand-in for Pinata's pinning API, an IPFS gateway and a local node's /api/v0/add
+Served over TLS with a self-signed certificate, behind a proxy that adds network latency to
+every connection setup and every packet, so connection reuse shows up as it would over the internet
+"""
+
+import asyncio
+import base64
+import datetime
+import hashlib
+import ipaddress
+import json
+import os
+import random
+import ssl
+import tempfile
+from typing import Dict, Optional, Set
+
+from aiohttp import web
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+
+def make_certificate(directory: str, host: str = "127.0.0.1"):
+    """Self-signed certificate for host, returns (certificate path, key path)"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    # A distinct subject per server, so several stand-ins' certificates can share one CA bundle
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, f"stand-in IPFS {os.urandom(4).hex()}")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address(host))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "stand-in-ipfs.pem")
+    key_path = os.path.join(directory, "stand-in-ipfs.key")
+    with open(cert_path, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+def content_id(data: bytes) -> str:
+    """CIDv1 of data as a single raw block (what `ipfs add --raw-leaves` gives content up to one chunk)"""
+    return _raw_cid(hashlib.sha256(data).digest())
+
+
+def _raw_cid(sha256_digest: bytes) -> str:
+    cid = b"\x01\x55\x12\x20" + sha256_digest
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("=")
+
+
+class StandInIPFS:
+    """
+    HTTPS server storing pinned content in memory and serving it back at /ipfs/{cid}
+
+    Clients connect to a proxy, which waits one round trip before accepting a
+    connection (the TCP handshake) and delays every chunk in either direction by
+    half a round trip, so TLS handshakes and requests cost what they would over a
+    link with that RTT. Set ca_file as SSL_CERT_FILE for httpx to trust the server.
+    """
+
+    def __init__(
+        self,
+        rtt: float = 0.0,
+        response_delay: float = 0.0,
+        keep_content: bool = True,
+        tail_probability: float = 0.0,
+        tail_delay: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            rtt: Emulated network round-trip time in seconds
+            response_delay: Server-side processing time per request in seconds
+            keep_content: Store uploaded files; without it uploads are only hashed, in constant memory
+            tail_probability: Fraction of gateway reads that stall before responding
+            tail_delay: Seconds such a read stalls
+            seed: Seed for choosing the stalled reads
+        """
+        self.rtt = rtt
+        self.response_delay = response_delay
+        self.keep_content = keep_content
+        self.tail_probability = tail_probability
+        self.tail_delay = tail_delay
+        self._random = random.Random(seed)
+        self.blobs: Dict[str, bytes] = {}
+
+        self.connections = 0
+        self.request_count = 0
+        self.bytes_received = 0
+
+        self._workdir = tempfile.mkdtemp(prefix="stand-in-ipfs-")
+        self.ca_file, self._key_file = make_certificate(self._workdir)
+        self._runner: Optional[web.AppRunner] = None
+        self._proxy: Optional[asyncio.AbstractServer] = None
+        self._links: Set[asyncio.Task] = set()
+        self._backend_port = 0
+        self.url: Optional[str] = None
+
+    @property
+    def gateway(self) -> str:
+        """Gateway URL prefix, as IPFSClient's ipfs_gateway"""
+        return f"{self.url}/ipfs/"
+
+    def pin(self, data: bytes) -> str:
+        """Store content directly, returns its CID"""
+        cid = content_id(data)
+        self.blobs[cid] = data
+        return cid
+
+    # ============ Lifecycle ============
+
+    async def start(self, host: str = "127.0.0.1") -> str:
+        """Start serving, returns the base URL (Pinata API and gateway share it)"""
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(self.ca_file, self._key_file)
+
+        app = web.Application(client_max_size=1024 * 1024 * 1024)
+        app.router.add_post("/pinning/pinFileToIPFS", self._pin_file)
+        app.router.add_post("/pinning/pinJSONToIPFS", self._pin_json)
+        app.router.add_post("/api/v0/add", self._add)
+        app.router.add_get("/ipfs/{cid}", self._get)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, 0, ssl_context=ssl_context)
+        await site.start()
+        self._backend_port = site._server.sockets[0].getsockname()[1]
+
+        self._proxy = await asyncio.start_server(self._accept, host, 0)
+        self.url = f"https://{host}:{self._proxy.sockets[0].getsockname()[1]}"
+        return self.url
+
+    async def stop(self):
+        if self._proxy:
+            self._proxy.close()
+        for link in self._links:
+            link.cancel()
+        await asyncio.gather(*self._links, return_exceptions=True)
+        if self._runner:
+            await self._runner.cleanup()
+
+    # ============ Latency proxy ============
+
+    async def _accept(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        self.connections += 1
+        link = asyncio.current_task()
+        self._links.add(link)
+        try:
+            await asyncio.sleep(self.rtt)
+            server_reader, server_writer = await asyncio.open_connection("127.0.0.1", self._backend_port)
+            await asyncio.gather(
+                self._pipe(client_reader, server_writer),
+                self._pipe(server_reader, client_writer),
+                return_exceptions=True,
+            )
+        except (OSError, asyncio.CancelledError):
+            # The streams callback logs a handler that ends cancelled, so end it normally
+            client_writer.close()
+        finally:
+            self._links.discard(link)
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Forward one direction, delivering each chunk half a round trip after it was read"""
+        loop = asyncio.get_running_loop()
+        # Bounded, so a slow receiver pushes back on the sender as a real link would
+        queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+
+        async def deliver():
+            while True:
+                due, data = await queue.get()
+                if data is None:
+                    break
+                await asyncio.sleep(max(0.0, due - loop.time()))
+                writer.write(data)
+                await writer.drain()
+
+        delivery = asyncio.create_task(deliver())
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                await queue.put((loop.time() + self.rtt / 2, data))
+        finally:
+            if not delivery.done():
+                await queue.put((0.0, None))
+            try:
+                await delivery
+            finally:
+                writer.close()
+
+    # ============ HTTP ============
+
+    async def _pin_file(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        cid, size = await self._receive_file(request)
+        if self.response_delay:
+            await asyncio.sleep(self.response_delay)
+        return web.json_response({"IpfsHash": cid, "PinSize": size})
+
+    async def _receive_file(self, request: web.Request):
+        """Read the "file" part chunk by chunk, returns its (CID, size)"""
+        digest = hashlib.sha256()
+        chunks = []
+        size = 0
+        async for part in await request.multipart():
+            if part.name != "file":
+                await part.read()
+                continue
+            while chunk := await part.read_chunk(1024 * 1024):
+                digest.update(chunk)
+                size += len(chunk)
+                if self.keep_content:
+                    chunks.append(chunk)
+        self.bytes_received += size
+        cid = _raw_cid(digest.digest())
+        if self.keep_content:
+            self.blobs[cid] = b"".join(chunks)
+        return cid, size
+
+    async def _pin_json(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        payload = await request.json()
+        data = json.dumps(payload["pinataContent"]).encode()
+        self.bytes_received += len(data)
+        if self.response_delay:
+            await asyncio.sleep(self.response_delay)
+        return web.json_response({"IpfsHash": self.pin(data), "PinSize": len(data)})
+
+    async def _add(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        cid, size = await self._receive_file(request)
+        return web.json_response({"Hash": cid, "Size": str(size)})
+
+    async def _get(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        delay = self.response_delay
+        if self._random.random() < self.tail_probability:
+            delay += self.tail_delay
+        if delay:
+            await asyncio.sleep(delay)
+        data = self.blobs.get(request.match_info["cid"])
+        if data is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=data, content_type="application/octet-stream")
@@ -0,0 +1,96 @@
+# Agent status cache - probe sharing and AgentRegistry event handling (no network)
+import asyncio
+
+import pytest
+from web3 import AsyncWeb3, Web3
+
+from app.agent_status import AgentStatus
+
+DID = "did:key:z6MkTestAgent"
+REGISTRY = "0x" + "33" * 20
+STATUS_EVENT_ABI = [
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "didHash", "type": "bytes32"},
+            {"indexed": False, "name": "timestamp", "type": "uint256"},
+        ],
+        "name": name,
+        "type": "event",
+    }
+    for name in ("AgentDeactivated", "AgentReactivated")
+] + [
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "didHash", "type": "bytes32"},
+            {"indexed": True, "name": "controller", "type": "address"},
+            {"indexed": False, "name": "did", "type": "string"},
+            {"indexed": False, "name": "name", "type": "string"},
+            {"indexed": False, "name": "metadataURI", "type": "string"},
+            {"indexed": False, "name": "timestamp", "type": "uint256"},
+        ],
+        "name": "AgentRegistered",
+        "type": "event",
+    }
+]
+
+
+class FakeClient:
+    def __init__(self, active=True):
+        self.agent_registry = AsyncWeb3().eth.contract(address=Web3.to_checksum_address(REGISTRY), abi=STATUS_EVENT_ABI)
+        self.active = active
+        self.reads = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def is_agent_active(self, did):
+        self.reads += 1
+        await self.release.wait()
+        return self.active
+
+
+def status_log(status, name, block_number, did=DID, removed=False):
+    return {
+        "address": REGISTRY,
+        "topics": [getattr(status.registry.events, name).topic, "0x" + Web3.keccak(text=did).hex()],
+        "data": "0x",
+        "blockNumber": hex(block_number),
+        "logIndex": "0x0",
+        "removed": removed,
+    }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_share_one_probe_then_come_from_memory():
+    client = FakeClient()
+    status = AgentStatus(client, DID)
+
+    assert await asyncio.gather(*[status.get() for _ in range(10)]) == [True] * 10
+    assert await status.get() is True
+    assert client.reads == 1
+
+
+@pytest.mark.asyncio
+async def test_events_update_status_and_win_over_an_inflight_probe():
+    client = FakeClient(active=True)
+    status = AgentStatus(client, DID)
+
+    client.release.clear()
+    probe = asyncio.create_task(status.probe())
+    while not client.reads:
+        await asyncio.sleep(0)
+    status.on_log(status_log(status, "AgentDeactivated", 10))
+    client.release.set()
+    await probe
+    assert status.active is False and status.source == "AgentDeactivated"
+
+    # Older or other-DID logs change nothing; a removed one asks for a probe
+    status.on_log(status_log(status, "AgentReactivated", 9))
+    status.on_log(status_log(status, "AgentReactivated", 11, did="did:key:someone-else"))
+    assert status.active is False
+    status.on_log(status_log(status, "AgentDeactivated", 10, removed=True))
+    assert status._wake.is_set()
+
+    status.on_log(status_log(status, "AgentReactivated", 12))
+    assert status.active is True and status.events_applied == 2
@@ -0,0 +1,131 @@
+# Provenance batching tests - Merkle-batched anchoring with in-memory clients
+import asyncio
+
+import pytest
+from web3 import Web3
+
+from app.anchoring import ProvenanceAnchor, BATCH_MANIFEST_TYPE, normalize_root
+from app.database import DocumentDatabase
+from app.verifiable import MerkleTree
+
+
+class RecordingSomnia:
+    """Stands in for SomniaClient.record_provenance"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def record_provenance(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"tx_hash": f"0x{len(self.calls):064x}", "record_id": len(self.calls) - 1}
+
+
+class MemoryIPFS:
+    def __init__(self):
+        self.uploads = {}
+
+    async def upload_json(self, data, filename="data.json"):
+        cid = f"QmManifest{len(self.uploads)}"
+        self.uploads[cid] = data
+        return cid
+
+
+def execution(i):
+    return {
+        "input_cid": f"QmInput{i}",
+        "input_root": Web3.keccak(text=f"input-{i}").hex(),
+        "output_cid": f"QmOutput{i}",
+        "execution_root": Web3.keccak(text=f"execution-{i}").hex(),
+        "trace_cid": f"QmTrace{i}",
+    }
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_anchored_in_one_record_with_valid_proofs():
+    somnia, ipfs = RecordingSomnia(), MemoryIPFS()
+    anchor = ProvenanceAnchor(somnia, ipfs, "did:key:test", window_seconds=60, max_batch_size=5)
+
+    handles = [await anchor.submit(nft_token_id=1, **execution(i)) for i in range(5)]
+    await asyncio.wait_for(asyncio.gather(*[h.wait() for h in handles]), timeout=1)
+
+    assert len(somnia.calls) == 1
+    call = somnia.calls[0]
+    manifest = ipfs.uploads[call["trace_cid"]]
+    assert manifest["type"] == BATCH_MANIFEST_TYPE
+    assert call["execution_root"] == MerkleTree(manifest["execution_roots"]).root
+
+    for index, handle in enumerate(handles):
+        assert handle.status == "anchored"
+        assert handle.record_id == 0
+        assert handle.leaf_index == index
+        assert MerkleTree.verify_proof(
+            manifest["execution_roots"][index], handle.proof, index, handle.leaf_count, call["execution_root"]
+        )
+
+
+@pytest.mark.asyncio
+async def test_window_flushes_partial_batches_per_nft():
+    somnia, ipfs = RecordingSomnia(), MemoryIPFS()
+    anchor = ProvenanceAnchor(somnia, ipfs, "did:key:test", window_seconds=0.05, max_batch_size=32)
+
+    first = await anchor.submit(nft_token_id=1, **execution(1))
+    second = await anchor.submit(nft_token_id=1, **execution(2))
+    other = await anchor.submit(nft_token_id=2, **execution(3))
+    await asyncio.wait_for(asyncio.gather(first.wait(), second.wait(), other.wait()), timeout=1)
+
+    assert sorted(c["nft_token_id"] for c in somnia.calls) == [1, 2]
+    assert first.record_id == second.record_id != other.record_id
+
+
+@pytest.mark.asyncio
+async def test_single_execution_is_recorded_as_plain_record():
+    somnia, ipfs = RecordingSomnia(), MemoryIPFS()
+    anchor = ProvenanceAnchor(somnia, ipfs, "did:key:test", window_seconds=0.01, max_batch_size=32)
+    data = execution(7)
+
+    handle = await anchor.submit(nft_token_id=3, **data)
+    await handle.wait(timeout=1)
+
+    assert somnia.calls[0]["execution_root"] == data["execution_root"]
+    assert somnia.calls[0]["trace_cid"] == data["trace_cid"]
+    assert ipfs.uploads == {}
+    assert handle.proof == [] and handle.leaf_count == 1
+
+
+@pytest.mark.asyncio
+async def test_resubmitting_an_execution_returns_the_same_handle():
+    anchor = ProvenanceAnchor(RecordingSomnia(), MemoryIPFS(), "did:key:test", window_seconds=0.01)
+    first = await anchor.submit(nft_token_id=1, **execution(1))
+    again = await anchor.submit(nft_token_id=1, **execution(1))
+
+    assert first is again
+    await first.wait(timeout=1)
+    assert anchor.get(execution(1)["execution_root"]) is first
+
+
+@pytest.mark.asyncio
+async def test_settled_batches_survive_a_restart(tmp_path):
+    db = DocumentDatabase(str(tmp_path / "documents.db"))
+    somnia, ipfs = RecordingSomnia(), MemoryIPFS()
+    anchor = ProvenanceAnchor(somnia, ipfs, "did:key:test", window_seconds=60, max_batch_size=2, db=db)
+    handles = [await anchor.submit(nft_token_id=1, **execution(i)) for i in range(2)]
+    await asyncio.wait_for(asyncio.gather(*[h.wait() for h in handles]), timeout=1)
+
+    # A fresh service (after a restart) has no handles in memory
+    restarted = ProvenanceAnchor(somnia, ipfs, "did:key:test", window_seconds=0.01, db=db)
+    assert restarted.get(execution(1)["execution_root"]) is None
+    found = await restarted.lookup(execution(1)["execution_root"].upper())
+    assert found.status == "anchored"
+    assert (found.record_id, found.leaf_index, found.proof) == (0, 1, handles[1].proof)
+    assert normalize_root(found.batch_root) == normalize_root(handles[1].batch_root)
+
+    again = await restarted.submit(nft_token_id=1, **execution(1))
+    assert (await again.wait(timeout=1)).record_id == 0
+    assert len(somnia.calls) == 1
+
+    stored = db.get_provenance_anchor(execution(0)["execution_root"])
+    assert stored["batch_root"] == normalize_root(somnia.calls[0]["execution_root"])
+    assert stored["manifest_cid"] == somnia.calls[0]["trace_cid"]
+    assert MerkleTree.verify_proof(
+        stored["execution_root"], stored["proof"], stored["leaf_index"], stored["leaf_count"], stored["batch_root"]
+    )
@@ -0,0 +1,83 @@
+# NFT auth decision cache - shared reads, TTL and Transfer-event invalidation (no network)
+import asyncio
+
+import pytest
+from web3 import Web3
+
+from app.auth_cache import TRANSFER_TOPIC, AuthCache
+
+ACCESS_NFT = "0x" + "44" * 20
+ALICE = "0x" + "a1" * 20
+BOB = "0x" + "b0" * 20
+
+
+class FakeChain:
+    def __init__(self, holders):
+        self.holders = holders
+        self.reads = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    def reader(self, address):
+        async def read():
+            self.reads += 1
+            await self.release.wait()
+            token_id = self.holders.get(address)
+            return token_id is not None, token_id
+        return read
+
+
+def transfer_log(sender, receiver, token_id=1):
+    def word(address):
+        return "0x" + "00" * 12 + address[2:]
+    return {
+        "address": ACCESS_NFT,
+        "topics": ["0x" + TRANSFER_TOPIC.hex(), word(sender), word(receiver), "0x" + f"{token_id:064x}"],
+        "data": "0x",
+        "blockNumber": "0x10",
+        "logIndex": "0x0",
+    }
+
+
+@pytest.mark.asyncio
+async def test_positive_decisions_are_shared_and_reused_until_a_transfer():
+    chain = FakeChain({ALICE: 7})
+    cache = AuthCache(ACCESS_NFT)
+    cache.set_live(True)
+
+    results = await asyncio.gather(*[cache.decision(ALICE, chain.reader(ALICE)) for _ in range(10)])
+    assert results == [(True, 7)] * 10 and chain.reads == 1
+    assert await cache.decision(Web3.to_checksum_address(ALICE), chain.reader(ALICE)) == (True, 7)
+    assert chain.reads == 1 and cache.hits == 1
+
+    # Negative decisions are not kept: minting takes effect on the next check
+    assert await cache.decision(BOB, chain.reader(BOB)) == (False, None)
+    chain.holders[BOB] = 8
+    assert await cache.decision(BOB, chain.reader(BOB)) == (True, 8)
+
+    # Alice sends her token away; Bob's entry goes too, as the receiver
+    del chain.holders[ALICE]
+    cache.on_log(transfer_log(ALICE, BOB))
+    assert await cache.decision(ALICE, chain.reader(ALICE)) == (False, None)
+    assert cache.metrics()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_transfer_during_a_read_keeps_the_stale_answer_out_and_entries_expire():
+    chain = FakeChain({ALICE: 7})
+    cache = AuthCache(ACCESS_NFT, poll_ttl=0.05)
+
+    chain.release.clear()
+    pending = asyncio.create_task(cache.decision(ALICE, chain.reader(ALICE)))
+    while not chain.reads:
+        await asyncio.sleep(0)
+    cache.on_log(transfer_log(ALICE, BOB))
+    chain.release.set()
+    assert await pending == (True, 7)
+    assert cache.metrics()["entries"] == 0
+
+    # Without the subscription entries only live for poll_ttl
+    await cache.decision(ALICE, chain.reader(ALICE))
+    await asyncio.sleep(0.06)
+    await cache.decision(ALICE, chain.reader(ALICE))
+    assert chain.reads == 3
@@ -0,0 +1,87 @@
+# Content-addressed IPFS cache - CID checks, shared downloads, LRU eviction and mmap hits (no network)
+import asyncio
+import base64
+import hashlib
+import mmap
+
+import pytest
+
+from app.blob_cache import BlobCache
+from app.cid import CHUNK_SIZE, verify
+from benchmarks.stand_in_ipfs import content_id
+
+
+def test_cids_are_recomputed_from_content():
+    # `echo "hello world" | ipfs add` and the empty file, both CIDv0 (dag-pb)
+    assert verify("QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o", b"hello world\n")
+    assert verify("QmbFMke1KXqnYyBBWxB74N4c5SBnJMVAiMNRcGu6x1AwQH", b"")
+    assert not verify("QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o", b"hello world")
+    # CIDv1, raw codec
+    assert verify("bafkreifzjut3te2nhyekklss27nh3k72ysco7y32koao5eei66wof36n5e", b"hello world")
+    assert not verify("bafkreifzjut3te2nhyekklss27nh3k72ysco7y32koao5eei66wof36n5e", b"hello world\n")
+    assert not verify("not-a-cid", b"")
+
+
+def test_multi_chunk_cids_follow_the_balanced_layout():
+    # Over 256 KiB, so more than one chunk: 5 chunks under the root, and 176 chunks under two levels
+    pattern = bytes(range(251))
+    one_level = (pattern * (4 * CHUNK_SIZE // 251 + 1))[:4 * CHUNK_SIZE + 1]
+    two_level = (pattern * (175 * CHUNK_SIZE // 251 + 1))[:175 * CHUNK_SIZE + 1]
+    # CIDv0 from `ipfs add --only-hash` (kubo)
+    assert verify("QmXFGdWM6dMXHxGby9dZifmvH5ws2MwYCE1paUfJSp3Kj6", one_level)
+    assert verify("QmfSNfmSo1Gg885jm8qFWAEe14nkjYc7bXgXjuvKWjVoKw", two_level)
+    assert not verify("QmXFGdWM6dMXHxGby9dZifmvH5ws2MwYCE1paUfJSp3Kj6", one_level[:-1])
+    assert not verify("QmfSNfmSo1Gg885jm8qFWAEe14nkjYc7bXgXjuvKWjVoKw", two_level[:-1])
+
+    # CIDv1 (raw leaves): root built by hand from the dag-pb and UnixFS specs, not from `ipfs add`
+    def varint(n):
+        return bytes([n]) if n < 0x80 else bytes([n & 0x7F | 0x80]) + varint(n >> 7)
+
+    chunks = [one_level[i:i + CHUNK_SIZE] for i in range(0, len(one_level), CHUNK_SIZE)]
+    unixfs = b"\x08\x02\x18" + varint(len(one_level)) + b"".join(b"\x20" + varint(len(c)) for c in chunks)
+    root = b""
+    for chunk in chunks:
+        link = b"\x0a\x24\x01\x55\x12\x20" + hashlib.sha256(chunk).digest() + b"\x12\x00\x18" + varint(len(chunk))
+        root += b"\x12" + varint(len(link)) + link
+    root += b"\x0a" + varint(len(unixfs)) + unixfs
+    cid = "b" + base64.b32encode(b"\x01\x70\x12\x20" + hashlib.sha256(root).digest()).decode().lower().rstrip("=")
+    assert verify(cid, one_level)
+    assert not verify(cid, one_level[:-1])
+
+
+@pytest.mark.asyncio
+async def test_misses_share_one_download_and_only_verified_content_is_kept(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=3000, mmap_threshold=1000)
+    small, large = b"a" * 500, b"b" * 2000
+    downloads = []
+
+    def downloader(data):
+        async def download():
+            downloads.append(data)
+            await asyncio.sleep(0.01)
+            return data
+        return download
+
+    results = await asyncio.gather(*[cache.get(content_id(small), downloader(small)) for _ in range(5)])
+    assert results == [small] * 5 and len(downloads) == 1
+    assert await cache.get(content_id(small), downloader(small)) == small
+    assert len(downloads) == 1
+
+    # Bytes that don't hash to the CID are returned but not cached
+    assert await cache.get(content_id(b"other"), downloader(small)) == small
+    assert cache.cached(content_id(b"other")) is None
+
+    assert await cache.get(content_id(large), downloader(large)) == large
+    hit = cache.cached(content_id(large))
+    assert isinstance(hit, mmap.mmap) and hit[:] == large
+
+    # Another 1000 bytes pushes out the least recently used entry (small)
+    medium = b"c" * 1000
+    assert await cache.put(content_id(medium), medium)
+    assert cache.cached(content_id(small)) is None
+    assert cache.metrics()["bytes"] == 3000
+
+    # The index is rebuilt from disk on restart
+    reopened = BlobCache(str(tmp_path), max_bytes=3000, mmap_threshold=1000)
+    assert reopened.cached(content_id(medium))[:] == medium
+    assert reopened.cached(content_id(small)) is None
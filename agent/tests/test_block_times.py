@@ -0,0 +1,88 @@
+# Block timestamp lookup - memory, SQLite and batched header reads against a fake node (no network)
+import pytest
+
+from app.block_times import BlockTimestamps
+from app.database import DocumentDatabase
+
+
+def block_time(number):
+    # Irregular block times, so interpolated values differ from the real ones
+    return 1_700_000_000 + number * 2 + number % 3
+
+
+class FakeBatch:
+    def __init__(self, node):
+        self.node = node
+        self.numbers = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def add(self, number):
+        self.numbers.append(number)
+
+    async def async_execute(self):
+        self.node.batches.append(list(self.numbers))
+        return [{"timestamp": block_time(number)} for number in self.numbers]
+
+
+class FakeW3:
+    """Just enough of AsyncWeb3 for JSON-RPC batches of eth_getBlockByNumber"""
+
+    def __init__(self):
+        self.batches = []
+        self.eth = self
+
+    def batch_requests(self):
+        return FakeBatch(self)
+
+    def get_block(self, number):
+        return number
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DocumentDatabase(str(tmp_path / "documents.db"))
+
+
+@pytest.mark.asyncio
+async def test_lookups_go_memory_then_sqlite_then_batched_headers(db):
+    w3 = FakeW3()
+    times = BlockTimestamps(w3, db, mode="exact", batch_size=3)
+
+    assert await times.get_many([5, 1, 2, 5, 3, 4, 6, 7]) == {n: block_time(n) for n in range(1, 8)}
+    # 7 distinct misses in batches of at most 3
+    assert sorted(len(batch) for batch in w3.batches) == [1, 3, 3]
+    assert sorted(n for batch in w3.batches for n in batch) == list(range(1, 8))
+
+    assert await times.get_many([1, 7]) == {1: block_time(1), 7: block_time(7)}
+    assert times.memory_hits == 2 and len(w3.batches) == 3
+
+    # A fresh instance (after a restart) reads them back from SQLite
+    restarted = BlockTimestamps(w3, db, mode="exact", batch_size=3)
+    assert await restarted.get_many([2, 3, 8]) == {2: block_time(2), 3: block_time(3), 8: block_time(8)}
+    assert restarted.db_hits == 2 and w3.batches[-1] == [8]
+
+
+@pytest.mark.asyncio
+async def test_interpolation_stays_between_fetched_bounds_and_is_not_stored(db):
+    w3 = FakeW3()
+    times = BlockTimestamps(w3, db, mode="interpolate", batch_size=100)
+
+    estimates = await times.get_many(range(100, 111))
+
+    assert w3.batches == [[100, 110]]
+    assert estimates[100] == block_time(100) and estimates[110] == block_time(110)
+    values = [estimates[n] for n in range(100, 111)]
+    assert values == sorted(values)
+    assert all(block_time(100) <= value <= block_time(110) for value in values)
+    assert times.interpolated == 9
+    assert db.get_block_timestamps(list(range(100, 111))) == {100: block_time(100), 110: block_time(110)}
+
+    # Indexers ask for exact timestamps, which fetches the estimated blocks
+    exact = await times.get_many(range(100, 111), exact=True)
+    assert exact == {n: block_time(n) for n in range(100, 111)}
+    assert sorted(w3.batches[-1]) == list(range(101, 110))
@@ -0,0 +1,243 @@
+# SomniaClient provenance reads - batched getRecord with fallbacks, and duplicate-execution checks against a stub node (no network)
+import pytest
+from web3 import AsyncWeb3, Web3
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+from app.chains import SomniaClient
+from app.multicall import MulticallAggregator
+from app.read_cache import ChainReadCache
+
+PROVENANCE = "0x1111111111111111111111111111111111111111"
+RECORD_TYPES = "(uint256,string,bytes32,string,bytes32,string,bytes32,address,uint256,string,bool)"
+PROVENANCE_ABI = [
+    {
+        "inputs": [{"name": "recordId", "type": "uint256"}],
+        "name": "getRecord",
+        "outputs": [{
+            "name": "",
+            "type": "tuple",
+            "components": [
+                {"name": "nftTokenId", "type": "uint256"},
+                {"name": "inputCID", "type": "string"},
+                {"name": "inputRoot", "type": "bytes32"},
+                {"name": "outputCID", "type": "string"},
+                {"name": "executionRoot", "type": "bytes32"},
+                {"name": "traceCID", "type": "string"},
+                {"name": "agentDIDHash", "type": "bytes32"},
+                {"name": "executor", "type": "address"},
+                {"name": "timestamp", "type": "uint256"},
+                {"name": "proofCID", "type": "string"},
+                {"name": "verified", "type": "bool"},
+            ],
+        }],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "", "type": "bytes32"}],
+        "name": "executionRootToRecordId",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+GET_RECORD = Web3.keccak(text="getRecord(uint256)")[:4]
+ROOT_TO_RECORD = Web3.keccak(text="executionRootToRecordId(bytes32)")[:4]
+HEAD = 1_000
+CONFIRMATIONS = 20
+
+
+def execution_root(record_id):
+    return Web3.keccak(text=f"execution-{record_id}")
+
+
+def revert(reason):
+    data = Web3.keccak(text="Error(string)")[:4] + Web3().codec.encode(["string"], [reason])
+    return {"code": 3, "message": f"execution reverted: {reason}", "data": "0x" + data.hex()}
+
+
+class ProvenanceNode(AsyncJSONBaseProvider):
+    """
+    A Provenance contract whose records were created at the given blocks
+
+    Batches holding any of reject_batches_with fail as a whole, like endpoints that
+    refuse JSON-RPC batches. Multicall3 is not deployed, so view calls go out singly.
+    """
+
+    def __init__(self, created_at, reject_batches_with=()):
+        super().__init__()
+        self.created_at = created_at
+        self.reject_batches_with = set(reject_batches_with)
+        self.batches = []
+        self.single_calls = []
+        self.requests = []
+
+    def _record_id(self, params):
+        data = bytes.fromhex(params[0]["data"][2:])
+        return Web3().codec.decode(["uint256"], data[4:])[0] if data[:4] == GET_RECORD else None
+
+    def _answer(self, method, params):
+        if method == "eth_blockNumber":
+            return {"result": hex(HEAD)}
+        if method == "eth_chainId":
+            return {"result": "0xc4a8"}
+        if method == "eth_getCode":
+            return {"result": "0x"}
+        assert method == "eth_call"
+        codec = Web3().codec
+        data = bytes.fromhex(params[0]["data"][2:])
+        block = params[1]
+        if data[:4] == ROOT_TO_RECORD:
+            (root,) = codec.decode(["bytes32"], data[4:])
+            stored = next((i + 1 for i in range(len(self.created_at)) if execution_root(i) == root), 0)
+            return {"result": "0x" + codec.encode(["uint256"], [stored]).hex()}
+        record_id = codec.decode(["uint256"], data[4:])[0]
+        at = HEAD if block == "latest" else int(block, 16)
+        if record_id >= len(self.created_at) or self.created_at[record_id] > at:
+            return {"error": revert("Invalid record ID")}
+        record = (
+            100 + record_id, f"QmInput{record_id}", b"\x01" * 32, f"QmOutput{record_id}", execution_root(record_id),
+            f"QmTrace{record_id}", b"\x03" * 32, "0x" + "aa" * 20, 1_700_000_000 + record_id, "", False,
+        )
+        return {"result": "0x" + codec.encode([RECORD_TYPES], [record]).hex()}
+
+    async def make_request(self, method, params):
+        self.requests.append((method, params))
+        if method == "eth_call":
+            self.single_calls.append(self._record_id(params))
+        return {"jsonrpc": "2.0", "id": 1, **self._answer(method, params)}
+
+    async def make_batch_request(self, requests):
+        ids = [self._record_id(params) for _, params in requests]
+        self.batches.append((ids, requests[0][1][1]))
+        if self.reject_batches_with & set(ids):
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch requests are not supported"}}
+        return [{"jsonrpc": "2.0", "id": index, **self._answer(method, params)} for index, (method, params) in enumerate(requests)]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """SomniaClient reading through a ProvenanceNode; set client.node before use"""
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "documents.db"))
+    monkeypatch.setenv("PROVENANCE_READ_BATCH_SIZE", "4")
+    # Throwaway key - never used to sign anything here
+    client = SomniaClient(rpc_url="http://127.0.0.1:1", private_key="0x" + "4c" * 32)
+
+    def attach(node):
+        client.node = node
+        client.w3 = AsyncWeb3(node)
+        client.provenance = client.w3.eth.contract(address=Web3.to_checksum_address(PROVENANCE), abi=PROVENANCE_ABI)
+        client.multicall = MulticallAggregator(client.w3, tick_seconds=0)
+        client.reads = ChainReadCache(client.w3, client.multicall, client.db, confirmations=CONFIRMATIONS)
+        return client
+
+    return attach
+
+
+@pytest.mark.asyncio
+async def test_get_records_keeps_order_through_batch_fallbacks(client):
+    final = HEAD - CONFIRMATIONS
+    # Record 9 is newer than the final block; batches holding record 5 are refused
+    created_at = [100 + i for i in range(9)] + [final + 5]
+    somnia = client(ProvenanceNode(created_at, reject_batches_with={5}))
+    node = somnia.node
+
+    # Record 2 is memoized up front and read from the cache afterwards
+    assert (await somnia.get_records([2]))[0]["inputCID"] == "QmInput2"
+    node.batches.clear()
+
+    wanted = [9, 3, 5, 0, 2, 8, 1, 7, 6, 4]
+    records = await somnia.get_records(wanted)
+
+    assert [r["inputCID"] for r in records] == [f"QmInput{i}" for i in wanted]
+    assert [r["executionRoot"] for r in records] == [execution_root(i).hex() for i in wanted]
+    assert [r["nftTokenId"] for r in records] == [100 + i for i in wanted]
+    # Three chunks of the nine unmemoized reads, each first tried at the final block
+    assert sorted((ids, block) for ids, block in node.batches if block != "latest") == sorted([
+        ([9, 3, 5, 0], hex(final)), ([8, 1, 7, 6], hex(final)), ([4], hex(final))
+    ])
+    # The chunk holding the young record is re-read at latest; the refused one goes out singly
+    assert ([9, 3, 5, 0], "latest") in node.batches
+    assert sorted(node.single_calls) == [0, 3, 5, 9]
+
+    # Reads at the final block are memoized, the chunk read at latest is not
+    cached = await somnia.reads.lookup(somnia.provenance, "getRecord", [(i,) for i in range(10)])
+    assert [i for i, record in enumerate(cached) if record is not None] == [1, 2, 4, 6, 7, 8]
+
+
+def mirrored(record_id, block_number):
+    """A ProvenanceRecorded mirror row for a record on the ProvenanceNode"""
+    return {
+        "record_id": record_id,
+        "nft_token_id": 100 + record_id,
+        "input_cid": f"QmInput{record_id}",
+        "input_root": "0x" + "01" * 32,
+        "output_cid": f"QmOutput{record_id}",
+        "execution_root": execution_root(record_id).to_0x_hex(),
+        "trace_cid": f"QmTrace{record_id}",
+        "agent_did_hash": "0x" + "03" * 32,
+        "executor": "0x" + "aa" * 20,
+        "timestamp": 1_700_000_000 + record_id,
+        "proof_cid": "",
+        "verified": False,
+        "tx_hash": f"0x{record_id:064x}",
+        "block_number": block_number,
+        "block_hash": f"0x{block_number:064x}",
+    }
+
+
+@pytest.mark.asyncio
+async def test_is_execution_recorded_prefers_confirmed_mirror_rows(client):
+    somnia = client(ProvenanceNode([100] * 5))
+    view_calls = lambda: somnia.node.single_calls.count(None)
+    somnia.db.index_provenance("ProvenanceRecorded", [mirrored(1, 100)], 900)
+    somnia.db.store_tentative_provenance("ProvenanceRecorded", [mirrored(3, 990)], [])
+
+    # Confirmed mirror row: no round trip
+    assert await somnia.is_execution_recorded(execution_root(1).hex()) == 1
+    assert view_calls() == 0
+
+    # Unconfirmed row (could still be reorged away): asks executionRootToRecordId
+    assert await somnia.is_execution_recorded(execution_root(3).to_0x_hex()) == 3
+    assert view_calls() == 1
+
+    # The mapping stores recordId + 1: record 0 is 1, and 0 means "not recorded"
+    assert await somnia.is_execution_recorded(execution_root(0).hex()) == 0
+    assert await somnia.is_execution_recorded(Web3.keccak(text="never recorded").hex()) is None
+    assert view_calls() == 3
+
+    # Anchored inside a batch: only the batch root is on-chain, the local anchor row answers
+    batched = Web3.keccak(text="batched execution").to_0x_hex()
+    somnia.db.store_provenance_anchors([{
+        "execution_root": batched, "nft_token_id": 101, "input_cid": "QmIn", "input_root": "0x" + "01" * 32,
+        "output_cid": "QmOut", "trace_cid": "QmTrace", "record_id": 1, "tx_hash": "0x" + "01" * 32,
+        "batch_root": execution_root(1).to_0x_hex(), "manifest_cid": "QmManifest", "leaf_index": 0,
+        "leaf_count": 2, "proof": ["0x" + "05" * 32],
+    }])
+    assert await somnia.is_execution_recorded(batched) == 1
+    assert view_calls() == 3
+
+
+@pytest.mark.asyncio
+async def test_recording_an_anchored_execution_again_sends_nothing(client):
+    somnia = client(ProvenanceNode([100] * 5))
+    somnia.db.index_provenance("ProvenanceRecorded", [mirrored(1, 100)], 900)
+
+    result = await somnia.record_provenance(
+        nft_token_id=101,
+        input_cid="QmInput1",
+        input_root="0x" + "01" * 32,
+        output_cid="QmOutput1",
+        execution_root=execution_root(1).to_0x_hex(),
+        trace_cid="QmTrace1",
+        agent_did="did:key:test",
+    )
+
+    assert result == {
+        "tx_hash": f"{1:064x}",
+        "record_id": 1,
+        "block_number": 100,
+        "gas_used": 0,
+        "already_recorded": True,
+    }
+    assert somnia.node.requests == []
@@ -0,0 +1,62 @@
+# Confirmed/tentative document tiers - finalize and reorg rollback on a scratch database
+from app.database import DocumentDatabase
+
+STREAM = "DocumentUploaded"
+USER = "0x00000000000000000000000000000000000000aa"
+
+
+def document(document_id, block_number):
+    return {
+        "user_address": USER,
+        "document_id": document_id,
+        "filename": f"doc-{document_id}.txt",
+        "ipfs_hash": f"QmDoc{document_id}",
+        "document_hash": f"0x{document_id:064x}",
+        "token_id": 1,
+        "timestamp": 1_700_000_000 + block_number,
+        "tx_hash": f"0x{document_id:064x}",
+        "block_number": block_number,
+        "block_hash": f"0x{block_number:064x}",
+    }
+
+
+def blocks(first, last):
+    return [
+        {"number": n, "block_hash": f"0x{n:064x}", "parent_hash": f"0x{n - 1:064x}"}
+        for n in range(first, last + 1)
+    ]
+
+
+def test_rollback_drops_only_reorganized_blocks(tmp_path):
+    db = DocumentDatabase(str(tmp_path / "documents.db"))
+    db.index_documents(STREAM, [], 100)
+    db.store_tentative(STREAM, [document(1, 101), document(2, 105), document(3, 108)], blocks(100, 110))
+
+    assert db.rollback_tentative(STREAM, 105) == 2
+
+    assert [doc["document_id"] for doc in db.get_user_tentative_documents(USER)] == [1]
+    assert max(db.get_indexed_blocks(STREAM)) == 104
+
+
+def test_finalize_promotes_and_keeps_anchor_hash(tmp_path):
+    db = DocumentDatabase(str(tmp_path / "documents.db"))
+    db.index_documents(STREAM, [], 100)
+    db.store_tentative(STREAM, [document(1, 101), document(2, 108)], blocks(100, 110))
+
+    assert db.finalize_tentative(STREAM, 105) == 1
+
+    assert [doc["document_id"] for doc in db.get_user_documents(USER)] == [1]
+    assert [doc["document_id"] for doc in db.get_user_tentative_documents(USER)] == [2]
+    assert db.get_indexer_cursor(STREAM) == 105
+    assert min(db.get_indexed_blocks(STREAM)) == 105
+
+
+def test_verified_range_replaces_pushed_rows(tmp_path):
+    db = DocumentDatabase(str(tmp_path / "documents.db"))
+    db.index_documents(STREAM, [], 100)
+    # Pushed over the subscription from a block that was then reorganized away
+    db.store_tentative(STREAM, [document(1, 103)], [])
+
+    db.store_tentative(STREAM, [document(2, 104)], blocks(100, 105), 101, 105)
+
+    assert [doc["document_id"] for doc in db.get_user_tentative_documents(USER)] == [2]
@@ -157,7 +157,8 @@ async def test_complete_workflow_live():
             "nft_token_id": token_id,
             "user_address": user_address,
             "prompt": "Summarize this document in exactly 3 bullet points, each starting with a dash.",
-            "model": "moonshotai/kimi-k2-0905"
+            "model": "moonshotai/kimi-k2-0905",
+            "wait_for_anchor": True
         })
         
         assert execute_response.status_code == 200
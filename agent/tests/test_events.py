@@ -0,0 +1,70 @@
+# Topic0 event decoder - agrees with web3's process_log and skips logs of other events (no network)
+from eth_abi import encode
+from hexbytes import HexBytes
+from web3 import AsyncWeb3, Web3
+from web3.datastructures import AttributeDict
+
+from app.contract_config import COMPANY_DROPBOX_ABI
+from app.events import EventDecoder
+
+DROPBOX = Web3.to_checksum_address("0x" + "44" * 20)
+OTHER = Web3.to_checksum_address("0x" + "55" * 20)
+UPLOADER = Web3.to_checksum_address("0x" + "ab" * 20)
+
+
+def dropbox(address=DROPBOX):
+    return AsyncWeb3().eth.contract(address=address, abi=COMPANY_DROPBOX_ABI)
+
+
+def upload_log(document_id, address=DROPBOX, file_name="report.pdf"):
+    return AttributeDict({
+        "address": address,
+        "topics": [
+            HexBytes(dropbox().events.DocumentUploaded.topic),
+            HexBytes(document_id.to_bytes(32, "big")),
+            HexBytes(bytes.fromhex(UPLOADER[2:]).rjust(32, b"\0")),
+            HexBytes((3).to_bytes(32, "big")),
+        ],
+        "data": HexBytes(encode(["string", "bytes32", "string"], ["QmReport", b"\x07" * 32, file_name])),
+        "blockNumber": 100 + document_id,
+        "blockHash": HexBytes(b"\x01" * 32),
+        "transactionHash": HexBytes(document_id.to_bytes(32, "big")),
+        "transactionIndex": 0,
+        "logIndex": 1,
+    })
+
+
+def verified_log(document_id):
+    return AttributeDict({
+        "address": DROPBOX,
+        "topics": [
+            HexBytes(dropbox().events.DocumentVerified.topic),
+            HexBytes(document_id.to_bytes(32, "big")),
+            HexBytes(bytes.fromhex(UPLOADER[2:]).rjust(32, b"\0")),
+        ],
+        "data": HexBytes(encode(["bool"], [True])),
+        "blockNumber": 100,
+        "blockHash": HexBytes(b"\x01" * 32),
+        "transactionHash": HexBytes(b"\x02" * 32),
+        "transactionIndex": 0,
+        "logIndex": 0,
+    })
+
+
+def test_decodes_like_process_log():
+    log = upload_log(9, file_name="naïve résumé.pdf")
+    expected = dropbox().events.DocumentUploaded().process_log(log)
+
+    decoded = EventDecoder().find([verified_log(9), log], dropbox().events.DocumentUploaded)
+
+    assert decoded["args"] == dict(expected["args"])
+    assert decoded["blockNumber"] == expected["blockNumber"]
+    assert decoded["transactionHash"] == expected["transactionHash"]
+
+
+def test_decode_many_skips_other_events_and_contracts():
+    decoder = EventDecoder()
+    decoder.register(dropbox().events.DocumentUploaded)
+    logs = [upload_log(1), verified_log(1), upload_log(2, address=OTHER), upload_log(3)]
+
+    assert [event["args"]["documentId"] for event in decoder.decode_many(logs)] == [1, 3]
@@ -0,0 +1,88 @@
+# In-process EVM harness - JSON-RPC bridge and the deployed contracts (needs eth-tester[py-evm]; no network)
+import asyncio
+
+import pytest
+
+pytest.importorskip("eth_tester")
+
+from web3 import AsyncWeb3
+from web3.exceptions import ContractCustomError
+
+from app.rpc_pool import RPCPool
+from app.transactions import NonceManager
+from benchmarks.evm_chain import ContractsUnavailable, EVMChain, require_contracts
+
+POKE_ABI = [{"inputs": [], "name": "poke", "outputs": [], "stateMutability": "nonpayable", "type": "function"}]
+
+
+def deploy_runtime(chain, runtime: str) -> str:
+    """Deploy hand-assembled runtime code (at most 32 bytes) without a compiler"""
+    size = len(runtime) // 2
+    init = "0x7f" + runtime.ljust(64, "0") + "600052" + f"60{size:02x}" + "6000f3"
+    tx_hash = chain.w3.eth.send_transaction({"from": chain.deployer, "data": init})
+    return chain.w3.eth.get_transaction_receipt(tx_hash)["contractAddress"]
+
+
+@pytest.mark.asyncio
+async def test_pipelined_sends_are_mined_in_nonce_order_and_reverts_carry_their_data():
+    chain = EVMChain()
+    url = await chain.start()
+    w3 = AsyncWeb3(RPCPool([url]))
+    try:
+        noop = deploy_runtime(chain, "00")
+        # revert(DeadBeef()) - a custom error with no arguments
+        custom_error = deploy_runtime(chain, "63deadbeef60e01b60005260046000fd")
+
+        account = w3.eth.account.from_key(chain.private_key(1))
+        nonces = NonceManager(w3, account.address)
+        transactions = [
+            {"to": noop, "value": 0, "gas": 50_000, "gasPrice": 10**9, "chainId": await w3.eth.chain_id,
+             "nonce": await nonces.allocate()}
+            for _ in range(5)
+        ]
+        signed = [account.sign_transaction(tx).raw_transaction for tx in transactions]
+        # Later nonces first: they wait until the gap before them is filled
+        hashes = await asyncio.gather(*[w3.eth.send_raw_transaction(raw) for raw in reversed(signed)])
+        receipts = [await w3.eth.get_transaction_receipt(tx_hash) for tx_hash in hashes]
+        assert all(receipt["status"] == 1 for receipt in receipts)
+        assert await w3.eth.get_transaction_count(account.address) == 5
+
+        with pytest.raises(ContractCustomError) as raised:
+            await w3.eth.contract(address=custom_error, abi=POKE_ABI).functions.poke().call()
+        assert raised.value.data == "0xdeadbeef"
+    finally:
+        await w3.provider.disconnect()
+        await chain.stop()
+
+
+@pytest.mark.asyncio
+async def test_deployed_contracts_authenticate_and_record_provenance(tmp_path, monkeypatch):
+    try:
+        require_contracts()
+    except ContractsUnavailable as e:
+        pytest.skip(str(e))
+    chain = EVMChain()
+    url = await chain.start()
+    addresses = chain.deploy_all(agent_did="did:key:z6MkTestAgent")
+    token_id = chain.mint_access_nft(chain.deployer)
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "documents.db"))
+
+    from app.chains import SomniaClient
+
+    client = SomniaClient(
+        rpc_url=url,
+        private_key=chain.private_key(0),
+        access_nft_address=addresses["AccessNFT"],
+        agent_registry_address=addresses["AgentRegistry"],
+        provenance_address=addresses["Provenance"],
+    )
+    try:
+        assert await client.is_agent_active("did:key:z6MkTestAgent")
+        result = await client.record_provenance(
+            token_id, "QmInput", "11" * 32, "QmOutput", "22" * 32, "QmTrace", "did:key:z6MkTestAgent"
+        )
+        assert (await client.get_record(result["record_id"]))["outputCID"] == "QmOutput"
+        assert await client.is_execution_recorded("22" * 32) == result["record_id"]
+    finally:
+        await client.close()
+        await chain.stop()
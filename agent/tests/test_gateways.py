@@ -0,0 +1,70 @@
+# Multi-gateway IPFS fetches against stand-in gateways - hedging, failover and health scores (no network)
+import time
+
+import httpx
+import pytest
+
+from app.gateways import GatewayPool
+from benchmarks.stand_in_ipfs import StandInIPFS
+
+
+@pytest.mark.asyncio
+async def test_a_stalled_gateway_is_raced_and_a_missing_cid_fails_over(tmp_path, monkeypatch):
+    stalled = StandInIPFS(tail_probability=1.0, tail_delay=2.0)
+    healthy = StandInIPFS()
+    await stalled.start()
+    await healthy.start()
+    bundle = tmp_path / "ca.pem"
+    bundle.write_text(open(stalled.ca_file).read() + open(healthy.ca_file).read())
+    monkeypatch.setenv("SSL_CERT_FILE", str(bundle))
+
+    pool = GatewayPool([stalled.gateway, healthy.gateway], hedge_min_delay=0.05, hedge_max_delay=0.2)
+    http = httpx.AsyncClient()
+    try:
+        cid = healthy.pin(b"document")
+        stalled.pin(b"document")
+        started = time.monotonic()
+        assert await pool.fetch(http, cid) == b"document"
+        assert time.monotonic() - started < 1
+        assert pool.hedged == 1 and pool.hedge_wins == 1
+        # The cancelled attempt still counts against the stalled gateway, which now ranks second
+        assert pool._ranked()[0].url == healthy.gateway
+
+        # Only the stalled gateway has this one: the healthy gateway's 404 fails over to it
+        pool = GatewayPool([healthy.gateway, stalled.gateway], hedge_min_delay=0.05, hedge_max_delay=0.2)
+        stalled.tail_probability = 0.0
+        other = stalled.pin(b"elsewhere")
+        assert await pool.fetch(http, other) == b"elsewhere"
+        assert pool.failovers == 1
+        metrics = pool.metrics()["gateways"]
+        assert metrics[0]["failures"] == 1 and metrics[1]["wins"] == 1
+    finally:
+        await http.aclose()
+        await stalled.stop()
+        await healthy.stop()
+
+
+@pytest.mark.asyncio
+async def test_a_failed_hedge_is_replaced_without_waiting_for_the_next_hedge(tmp_path, monkeypatch):
+    stalled, missing, healthy = StandInIPFS(tail_probability=1.0, tail_delay=2.0), StandInIPFS(), StandInIPFS()
+    servers = [stalled, missing, healthy]
+    for server in servers:
+        await server.start()
+    bundle = tmp_path / "ca.pem"
+    bundle.write_text("".join(open(server.ca_file).read() for server in servers))
+    monkeypatch.setenv("SSL_CERT_FILE", str(bundle))
+
+    pool = GatewayPool([server.gateway for server in servers], hedge_min_delay=0.3, hedge_max_delay=0.3)
+    http = httpx.AsyncClient()
+    try:
+        cid = healthy.pin(b"document")
+        stalled.pin(b"document")
+        started = time.monotonic()
+        assert await pool.fetch(http, cid) == b"document"
+        # Hedged to the second gateway after 0.3s; its 404 starts the third at once, not 0.3s later
+        assert time.monotonic() - started < 0.55
+        assert pool.hedged == 1 and pool.failovers == 1
+    finally:
+        await http.aclose()
+        for server in servers:
+            await server.stop()
@@ -0,0 +1,169 @@
+# Event indexer state machine - catch-up, a reorg of the tentative tier and promotion against a fake chain (no network)
+import pytest
+from hexbytes import HexBytes
+from web3 import Web3
+
+from app.database import DocumentDatabase
+from app.indexer import DocumentIndexer, ProvenanceIndexer
+
+UPLOADER = "0x" + "ab" * 20
+
+
+class FakeChain:
+    """
+    Blocks whose hashes depend on the fork they are on; documents are uploaded at given blocks
+
+    reorg(from_block, uploads) replaces every block from from_block with a new fork
+    and the documents uploaded in them.
+    """
+
+    def __init__(self, head, uploads):
+        self.head = head
+        self.uploads = dict(uploads)  # block -> document_id
+        self.forks = {}  # first block of a fork -> fork id
+        self.batches = []
+        self.eth = self
+
+    def _fork(self, number):
+        return max([fork for start, fork in self.forks.items() if number >= start], default=0)
+
+    def _hash(self, number):
+        return HexBytes(Web3.keccak(text=f"{self._fork(number)}-{number}"))
+
+    def reorg(self, from_block, uploads):
+        self.forks[from_block] = len(self.forks) + 1
+        self.uploads = {block: doc for block, doc in self.uploads.items() if block < from_block}
+        self.uploads.update(uploads)
+
+    @property
+    async def block_number(self):
+        return self.head
+
+    async def get_block(self, number):
+        if number > self.head:
+            return None
+        return {
+            "hash": self._hash(number),
+            "parentHash": self._hash(number - 1),
+            "timestamp": 1_700_000_000 + number,
+        }
+
+    def batch_requests(self):
+        return FakeBatch(self)
+
+    def events(self, from_block, to_block):
+        return [
+            {
+                "args": {
+                    "uploader": Web3.to_checksum_address(UPLOADER),
+                    "documentId": doc,
+                    "fileName": f"doc-{doc}.pdf",
+                    "ipfsHash": f"QmDoc{doc}",
+                    "documentHash": b"\x07" * 32,
+                    "tokenId": 1,
+                },
+                "transactionHash": HexBytes(Web3.keccak(text=f"tx-{doc}")),
+                "blockNumber": block,
+                "blockHash": self._hash(block),
+            }
+            for block, doc in sorted(self.uploads.items())
+            if from_block <= block <= min(to_block, self.head)
+        ]
+
+
+class FakeBatch:
+    def __init__(self, chain):
+        self.chain = chain
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def add(self, coroutine):
+        self.calls.append(coroutine)
+
+    async def async_execute(self):
+        return [await call for call in self.calls]
+
+
+class FakeClient:
+    def __init__(self, chain, db):
+        self.w3 = chain
+        self.db = db
+        self.company_dropbox = object()
+        self.provenance = object()
+
+
+class ChainIndexer(DocumentIndexer):
+    """DocumentIndexer reading decoded events straight from the FakeChain"""
+
+    async def _fetch_events(self, from_block, to_block):
+        return self.somnia_client.w3.events(from_block, to_block)
+
+
+def indexed(db):
+    final = sorted(doc["document_id"] for doc in db.get_user_documents(UPLOADER))
+    tentative = sorted(doc["document_id"] for doc in db.get_user_tentative_documents(UPLOADER))
+    return final, tentative
+
+
+@pytest.mark.asyncio
+async def test_catch_up_reorg_and_promotion(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMPANY_DROPBOX_DEPLOYMENT_BLOCK", "1000")
+    monkeypatch.setenv("DOCUMENT_INDEXER_CONFIRMATIONS", "5")
+    db = DocumentDatabase(str(tmp_path / "documents.db"))
+    chain = FakeChain(head=1050, uploads={1002: 1, 1020: 2, 1047: 3, 1049: 4})
+    indexer = ChainIndexer(FakeClient(chain, db), batch_size=10, concurrency=3)
+    assert indexer.cursor == 999
+
+    # Catch-up: blocks through head - confirmations are final, the rest tentative
+    await indexer.sync_once()
+    assert indexed(db) == ([1, 2], [3, 4])
+    assert (indexer.cursor, indexer.tentative_through) == (1045, 1050)
+    assert indexer.fetcher.requests > 1
+    stored = db.get_user_documents(UPLOADER)[0]
+    assert stored["timestamp"] == 1_700_000_000 + stored["block_number"]
+
+    # Blocks from 1048 are replaced: upload 4 is gone, upload 5 took its place
+    chain.reorg(1048, {1048: 5})
+    chain.head = 1052
+    await indexer.sync_once()
+    assert indexer.reorgs == 1
+    assert indexed(db) == ([1, 2], [3])
+    assert indexer.tentative_through == 1047
+
+    # Block 1047 is now deep enough to promote; the new 1048 upload is picked up
+    await indexer.sync_once()
+    assert indexed(db) == ([1, 2, 3], [5])
+    assert (indexer.cursor, indexer.tentative_through) == (1047, 1052)
+
+    # The replacement upload is promoted once it is deep enough, the orphaned one never is
+    chain.head = 1060
+    await indexer.sync_once()
+    assert indexed(db) == ([1, 2, 3, 5], [])
+    assert (indexer.cursor, indexer.tentative_through) == (1055, 1060)
+
+    # The properties are served from memory, without SQLite
+    monkeypatch.setattr(db, "get_indexer_cursor", lambda name: pytest.fail("cursor read on the loop"))
+    monkeypatch.setattr(db, "get_indexed_blocks", lambda name: pytest.fail("blocks read on the loop"))
+    assert indexer.metrics()["cursor_block"] == 1055 and indexer.lag_blocks == 5
+
+
+@pytest.mark.asyncio
+async def test_provenance_indexer_requires_its_deployment_block(tmp_path, monkeypatch):
+    monkeypatch.delenv("COMPANY_DROPBOX_DEPLOYMENT_BLOCK", raising=False)
+    monkeypatch.delenv("PROVENANCE_DEPLOYMENT_BLOCK", raising=False)
+    client = FakeClient(FakeChain(head=1050, uploads={}), DocumentDatabase(str(tmp_path / "documents.db")))
+
+    assert DocumentIndexer(client).deployment_block == 219187000
+    indexer = ProvenanceIndexer(client)
+    indexer.start()
+    assert indexer.deployment_block is None and indexer._task is None
+    assert indexer.subscription_filter() is None
+    assert indexer.metrics()["last_error"] == "PROVENANCE_DEPLOYMENT_BLOCK is not set"
+
+    monkeypatch.setenv("PROVENANCE_DEPLOYMENT_BLOCK", "1000")
+    assert ProvenanceIndexer(client).cursor == 999
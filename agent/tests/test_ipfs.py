@@ -0,0 +1,65 @@
+# IPFSClient against the local stand-in Pinata/gateway over TLS - connection reuse and streamed uploads (no network)
+import hashlib
+
+import pytest
+
+from app.ipfs import IPFSClient
+from benchmarks.stand_in_ipfs import StandInIPFS
+
+
+@pytest.mark.asyncio
+async def test_uploads_and_fetches_share_one_pooled_connection(tmp_path, monkeypatch):
+    server = StandInIPFS()
+    url = await server.start()
+    monkeypatch.setenv("SSL_CERT_FILE", server.ca_file)
+    # Every fetch goes to the gateway
+    monkeypatch.setenv("IPFS_CACHE_ENABLED", "false")
+    client = IPFSClient(pinata_jwt="test", ipfs_gateway=server.gateway, pinata_api_url=url)
+    document = tmp_path / "document.txt"
+    document.write_bytes(b"hello")
+    try:
+        await client.open()
+        file_cid = await client.upload_file(document, {"name": "document.txt"})
+        json_cid = await client.upload_json({"answer": 42}, "answer.json")
+        assert await client.fetch(file_cid) == b"hello"
+        assert await client.fetch_json(json_cid) == {"answer": 42}
+        assert server.connections == 1
+
+        # Closed on shutdown; a later request opens a new pool
+        await client.close()
+        assert await client.fetch(file_cid) == b"hello"
+        assert server.connections == 2
+        assert client.metrics()["clients_opened"] == 2
+    finally:
+        await client.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_streamed_upload_is_hashed_on_the_way_and_written_through_to_the_cache(tmp_path, monkeypatch):
+    from app.blob_cache import BlobCache
+
+    server = StandInIPFS()
+    url = await server.start()
+    monkeypatch.setenv("SSL_CERT_FILE", server.ca_file)
+    cache = BlobCache(str(tmp_path / "cache"))
+    client = IPFSClient(pinata_jwt="test", ipfs_gateway=server.gateway, pinata_api_url=url, cache=cache)
+    pieces = [bytes([i]) * 100_000 for i in range(10)]
+
+    async def chunks():
+        for piece in pieces:
+            yield piece
+
+    try:
+        result = await client.upload_stream(chunks(), 'report "final".pdf', {"name": "report.pdf"})
+        content = b"".join(pieces)
+        assert result["sha256"] == hashlib.sha256(content).hexdigest()
+        assert result["size"] == len(content)
+        assert server.blobs[result["cid"]] == content
+        # Served from the write-through copy, not the gateway
+        requests = server.request_count
+        assert await client.fetch(result["cid"]) == content
+        assert server.request_count == requests
+    finally:
+        await client.close()
+        await server.stop()
@@ -0,0 +1,121 @@
+# Block-range fetcher tests - ordering, splitting, retries and widening (no network)
+import asyncio
+import random
+
+import pytest
+
+from app.log_fetcher import BlockRangeFetcher, RangeFetchError
+
+
+class FakeLogs:
+    """eth_getLogs stand-in: one item per block, with configurable failures"""
+
+    def __init__(self, max_range=None, flaky=None, broken=None):
+        self.max_range = max_range
+        self.flaky = dict(flaky or {})  # block -> failures before it succeeds
+        self.broken = broken  # block that never succeeds
+        self.calls = []
+
+    async def fetch(self, from_block, to_block):
+        self.calls.append((from_block, to_block))
+        await asyncio.sleep(random.random() / 1000)
+        if self.max_range and to_block - from_block + 1 > self.max_range:
+            raise ValueError("block range exceeds limit")
+        if self.broken is not None and from_block <= self.broken <= to_block:
+            raise ValueError("internal error")
+        for block, remaining in self.flaky.items():
+            if from_block <= block <= to_block and remaining:
+                self.flaky[block] -= 1
+                raise ValueError("upstream unavailable")
+        return list(range(from_block, to_block + 1))
+
+
+async def collect(fetcher, from_block, to_block):
+    windows = []
+    async for start, end, items in fetcher.iter_ranges(from_block, to_block):
+        windows.append((start, end, items))
+    return windows
+
+
+def assert_contiguous(windows, from_block, to_block):
+    assert windows[0][0] == from_block
+    assert windows[-1][1] == to_block
+    for (_, end, _), (start, _, _) in zip(windows, windows[1:]):
+        assert start == end + 1
+
+
+@pytest.mark.asyncio
+async def test_windows_are_yielded_in_order_and_complete():
+    logs = FakeLogs()
+    fetcher = BlockRangeFetcher(logs.fetch, concurrency=8, initial_window=10, target_results=10_000)
+
+    windows = await collect(fetcher, 100, 5_099)
+
+    assert_contiguous(windows, 100, 5_099)
+    assert [item for _, _, items in windows for item in items] == list(range(100, 5_100))
+    # Sparse windows widen towards max_window
+    assert fetcher.window > 10
+
+
+@pytest.mark.asyncio
+async def test_rejected_range_is_split_and_ceiling_learned():
+    logs = FakeLogs(max_range=100)
+    fetcher = BlockRangeFetcher(logs.fetch, concurrency=4, initial_window=500, max_window=1000)
+
+    windows = await collect(fetcher, 0, 2_999)
+
+    assert_contiguous(windows, 0, 2_999)
+    assert all(end - start + 1 <= 100 for start, end, _ in windows)
+    assert fetcher.splits > 0
+    assert fetcher.max_window < 500
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried():
+    logs = FakeLogs(flaky={250: 2})
+    fetcher = BlockRangeFetcher(logs.fetch, concurrency=4, initial_window=100, retry_backoff=0)
+
+    windows = await collect(fetcher, 0, 999)
+
+    assert_contiguous(windows, 0, 999)
+    assert fetcher.retries == 2
+
+
+@pytest.mark.asyncio
+async def test_persistent_failure_stops_at_contiguous_prefix():
+    logs = FakeLogs(broken=450)
+    fetcher = BlockRangeFetcher(logs.fetch, concurrency=4, initial_window=100, max_attempts=2, retry_backoff=0)
+    windows = []
+
+    with pytest.raises(RangeFetchError) as error:
+        async for window in fetcher.iter_ranges(0, 999):
+            windows.append(window)
+
+    assert error.value.from_block <= 450 <= error.value.to_block
+    assert windows and windows[-1][1] == error.value.from_block - 1
+    assert_contiguous(windows, 0, error.value.from_block - 1)
+
+
+@pytest.mark.asyncio
+async def test_earlier_windows_still_in_flight_are_yielded_before_a_failure():
+    later_failed = asyncio.Event()
+
+    async def fetch(from_block, to_block):
+        if from_block == 0:
+            # Only answers once the later window has failed for good and the fetcher has seen it
+            await later_failed.wait()
+            for _ in range(10):
+                await asyncio.sleep(0)
+            return list(range(from_block, to_block + 1))
+        later_failed.set()
+        raise ValueError("internal error")
+
+    fetcher = BlockRangeFetcher(fetch, concurrency=2, initial_window=100, max_attempts=1, retry_backoff=0)
+    windows = []
+
+    with pytest.raises(RangeFetchError) as error:
+        async for window in fetcher.iter_ranges(0, 199):
+            windows.append(window)
+
+    assert error.value.from_block == 100
+    assert windows == [(0, 99, list(range(100)))]
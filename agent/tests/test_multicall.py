@@ -0,0 +1,132 @@
+# Multicall3 aggregation - tick batching, chunking, revert mapping and fallback against a stub node (no network)
+import asyncio
+
+import pytest
+from web3 import AsyncWeb3, Web3
+from web3.exceptions import ContractLogicError
+from web3.providers.async_base import AsyncBaseProvider
+
+from app.multicall import DEFAULT_MULTICALL3_ADDRESS, MulticallAggregator
+
+TARGET = "0x00000000000000000000000000000000000000aa"
+TARGET_ABI = [
+    {
+        "inputs": [{"name": "n", "type": "uint256"}],
+        "name": "double",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "owner",
+        "outputs": [{"name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+DOUBLE = Web3.keccak(text="double(uint256)")[:4]
+OWNER = "0x00000000000000000000000000000000000000bb"
+
+
+class StubNode(AsyncBaseProvider):
+    """Answers eth_call for TARGET, and for Multicall3.aggregate3 if deployed"""
+
+    def __init__(self, multicall_deployed=True):
+        super().__init__()
+        self.multicall_deployed = multicall_deployed
+        self.aggregates = []  # Inner call count of each aggregate3
+        self.direct = 0
+
+    def _run(self, data: bytes):
+        """(success, return data) of one call to TARGET; double() reverts above 1000"""
+        codec = Web3().codec
+        if data[:4] == DOUBLE:
+            (n,) = codec.decode(["uint256"], data[4:])
+            if n > 1000:
+                return False, Web3.keccak(text="Error(string)")[:4] + codec.encode(["string"], ["too big"])
+            return True, codec.encode(["uint256"], [n * 2])
+        return True, codec.encode(["address"], [OWNER])
+
+    async def make_request(self, method, params):
+        if method == "eth_getCode":
+            return {"jsonrpc": "2.0", "id": 1, "result": "0x6080" if self.multicall_deployed else "0x"}
+        if method == "eth_chainId":
+            return {"jsonrpc": "2.0", "id": 1, "result": "0x1"}
+        assert method == "eth_call"
+        to, data = params[0]["to"].lower(), bytes.fromhex(params[0]["data"][2:])
+        codec = Web3().codec
+        if to == DEFAULT_MULTICALL3_ADDRESS.lower():
+            assert self.multicall_deployed
+            (calls,) = codec.decode(["(address,bool,bytes)[]"], data[4:])
+            self.aggregates.append(len(calls))
+            results = [self._run(call_data) for _, _, call_data in calls]
+            return {"jsonrpc": "2.0", "id": 1, "result": "0x" + codec.encode(["(bool,bytes)[]"], [results]).hex()}
+        self.direct += 1
+        success, output = self._run(data)
+        if not success:
+            return {"jsonrpc": "2.0", "id": 1, "error": {"code": 3, "message": "execution reverted: too big", "data": "0x" + output.hex()}}
+        return {"jsonrpc": "2.0", "id": 1, "result": "0x" + output.hex()}
+
+
+def setup(**kwargs):
+    node = StubNode(kwargs.pop("multicall_deployed", True))
+    w3 = AsyncWeb3(node)
+    contract = w3.eth.contract(address=Web3.to_checksum_address(TARGET), abi=TARGET_ABI)
+    return node, contract, MulticallAggregator(w3, tick_seconds=0.01, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_calls_within_a_tick_share_one_aggregate():
+    node, contract, multicall = setup(max_calls=50)
+
+    results = await asyncio.gather(
+        *[multicall.call(contract.functions.double(n)) for n in range(10)],
+        multicall.call(contract.functions.owner()),
+    )
+
+    assert results == [n * 2 for n in range(10)] + [Web3.to_checksum_address(OWNER)]
+    assert node.aggregates == [11] and node.direct == 0
+
+
+@pytest.mark.asyncio
+async def test_large_batches_are_split_at_max_calls():
+    node, contract, multicall = setup(max_calls=4)
+
+    results = await asyncio.gather(*[multicall.call(contract.functions.double(n)) for n in range(10)])
+
+    assert results == [n * 2 for n in range(10)]
+    assert sorted(node.aggregates) == [2, 4, 4]
+    assert multicall.metrics()["aggregates"] == 3
+
+
+@pytest.mark.asyncio
+async def test_a_revert_fails_only_its_caller_with_the_direct_call_error():
+    node, contract, multicall = setup(max_calls=50)
+
+    results = await asyncio.gather(
+        *[multicall.call(contract.functions.double(n)) for n in (1, 5000, 2)],
+        return_exceptions=True,
+    )
+
+    assert results[0] == 2 and results[2] == 4
+    assert node.aggregates == [3]
+    with pytest.raises(ContractLogicError) as direct:
+        await contract.functions.double(5000).call()
+    assert isinstance(results[1], ContractLogicError)
+    assert str(results[1]) == str(direct.value) and "too big" in str(results[1])
+    assert results[1].data == direct.value.data
+
+
+@pytest.mark.asyncio
+async def test_without_multicall3_calls_go_out_individually():
+    node, contract, multicall = setup(multicall_deployed=False, max_calls=50)
+
+    results = await asyncio.gather(*[multicall.call(contract.functions.double(n)) for n in range(3)])
+
+    assert results == [0, 2, 4]
+    assert multicall.available is False
+    assert node.aggregates == [] and node.direct == 3
+    # Later calls skip the queue altogether
+    assert await multicall.call(contract.functions.double(4)) == 8
+    assert node.direct == 4 and multicall.metrics()["direct_calls"] == 4
@@ -0,0 +1,85 @@
+# Bulk NFT authentication - dedupe, cached answers and grouped reads (no network)
+import pytest
+from web3 import AsyncWeb3
+
+from app.nft_auth import NFTAuthenticator
+
+HOLDERS = {("0x" + f"{i:040x}").lower(): i for i in range(1, 301) if i % 3}
+
+
+class FakeMulticall:
+    max_calls = 20
+
+    def __init__(self):
+        self.calls = 0
+
+    async def call(self, function):
+        self.calls += 1
+        address = function.args[0].lower()
+        if function.fn_name == "isAuthenticated":
+            return address in HOLDERS
+        if address not in HOLDERS:
+            raise Exception("execution reverted: no token")
+        return HOLDERS[address]
+
+
+@pytest.mark.asyncio
+async def test_bulk_check_dedupes_answers_cached_addresses_locally_and_reads_the_rest(monkeypatch):
+    monkeypatch.setenv("ACCESS_NFT_ADDRESS", "0x" + "44" * 20)
+    multicall = FakeMulticall()
+    authenticator = NFTAuthenticator(w3=AsyncWeb3(), multicall=multicall)
+
+    addresses = ["0x" + f"{i:040x}" for i in range(1, 301)]
+    await authenticator.require_nft_authentication(addresses[0])
+    assert multicall.calls == 2
+
+    requested = addresses + [address.upper().replace("0X", "0x") for address in addresses[:50]] + ["not-an-address"]
+    results = [result async for result in authenticator.require_nft_authentication_many(requested)]
+
+    assert len(results) == 301
+    # The cached address comes back first, the invalid one is flagged, every other address is read once
+    assert results[0] == {"address": addresses[0], "authenticated": True, "token_id": 1, "message": "NFT authentication verified"}
+    assert {"address": "not-an-address", "authenticated": False, "error": "Invalid address"} in results
+    assert multicall.calls == 2 + 2 * 299
+    by_address = {result["address"]: result for result in results}
+    assert by_address[addresses[1]]["token_id"] == 2 and not by_address[addresses[299]]["authenticated"]
+
+
+class FlakyMulticall(FakeMulticall):
+    """Fails every read for the addresses in down"""
+
+    def __init__(self, down):
+        super().__init__()
+        self.down = down
+
+    async def call(self, function):
+        if function.args[0].lower() in self.down:
+            self.calls += 1
+            raise ConnectionError("aggregate3 failed")
+        return await super().call(function)
+
+
+@pytest.mark.asyncio
+async def test_bulk_check_reports_failed_reads_as_errors_not_negative_answers(monkeypatch):
+    monkeypatch.setenv("ACCESS_NFT_ADDRESS", "0x" + "44" * 20)
+    addresses = ["0x" + f"{i:040x}" for i in range(1, 41)]
+    # Group size is max_calls // 2 = 10, so the second group fails as a whole
+    multicall = FlakyMulticall(down=set(addresses[10:20]))
+    authenticator = NFTAuthenticator(w3=AsyncWeb3(), multicall=multicall)
+
+    results = {result["address"]: result async for result in authenticator.require_nft_authentication_many(addresses)}
+
+    assert len(results) == 40
+    for address in addresses[10:20]:
+        assert results[address] == {
+            "address": address, "authenticated": None, "error": "Authentication check failed: aggregate3 failed"
+        }
+    assert results[addresses[0]]["authenticated"] is True and results[addresses[2]]["authenticated"] is False
+    assert all(result["authenticated"] is not None for address, result in results.items() if address not in multicall.down)
+
+    # Failures aren't cached; once the node recovers the addresses are read again
+    multicall.down = set()
+    assert (await authenticator.require_nft_authentication(addresses[10]))["authenticated"] is True
+    # The single-address check still answers a failed read as unauthenticated
+    multicall.down = {addresses[13]}
+    assert (await authenticator.require_nft_authentication(addresses[13]))["authenticated"] is False
@@ -0,0 +1,54 @@
+# ProvenanceRecorded mirror - keyset pagination and confirmed/tentative tiers on a scratch database
+from app.database import DocumentDatabase
+
+STREAM = "ProvenanceRecorded"
+AGENT = "0x" + "ab" * 32
+
+
+def record(record_id, block_number, token_id=1):
+    return {
+        "record_id": record_id,
+        "nft_token_id": token_id,
+        "input_cid": f"QmInput{record_id}",
+        "input_root": f"0x{record_id:064x}",
+        "output_cid": f"QmOutput{record_id}",
+        "execution_root": f"0x{record_id + 1000:064X}",
+        "trace_cid": f"QmTrace{record_id}",
+        "agent_did_hash": AGENT,
+        "executor": "0x00000000000000000000000000000000000000aa",
+        "timestamp": 1_700_000_000 + block_number,
+        "proof_cid": "",
+        "verified": False,
+        "tx_hash": f"0x{record_id:064x}",
+        "block_number": block_number,
+        "block_hash": f"0x{block_number:064x}",
+    }
+
+
+def test_pages_walk_newest_first_without_gaps(tmp_path):
+    db = DocumentDatabase(str(tmp_path / "documents.db"))
+    db.index_provenance(STREAM, [record(i, 100 + i, token_id=1 + i % 2) for i in range(10)], 200)
+
+    pages, before = [], None
+    while True:
+        page = db.get_provenance_by_nft(1, 2, before)
+        if not page:
+            break
+        pages.append([r["record_id"] for r in page])
+        before = page[-1]["record_id"]
+
+    assert pages == [[8, 6], [4, 2], [0]]
+    assert len(db.get_provenance_by_agent(AGENT.upper().replace("0X", "0x"), 50)) == 10
+    assert db.get_provenance_by_root(f"{1003:064x}")["record_id"] == 3
+
+
+def test_tentative_records_are_confirmed_or_rolled_back(tmp_path):
+    db = DocumentDatabase(str(tmp_path / "documents.db"))
+    db.index_provenance(STREAM, [record(0, 90)], 100)
+    db.store_tentative_provenance(STREAM, [record(1, 102), record(2, 108)], [])
+
+    assert db.finalize_tentative_provenance(STREAM, 105) == 1
+    assert db.rollback_tentative_provenance(STREAM, 106) == 1
+
+    assert [(r["record_id"], r["confirmed"]) for r in db.get_provenance_by_nft(1)] == [(1, True), (0, True)]
+    assert db.get_indexer_cursor(STREAM) == 105
@@ -0,0 +1,96 @@
+# Chain read memoization - final-block pinning, unsettled TTL and LRU size bound on a scratch database (no network)
+import pytest
+from web3.exceptions import ContractLogicError
+
+from app.database import DocumentDatabase
+from app.read_cache import ChainReadCache
+
+PROVENANCE = "0x" + "11" * 20
+
+
+class FakeEth:
+    def __init__(self, head):
+        self.head = head
+
+    @property
+    async def block_number(self):
+        return self.head
+
+
+class FakeWeb3:
+    def __init__(self, head=1_000):
+        self.eth = FakeEth(head)
+
+
+class FakeMulticall:
+    """Latest-state reads; records[i] holds (created_at_block, verified)"""
+
+    def __init__(self, records):
+        self.records = records
+        self.calls = 0
+
+    async def call(self, function):
+        self.calls += 1
+        return function.result(None)
+
+
+class FakeGetRecord:
+    address = PROVENANCE
+    fn_name = "getRecord"
+
+    def __init__(self, chain, record_id):
+        self.chain = chain
+        self.args = (record_id,)
+        self.pinned_calls = 0
+
+    def result(self, block):
+        created, verified = self.chain.records[self.args[0]]
+        if block is not None and created > block:
+            raise ContractLogicError("execution reverted: Invalid record ID")
+        return (1, "QmInput", b"\x01" * 32, "QmOutput", b"\x02" * 32, "QmTrace", b"\x03" * 32,
+                "0x" + "aa" * 20, 1_700_000_000, "", verified)
+
+    async def call(self, block_identifier="latest"):
+        self.pinned_calls += 1
+        return self.result(block_identifier)
+
+
+def cache(tmp_path, chain, **options):
+    return ChainReadCache(FakeWeb3(), chain, DocumentDatabase(str(tmp_path / "documents.db")), confirmations=20, **options)
+
+
+@pytest.mark.asyncio
+async def test_final_records_are_read_once_and_new_ones_pass_through(tmp_path):
+    chain = FakeMulticall({0: (900, True), 1: (995, False)})
+    reads = cache(tmp_path, chain)
+
+    old = FakeGetRecord(chain, 0)
+    assert (await reads.call(old))[1] == "QmInput"
+    await reads.call(FakeGetRecord(chain, 0))
+    assert old.pinned_calls == 1 and reads.memory_hits == 1
+
+    # A fresh process finds it in SQLite, bytes intact
+    reloaded = cache(tmp_path, chain)
+    record = await reloaded.call(FakeGetRecord(chain, 0))
+    assert reloaded.db_hits == 1 and bytes(record[2]) == b"\x01" * 32
+
+    # Record 1 is newer than the final block (head 1000 - 20): served from latest, not memoized
+    await reads.call(FakeGetRecord(chain, 1))
+    await reads.call(FakeGetRecord(chain, 1))
+    assert chain.calls == 2 and (await reads.lookup(FakeGetRecord, "getRecord", [(0,), (1,)]))[1] is None
+
+
+@pytest.mark.asyncio
+async def test_unverified_records_expire_and_size_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHAIN_READ_UNSETTLED_TTL", "0")
+    chain = FakeMulticall({i: (100, i == 0) for i in range(50)})
+    reads = cache(tmp_path, chain, max_bytes=2_000)
+
+    unverified = FakeGetRecord(chain, 1)
+    await reads.call(unverified)
+    await reads.call(unverified)
+    assert unverified.pinned_calls == 2
+
+    for record_id in range(50):
+        await reads.call(FakeGetRecord(chain, record_id))
+    assert reads.evicted > 0 and reads.db.get_chain_reads_size() <= 2_000
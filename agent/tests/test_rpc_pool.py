@@ -0,0 +1,86 @@
+# RPC pool tests - hedging, failover and sticky writes over fake endpoints (no network)
+import asyncio
+
+import pytest
+
+from app.rpc_pool import RPCPool
+
+
+class FakeEndpoint:
+    """Stands in for the AsyncHTTPProvider behind one pool endpoint"""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.methods = []
+
+    async def make_request(self, method, params):
+        self.methods.append(method)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(f"{self.name} unreachable")
+        return {"jsonrpc": "2.0", "id": 0, "result": self.name}
+
+    async def make_batch_request(self, requests):
+        return [await self.make_request(method, params) for method, params in requests]
+
+    async def disconnect(self):
+        pass
+
+
+def make_pool(*fakes, **kwargs):
+    pool = RPCPool([f"http://{fake.name}.invalid" for fake in fakes], **kwargs)
+    for endpoint, fake in zip(pool.endpoints, fakes):
+        endpoint.provider = fake
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_slow_read_is_hedged_to_second_endpoint():
+    slow, fast = FakeEndpoint("slow", delay=1.0), FakeEndpoint("fast", delay=0.01)
+    pool = make_pool(slow, fast, hedge_max_delay=0.05)
+
+    response = await asyncio.wait_for(pool.make_request("eth_blockNumber", []), timeout=0.5)
+
+    assert response["result"] == "fast"
+    assert pool.hedged == 1 and pool.hedge_wins == 1
+    # The abandoned slow request still counts against the slow endpoint's score
+    assert pool.endpoints[0].score() > pool.endpoints[1].score()
+
+
+@pytest.mark.asyncio
+async def test_failed_read_fails_over_and_endpoint_cools_down():
+    broken, healthy = FakeEndpoint("broken", fail=True), FakeEndpoint("healthy")
+    pool = make_pool(broken, healthy, failures_before_cooldown=1)
+
+    for _ in range(3):
+        response = await pool.make_request("eth_getBalance", ["0xabc", "latest"])
+        assert response["result"] == "healthy"
+
+    assert pool.endpoints[0].is_down
+    assert len(broken.methods) == 1
+    assert pool.failovers == 1
+
+
+@pytest.mark.asyncio
+async def test_writes_stick_to_one_endpoint():
+    first, second = FakeEndpoint("first", delay=0.02), FakeEndpoint("second")
+    pool = make_pool(first, second, hedge_max_delay=0.001)
+
+    for _ in range(5):
+        response = await pool.make_request("eth_sendRawTransaction", ["0x00"])
+        assert response["result"] == "first"
+
+    assert second.methods == []
+    assert pool.hedged == 0
+
+
+def test_from_env_skips_entries_that_are_not_http_urls(monkeypatch):
+    # What python-dotenv yields for a blank value followed by an inline comment
+    monkeypatch.setenv("SOMNIA_RPC_URLS", "# Optional comma-separated endpoint pool, overrides SOMNIA_RPC_URL")
+    monkeypatch.setenv("SOMNIA_RPC_URL", "https://rpc.example")
+    assert [e.url for e in RPCPool.from_env().endpoints] == ["https://rpc.example"]
+
+    monkeypatch.setenv("SOMNIA_RPC_URLS", "wss://ws.example, https://a.example ,http://b.example")
+    assert [e.url for e in RPCPool.from_env().endpoints] == ["https://a.example", "http://b.example"]
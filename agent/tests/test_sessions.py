@@ -0,0 +1,104 @@
+# Wallet sign-in and session tokens - signature checks, tampering and Transfer-event revocation (no network)
+import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from app.auth_cache import TRANSFER_TOPIC
+from app.sessions import SessionError, SessionManager
+
+ACCESS_NFT = "0x" + "44" * 20
+
+
+def sign(account, message):
+    return "0x" + account.sign_message(encode_defunct(text=message)).signature.hex().removeprefix("0x")
+
+
+def transfer_log(sender, receiver):
+    def word(address):
+        return "0x" + "00" * 12 + address[2:].lower()
+    return {"address": ACCESS_NFT, "topics": ["0x" + TRANSFER_TOPIC.hex(), word(sender), word(receiver), "0x" + "00" * 31 + "07"]}
+
+
+def test_sign_in_issues_a_token_that_validates_locally_and_only_once_per_nonce():
+    sessions = SessionManager(ACCESS_NFT, secret="test-secret")
+    alice, mallory = Account.create(), Account.create()
+
+    challenge = sessions.challenge(alice.address)
+    assert f"Nonce: {challenge['nonce']}" in challenge["message"]
+    with pytest.raises(SessionError):
+        sessions.verify_signature(challenge["message"], sign(mallory, challenge["message"]))
+    # The failed attempt consumed the nonce
+    with pytest.raises(SessionError):
+        sessions.verify_signature(challenge["message"], sign(alice, challenge["message"]))
+
+    challenge = sessions.challenge(alice.address)
+    altered = challenge["message"].replace("Chain ID: 50312", "Chain ID: 1")
+    with pytest.raises(SessionError):
+        sessions.verify_signature(altered, sign(alice, altered))
+
+    challenge = sessions.challenge(alice.address)
+    assert sessions.verify_signature(challenge["message"], sign(alice, challenge["message"])) == alice.address
+
+    token = sessions.issue(alice.address, 7)["token"]
+    session = sessions.validate(token)
+    assert session.address == alice.address and session.token_id == 7
+
+    body, _, signature = token.partition(".")
+    with pytest.raises(SessionError):
+        sessions.validate(body[:-2] + "xx." + signature)
+    with pytest.raises(SessionError):
+        SessionManager(ACCESS_NFT, secret="other-secret").validate(token)
+
+
+def test_transfers_and_reconnects_revoke_earlier_tokens():
+    sessions = SessionManager(ACCESS_NFT, secret="test-secret")
+    alice, bob = Account.create(), Account.create()
+    sessions.set_live(True)
+
+    alice_token = sessions.issue(alice.address, 7)["token"]
+    bob_token = sessions.issue(bob.address, 8)["token"]
+
+    sessions.on_log(transfer_log(alice.address, "0x" + "cc" * 20))
+    with pytest.raises(SessionError):
+        sessions.validate(alice_token)
+    assert sessions.validate(bob_token).token_id == 8
+
+    # Signing in again after the transfer works
+    assert sessions.validate(sessions.issue(alice.address, 9)["token"]).token_id == 9
+
+    # Transfers may have been missed while the socket was down
+    sessions.set_live(False)
+    assert sessions.validate(bob_token)
+    sessions.set_live(True)
+    with pytest.raises(SessionError):
+        sessions.validate(bob_token)
+    assert sessions.sessions_rejected == 2
+
+
+def test_tokens_are_short_lived_without_pushed_transfers_and_challenges_are_bounded(monkeypatch):
+    sessions = SessionManager(ACCESS_NFT, secret="test-secret", ttl=900, poll_ttl=15, max_challenges=3, max_challenges_per_address=2)
+    alice, bob = Account.create(), Account.create()
+    clock = [1000.0]
+    monkeypatch.setattr("app.sessions.time.time", lambda: clock[0])
+
+    assert sessions.issue(alice.address, 7)["expires_at"] == 1015.0
+    sessions.set_live(True)
+    token = sessions.issue(alice.address, 7)["token"]
+    # The subscription drops: a token from while it was live is only trusted for poll_ttl
+    sessions.set_live(False)
+    clock[0] += 16
+    with pytest.raises(SessionError):
+        sessions.validate(token)
+
+    first = sessions.challenge(alice.address)
+    for _ in range(2):
+        sessions.challenge(alice.address)
+    with pytest.raises(SessionError):
+        sessions.verify_signature(first["message"], sign(alice, first["message"]))
+    for _ in range(2):
+        sessions.challenge(bob.address)
+    assert sessions.metrics()["pending_challenges"] == 3
+
+    for secret in ("# HMAC key for session tokens", "two words"):
+        with pytest.raises(ValueError):
+            SessionManager(ACCESS_NFT, secret=secret)
@@ -0,0 +1,191 @@
+# Transaction pipeline tests - nonce allocation, transaction building and receipt tracking (no network)
+import asyncio
+
+import pytest
+
+from app.transactions import NonceManager, ReceiptTracker, TransactionBuilder, is_nonce_error
+
+
+class FakeEth:
+    """Just enough of AsyncWeb3.eth for the transaction pipeline"""
+
+    def __init__(self, pending_nonce=0):
+        self.pending_nonce = pending_nonce
+        self.nonce_reads = 0
+        self.receipts = {}
+        self.reads = {"chain_id": 0, "gas_price": 0}
+
+    @property
+    async def chain_id(self):
+        self.reads["chain_id"] += 1
+        return 50312
+
+    @property
+    async def gas_price(self):
+        self.reads["gas_price"] += 1
+        return 6_000_000_000
+
+    async def get_transaction_count(self, address, block_identifier="latest"):
+        self.nonce_reads += 1
+        return self.pending_nonce
+
+    async def get_transaction_receipt(self, tx_hash):
+        if tx_hash not in self.receipts:
+            raise LookupError("not mined")
+        return self.receipts[tx_hash]
+
+
+class FakeWeb3:
+    def __init__(self, pending_nonce=0):
+        self.eth = FakeEth(pending_nonce)
+
+
+class FakeFunction:
+    """Bound contract function stand-in with a counted estimate_gas"""
+
+    address = "0x" + "12" * 20
+    fn_name = "recordDerivative"
+
+    def __init__(self, argument_bytes=64):
+        self.data = "0x" + "ab" * 4 + "00" * argument_bytes
+        self.estimates = 0
+
+    def _encode_transaction_data(self):
+        return self.data
+
+    async def estimate_gas(self, transaction=None):
+        self.estimates += 1
+        await asyncio.sleep(0)
+        return 100_000
+
+
+@pytest.mark.asyncio
+async def test_nonces_are_sequential_with_single_chain_read():
+    w3 = FakeWeb3(pending_nonce=7)
+    manager = NonceManager(w3, "0xabc")
+
+    nonces = await asyncio.gather(*[manager.allocate() for _ in range(20)])
+
+    assert sorted(nonces) == list(range(7, 27))
+    assert w3.eth.nonce_reads == 1
+
+
+@pytest.mark.asyncio
+async def test_released_nonce_is_reused_before_new_ones():
+    manager = NonceManager(FakeWeb3(pending_nonce=0), "0xabc")
+    first, second, third = [await manager.allocate() for _ in range(3)]
+
+    manager.release(second)
+    manager.mark_sent(first)
+    manager.mark_sent(third)
+
+    assert await manager.allocate() == second
+    assert await manager.allocate() == 3
+
+
+@pytest.mark.asyncio
+async def test_resync_after_nonce_too_low():
+    w3 = FakeWeb3(pending_nonce=0)
+    manager = NonceManager(w3, "0xabc")
+    assert await manager.allocate() == 0
+
+    # Another sender used the key; the chain is now ahead of us
+    w3.eth.pending_nonce = 5
+    assert is_nonce_error(ValueError("{'code': -32000, 'message': 'nonce too low'}"))
+    await manager.resync()
+
+    assert await manager.allocate() == 5
+
+
+@pytest.mark.asyncio
+async def test_gap_left_by_a_failed_concurrent_send_is_filled_and_resync_keeps_unsent_nonces():
+    w3 = FakeWeb3(pending_nonce=0)
+    broadcast = []
+
+    async def fill_gap(nonce):
+        broadcast.append(nonce)
+
+    manager = NonceManager(w3, "0xabc", fill_gap=fill_gap, gap_fill_delay=0.01)
+
+    async def send(fail):
+        nonce = await manager.allocate()
+        await asyncio.sleep(0.005)
+        if fail:
+            manager.release(nonce)
+            return None
+        broadcast.append(nonce)
+        manager.mark_sent(nonce)
+        return nonce
+
+    # Nonce 0 fails to send after nonce 1 went out; 1 would wait on 0 forever
+    assert await asyncio.gather(send(fail=True), send(fail=False)) == [None, 1]
+    await asyncio.sleep(0.05)
+    assert sorted(broadcast) == [0, 1] and manager.gaps_filled == 1
+
+    # A gap that the next send takes in time isn't filled
+    assert await asyncio.gather(send(fail=True), send(fail=False)) == [None, 3]
+    assert await send(fail=False) == 2
+    await asyncio.sleep(0.05)
+    assert manager.gaps_filled == 1
+
+    # Another sender's rejected nonce forces a resync while this one holds 4 unsent
+    held = await manager.allocate()
+    w3.eth.pending_nonce = 4
+    await manager.resync()
+    assert await manager.allocate() == held + 1
+
+
+@pytest.mark.asyncio
+async def test_receipt_tracker_resolves_many_hashes_in_one_loop():
+    w3 = FakeWeb3()
+    tracker = ReceiptTracker(w3, poll_interval=0.01)
+    hashes = [bytes([i]) * 32 for i in range(5)]
+    futures = [tracker.track(h) for h in hashes]
+
+    for h in hashes:
+        w3.eth.receipts[h] = {"transactionHash": h, "status": 1}
+
+    receipts = await asyncio.wait_for(asyncio.gather(*futures), timeout=1)
+    assert [r["transactionHash"] for r in receipts] == hashes
+    assert tracker.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_receipt_tracker_times_out():
+    tracker = ReceiptTracker(FakeWeb3(), poll_interval=0.01)
+    with pytest.raises(Exception, match="not in the chain"):
+        await tracker.wait(b"\x01" * 32, timeout=0.05)
+
+
+@pytest.mark.asyncio
+async def test_builder_caches_chain_id_fees_and_gas():
+    w3 = FakeWeb3()
+    builder = TransactionBuilder(w3, "0xabc", fee_mode="legacy", fee_ttl=60, gas_buffer=1.5, size_bucket=64)
+    function = FakeFunction()
+
+    txs = await asyncio.gather(*[builder.build(function, nonce) for nonce in range(10)])
+
+    assert [tx["nonce"] for tx in txs] == list(range(10))
+    assert all(tx["gas"] == 150_000 and tx["gasPrice"] == 6_000_000_000 and tx["chainId"] == 50312 for tx in txs)
+    assert w3.eth.reads == {"chain_id": 1, "gas_price": 1}
+    assert function.estimates == 1
+
+    # Much larger calldata falls in another bucket and gets its own estimate
+    larger = FakeFunction(argument_bytes=1024)
+    await builder.build(larger, 10)
+    assert larger.estimates == 1
+
+
+@pytest.mark.asyncio
+async def test_builder_re_estimates_after_out_of_gas():
+    builder = TransactionBuilder(FakeWeb3(), "0xabc", fee_mode="legacy")
+    function = FakeFunction()
+    tx = await builder.build(function, 0)
+
+    assert not builder.ran_out_of_gas(tx, {"status": 1, "gasUsed": 90_000})
+    await builder.build(function, 1)
+    assert function.estimates == 1
+
+    assert builder.ran_out_of_gas(tx, {"status": 0, "gasUsed": tx["gas"]})
+    await builder.build(function, 2)
+    assert function.estimates == 2